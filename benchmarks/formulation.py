@@ -0,0 +1,94 @@
+"""
+Benchmark of the formulations of the logical constraints of the collective (pool) MILP: big-M constraints (all
+solvers) versus indicator constraints (CPLEX only).
+The instances are built from the post-processing example backpack, replicated over a number of meters (with slightly
+scaled loads, generation and tariffs, so that they are not identical) and days, with strict positive and total share
+allocation coefficients, i.e., with all logical constraints. Run it with the library installed (or with the root folder
+of the repository in the PYTHONPATH):
+	python benchmarks/formulation.py [--meters N] [--days D] [--solvers CBC CPLEX ...] [--timeout S] [--mipgap G]
+"""
+import argparse
+import time
+
+from copy import deepcopy
+from loguru import logger
+from pulp import listSolvers
+
+from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+from rec_sizing.optimization.module.indicator_constraints import INDICATOR_SOLVERS
+from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing import INPUTS_INSTALL_POOL_PP
+
+
+# puLP names of the solvers' interfaces
+SOLVER_INTERFACES = {'CBC': 'PULP_CBC_CMD', 'CPLEX': 'CPLEX_CMD', 'HiGHS': 'HiGHS_CMD'}
+
+
+def build_backpack(nr_meters: int, nr_days: int) -> dict:
+	"""
+	Builds a synthetic backpack by replicating the example backpack's meters and days.
+	:param nr_meters: number of meters
+	:param nr_days: number of times the example's horizon is repeated
+	:return: the backpack, with clustering weights of 1
+	"""
+	backpack = deepcopy(INPUTS_INSTALL_POOL_PP)
+	meters = list(backpack['meters'].values())
+	backpack['meters'] = {}
+	for i in range(nr_meters):
+		meter = deepcopy(meters[i % len(meters)])
+		for key in ['l_buy', 'l_sell', 'e_c', 'e_g_factor']:
+			meter[key] = [val * (1 + 0.01 * i) for val in meter[key]] * nr_days
+		backpack['meters'][f'Meter#{i + 1}'] = meter
+	backpack['l_grid'] = backpack['l_grid'] * nr_days
+	backpack['nr_days'] *= nr_days
+	backpack['w_clustering'] = [1] * len(backpack['l_grid'])
+	backpack['strict_pos_coeffs'] = True
+	backpack['total_share_coeffs'] = True
+
+	return backpack
+
+
+def run(backpack: dict, solver: str, formulation: str, timeout: int, mipgap: float) -> dict:
+	"""
+	Solves the collective (pool) MILP with a given solver and formulation.
+	:param backpack: the backpack
+	:param solver: solver to be used
+	:param formulation: one of "big_m" and "indicator"
+	:param timeout: time limit of the solver (s)
+	:param mipgap: relative MIP gap tolerance
+	:return: dict with the MILP's status, objective function value and solving time (s)
+	"""
+	milp = CollectiveMILPPool(deepcopy(backpack), backpack['nr_days'], solver, timeout, mipgap, write_lp=False,
+							  formulation=formulation)
+	tic = time.perf_counter()
+	milp.solve_milp()
+
+	return {'status': milp.status, 'obj_value': milp.obj_value, 'time': time.perf_counter() - tic}
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark of the big-M and indicator formulations')
+	parser.add_argument('--meters', type=int, default=6, help='number of meters')
+	parser.add_argument('--days', type=int, default=2, help='number of repetitions of the example\'s horizon')
+	parser.add_argument('--solvers', nargs='+', default=['CBC', 'HiGHS', 'CPLEX'], help='solvers to be benchmarked')
+	parser.add_argument('--timeout', type=int, default=600, help='time limit of the solver (s)')
+	parser.add_argument('--mipgap', type=float, default=0.0, help='relative MIP gap tolerance')
+	args = parser.parse_args()
+	logger.remove()
+
+	available = listSolvers(onlyAvailable=True)
+	backpack = build_backpack(args.meters, args.days)
+	print(f'{args.meters} meters, {len(backpack["l_grid"])} time steps')
+	print(f'{"solver":<8} {"formulation":<12} {"status":<12} {"objective":>12} {"time (s)":>9}')
+	for solver in args.solvers:
+		if SOLVER_INTERFACES.get(solver) not in available:
+			print(f'{solver:<8} not available')
+			continue
+		formulations = ['big_m', 'indicator'] if solver in INDICATOR_SOLVERS else ['big_m']
+		for formulation in formulations:
+			result = run(backpack, solver, formulation, args.timeout, args.mipgap)
+			obj_value = f'{result["obj_value"]:.4f}' if result['obj_value'] is not None else '-'
+			print(f'{solver:<8} {formulation:<12} {result["status"]:<12} {obj_value:>12} {result["time"]:>9.2f}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,63 @@
+"""
+Import-time benchmark of the rec_sizing package and of its subsystems.
+Each import is timed in a fresh interpreter (so that no module is cached), and the heavy dependencies loaded by each
+import are listed, for tracking the package's startup time. Run it from the root folder of the repository:
+	python benchmarks/import_time.py [--runs N]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+# Imports to be timed, from the lightest to the heaviest subsystem
+IMPORTS = (
+	'rec_sizing',
+	'rec_sizing.optimization_functions',
+	'rec_sizing.post_processing_functions',
+	'rec_sizing.persistence_functions',
+	'rec_sizing.clustering.module.Clustering',
+)
+# Heavy dependencies whose loading is reported
+HEAVY_MODULES = ('pulp', 'joblib', 'pandas', 'scipy', 'sklearn', 'sklearn_extra', 'matplotlib')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def time_import(module: str, runs: int) -> dict:
+	"""
+	Times the import of a module in fresh interpreters.
+	:param module: name of the module to be imported
+	:param runs: number of fresh interpreters in which the import is timed
+	:return: dict with the median and minimum import times, in seconds, and the heavy dependencies loaded
+	"""
+	results = []
+	for _ in range(runs):
+		output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+								capture_output=True, text=True, check=True).stdout
+		results.append(json.loads(output.strip().splitlines()[-1]))
+	elapsed = [result['elapsed'] for result in results]
+
+	return {'median': statistics.median(elapsed), 'min': min(elapsed), 'loaded': results[-1]['loaded']}
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Import-time benchmark of the rec_sizing package')
+	parser.add_argument('--runs', type=int, default=5, help='number of fresh interpreters per import')
+	args = parser.parse_args()
+
+	print(f'{"import":<45} {"median (s)":>10} {"min (s)":>8}  heavy dependencies loaded')
+	for module in IMPORTS:
+		result = time_import(module, args.runs)
+		print(f'{module:<45} {result["median"]:>10.3f} {result["min"]:>8.3f}  {", ".join(result["loaded"]) or "-"}')
+
+
+if __name__ == '__main__':
+	main()
@@ -1,8 +1,24 @@
+import importlib
 import os
 import sys
 
 from loguru import logger
-from .optimization_functions import *
+
+
+# Main optimization functions, exported by "from rec_sizing import *" (and loaded on first access)
+__all__ = [
+	'run_clustering_kmedoids',
+	'run_pre_collective_pool_milp',
+	'run_rolling_horizon_collective_pool_milp',
+	'run_fixed_investment_evaluation',
+	'run_heuristic_screening',
+	'run_coarse_to_fine_collective_pool_milp',
+	'run_relax_and_fix_collective_pool_milp',
+	'run_admm_collective_pool_milp',
+	'run_stochastic_collective_pool_milp',
+	'run_lp_dual_pricing',
+	'run_infeasibility_diagnosis'
+]
 
 
 LOG_FORMAT = \
@@ -14,3 +30,25 @@ LOG_FORMAT = \
 	'{message}'
 
 logger.configure(handlers=[{'sink': sys.stderr, 'format': LOG_FORMAT, 'level': 'INFO'}])
+
+
+def __getattr__(name: str):
+	"""
+	Loads the main optimization functions (and their heavy dependencies, e.g., puLP and joblib) only when they are
+	first accessed, e.g., "rec_sizing.run_pre_collective_pool_milp", so that importing the package is fast (PEP 562).
+	:param name: name of the attribute being accessed
+	:return: the attribute of "rec_sizing.optimization_functions" with that name
+	"""
+	if not name.startswith('_'):
+		optimization_functions = importlib.import_module('.optimization_functions', __name__)
+		if hasattr(optimization_functions, name):
+			return getattr(optimization_functions, name)
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+	"""
+	Lists the package's attributes, including the (not yet loaded) main optimization functions, without importing them.
+	:return: sorted list with the attributes' names
+	"""
+	return sorted(globals().keys() | set(__all__))
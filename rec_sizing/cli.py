@@ -0,0 +1,325 @@
+"""
+Command-line interface of the REC sizing tool ("rec-sizing"), for running sizing jobs without a custom script.
+A job is defined by:
+	- a backpack: either a JSON file with the structure expected by run_pre_collective_pool_milp, or a directory with
+	the columnar layout read by load_backpack_from_directory (settings.json, meters' table and time series' files);
+	- optionally, the meters' ownership: a JSON file with the structure expected by run_post_processing, i.e.,
+	{"ownership": {meter_id: {member_id: share}}} (or just the inner {meter_id: {member_id: share}} dict); when it
+	is provided, the results are post-processed.
+The results are written in the compressed layout of save_results_to_directory.
+
+Usage:
+	rec-sizing run BACKPACK [--ownership OWNERSHIP.json] --output RESULTS_DIR [options]
+	rec-sizing batch JOBS_DIR --output RESULTS_DIR [--workers N] [options]
+	rec-sizing serve (--socket SOCKET_PATH | --queue QUEUE_DIR) [--workers N] [--max-rss-mb MB] [options]
+In batch mode, each subdirectory of JOBS_DIR is a job, with a "backpack.json" file or a columnar backpack layout, and
+an optional "ownership.json" file; the results of each job are written to RESULTS_DIR/<job name>.
+In serve mode, a pool of warm workers runs the jobs received over a local socket or through a file-based queue (see
+rec_sizing/worker.py).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from loguru import logger
+
+from rec_sizing.configs.configs import (
+	SOLVER_PROFILES,
+	WORKER_MAX_JOBS,
+	WORKER_MAX_RSS_MB,
+	WORKER_POOL_SIZE
+)
+
+
+# Names of the files of a job directory in batch mode
+BACKPACK_FILE = 'backpack.json'
+OWNERSHIP_FILE = 'ownership.json'
+# Columns of the timings' summary
+SUMMARY_COLUMNS = ('load', 'solve', 'post_processing', 'write', 'total')
+
+
+def _read_json(path: str) -> dict:
+	"""
+	Reads a JSON file.
+	:param path: path to the file
+	:return: the file's content
+	"""
+	with open(path) as json_file:
+		return json.load(json_file)
+
+
+def _load_backpack(backpack) -> dict:
+	"""
+	Loads a backpack from a JSON file or from a columnar backpack directory.
+	:param backpack: path to the JSON file or to the directory; a backpack dict is returned as is
+	:return: the backpack
+	"""
+	if isinstance(backpack, dict):
+		return backpack
+	if os.path.isdir(backpack):
+		if os.path.isfile(os.path.join(backpack, BACKPACK_FILE)):
+			return _read_json(os.path.join(backpack, BACKPACK_FILE))
+		from rec_sizing.persistence_functions import load_backpack_from_directory
+		return load_backpack_from_directory(backpack)
+	return _read_json(backpack)
+
+
+def _load_ownership(ownership) -> dict:
+	"""
+	Loads the meters' ownership from a JSON file, as expected by run_post_processing.
+	:param ownership: path to the JSON file, or the ownership dict itself
+	:return: dict with the "ownership" key
+	"""
+	if not isinstance(ownership, dict):
+		ownership = _read_json(ownership)
+	return ownership if 'ownership' in ownership else {'ownership': ownership}
+
+
+def run_job(backpack, output_path=None, ownership=None, solver_settings=None, validation='fast', file_format='npz',
+			log_level='INFO', job_name=None, model_cache=None, progress=False, gap_stall=None) -> dict:
+	"""
+	Runs a sizing job: loads the backpack (and ownership), runs the collective (pool) MILP, post-processes its results
+	if the ownership is provided and writes the results.
+	:param backpack: path to the backpack's JSON file or columnar directory, or the backpack dict itself
+	:param output_path: results directory; if None, the results are returned in the summary, under "results"
+	:param ownership: path to the ownership's JSON file, or the ownership dict itself; if None, the results are not
+		post-processed
+	:param solver_settings: dict with the "solver", "timeout" and "mipgap" to be used
+	:param validation: validation level of the post-processing; one of "off", "fast" and "full"
+	:param file_format: format of the results' time series files; one of "npz" and "parquet"
+	:param log_level: minimum level of the log messages written to stderr
+	:param job_name: name of the job in the summary; defaults to the backpack's file or directory name
+	:param model_cache: directory of the on-disk model cache; None disables it
+	:param progress: if True, the solver's progress (incumbent, bound, gap, nodes and elapsed time) is logged live
+	:param gap_stall: optional (improvement, seconds) pair; the solver's search is stopped, returning its incumbent,
+		when the relative gap has not improved by "improvement" (e.g., 0.001 for 0.1 %) in "seconds"
+	:return: summary of the job, with its status, validation outcome ("passed" or "failed"; None if the results were
+		not validated), objective function value, timings per stage (s) and error message
+	"""
+	from rec_sizing import LOG_FORMAT
+	from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+	from rec_sizing.optimization.module.solver_progress import GapStagnationRule
+	from rec_sizing.persistence_functions import save_results_to_directory
+	logger.configure(handlers=[{'sink': sys.stderr, 'format': LOG_FORMAT, 'level': log_level}])
+
+	if job_name is None:
+		job_name = 'job' if isinstance(backpack, dict) else os.path.basename(os.path.normpath(backpack))
+	solver_settings = solver_settings or SOLVER_PROFILES['default']
+	summary = {'job': job_name, 'status': None, 'validation': None, 'obj_value': None, 'error': None,
+			   **{column: None for column in SUMMARY_COLUMNS}}
+	start = time.perf_counter()
+	try:
+		# -- LOAD ------------------------------------------------------------------------------------------------------
+		tic = time.perf_counter()
+		backpack = _load_backpack(backpack)
+		ownership = _load_ownership(ownership) if ownership is not None else None
+		summary['load'] = time.perf_counter() - tic
+
+		# -- SOLVE -----------------------------------------------------------------------------------------------------
+		tic = time.perf_counter()
+		results = run_pre_collective_pool_milp(
+			backpack, **solver_settings, model_cache=model_cache,
+			progress_callback=_log_progress if progress else None,
+			stop_rule=GapStagnationRule(*gap_stall) if gap_stall is not None else None)
+		summary['solve'] = time.perf_counter() - tic
+		summary['status'] = results.get('milp_status', 'Infeasible')
+		summary['obj_value'] = results.get('obj_value')
+
+		# -- POST-PROCESSING -------------------------------------------------------------------------------------------
+		if ownership is not None and results:
+			from rec_sizing.post_processing_functions import run_post_processing
+			tic = time.perf_counter()
+			results = run_post_processing(results, backpack, ownership, validation=validation)
+			summary['post_processing'] = time.perf_counter() - tic
+			if 'validation' in results:
+				summary['validation'] = 'passed' if results['validation']['passed'] else 'failed'
+
+		# -- WRITE -----------------------------------------------------------------------------------------------------
+		if output_path is not None:
+			tic = time.perf_counter()
+			save_results_to_directory(results, output_path, file_format)
+			summary['write'] = time.perf_counter() - tic
+		else:
+			summary['results'] = results
+
+	except Exception as e:
+		logger.error(f'job {summary["job"]} failed: {e}')
+		summary['status'] = 'Error'
+		summary['error'] = str(e)
+
+	summary['total'] = time.perf_counter() - start
+
+	return summary
+
+
+def _log_progress(event: dict):
+	"""
+	Logs a progress event of the solver.
+	:param event: progress event (see SolverMonitor)
+	"""
+	gap = f'{event["gap"]:.2%}' if event['gap'] is not None else '-'
+	logger.info(f'[{event["solver"]} {event["elapsed"]:8.1f} s] incumbent = {event["incumbent"]}, '
+				f'bound = {event["bound"]}, gap = {gap}, nodes = {event["nodes"]}')
+
+
+def find_jobs(jobs_path: str) -> list:
+	"""
+	Lists the jobs in a jobs directory, i.e., its subdirectories with a backpack (JSON file or columnar layout).
+	:param jobs_path: jobs directory
+	:return: list of (job name, backpack path, ownership path or None) tuples, sorted by job name
+	"""
+	jobs = []
+	for job_name in sorted(os.listdir(jobs_path)):
+		job_path = os.path.join(jobs_path, job_name)
+		if not os.path.isdir(job_path):
+			continue
+		if not os.path.isfile(os.path.join(job_path, BACKPACK_FILE)) and \
+				not os.path.isfile(os.path.join(job_path, 'settings.json')):
+			logger.warning(f'{job_path} has no {BACKPACK_FILE} nor a columnar backpack layout; skipping it')
+			continue
+		ownership_path = os.path.join(job_path, OWNERSHIP_FILE)
+		jobs.append((job_name, job_path, ownership_path if os.path.isfile(ownership_path) else None))
+
+	return jobs
+
+
+def format_summary(summaries: list) -> str:
+	"""
+	Formats the summaries of the jobs as a table.
+	:param summaries: list with the summaries returned by run_job
+	:return: table with one row per job, with its status, validation outcome, objective function value and timings (s)
+	"""
+	job_width = max([len('job')] + [len(summary['job']) for summary in summaries])
+	fmt_time = lambda val: f'{val:.2f}' if val is not None else '-'
+	lines = [f'{"job":<{job_width}}  {"status":<10}  {"validation":<10}  {"obj_value":>12}  ' +
+			 '  '.join(f'{column:>15}' for column in SUMMARY_COLUMNS)]
+	for summary in summaries:
+		obj_value = f'{summary["obj_value"]:.3f}' if summary['obj_value'] is not None else '-'
+		validation = summary.get('validation') or '-'
+		lines.append(f'{summary["job"]:<{job_width}}  {summary["status"]:<10}  {validation:<10}  {obj_value:>12}  ' +
+					 '  '.join(f'{fmt_time(summary[column]):>15}' for column in SUMMARY_COLUMNS))
+
+	return '\n'.join(lines)
+
+
+def _solver_settings(args) -> dict:
+	"""
+	Builds the solver settings from the chosen profile, overridden by any explicitly provided setting.
+	:param args: parsed command-line arguments
+	:return: dict with the "solver", "timeout" and "mipgap" to be used
+	"""
+	solver_settings = dict(SOLVER_PROFILES[args.profile])
+	for key in ('solver', 'timeout', 'mipgap'):
+		if getattr(args, key) is not None:
+			solver_settings[key] = getattr(args, key)
+
+	return solver_settings
+
+
+def build_parser() -> argparse.ArgumentParser:
+	"""
+	Builds the parser of the command-line arguments.
+	:return: the argument parser
+	"""
+	parser = argparse.ArgumentParser(prog='rec-sizing', description='REC Sizing Tool for optimal REC planning and sizing')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	common = argparse.ArgumentParser(add_help=False)
+	common.add_argument('--output', '-o', required=True, help='results directory')
+	common.add_argument('--profile', choices=sorted(SOLVER_PROFILES), default='default',
+						help='solver profile, i.e., solver, timeout and mipgap (default: %(default)s)')
+	common.add_argument('--solver', choices=['CBC', 'CPLEX', 'HiGHS'], help='solver; overrides the profile')
+	common.add_argument('--timeout', type=int, help='time limit of the solver, in seconds; overrides the profile')
+	common.add_argument('--mipgap', type=float, help='relative MIP gap tolerance; overrides the profile')
+	common.add_argument('--validation', choices=['off', 'fast', 'full'], default='fast',
+						help='validation level of the post-processed results (default: %(default)s)')
+	common.add_argument('--format', dest='file_format', choices=['npz', 'parquet'], default='npz',
+						help='format of the results\' time series files (default: %(default)s)')
+	common.add_argument('--model-cache', help='directory of the on-disk cache of compiled MILP structures')
+	common.add_argument('--progress', action='store_true',
+						help='log the solver\'s progress (incumbent, bound, gap, nodes and elapsed time) live')
+	common.add_argument('--gap-stall', nargs=2, type=float, metavar=('IMPROVEMENT', 'SECONDS'),
+						help='stop the search, keeping the incumbent, if the relative gap has not improved by '
+							 'IMPROVEMENT (e.g., 0.001) in SECONDS (CBC and CPLEX)')
+	common.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+						help='minimum level of the log messages (default: %(default)s)')
+
+	run_parser = subparsers.add_parser('run', parents=[common], help='run a single sizing job')
+	run_parser.add_argument('backpack', help='backpack JSON file or columnar backpack directory')
+	run_parser.add_argument('--ownership', help='ownership JSON file; if provided, the results are post-processed')
+
+	batch_parser = subparsers.add_parser('batch', parents=[common], help='run all sizing jobs of a directory')
+	batch_parser.add_argument('jobs', help='directory with one subdirectory per job')
+	batch_parser.add_argument('--workers', '-w', type=int, default=1,
+							  help='number of jobs run in parallel; -1 uses all available CPUs (default: %(default)s)')
+
+	serve_parser = subparsers.add_parser('serve', help='serve sizing jobs with a pool of warm workers')
+	channel = serve_parser.add_mutually_exclusive_group(required=True)
+	channel.add_argument('--socket', help='path of the local (Unix domain) socket to listen on')
+	channel.add_argument('--queue', help='directory of the file-based queue to serve')
+	serve_parser.add_argument('--workers', '-w', type=int, default=WORKER_POOL_SIZE,
+							  help='number of worker processes (default: %(default)s)')
+	serve_parser.add_argument('--max-rss-mb', type=float, default=WORKER_MAX_RSS_MB,
+							  help='resident memory (MB) above which a worker is recycled (default: %(default)s)')
+	serve_parser.add_argument('--max-jobs-per-worker', type=int, default=WORKER_MAX_JOBS,
+							  help='number of jobs after which a worker is recycled (default: no limit)')
+	serve_parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+							  help='minimum level of the log messages (default: %(default)s)')
+
+	return parser
+
+
+def main(argv=None) -> int:
+	"""
+	Entry point of the "rec-sizing" command.
+	:param argv: command-line arguments; if None, sys.argv is used
+	:return: exit code; 0 if all jobs were solved (or the server stopped), 1 otherwise
+	"""
+	args = build_parser().parse_args(argv)
+	if args.command == 'serve':
+		from rec_sizing.worker import serve_queue, serve_socket, WorkerPool
+		with WorkerPool(args.workers, args.max_rss_mb, args.max_jobs_per_worker, args.log_level) as pool:
+			try:
+				if args.socket is not None:
+					serve_socket(pool, args.socket)
+				else:
+					serve_queue(pool, args.queue)
+			except KeyboardInterrupt:
+				logger.info('stopping the worker pool...')
+		return 0
+
+	if args.file_format == 'parquet':
+		from rec_sizing.persistence.module.backpack_io import require_parquet_engine
+		try:
+			require_parquet_engine()
+		except ImportError as error:
+			logger.error(str(error))
+			return 1
+	solver_settings = _solver_settings(args)
+	job_settings = {'solver_settings': solver_settings, 'validation': args.validation, 'file_format': args.file_format,
+					'log_level': args.log_level, 'model_cache': args.model_cache, 'progress': args.progress,
+					'gap_stall': args.gap_stall}
+
+	if args.command == 'run':
+		summaries = [run_job(args.backpack, args.output, args.ownership, **job_settings)]
+	else:
+		jobs = find_jobs(args.jobs)
+		if not jobs:
+			logger.error(f'no jobs found in {args.jobs}')
+			return 1
+		from joblib import Parallel, delayed
+		summaries = Parallel(n_jobs=args.workers)(
+			delayed(run_job)(backpack_path, os.path.join(args.output, job_name), ownership_path, job_name=job_name,
+							 **job_settings)
+			for job_name, backpack_path, ownership_path in jobs
+		)
+
+	print(format_summary(summaries))
+
+	return 0 if all(summary['status'] in ['Optimal', 'Not Solved'] for summary in summaries) else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main())
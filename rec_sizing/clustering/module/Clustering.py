@@ -1,10 +1,6 @@
-import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
-import pickle
 
 from datetime import datetime
-from sklearn_extra.cluster import KMedoids
 
 from rec_sizing.custom_types.clustering_types import (
     BackpackKMedoids,
@@ -18,6 +14,8 @@ def clustering_kmedoids(inputs: BackpackKMedoids) -> OutputsKMedoids:
     user-defined number of clusters.
     Data must be provided in a fixed, yet configurable time step, in multiples of 1 day, and must include 4 series of
     data per day: generation PV factor, consumption in kWh and buying and selling opportunity costs in €/kWh
+    Any of these series can be provided as the name of a series in inputs['series'], in which case series shared by
+    several meters are clustered only once, and their representative days are also returned per name.
 
     :param inputs: dictionary with the data to be clustered, the data's time step, the number of days included
     and the desired number of resulting clusters (i.e., representative days)
@@ -25,51 +23,75 @@ def clustering_kmedoids(inputs: BackpackKMedoids) -> OutputsKMedoids:
     :return: dictionary with the medoids (representative days) separated by data serie, the medoid label attributed to
     each day, an inertia parameter (representing an intracluster distance) and the number of days per clusters
     """
+    # scikit-learn(-extra) is only imported when clustering is used, since it takes a while to load
+    from sklearn_extra.cluster import KMedoids
+
     nr_days = inputs['nr_days']
     delta_t = inputs['delta_t']
     # Number of meters defined
     meter_ids = inputs['timeseries_data'].keys()
-    nr_meters = len(meter_ids)
-    # Number of data points in a day for a single var (e_g, e_c, l_buy or l_sell; l_grid not included)
-    nr_daily_points_per_var = int(24 * nr_meters / delta_t)
-    # Number of total data points for a single var (e_g, e_c, l_buy or l_sell; l_grid not included)
-    nr_points_per_var = int(nr_days * 24 * nr_meters / delta_t)
     # Number of data points in a day for a single var and single meter (e_g, e_c, l_buy, l_sell and l_grid)
     nr_daily_delta_t = int(24 / delta_t)
-
-    # Create an auxiliary dataframe version of the inputs
-    inputs_df = None
-    for meter_id in meter_ids:
-        if inputs_df is not None:
-            meter_df = pd.DataFrame(inputs['timeseries_data'][meter_id])
-            meter_df['meter_id'] = meter_id
-            meter_df['date'] = 0
-            inputs_df = pd.concat([inputs_df, meter_df], axis=0)
-        else:
-            inputs_df = pd.DataFrame(inputs['timeseries_data'][meter_id])
-            inputs_df['meter_id'] = meter_id
-            inputs_df['date'] = 0
-    inputs_df.reset_index(inplace=True, drop=True)
-
-    inputs_df['hours'] = list(range(nr_daily_delta_t * nr_days)) * nr_meters
-    inputs_df['date'] = inputs_df['hours'] // nr_daily_delta_t
-
-    # Check that the number of timeseries data points provided matches the number of days times the step in hours
-    assert len(inputs_df) == nr_points_per_var, \
-        f'The number of timeseries data points ({len(inputs_df)}) provided ' \
-        f'does not match nr_days * 24 / delta_t = {nr_points_per_var}'
+    # Number of total data points for a single var and single meter (e_g, e_c, l_buy, l_sell and l_grid)
+    nr_points_per_series = int(nr_days * 24 / delta_t)
+    # Named series that can be referenced by the meters instead of their own data
+    series_table = inputs.get('series') or {}
+
+    # Identify the unique series of each var (e_g, e_c, l_buy or l_sell): each meter's own series, or the named series
+    # it references, so that named series shared by several meters are included only once in the clustering
+    def series_sources(var: str) -> list:
+        """
+        Lists the unique sources of a var's series, in the order of the meters, as (source_type, source_id) tuples.
+        :param var: name of the var
+        :return: list with the unique sources of the var's series
+        """
+        sources = []
+        for meter_id in meter_ids:
+            meter_series = inputs['timeseries_data'][meter_id][var]
+            source = ('series', meter_series) if isinstance(meter_series, str) else ('meter', meter_id)
+            if source not in sources:
+                sources.append(source)
+        return sources
+
+    def series_matrix(var: str, sources: list) -> np.ndarray:
+        """
+        Re-organizes the series of a var into a matrix with one row per day, where each row is the concatenation of
+        the daily data of all the var's sources, i.e., with length = nr_daily_delta_t * nr_sources.
+        :param var: name of the var
+        :param sources: list with the unique sources of the var's series
+        :return: 2D NumPy array with shape (nr_days, nr_daily_delta_t * nr_sources)
+        """
+        daily_matrices = []
+        for source_type, source_id in sources:
+            if source_type == 'series':
+                if source_id not in series_table:
+                    raise ValueError(f'{var} references an unknown series "{source_id}"')
+                data = np.asarray(series_table[source_id], dtype=float)
+            else:
+                data = np.asarray(inputs['timeseries_data'][source_id][var], dtype=float)
+            # Check that the number of timeseries data points provided matches the number of days times the step
+            assert len(data) == nr_points_per_series, \
+                f'The number of timeseries data points ({len(data)}) provided ' \
+                f'does not match nr_days * 24 / delta_t = {nr_points_per_series}'
+            daily_matrices.append(data.reshape(nr_days, nr_daily_delta_t))
+        return np.concatenate(daily_matrices, axis=1)
+
+    e_g_sources = series_sources('e_g_factor')
+    e_c_sources = series_sources('e_c')
+    l_buy_sources = series_sources('l_buy')
+    l_sell_sources = series_sources('l_sell')
 
     # Create auxiliry array of the grid tariffs' list
     l_grid_array = np.array(inputs['l_grid'])
 
-    # Re-organize data into lists of lists, where each list represents a different type of data
-    # and each sublist has the extent of one day * nr_meters
-    # Results in an array with nr_days arrays, each with length = nr_daily_delta_t * nr_meters, except for
+    # Re-organize data into matrices, where each matrix represents a different type of data
+    # and each row has the extent of one day * nr_sources
+    # Results in arrays with nr_days rows, each with length = nr_daily_delta_t * nr_sources, except for
     # l_grid_matrix with length = nr_daily_delta_t, since it is meter-agnostic
-    e_g_ready = np.array([inputs_df.loc[inputs_df['date'] == date, 'e_g_factor'].values for date in range(nr_days)])
-    e_c_matrix = np.array([inputs_df.loc[inputs_df['date'] == date, 'e_c'].values for date in range(nr_days)])
-    l_buy_matrix = np.array([inputs_df.loc[inputs_df['date'] == date, 'l_buy'].values for date in range(nr_days)])
-    l_sell_matrix = np.array([inputs_df.loc[inputs_df['date'] == date, 'l_sell'].values for date in range(nr_days)])
+    e_g_ready = series_matrix('e_g_factor', e_g_sources)
+    e_c_matrix = series_matrix('e_c', e_c_sources)
+    l_buy_matrix = series_matrix('l_buy', l_buy_sources)
+    l_sell_matrix = series_matrix('l_sell', l_sell_sources)
 
     l_grid_matrix = l_grid_array.reshape(nr_days, nr_daily_delta_t)
 
@@ -111,22 +133,22 @@ def clustering_kmedoids(inputs: BackpackKMedoids) -> OutputsKMedoids:
     total_distance_calculation = round(kmedoids.inertia_, 3)
 
     # Individualize each variable at the representative days matrix
-    # Note that each representative day in the rep_days_matrix, i.e., each sublist has
-    # length = nr_daily_delta_t * nr_meters * 4 + nr_daily_delta_t; the first nr_daily_delta_t * nr_meters are the
-    # e_g timeseries and so on
-    up_limit_e_g = nr_daily_points_per_var
+    # Note that each representative day in the rep_days_matrix, i.e., each row has
+    # length = nr_daily_delta_t * (nr_e_g_sources + nr_e_c_sources + nr_l_buy_sources + nr_l_sell_sources + 1);
+    # the first nr_daily_delta_t * nr_e_g_sources are the e_g timeseries and so on
+    up_limit_e_g = nr_daily_delta_t * len(e_g_sources)
     rep_days_e_g_final = rep_days_matrix[:, :up_limit_e_g]
 
     dn_limit_e_c = up_limit_e_g
-    up_limit_e_c = nr_daily_points_per_var * 2
+    up_limit_e_c = dn_limit_e_c + nr_daily_delta_t * len(e_c_sources)
     rep_days_e_c_normalized = rep_days_matrix[:, dn_limit_e_c:up_limit_e_c]
 
     dn_limit_l_buy = up_limit_e_c
-    up_limit_l_buy = nr_daily_points_per_var * 3
+    up_limit_l_buy = dn_limit_l_buy + nr_daily_delta_t * len(l_buy_sources)
     rep_days_l_buy_normalized = rep_days_matrix[:, dn_limit_l_buy:up_limit_l_buy]
 
     dn_limit_l_sell = up_limit_l_buy
-    up_limit_l_sell = nr_daily_points_per_var * 4
+    up_limit_l_sell = dn_limit_l_sell + nr_daily_delta_t * len(l_sell_sources)
     rep_days_l_sell_normalized = rep_days_matrix[:, dn_limit_l_sell:up_limit_l_sell]
 
     dn_limit_l_grid = up_limit_l_sell
@@ -155,45 +177,48 @@ def clustering_kmedoids(inputs: BackpackKMedoids) -> OutputsKMedoids:
     unique_cluster_labels, cluster_counts = np.unique(day_cluster_labels, return_counts=True)
 
     # Fill and return the outputs
-    representative_e_g_factor = {
-        meter_id: {
-            cluster_label:
-                list(rep_days_e_g_final[idx_cluster][
-                     int(nr_daily_delta_t * idx_meter):int(nr_daily_delta_t*(idx_meter+1))].round(3))
-            for idx_cluster, cluster_label in enumerate(unique_cluster_labels)
+    def representative_series(rep_days_final: np.ndarray, sources: list, decimals: int) -> dict:
+        """
+        Retrieves the representative days of each source of a var's series.
+        :param rep_days_final: 2D NumPy array with the (denormalized) representative days of the var
+        :param sources: list with the unique sources of the var's series, in the order of the array's columns
+        :param decimals: number of decimals to which the values are rounded
+        :return: dict with the representative days per cluster label, per source
+        """
+        return {
+            source: {
+                cluster_label:
+                    list(rep_days_final[idx_cluster][
+                         int(nr_daily_delta_t * idx_source):int(nr_daily_delta_t * (idx_source + 1))].round(decimals))
+                for idx_cluster, cluster_label in enumerate(unique_cluster_labels)
+            }
+            for idx_source, source in enumerate(sources)
         }
-        for idx_meter, meter_id in enumerate(meter_ids)
-    }
 
-    representative_e_c = {
-        meter_id: {
-            cluster_label:
-                list(rep_days_e_c_final[idx_cluster][
-                     int(nr_daily_delta_t*idx_meter):int(nr_daily_delta_t*(idx_meter+1))].round(3))
-            for idx_cluster, cluster_label in enumerate(unique_cluster_labels)
-        }
-        for idx_meter, meter_id in enumerate(meter_ids)
+    representative_sources = {
+        'e_g_factor': representative_series(rep_days_e_g_final, e_g_sources, 3),
+        'e_c': representative_series(rep_days_e_c_final, e_c_sources, 3),
+        'l_buy': representative_series(rep_days_l_buy_final, l_buy_sources, 6),
+        'l_sell': representative_series(rep_days_l_sell_final, l_sell_sources, 6)
     }
 
-    representative_l_buy = {
-        meter_id: {
-            cluster_label:
-                list(rep_days_l_buy_final[idx_cluster][
-                     int(nr_daily_delta_t*idx_meter):int(nr_daily_delta_t*(idx_meter+1))].round(6))
-            for idx_cluster, cluster_label in enumerate(unique_cluster_labels)
-        }
-        for idx_meter, meter_id in enumerate(meter_ids)
-    }
+    def meter_source(meter_id: str, var: str) -> tuple:
+        """
+        Identifies the source of a meter's series for a given var, as in series_sources.
+        :param meter_id: meter identifier
+        :param var: name of the var
+        :return: (source_type, source_id) tuple
+        """
+        meter_series = inputs['timeseries_data'][meter_id][var]
+        return ('series', meter_series) if isinstance(meter_series, str) else ('meter', meter_id)
 
-    representative_l_sell = {
-        meter_id: {
-            cluster_label:
-                list(rep_days_l_sell_final[idx_cluster][
-                     int(nr_daily_delta_t*idx_meter):int(nr_daily_delta_t*(idx_meter+1))].round(6))
-            for idx_cluster, cluster_label in enumerate(unique_cluster_labels)
+    representative_e_g_factor, representative_e_c, representative_l_buy, representative_l_sell = [
+        {
+            meter_id: representative_sources[var][meter_source(meter_id, var)]
+            for meter_id in meter_ids
         }
-        for idx_meter, meter_id in enumerate(meter_ids)
-    }
+        for var in ['e_g_factor', 'e_c', 'l_buy', 'l_sell']
+    ]
 
     representative_l_grid = {
         cluster_label:
@@ -217,4 +242,12 @@ def clustering_kmedoids(inputs: BackpackKMedoids) -> OutputsKMedoids:
         'cluster_nr_days': cluster_nr_days
     }
 
+    if series_table:
+        # Named series are shared by several meters, so their representative days are also provided once per name
+        outputs['representative_series'] = {}
+        for var_sources in representative_sources.values():
+            for (source_type, source_id), representative_days in var_sources.items():
+                if source_type == 'series' and source_id not in outputs['representative_series']:
+                    outputs['representative_series'][source_id] = representative_days
+
     return outputs
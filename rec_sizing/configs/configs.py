@@ -5,3 +5,42 @@ DT_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 MIPGAP = 0.01
 SOLVER = 'CPLEX'
 TIMEOUT = 86400  # seconds
+
+# Default number of parallel jobs (joblib convention: -1 uses all available CPUs)
+N_JOBS = -1
+
+# Number of clustering results kept in memory, per process, to be reused by backpacks with the same data (0 disables it)
+CLUSTERING_CACHE_SIZE = 8
+
+# On-disk cache of the compiled MILP structure: default directory (None disables it) and maximum size (MB)
+MODEL_CACHE_DIR = None
+MODEL_CACHE_MAX_MB = 1024
+
+# Solver profiles for the command-line interface: solver, time limit (seconds) and tolerance per profile
+SOLVER_PROFILES = {
+	'default': {'solver': SOLVER, 'timeout': TIMEOUT, 'mipgap': MIPGAP},
+	'fast': {'solver': 'CBC', 'timeout': 600, 'mipgap': 0.05},
+	'cbc': {'solver': 'CBC', 'timeout': TIMEOUT, 'mipgap': MIPGAP},
+	'highs': {'solver': 'HiGHS', 'timeout': TIMEOUT, 'mipgap': MIPGAP},
+	'exact': {'solver': SOLVER, 'timeout': TIMEOUT, 'mipgap': 0.0},
+}
+
+# Warm worker pool: number of worker processes, resident memory (MB) above which a worker is recycled after its job and
+# maximum number of jobs per worker before it is recycled (None for no limit)
+WORKER_POOL_SIZE = 2
+WORKER_MAX_RSS_MB = 4096
+WORKER_MAX_JOBS = None
+
+# ADMM decomposition across meters: penalty on the deviations from the pool exchange targets (€/kWh), step of the pool
+# prices' update (€/kWh per kWh of mean pool imbalance), maximum number of iterations and tolerance on the pool
+# imbalances (kWh)
+ADMM_PENALTY = 0.01
+ADMM_STEP = 0.05
+ADMM_MAX_ITERATIONS = 30
+ADMM_TOLERANCE = 0.001
+
+# Progressive hedging over scenarios: penalty on the deviations of the investments from their consensus (fraction of
+# their costs), maximum number of iterations and tolerance on the expected deviation from the consensus (kW or kWh)
+PH_PENALTY = 0.1
+PH_MAX_ITERATIONS = 30
+PH_TOLERANCE = 0.01
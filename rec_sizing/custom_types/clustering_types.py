@@ -1,11 +1,12 @@
-from typing import Dict, List, TypedDict
+from typing import Dict, List, TypedDict, Union
 
 # -- INPUTS ------------------------------------------------------------------------------------------------------------
 class TimeseriesDataDict(TypedDict):
-    e_g_factor: List[float]
-    e_c: List[float]
-    l_buy: List[float]
-    l_sell: List[float]
+    # time series can also be provided as the name of a series in the backpack's "series" table
+    e_g_factor: Union[List[float], str]
+    e_c: Union[List[float], str]
+    l_buy: Union[List[float], str]
+    l_sell: Union[List[float], str]
 
 
 class BackpackKMedoids(TypedDict):
@@ -14,6 +15,7 @@ class BackpackKMedoids(TypedDict):
     nr_representative_days: int
     l_grid: List[float]
     timeseries_data: Dict[str, TimeseriesDataDict]
+    series: Dict[str, List[float]]  # optional; named series referenced in timeseries_data
 
 
 # -- OUTPUTS -----------------------------------------------------------------------------------------------------------
@@ -28,4 +30,5 @@ class OutputsKMedoids(TypedDict):
     representative_l_buy: CommonRepresentativeTimeseriesDict
     representative_l_sell: CommonRepresentativeTimeseriesDict
     representative_l_grid: Dict[str, List[float]]
+    representative_series: Dict[str, Dict[str, List[float]]]  # only if named series were provided
     cluster_nr_days: Dict[str, float]
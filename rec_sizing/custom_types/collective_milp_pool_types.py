@@ -14,6 +14,7 @@ class BackpackCollectivePoolDict(TypedDict):
     strict_pos_coeffs: bool
     total_share_coeffs: bool
     meters: Meters
+    series: Dict[str, List[float]]  # optional; named series that meters can reference instead of their own lists
 
 
 # -- OUTPUTS -----------------------------------------------------------------------------------------------------------
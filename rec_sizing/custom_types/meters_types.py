@@ -3,20 +3,22 @@ from typing import Dict, List, TypedDict, Union
 # from typing_extensions import TypeAlias
 
 class SingleMeter(TypedDict):
-    l_buy: List[float]
-    l_sell: List[float]
+    # time series can also be provided as the name of a series in the backpack's "series" table
+    l_buy: Union[List[float], str]
+    l_sell: Union[List[float], str]
     l_cont: float
     l_gic: float
     l_bic: float
-    e_c: List[float]
+    e_c: Union[List[float], str]
     p_gn_init: float
-    e_g_factor: List[float]
+    e_g_factor: Union[List[float], str]
     p_gn_min: float
     p_gn_max: float
     e_bn_init: float
     e_bn_min: float
     e_bn_max: float
     soc_min: float
+    soc_init: float
     eff_bc: float
     eff_bd: float
     soc_max: float
@@ -0,0 +1,191 @@
+import numpy as np
+
+from typing import (
+	List,
+	Tuple
+)
+
+from rec_sizing.custom_types.collective_milp_pool_types import BackpackCollectivePoolDict
+
+
+# Meters' parameters that are provided as time series, i.e., with one value per time step
+METER_TIMESERIES_KEYS = ('l_buy', 'l_sell', 'e_c', 'e_g_factor')
+# Time series that express energy per time step (summed when aggregating), as opposed to factors and prices (averaged)
+ENERGY_TIMESERIES_KEYS = ('e_c',)
+
+
+def resolve_series(backpack: BackpackCollectivePoolDict) -> BackpackCollectivePoolDict:
+	"""
+	Replaces, in place, the meters' time series provided as the name of a series in backpack["series"] by that series.
+	Meters that reference the same named series are assigned the same list, so the data is not duplicated.
+	:param backpack: backpack with the meters' data, as expected by run_pre_collective_pool_milp
+	:return: the same backpack, with all time series resolved
+	"""
+	series = backpack.get('series') or {}
+	for meter_id, meter_data in backpack['meters'].items():
+		for key in METER_TIMESERIES_KEYS:
+			series_name = meter_data.get(key)
+			if not isinstance(series_name, str):
+				continue
+			if series_name not in series:
+				raise ValueError(f'{key} of meter {meter_id} references an unknown series "{series_name}"')
+			meter_data[key] = series[series_name]
+
+	return backpack
+
+
+def slice_backpack(backpack: BackpackCollectivePoolDict, first_step: int, last_step: int) \
+		-> BackpackCollectivePoolDict:
+	"""
+	Returns a copy of the backpack whose time series data only cover the time steps in [first_step, last_step[.
+	Scalar parameters are shared with the original backpack and "nr_days" is updated to the sliced horizon.
+	:param backpack: backpack with the full horizon data, as expected by run_pre_collective_pool_milp
+	:param first_step: first time step to be included in the sliced backpack
+	:param last_step: time step after the last one to be included in the sliced backpack
+	:return: backpack with the sliced data
+	"""
+	sliced = {
+		key: val for key, val in backpack.items()
+		if key not in ('meters', 'l_grid', 'w_clustering', 'series')
+	}
+	sliced['nr_days'] = (last_step - first_step) * backpack['delta_t'] / 24
+	if sliced['nr_days'] == int(sliced['nr_days']):
+		sliced['nr_days'] = int(sliced['nr_days'])
+	sliced['l_grid'] = list(backpack['l_grid'][first_step:last_step])
+	if backpack.get('w_clustering') is not None:
+		sliced['w_clustering'] = list(backpack['w_clustering'][first_step:last_step])
+	sliced['meters'] = {
+		meter_id: {
+			key: list(val[first_step:last_step]) if key in METER_TIMESERIES_KEYS else val
+			for key, val in meter_data.items()
+		}
+		for meter_id, meter_data in backpack['meters'].items()
+	}
+
+	return sliced
+
+
+def select_meters(backpack: BackpackCollectivePoolDict, meter_ids) -> BackpackCollectivePoolDict:
+	"""
+	Returns a copy of the backpack with the data of some of its meters only.
+	The remaining data and the meters' data are shared with the original backpack.
+	:param backpack: backpack with the data of all meters, as expected by run_pre_collective_pool_milp
+	:param meter_ids: IDs of the meters to be kept
+	:return: backpack with the selected meters
+	"""
+	selected = {key: val for key, val in backpack.items() if key != 'meters'}
+	selected['meters'] = {meter_id: backpack['meters'][meter_id] for meter_id in meter_ids}
+
+	return selected
+
+
+def scenario_backpacks(backpack: BackpackCollectivePoolDict) -> Tuple[List[BackpackCollectivePoolDict], List[float]]:
+	"""
+	Expands the scenarios of a backpack into one backpack per scenario. Each scenario in backpack["scenarios"] is a
+	dict with its "weight" (any positive value; the weights are normalized to add up to 1) and, optionally, its own
+	"l_grid" and a "meters" dict with, per meter ID, the meters' time series that differ from the backpack's (any of
+	"l_buy", "l_sell", "e_c" and "e_g_factor", as arrays or names of series in backpack["series"]).
+	The remaining data is shared with the original backpack.
+	:param backpack: backpack with the scenarios, as expected by run_stochastic_collective_pool_milp
+	:return: tuple with the list of backpacks (without "scenarios") and the list of normalized weights
+	"""
+	scenarios = backpack.get('scenarios')
+	if not scenarios:
+		raise ValueError('the backpack has no "scenarios"; please provide a list with at least one scenario')
+	weights = [scenario.get('weight') for scenario in scenarios]
+	if not all(isinstance(weight, (int, float)) and weight > 0 for weight in weights):
+		raise ValueError(f'scenarios\' weights = {weights}; please provide a positive weight for each scenario')
+
+	backpacks = []
+	for i, scenario in enumerate(scenarios):
+		unknown_keys = set(scenario) - {'weight', 'l_grid', 'meters'}
+		if unknown_keys:
+			raise ValueError(f'scenario {i} has unknown keys {sorted(unknown_keys)}; please provide any of '
+							 f'["weight", "l_grid", "meters"]')
+		scenario_backpack = {key: val for key, val in backpack.items() if key not in ('scenarios', 'meters')}
+		if scenario.get('l_grid') is not None:
+			scenario_backpack['l_grid'] = scenario['l_grid']
+		scenario_backpack['meters'] = {
+			meter_id: dict(meter_data) for meter_id, meter_data in backpack['meters'].items()
+		}
+		for meter_id, meter_series in scenario.get('meters', {}).items():
+			if meter_id not in backpack['meters']:
+				raise ValueError(f'scenario {i} refers to an unknown meter {meter_id}')
+			for key, val in meter_series.items():
+				if key not in METER_TIMESERIES_KEYS:
+					raise ValueError(f'{key} of meter {meter_id} in scenario {i} is not a time series; please provide '
+									 f'any of {list(METER_TIMESERIES_KEYS)}')
+				scenario_backpack['meters'][meter_id][key] = val
+		backpacks.append(scenario_backpack)
+
+	return backpacks, [weight / sum(weights) for weight in weights]
+
+
+def stack_scenarios(backpacks: List[BackpackCollectivePoolDict], weights: List[float]) -> BackpackCollectivePoolDict:
+	"""
+	Stacks the time series of several scenarios' backpacks along the horizon, with the clustering weights of each
+	scenario scaled by its weight, so that a single MILP over the stacked horizon minimizes the expected cost.
+	:param backpacks: list with the backpacks of each scenario, prepared for the MILP (i.e., with their time series
+		resolved and their "w_clustering") and with the same meters and horizon
+	:param weights: list with the weights of each scenario, adding up to 1
+	:return: backpack with the stacked data and "nr_days" = number of scenarios * the scenarios' "nr_days"
+	"""
+	stacked = {
+		key: val for key, val in backpacks[0].items()
+		if key not in ('meters', 'l_grid', 'w_clustering', 'series')
+	}
+	stacked['nr_days'] = backpacks[0]['nr_days'] * len(backpacks)
+	stacked['l_grid'] = [val for scenario_backpack in backpacks for val in scenario_backpack['l_grid']]
+	stacked['w_clustering'] = [val * weight for scenario_backpack, weight in zip(backpacks, weights)
+							   for val in scenario_backpack['w_clustering']]
+	stacked['meters'] = {
+		meter_id: {
+			key: [val for scenario_backpack in backpacks for val in scenario_backpack['meters'][meter_id][key]]
+			if key in METER_TIMESERIES_KEYS else val
+			for key, val in meter_data.items()
+		}
+		for meter_id, meter_data in backpacks[0]['meters'].items()
+	}
+
+	return stacked
+
+
+def aggregate_backpack(backpack: BackpackCollectivePoolDict, coarse_delta_t: float) -> BackpackCollectivePoolDict:
+	"""
+	Returns a copy of the backpack with its time series aggregated to a coarser time step, e.g., from 15 minutes to
+	1 hour. Energy time series are summed over the aggregated steps, while generation factors, prices and clustering
+	weights are averaged.
+	:param backpack: backpack with the original data, as expected by run_pre_collective_pool_milp
+	:param coarse_delta_t: the coarser time step, in hours; must be a multiple of the original "delta_t"
+	:return: backpack with the aggregated data and "delta_t" = coarse_delta_t
+	"""
+	delta_t = backpack['delta_t']
+	factor = coarse_delta_t / delta_t
+	if factor < 1 or abs(factor - round(factor)) > 1e-9:
+		raise ValueError(f'coarse_delta_t = {coarse_delta_t} is not a multiple of delta_t = {delta_t}')
+	factor = int(round(factor))
+
+	def aggregate(series, func):
+		series = np.asarray(series, dtype=float)
+		if len(series) % factor != 0:
+			raise ValueError(f'time series with {len(series)} steps cannot be aggregated in groups of {factor} steps')
+		return func(series.reshape(-1, factor), axis=1).tolist()
+
+	aggregated = {
+		key: val for key, val in backpack.items()
+		if key not in ('meters', 'l_grid', 'w_clustering', 'series')
+	}
+	aggregated['delta_t'] = coarse_delta_t
+	aggregated['l_grid'] = aggregate(backpack['l_grid'], np.mean)
+	if backpack.get('w_clustering') is not None:
+		aggregated['w_clustering'] = aggregate(backpack['w_clustering'], np.mean)
+	aggregated['meters'] = {
+		meter_id: {
+			key: aggregate(val, np.sum if key in ENERGY_TIMESERIES_KEYS else np.mean)
+			if key in METER_TIMESERIES_KEYS else val
+			for key, val in meter_data.items()
+		}
+		for meter_id, meter_data in backpack['meters'].items()
+	}
+
+	return aggregated
@@ -1,5 +1,3 @@
-import pandas as pd
-
 from datetime import datetime, timedelta
 from rec_sizing.configs.configs import DT_FORMAT
 from rec_sizing.custom_types.optimization_helpers_types import (
@@ -0,0 +1,218 @@
+import numpy as np
+
+from typing import List
+
+from rec_sizing.custom_types.collective_milp_pool_types import (
+	BackpackCollectivePoolDict,
+	OutputsCollectivePoolDict,
+	ValuePerId
+)
+
+
+# Outputs of the collective (pool) MILP with one value per meter
+INVESTMENT_KEYS = ('p_cont', 'p_gn_new', 'p_gn_total', 'e_bn_new', 'e_bn_total')
+# Outputs of the collective (pool) MILP with one array per meter, with one value per time step
+METER_STEP_KEYS = ('e_cmet', 'e_g', 'e_bc', 'e_bd', 'e_sup', 'e_sur', 'e_pur_pool', 'e_sale_pool', 'e_slc_pool',
+				   'e_bat', 'delta_sup', 'e_consumed', 'e_alc', 'delta_slc', 'delta_coeff', 'delta_meter_balance')
+# Outputs of the collective (pool) MILP with one value per time step
+STEP_KEYS = ('delta_rec_balance',)
+# Outputs of the collective (pool) MILP that correspond to binary variables
+BINARY_KEYS = ('delta_sup', 'delta_slc', 'delta_coeff', 'delta_meter_balance', 'delta_rec_balance')
+# Status of the outputs of decomposition heuristics whose parts were all optimally solved, e.g., the exchange ADMM
+# or progressive hedging; their solutions are feasible, but not necessarily optimal for the full MILP
+HEURISTIC_STATUS = 'Heuristic'
+
+
+def individual_costs(outputs: OutputsCollectivePoolDict, backpack: BackpackCollectivePoolDict,
+					 w_clustering: List[float], nr_dates: float) -> ValuePerId:
+	"""
+	Computes the individual costs of each meter for the optimization horizon, as considered in the objective function
+	of the collective (pool) MILP, i.e., the (unrounded) values of "c_ind2pool".
+	:param outputs: outputs with the schedules and investments per meter
+	:param backpack: backpack with the data used to obtain the outputs
+	:param w_clustering: clustering weights, i.e., nr. of days represented by each time step
+	:param nr_dates: number of original days considered in the optimization horizon
+	:return: dict with the individual costs per meter, in €
+	"""
+	l_grid = np.array(backpack['l_grid'])
+	w_clustering = np.array(w_clustering)
+	c_ind = {}
+	for n, meter_data in backpack['meters'].items():
+		e_sup = np.array(outputs['e_sup'][n])
+		e_sur = np.array(outputs['e_sur'][n])
+		e_slc = np.array(outputs['e_slc_pool'][n])
+		e_bd = np.array(outputs['e_bd'][n])
+		c_ind[n] = \
+			sum((e_sup * np.array(meter_data['l_buy']) - e_sur * np.array(meter_data['l_sell']) + e_slc * l_grid +
+				 e_bd * meter_data['deg_cost']) * w_clustering) + \
+			outputs['p_cont'][n] * meter_data['l_cont'] * nr_dates + \
+			outputs['p_gn_new'][n] * meter_data['l_gic'] * nr_dates + \
+			outputs['e_bn_new'][n] * meter_data['l_bic'] * nr_dates
+
+	return c_ind
+
+
+def merge_outputs(partial_outputs: List[OutputsCollectivePoolDict], nr_kept_steps: List[int],
+				  backpack: BackpackCollectivePoolDict, nr_dates: float) -> OutputsCollectivePoolDict:
+	"""
+	Merges the outputs of several collective (pool) MILPs, each solved for a consecutive part of the horizon, into the
+	usual outputs' structure of the full horizon. Only the first "nr_kept_steps" time steps of each partial output are
+	kept, so that overlapping (look-ahead) steps are discarded.
+	The contracted power of each meter is the maximum contracted power required over all parts, while the remaining
+	investment variables are taken from the first part (they are expected to be fixed and equal in all of them).
+	Individual costs and the objective function value are recomputed for the full horizon.
+	:param partial_outputs: list with the outputs of each part, in chronological order
+	:param nr_kept_steps: list with the number of time steps to keep from each part
+	:param backpack: backpack with the data of the full horizon
+	:param nr_dates: number of original days considered in the full horizon
+	:return: outputs dictionary with the merged MILP variables' and other computed values
+	"""
+	statuses = [part['milp_status'] for part in partial_outputs]
+	first_part = partial_outputs[0]
+
+	outputs = {
+		'obj_value': None,
+		'milp_status': next((status for status in statuses if status != 'Optimal'), 'Optimal'),
+		'nr_dates': nr_dates,
+		'w_clustering': [1] * sum(nr_kept_steps)
+	}
+
+	for key in INVESTMENT_KEYS:
+		outputs[key] = dict(first_part[key])
+	outputs['p_cont'] = {n: max(part['p_cont'][n] for part in partial_outputs) for n in first_part['p_cont']}
+
+	for key in METER_STEP_KEYS:
+		if key not in first_part:
+			continue
+		outputs[key] = {
+			n: [val for part, nr_steps in zip(partial_outputs, nr_kept_steps) for val in part[key][n][:nr_steps]]
+			for n in first_part[key]
+		}
+	for key in STEP_KEYS:
+		if key not in first_part:
+			continue
+		outputs[key] = [val for part, nr_steps in zip(partial_outputs, nr_kept_steps) for val in part[key][:nr_steps]]
+
+	c_ind = individual_costs(outputs, backpack, outputs['w_clustering'], nr_dates)
+	outputs['obj_value'] = round(sum(c_ind.values()), 3)
+	outputs['c_ind2pool'] = {n: round(cost, 4) for n, cost in c_ind.items()}
+	outputs['dual_prices'] = [
+		val for part, nr_steps in zip(partial_outputs, nr_kept_steps) for val in part['dual_prices'][:nr_steps]
+	]
+
+	return outputs
+
+
+def disaggregate_binaries(outputs: OutputsCollectivePoolDict, factor: int) -> dict:
+	"""
+	Repeats the values of the binary variables of a coarse time step MILP's outputs, so that they can be used as
+	initial values of a MILP with a time step "factor" times finer.
+	:param outputs: outputs of the coarse MILP
+	:param factor: ratio between the coarse and the fine time steps
+	:return: dict with the binary variables' keys and the repeated values, as in the MILP outputs
+	"""
+	repeat = lambda values: [val for val in values for _ in range(factor)]
+	binaries = {}
+	for key in BINARY_KEYS:
+		if key not in outputs:
+			continue
+		if key in STEP_KEYS:
+			binaries[key] = repeat(outputs[key])
+		else:
+			binaries[key] = {n: repeat(values) for n, values in outputs[key].items()}
+
+	return binaries
+
+
+def slice_binaries(outputs: OutputsCollectivePoolDict, first_step: int, last_step: int) -> dict:
+	"""
+	Retrieves the values of the binary variables of a MILP's outputs for the time steps in [first_step, last_step[,
+	e.g., for fixing them in a MILP solved for a part of the horizon.
+	:param outputs: outputs of the MILP
+	:param first_step: first time step to be retrieved
+	:param last_step: time step after the last one to be retrieved
+	:return: dict with the binary variables' keys and the sliced values, as in the MILP outputs
+	"""
+	binaries = {}
+	for key in BINARY_KEYS:
+		if key not in outputs:
+			continue
+		if key in STEP_KEYS:
+			binaries[key] = list(outputs[key][first_step:last_step])
+		else:
+			binaries[key] = {n: list(values[first_step:last_step]) for n, values in outputs[key].items()}
+
+	return binaries
+
+
+def slice_outputs(outputs: OutputsCollectivePoolDict, first_step: int, last_step: int,
+				  backpack: BackpackCollectivePoolDict, w_clustering: List[float], nr_dates: float) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Retrieves the outputs of a collective (pool) MILP for the time steps in [first_step, last_step[, e.g., for one of
+	the scenarios stacked along the horizon, as the outputs of a MILP over those time steps with the same investments.
+	Individual costs and the objective function value are recomputed for the sliced horizon.
+	:param outputs: outputs of the MILP
+	:param first_step: first time step to be retrieved
+	:param last_step: time step after the last one to be retrieved
+	:param backpack: backpack with the data of the sliced horizon
+	:param w_clustering: clustering weights of the sliced horizon
+	:param nr_dates: number of original days considered in the sliced horizon
+	:return: outputs dictionary with the sliced MILP variables' and other computed values
+	"""
+	sliced = {
+		'obj_value': None,
+		'milp_status': outputs['milp_status'],
+		'nr_dates': nr_dates,
+		'w_clustering': list(w_clustering)
+	}
+	for key in INVESTMENT_KEYS:
+		sliced[key] = dict(outputs[key])
+	for key in METER_STEP_KEYS:
+		if key in outputs:
+			sliced[key] = {n: list(values[first_step:last_step]) for n, values in outputs[key].items()}
+	for key in STEP_KEYS:
+		if key in outputs:
+			sliced[key] = list(outputs[key][first_step:last_step])
+
+	c_ind = individual_costs(sliced, backpack, w_clustering, nr_dates)
+	sliced['obj_value'] = round(sum(c_ind.values()), 3)
+	sliced['c_ind2pool'] = {n: round(cost, 4) for n, cost in c_ind.items()}
+	sliced['dual_prices'] = list(outputs['dual_prices'][first_step:last_step])
+
+	return sliced
+
+
+def merge_meter_outputs(partial_outputs: List[OutputsCollectivePoolDict], rec_balance: List[float],
+						dual_prices: List[float]) -> OutputsCollectivePoolDict:
+	"""
+	Merges the outputs of several collective (pool) MILPs, each solved for a part of the meters over the full horizon
+	(e.g., as subproblems of a decomposition), into the usual outputs' structure of all meters. Since the pool payments
+	cancel out, the objective function value is the sum of the individual costs.
+	:param partial_outputs: list with the outputs of each part
+	:param rec_balance: values of the REC balance binary variables, common to all parts; only used if the outputs
+		include "delta_rec_balance"
+	:param dual_prices: market prices of the merged outputs, in €/kWh
+	:return: outputs dictionary with the merged MILP variables' and other computed values, where "milp_status" is
+		HEURISTIC_STATUS if all parts were optimally solved (the merged solution is not necessarily optimal), or the
+		status of the first part that was not
+	"""
+	statuses = [part['milp_status'] for part in partial_outputs]
+	first_part = partial_outputs[0]
+
+	outputs = {
+		'obj_value': None,
+		'milp_status': next((status for status in statuses if status != 'Optimal'), HEURISTIC_STATUS),
+		'nr_dates': first_part['nr_dates'],
+		'w_clustering': first_part['w_clustering']
+	}
+	for key in INVESTMENT_KEYS + METER_STEP_KEYS + ('c_ind2pool',):
+		if key not in first_part:
+			continue
+		outputs[key] = {n: val for part in partial_outputs for n, val in part[key].items()}
+	if 'delta_rec_balance' in first_part:
+		outputs['delta_rec_balance'] = list(rec_balance)
+	outputs['obj_value'] = round(sum(outputs['c_ind2pool'].values()), 3)
+	outputs['dual_prices'] = list(dual_prices)
+
+	return outputs
@@ -0,0 +1,215 @@
+import numpy as np
+
+from typing import List
+
+from rec_sizing.custom_types.collective_milp_pool_types import BackpackCollectivePoolDict
+from rec_sizing.optimization.helpers.backpack_helpers import METER_TIMESERIES_KEYS
+from rec_sizing.optimization.helpers.milp_helpers import time_intervals
+
+
+# Backpack's settings required by the collective (pool) MILP
+REQUIRED_SETTINGS = ('nr_days', 'l_grid', 'delta_t', 'storage_ratio', 'meters')
+# Meters' scalar parameters required by the collective (pool) MILP ("soc_init" is optional)
+METER_SCALAR_KEYS = ('l_cont', 'l_gic', 'l_bic', 'p_meter_max', 'p_gn_init', 'p_gn_min', 'p_gn_max', 'e_bn_init',
+					 'e_bn_min', 'e_bn_max', 'soc_min', 'eff_bc', 'eff_bd', 'soc_max', 'deg_cost')
+# Meters' parameters that cannot be negative
+NON_NEGATIVE_KEYS = ('p_meter_max', 'p_gn_init', 'p_gn_max', 'e_bn_init', 'e_bn_max')
+# Relative tolerance for the feasibility conditions
+FEASIBILITY_RTOL = 1e-9
+
+
+def _is_number(val) -> bool:
+	"""
+	Checks if a value is a finite (non-boolean) real number.
+	:param val: value to be checked
+	:return: True if the value is a finite number
+	"""
+	return isinstance(val, (int, float, np.number)) and not isinstance(val, (bool, np.bool_)) and np.isfinite(val)
+
+
+def _settings_issues(backpack: BackpackCollectivePoolDict) -> List[str]:
+	"""
+	Checks the backpack's settings.
+	:param backpack: backpack, as expected by run_pre_collective_pool_milp
+	:return: list with the issues found
+	"""
+	issues = [f'"{key}" is missing from the backpack' for key in REQUIRED_SETTINGS if backpack.get(key) is None]
+	if issues:
+		return issues
+
+	nr_days = backpack['nr_days']
+	for key in ('nr_days', 'nr_clusters'):
+		nr = backpack.get(key)
+		if key == 'nr_clusters' and nr is None:
+			continue
+		if not _is_number(nr) or nr <= 0 or (nr >= 1 and nr != int(nr)):
+			issues.append(f'{key} = {nr}; it must be a positive integer (or a fraction of a single day)')
+	delta_t = backpack['delta_t']
+	if not _is_number(delta_t) or delta_t <= 0:
+		issues.append(f'delta_t = {delta_t}; it must be a positive number of hours')
+	elif abs(24 / delta_t - round(24 / delta_t)) > 1e-9:
+		issues.append(f'delta_t = {delta_t}; a day must have an integer number of time steps')
+	elif _is_number(nr_days) and nr_days > 0 and abs(nr_days * 24 / delta_t - round(nr_days * 24 / delta_t)) > 1e-9:
+		issues.append(f'nr_days = {nr_days} and delta_t = {delta_t}; the horizon must have an integer number of time '
+					  f'steps')
+	if not _is_number(backpack['storage_ratio']) or backpack['storage_ratio'] < 0:
+		issues.append(f'storage_ratio = {backpack["storage_ratio"]}; it must be a non-negative number')
+	if not backpack['meters']:
+		issues.append('the backpack has no meters')
+
+	return issues
+
+
+def _series_issues(backpack: BackpackCollectivePoolDict, nr_steps: int) -> List[str]:
+	"""
+	Checks the length and values of the backpack's time series, including the meters' references to named series.
+	:param backpack: backpack, as expected by run_pre_collective_pool_milp
+	:param nr_steps: expected number of time steps of the time series
+	:return: list with the issues found
+	"""
+	issues = []
+	named_series = backpack.get('series') or {}
+
+	def check_series(label: str, series):
+		try:
+			series = np.asarray(series, dtype=float)
+		except (TypeError, ValueError):
+			issues.append(f'{label} must be an array of numbers')
+			return
+		if series.ndim != 1 or len(series) != nr_steps:
+			issues.append(f'{label} has shape {series.shape}; expected {nr_steps} time steps')
+		elif not np.isfinite(series).all():
+			issues.append(f'{label} has {int((~np.isfinite(series)).sum())} non-finite value(s), the first at time step '
+						  f'{int(np.argmax(~np.isfinite(series)))}')
+
+	check_series('l_grid', backpack['l_grid'])
+	if backpack.get('w_clustering') is not None:
+		check_series('w_clustering', backpack['w_clustering'])
+	for meter_id, meter_data in backpack['meters'].items():
+		for key in METER_TIMESERIES_KEYS:
+			series = meter_data.get(key)
+			if series is None:
+				issues.append(f'{key} of meter {meter_id} is missing')
+			elif isinstance(series, str):
+				if series not in named_series:
+					issues.append(f'{key} of meter {meter_id} references an unknown series "{series}"')
+				else:
+					check_series(f'{key} of meter {meter_id} (series "{series}")', named_series[series])
+			else:
+				check_series(f'{key} of meter {meter_id}', series)
+
+	return issues
+
+
+def _bounds_issues(backpack: BackpackCollectivePoolDict) -> List[str]:
+	"""
+	Checks the meters' scalar parameters and the consistency of their bounds.
+	:param backpack: backpack, as expected by run_pre_collective_pool_milp
+	:return: list with the issues found
+	"""
+	issues = []
+	for meter_id, meter_data in backpack['meters'].items():
+		invalid_keys = [key for key in METER_SCALAR_KEYS if not _is_number(meter_data.get(key))]
+		if meter_data.get('soc_init') is not None and not _is_number(meter_data['soc_init']):
+			invalid_keys.append('soc_init')
+		if invalid_keys:
+			issues.append(f'meter {meter_id}: {", ".join(invalid_keys)} missing or not a finite number')
+			continue
+
+		for key in NON_NEGATIVE_KEYS:
+			if meter_data[key] < 0:
+				issues.append(f'meter {meter_id}: {key} = {meter_data[key]} < 0')
+		if meter_data['p_gn_min'] > meter_data['p_gn_max']:
+			issues.append(f'meter {meter_id}: p_gn_min = {meter_data["p_gn_min"]} > '
+						  f'p_gn_max = {meter_data["p_gn_max"]}')
+		if meter_data['e_bn_min'] > meter_data['e_bn_max']:
+			issues.append(f'meter {meter_id}: e_bn_min = {meter_data["e_bn_min"]} > '
+						  f'e_bn_max = {meter_data["e_bn_max"]}')
+		if not 0 <= meter_data['soc_min'] <= meter_data['soc_max'] <= 100:
+			issues.append(f'meter {meter_id}: soc_min = {meter_data["soc_min"]} and soc_max = {meter_data["soc_max"]} '
+						  f'must satisfy 0 <= soc_min <= soc_max <= 100')
+		soc_init = meter_data.get('soc_init')
+		if soc_init is not None and not meter_data['soc_min'] <= soc_init <= meter_data['soc_max']:
+			issues.append(f'meter {meter_id}: soc_init = {soc_init} outside [soc_min, soc_max] = '
+						  f'[{meter_data["soc_min"]}, {meter_data["soc_max"]}]')
+		for key in ('eff_bc', 'eff_bd'):
+			if not 0 < meter_data[key] <= 1:
+				issues.append(f'meter {meter_id}: {key} = {meter_data[key]} outside ]0, 1]')
+
+	return issues
+
+
+def _feasibility_issues(backpack: BackpackCollectivePoolDict) -> List[str]:
+	"""
+	Checks obvious infeasibility conditions of meters where no storage can be installed: the net load
+	e_c - e_g_factor * p_gn_total * delta_t must be within +/- p_meter_max * delta_t at every time step, for some PV
+	capacity p_gn_total between p_gn_init + max(p_gn_min, 0) and p_gn_init + p_gn_max (Eqs. 2, 4, 5, 7 and 8).
+	Expects the backpack to have passed the remaining checks.
+	:param backpack: backpack, as expected by run_pre_collective_pool_milp
+	:return: list with the issues found
+	"""
+	issues = []
+	named_series = backpack.get('series') or {}
+	resolve = lambda series: named_series[series] if isinstance(series, str) else series
+	delta_t = backpack['delta_t']
+
+	meters = [(meter_id, meter_data) for meter_id, meter_data in backpack['meters'].items()
+			  if meter_data['e_bn_init'] + meter_data['e_bn_max'] <= 0]
+	if not meters:
+		return issues
+
+	# (meters x time steps) arrays for all meters without storage
+	e_c = np.array([resolve(meter_data['e_c']) for _, meter_data in meters], dtype=float)
+	e_g_factor = np.array([resolve(meter_data['e_g_factor']) for _, meter_data in meters], dtype=float)
+	param = lambda key: np.array([meter_data[key] for _, meter_data in meters], dtype=float)
+	e_max = (param('p_meter_max') * delta_t)[:, None]
+	tol = FEASIBILITY_RTOL * np.maximum(1, np.abs(e_c).max(axis=1, initial=0))[:, None]
+
+	# time steps without generation: the consumption alone must not exceed the meter's limit
+	no_generation = e_g_factor <= 0
+	excess = np.where(no_generation, np.abs(e_c) - e_max, -np.inf)
+	# time steps with generation: each one restricts p_gn_total to an interval
+	with np.errstate(divide='ignore', invalid='ignore'):
+		low = np.where(no_generation, -np.inf, (e_c - e_max - tol) / (e_g_factor * delta_t)).max(axis=1)
+		high = np.where(no_generation, np.inf, (e_c + e_max + tol) / (e_g_factor * delta_t)).min(axis=1)
+	low_total = param('p_gn_init') + np.maximum(param('p_gn_min'), 0)
+	high_total = param('p_gn_init') + param('p_gn_max')
+
+	for idx, (meter_id, meter_data) in enumerate(meters):
+		infeasible_steps = np.flatnonzero(excess[idx] > tol[idx])
+		if infeasible_steps.size:
+			step = infeasible_steps[0]
+			issues.append(
+				f'meter {meter_id}: without storage or generation, the load exceeds p_meter_max = '
+				f'{meter_data["p_meter_max"]} kW at {infeasible_steps.size} time step(s), the first at time step '
+				f'{step} ({e_c[idx, step] / delta_t:.6g} kW)'
+			)
+		elif max(low[idx], low_total[idx]) > min(high[idx], high_total[idx]):
+			issues.append(
+				f'meter {meter_id}: without storage, keeping the net load within p_meter_max = '
+				f'{meter_data["p_meter_max"]} kW requires {low[idx]:.6g} <= p_gn_total <= {high[idx]:.6g} kW, '
+				f'but the PV capacity is bounded to [{low_total[idx]:.6g}, {high_total[idx]:.6g}] kW'
+			)
+
+	return issues
+
+
+def check_backpack(backpack: BackpackCollectivePoolDict) -> BackpackCollectivePoolDict:
+	"""
+	Pre-flight checks of a backpack, before building the collective (pool) MILP: required settings and parameters,
+	time series' lengths and values, consistency of the meters' bounds and obvious infeasibility conditions of meters
+	without storage. All issues found are reported at once.
+	:param backpack: backpack, as expected by run_pre_collective_pool_milp
+	:return: the same backpack, if no issues are found
+	"""
+	issues = _settings_issues(backpack)
+	if not issues:
+		nr_steps = time_intervals(backpack['nr_days'] * 24, backpack['delta_t'])
+		issues = _series_issues(backpack, nr_steps) + _bounds_issues(backpack)
+		if not issues:
+			issues = _feasibility_issues(backpack)
+
+	if issues:
+		raise ValueError(f'{len(issues)} issue(s) found in the backpack:\n- ' + '\n- '.join(issues))
+
+	return backpack
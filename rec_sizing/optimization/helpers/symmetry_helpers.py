@@ -0,0 +1,152 @@
+import numpy as np
+
+from typing import (
+	List,
+	Tuple
+)
+
+from rec_sizing.custom_types.collective_milp_pool_types import (
+	BackpackCollectivePoolDict,
+	OutputsCollectivePoolDict
+)
+from rec_sizing.optimization.helpers.outputs_helpers import (
+	BINARY_KEYS,
+	INVESTMENT_KEYS,
+	METER_STEP_KEYS
+)
+
+
+# Meters' parameters that scale with the number of meters represented by an aggregated meter
+SCALED_METER_KEYS = ('e_c', 'p_meter_max', 'p_gn_init', 'p_gn_min', 'p_gn_max', 'e_bn_init', 'e_bn_min', 'e_bn_max')
+
+
+def _same_meter_data(meter_data: dict, other_meter_data: dict, rtol: float) -> bool:
+	"""
+	Checks if two meters have the same parameters and time series, up to a relative tolerance.
+	:param meter_data: data of a meter, as in backpack['meters']
+	:param other_meter_data: data of another meter, as in backpack['meters']
+	:param rtol: relative tolerance for comparing numeric values
+	:return: True if the meters are identical
+	"""
+	if meter_data.keys() != other_meter_data.keys():
+		return False
+	for key, val in meter_data.items():
+		other_val = other_meter_data[key]
+		if val is None or other_val is None:
+			if val is not other_val:
+				return False
+			continue
+		if np.shape(val) != np.shape(other_val):
+			return False
+		if not np.allclose(np.asarray(val, dtype=float), np.asarray(other_val, dtype=float), rtol=rtol, atol=0):
+			return False
+
+	return True
+
+
+def identical_meter_groups(backpack: BackpackCollectivePoolDict, rtol=0.0) -> List[List[str]]:
+	"""
+	Groups the meters of a backpack with identical (or, if rtol > 0, near-identical) data, i.e., with the same
+	tariffs, load and generation profiles, investment bounds and storage parameters.
+	:param backpack: backpack with the meters' data, as expected by run_pre_collective_pool_milp
+	:param rtol: relative tolerance for comparing numeric values; 0.0 groups only strictly identical meters
+	:return: list with the groups of meters' IDs, in the order of backpack['meters']; meters without an identical
+		counterpart form single-meter groups
+	"""
+	groups = []
+	for meter_id, meter_data in backpack['meters'].items():
+		group = next((group for group in groups
+					  if _same_meter_data(backpack['meters'][group[0]], meter_data, rtol)), None)
+		if group is None:
+			groups.append([meter_id])
+		else:
+			group.append(meter_id)
+
+	return groups
+
+
+def _fixed_net_load(meter_data: dict) -> bool:
+	"""
+	Checks if the net load of a meter is fixed by its data, i.e., if it has no storage (installed or to be installed)
+	and its new generation capacity is fixed by its bounds.
+	:param meter_data: data of a meter, as in backpack['meters']
+	:return: True if the meter cannot shift or change its net load
+	"""
+	return meter_data['e_bn_init'] + meter_data['e_bn_max'] <= 0 and meter_data['p_gn_min'] == meter_data['p_gn_max']
+
+
+def exact_aggregation_groups(backpack: BackpackCollectivePoolDict, groups: List[List[str]]) \
+		-> Tuple[List[List[str]], List[List[str]]]:
+	"""
+	Splits the groups of identical meters into the groups whose aggregation by aggregate_meter_groups is exact and the
+	remaining ones. The aggregation is exact for groups of meters with fixed net loads (no storage and a fixed new
+	generation capacity): being identical, those meters are always on the same side of the pool and never trade with
+	each other, so operating them alike loses nothing. Meters with storage or generation to be sized may be better
+	operated differently, e.g., with one meter's storage supplying another through the pool, which the aggregated meter
+	cannot represent.
+	:param backpack: backpack with the meters' data, as expected by run_pre_collective_pool_milp
+	:param groups: groups of meters' IDs, as returned by identical_meter_groups
+	:return: tuple with the groups to be aggregated, where the groups that cannot be aggregated exactly are split into
+		single-meter groups, and the groups with more than one meter that cannot be aggregated exactly
+	"""
+	aggregation_groups = []
+	other_groups = []
+	for group in groups:
+		if len(group) > 1 and not _fixed_net_load(backpack['meters'][group[0]]):
+			aggregation_groups += [[meter_id] for meter_id in group]
+			other_groups.append(group)
+		else:
+			aggregation_groups.append(group)
+
+	return aggregation_groups, other_groups
+
+
+def aggregate_meter_groups(backpack: BackpackCollectivePoolDict, groups: List[List[str]]) \
+		-> BackpackCollectivePoolDict:
+	"""
+	Returns a copy of the backpack where each group of identical meters is replaced by a single representative meter,
+	identified by the first meter ID of the group, whose loads, power limits and investment bounds are scaled by the
+	number of meters in the group. Solving the MILP for this backpack is equivalent to imposing the same schedule and
+	investments on all meters of a group, so it provides a feasible plan for the original backpack, which is only
+	guaranteed to be optimal for the groups selected by exact_aggregation_groups.
+	:param backpack: backpack with the meters' data, as expected by run_pre_collective_pool_milp
+	:param groups: groups of meters' IDs, as returned by identical_meter_groups
+	:return: backpack with one (scaled) meter per group
+	"""
+	aggregated = {key: val for key, val in backpack.items() if key != 'meters'}
+	aggregated['meters'] = {}
+	for group in groups:
+		nr_meters = len(group)
+		aggregated['meters'][group[0]] = {
+			key: (np.asarray(val, dtype=float) * nr_meters).tolist() if key in SCALED_METER_KEYS else val
+			for key, val in backpack['meters'][group[0]].items()
+		}
+
+	return aggregated
+
+
+def expand_meter_groups(outputs: OutputsCollectivePoolDict, groups: List[List[str]]) -> OutputsCollectivePoolDict:
+	"""
+	Expands the outputs of a MILP solved for a backpack aggregated by aggregate_meter_groups back to the original
+	meters: the representative's values are split evenly by the meters of its group, except for the binary variables,
+	which are replicated.
+	:param outputs: outputs of the MILP with one (scaled) meter per group
+	:param groups: groups of meters' IDs used for the aggregation
+	:return: outputs dictionary with the values per original meter
+	"""
+	if not outputs:
+		return outputs
+
+	expanded = dict(outputs)
+	for key in INVESTMENT_KEYS + METER_STEP_KEYS + ('c_ind2pool',):
+		if key not in outputs:
+			continue
+		expanded[key] = {}
+		for group in groups:
+			val = outputs[key][group[0]]
+			if key not in BINARY_KEYS:
+				val = (np.asarray(val, dtype=float) / len(group)).tolist() if val is not None else None
+			for meter_id in group:
+				expanded[key][meter_id] = list(val) if isinstance(val, list) else val
+
+	return expanded
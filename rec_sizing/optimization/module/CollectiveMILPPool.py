@@ -6,9 +6,12 @@ import itertools
 import numpy as np
 import os
 import re
+import shutil
+import tempfile
 
 from rec_sizing.configs.configs import (
 	MIPGAP,
+	MODEL_CACHE_MAX_MB,
 	SOLVER,
 	TIMEOUT
 )
@@ -18,19 +21,44 @@ from rec_sizing.optimization.helpers.milp_helpers import (
 	none_lists,
 	time_intervals
 )
+from rec_sizing.optimization.helpers.outputs_helpers import BINARY_KEYS
+from rec_sizing.optimization.module.indicator_constraints import (
+	INDICATOR_SOLVERS,
+	IndicatorLpProblem
+)
+from rec_sizing.optimization.module.infeasibility import (
+	deletion_filter_iis,
+	elastic_diagnosis,
+	IIS_MAX_CONSTRAINTS
+)
+from rec_sizing.optimization.module.model_cache import (
+	build_problem,
+	compile_problem,
+	compiled_layout,
+	load_compiled,
+	save_compiled,
+	structure_key
+)
+from rec_sizing.optimization.module.solver_progress import (
+	line_buffered_wrapper,
+	SolverMonitor
+)
 from rec_sizing.custom_types.collective_milp_pool_types import (
 	BackpackCollectivePoolDict,
 	OutputsCollectivePoolDict
 )
 from loguru import logger
 from pulp import (
+	COIN_CMD,
 	CPLEX_CMD,
 	HiGHS_CMD,
 	listSolvers,
 	LpBinary,
+	LpInteger,
 	LpMinimize,
 	LpProblem,
 	LpStatus,
+	LpElement,
 	lpSum,
 	LpVariable,
 	pulp,
@@ -38,12 +66,59 @@ from pulp import (
 )
 
 
+# Meters' parameters that define the structure of the MILP (besides the meters, horizon, time step and formulation
+# options); the remaining data (time series and tariffs) is patched into the compiled structure by the model cache
+STRUCTURAL_METER_KEYS = ('p_meter_max', 'p_gn_init', 'p_gn_min', 'p_gn_max', 'e_bn_init', 'e_bn_min', 'e_bn_max',
+						 'soc_min', 'soc_init', 'soc_max', 'eff_bc', 'eff_bd')
+
+
+# Abbreviations of the investment decisions in the names of the investment consensus' auxiliary variables
+INVESTMENT_ABBREVIATIONS = {'p_cont': 'cont', 'p_gn_new': 'gn', 'e_bn_new': 'bn'}
+
+
+# Tolerance for considering the constraints omitted by the row generation as satisfied
+ROW_GENERATION_TOLERANCE = 1e-5
+
+
+def _map_layout(layout, function):
+	"""
+	Applies a function to every leaf of a (nested) structure of dicts and lists, e.g., to the decision variables stored
+	by outputs' key and meter ID.
+	:param layout: the (nested) structure
+	:param function: function to apply to the leaves
+	:return: structure with the same dicts and lists, with the function's results as leaves
+	"""
+	if isinstance(layout, dict):
+		return {key: _map_layout(val, function) for key, val in layout.items()}
+	if isinstance(layout, list):
+		return [_map_layout(val, function) for val in layout]
+	return function(layout)
+
+
 class CollectiveMILPPool:
 	def __init__(self, backpack: BackpackCollectivePoolDict,
 				 nr_dates: int,
 				 solver=SOLVER,
 				 timeout=TIMEOUT,
-				 mipgap=MIPGAP):
+				 mipgap=MIPGAP,
+				 fixed_investments=None,
+				 write_lp=True,
+				 investment_bounds=None,
+				 initial_values=None,
+				 relaxed_steps=None,
+				 fixed_binaries=None,
+				 symmetric_groups=None,
+				 model_cache=None,
+				 model_cache_max_mb=MODEL_CACHE_MAX_MB,
+				 progress_callback=None,
+				 stop_rule=None,
+				 tight_bounds=False,
+				 formulation='big_m',
+				 row_generation=False,
+				 pool_exchange=None,
+				 restart_steps=None,
+				 investment_consensus=None,
+				 final_soc=None):
 		"""
 		Initialize core MILP class
 		:param backpack: necessary data
@@ -51,6 +126,53 @@ class CollectiveMILPPool:
 		:param solver: which available solver should be used; currently supports CBC and CPLEX
 		:param timeout: time limit (s) for the solver to find a solution, after which the best (not optimal) is returned
 		:param mipgap: tolerance for the solver; between 0 and 1
+		:param fixed_investments: optional dict with the investment decisions to be fixed, i.e., not optimized, with any
+			of the keys "p_cont", "p_gn_new" and "e_bn_new" pointing to a dict of floats per meter ID
+		:param write_lp: if True, the MILP formulation is written to an .lp file next to this module; should be False
+			whenever several MILPs are defined concurrently
+		:param investment_bounds: optional dict with bounds to the investment decisions, with any of the keys "p_cont",
+			"p_gn_new" and "e_bn_new" pointing to a dict of (lower bound, upper bound) tuples per meter ID, where None
+			means unbounded; the original constraints on the investments (Eqs. 5, 8 and 10) are kept
+		:param initial_values: optional dict with initial values for the decision variables, for warm starting the
+			solver, with the same keys and structure as the MILP outputs; partial structures are admissible
+		:param relaxed_steps: optional collection with the time steps whose binary variables are relaxed to continuous
+			variables in [0, 1]; if all time steps are provided, the LP relaxation of the MILP is solved
+		:param fixed_binaries: optional dict with values to which the binary variables are fixed, with the same keys
+			and structure as the binary variables in the MILP outputs; time steps with None values are not fixed
+		:param symmetric_groups: optional list of groups of identical meters' IDs; within each group, symmetry-breaking
+			constraints order the meters by their daily investment costs
+		:param model_cache: optional directory of the on-disk model cache; if provided, the compiled structure of the
+			MILP is stored there and reused by later instances with the same structure, even in other processes
+		:param model_cache_max_mb: maximum size of the model cache, in MB; least recently used entries are evicted first
+		:param progress_callback: optional function called with the solver's progress events (incumbent, bound, gap,
+			nodes and elapsed time), parsed from its log while it is written (see SolverMonitor)
+		:param stop_rule: optional function called with the solver's progress events that returns True when the search
+			should be stopped, e.g., GapStagnationRule; the incumbent solution at that point is returned (CBC and CPLEX)
+		:param tight_bounds: if True, finite upper bounds are propagated to the continuous energy flows (see
+			__propagate_bounds), which tightens the LP relaxation without changing the optimal objective value
+		:param formulation: formulation of the logical constraints (Eqs. 18 and 21-32); one of "big_m" or "indicator",
+			where the latter writes them as indicator constraints and is only supported by CPLEX (for other solvers,
+			it is reverted to "big_m", with a warning); time steps with relaxed binary variables are kept in big-M form
+		:param row_generation: if True, the MILP is first solved without the sharing rules' constraints (Eqs. 23-32),
+			which are then iteratively added only for the meters and time steps where the solution violates them, until
+			no constraint is violated (see __generate_sharing_rows)
+		:param pool_exchange: optional dict for solving the meters' blocks of the MILP without the constraints that
+			couple them (Eqs. 17 and 25-26), e.g., as subproblems of a decomposition, with the keys "prices" (pool price
+			per time step, in €/kWh, paid for the net pool purchases, i.e., "e_pur_pool" - "e_sale_pool"), "targets"
+			(dict with an array of net pool purchases per meter ID; None for no targets) and "penalty" (cost of the
+			deviations from the targets, in €/kWh; None to enforce the targets as constraints); the REC balance binary
+			variables should then be fixed through "fixed_binaries"
+		:param restart_steps: optional collection of time steps at which the storage energy content restarts from its
+			initial state of charge (Eq. 14), as in the first time step, e.g., the first time steps of each scenario
+			when several scenarios are stacked along the horizon
+		:param investment_consensus: optional dict for steering the investment decisions towards a consensus, e.g.,
+			in a progressive hedging, with the keys "prices" (linear cost of each investment decision), "targets" (value
+			of each investment decision; None for no targets) and "penalties" (cost of the absolute deviation of each
+			investment decision from its target), each with any of the keys "p_cont", "p_gn_new" and "e_bn_new"
+			pointing to a dict of floats per meter ID
+		:param final_soc: optional dict with the state of charge (%) that each meter's storage must reach at the last
+			time step of the horizon, replacing the reset to the initial state of charge at the end of every day
+			(Eq. 33), e.g., for windows of a longer horizon whose storage energy content is carried between them
 		"""
 		# Indices and sets
 		self._nr_days = backpack.get('nr_days')  # operation period (days) (= nr_clusters)
@@ -78,6 +200,7 @@ class CollectiveMILPPool:
 		self._storage_ratio = backpack.get('storage_ratio')  # ratio between the reference maximum admissible input and
 		# output storage power and the reference storage nominal capacity.
 		self._soc_min = None  # minimum state of charge of the storage systems in the meter [%]
+		self._soc_init = None  # initial state of charge of the storage systems in the meter [%]
 		self._eff_bc = None  # charging efficiency of the storage systems in the meter [%]
 		self._eff_bd = None  # discharging efficiency of the storage systems in the meter [%]
 		self._soc_max = None  # maximum state of charge of the storage systems in the meter [%]
@@ -91,6 +214,40 @@ class CollectiveMILPPool:
 		self.strict_pos_coeffs = backpack.get('strict_pos_coeffs')  # no negative coefficients if True
 		self.total_share_coeffs = backpack.get('total_share_coeffs')  # share all required in the REC if True
 		self._meters_data = backpack.get('meters')  # data from Meters
+		self.fixed_investments = fixed_investments  # investment decisions that are not to be optimized
+		self.write_lp = write_lp  # write the MILP formulation to an .lp file if True
+		self.investment_bounds = investment_bounds  # bounds to the investment decisions
+		self.initial_values = initial_values  # initial values for warm starting the solver
+		self.relaxed_steps = set(relaxed_steps) if relaxed_steps is not None else set()  # steps with relaxed binaries
+		self.fixed_binaries = fixed_binaries  # values to which the binary variables are fixed
+		self.symmetric_groups = symmetric_groups  # groups of identical meters
+		self.model_cache = model_cache  # directory of the on-disk model cache
+		self.model_cache_max_mb = model_cache_max_mb  # maximum size of the model cache (MB)
+		self.progress_callback = progress_callback  # function called with the solver's progress events
+		self.stop_rule = stop_rule  # function that decides when to stop the solver's search
+		self.progress_events = []  # solver's progress events of the last solve
+		self.stopped_early = False  # True if the stopping rule ended the last solve
+		self._log_dir = None  # temporary directory of the solver log, when its progress is followed
+		self.tight_bounds = tight_bounds  # propagate upper bounds to the continuous energy flows if True
+		if formulation not in ['big_m', 'indicator']:
+			logger.warning(f'formulation = {formulation} not recognized; reverting to "big_m"')
+			formulation = 'big_m'
+		elif formulation == 'indicator' and solver not in INDICATOR_SOLVERS:
+			logger.warning(f'{solver} does not support indicator constraints; reverting to the "big_m" formulation')
+			formulation = 'big_m'
+		self.formulation = formulation  # formulation of the logical constraints
+		if row_generation and pool_exchange is not None:
+			logger.warning('row generation is not supported with a pool exchange; reverting to row_generation = False')
+			row_generation = False
+		self.row_generation = row_generation  # add the sharing rules' constraints iteratively if True
+		self.row_generation_iterations = 0  # number of solves of the last row generation
+		self._sharing_rows = None  # (meter, time step) pairs whose sharing rules' constraints are in the MILP
+		self._rec_rows = None  # time steps whose REC balance constraints are in the MILP
+		self.pool_exchange = pool_exchange  # pool prices and targets replacing the market equilibrium constraints
+		self.restart_steps = set(restart_steps) if restart_steps is not None else set()  # steps restarting the storage
+		self.investment_consensus = investment_consensus  # prices and targets of the investment decisions
+		self.final_soc = final_soc  # state of charge at the end of the horizon, replacing the daily reset
+		self.milp_vars = None  # for storing the MILP decision variables, by outputs' key
 		self.milp = None  # for storing the MILP formulation
 		self.status = None  # stores the status of the MILP's solution
 		self.obj_value = None  # stores the MILP's numeric solution
@@ -99,6 +256,141 @@ class CollectiveMILPPool:
 		self.time_24_subseries = None  # for a subrange of time intervals that sinalize the end of each day
 		self.set_meters = None  # set with Meters' ID
 
+	def __binary_variable(self, name: str, t: int) -> LpVariable:
+		"""
+		Creates a binary variable, or its continuous relaxation in [0, 1] if the time step is to be relaxed.
+		:param name: name of the variable
+		:param t: time step of the variable
+		:return: puLP variable
+		"""
+		if t in self.relaxed_steps:
+			return LpVariable(name, lowBound=0, upBound=1)
+		return LpVariable(name, cat=LpBinary)
+
+	def __match_values(self, var_key: str, values):
+		"""
+		Pairs the decision variables stored under an outputs' key with the values provided for them, following the
+		MILP outputs' structure. Meters, time steps or keys not included in the MILP and None values are skipped.
+		:param var_key: outputs' key of the decision variables
+		:param values: values with the same structure as the respective MILP outputs (possibly partial)
+		:return: generator of (variable, value) pairs
+		"""
+		if var_key not in self.milp_vars:
+			return
+		if var_key == 'delta_rec_balance':
+			values = {None: values}
+			milp_vars = {None: self.milp_vars[var_key]}
+		else:
+			milp_vars = self.milp_vars[var_key]
+		for n, value_n in values.items():
+			if n not in milp_vars:
+				continue
+			if isinstance(value_n, list):
+				for var, value_t in zip(milp_vars[n], value_n):
+					if value_t is not None:
+						yield var, value_t
+			elif value_n is not None:
+				yield milp_vars[n], value_n
+
+	def __structure(self) -> dict:
+		"""
+		Collects the data that defines the structure of the MILP, i.e., everything but the time series and tariffs.
+		:return: JSON serializable dict with the MILP's structure
+		"""
+		params = {
+			'p_meter_max': self._p_meter_max, 'p_gn_init': self._p_gn_init, 'p_gn_min': self._p_gn_min,
+			'p_gn_max': self._p_gn_max, 'e_bn_init': self._e_bn_init, 'e_bn_min': self._e_bn_min,
+			'e_bn_max': self._e_bn_max, 'soc_min': self._soc_min, 'soc_init': self._soc_init, 'soc_max': self._soc_max,
+			'eff_bc': self._eff_bc, 'eff_bd': self._eff_bd
+		}
+		structure = {
+			'meters': self.set_meters,
+			'nr_days': self._nr_days,
+			'delta_t': self._delta_t,
+			'storage_ratio': self._storage_ratio,
+			'strict_pos_coeffs': bool(self.strict_pos_coeffs),
+			'total_share_coeffs': bool(self.total_share_coeffs),
+			'regulatory_context': self.regulatory_context,
+			'relaxed_steps': sorted(self.relaxed_steps),
+			'symmetric_groups': self.symmetric_groups,
+			'tight_bounds': bool(self.tight_bounds),
+			'row_generation': bool(self.row_generation),
+			'restart_steps': sorted(self.restart_steps),
+			'final_soc': [self.final_soc[n] for n in self.set_meters] if self.final_soc is not None else None,
+			'params': {key: [params[key][n] for n in self.set_meters] for key in STRUCTURAL_METER_KEYS}
+		}
+		# the investment costs are coefficients of the symmetry-breaking constraints
+		if self.symmetric_groups is not None:
+			structure['params']['l_gic'] = [self._l_gic[n] for n in self.set_meters]
+			structure['params']['l_bic'] = [self._l_bic[n] for n in self.set_meters]
+
+		return structure
+
+	def __compile(self) -> dict:
+		"""
+		Compiles the MILP, as just formulated, for the model cache, including the positions of the coefficients that
+		depend on the time series (Eqs. 2 and 7), which are patched when the compiled MILP is reused.
+		:return: dict with the compiled arrays
+		"""
+		variables = []
+
+		def column(var: LpVariable) -> int:
+			variables.append(var)
+			return len(variables) - 1
+
+		layout = _map_layout(self.milp_vars, column)
+		row = {name: i for i, name in enumerate(self.milp.constraints)}
+		row_name = lambda family, n, t: f'{family}{n}_t{t:07d}'.translate(LpElement.trans)
+		scaled_generation_entries = {
+			row_name('Scaled_generation_', n, t): [layout['p_gn_total'][n]]
+			for n, t in itertools.product(self.set_meters, self.time_series)
+		}
+		compiled = compile_problem(self.milp, variables, layout, scaled_generation_entries)
+
+		c_met_rows = np.array([[row[row_name('C_met_', n, t)] for t in self.time_series] for n in self.set_meters])
+		scaled_generation_rows = np.array([[row[row_name('Scaled_generation_', n, t)] for t in self.time_series]
+										   for n in self.set_meters])
+		# position of the p_gn_total coefficient within each Scaled_generation_ row of the CSR matrix
+		scaled_generation_pos = np.zeros(scaled_generation_rows.shape, dtype=np.int64)
+		for i, n in enumerate(self.set_meters):
+			for t, r in enumerate(scaled_generation_rows[i]):
+				start, end = compiled['indptr'][r], compiled['indptr'][r + 1]
+				scaled_generation_pos[i, t] = start + np.flatnonzero(
+					compiled['indices'][start:end] == layout['p_gn_total'][n])[0]
+		compiled['c_met_rows'] = c_met_rows
+		compiled['scaled_generation_pos'] = scaled_generation_pos
+
+		return compiled
+
+	def __patch_compiled(self, compiled: dict) -> np.ndarray:
+		"""
+		Patches, in place, the compiled MILP with the time series of this instance (Eqs. 2 and 7) and computes the
+		objective function's coefficients from its tariffs (Eq. 1).
+		:param compiled: dict with the compiled arrays
+		:return: array with the objective function's coefficients of all columns
+		"""
+		layout = compiled_layout(compiled)
+		w_clustering = np.asarray(self._w_clustering, dtype=float)
+		l_grid = np.asarray(self._l_grid, dtype=float)
+		objective = np.zeros(len(compiled['lb']))
+		data = compiled['data'].copy()
+		rhs = compiled['rhs'].copy()
+		for i, n in enumerate(self.set_meters):
+			series = lambda param: np.asarray(param[n], dtype=float)
+			objective[layout['e_sup'][n]] = series(self._l_buy) * w_clustering
+			objective[layout['e_sur'][n]] = -series(self._l_sell) * w_clustering
+			objective[layout['e_slc_pool'][n]] = l_grid * w_clustering
+			objective[layout['e_bd'][n]] = self._deg_cost[n] * w_clustering
+			objective[layout['p_cont'][n]] = self._l_cont[n] * self._nr_dates
+			objective[layout['p_gn_new'][n]] = self._l_gic[n] * self._nr_dates
+			objective[layout['e_bn_new'][n]] = self._l_bic[n] * self._nr_dates
+			rhs[compiled['c_met_rows'][i]] = series(self._e_c)
+			data[compiled['scaled_generation_pos'][i]] = -(series(self._e_g_factor) * self._delta_t)
+		compiled['data'] = data
+		compiled['rhs'] = rhs
+
+		return objective
+
 	def __define_milp(self):
 		"""
 		Method to define the collective MILP problem.
@@ -106,7 +398,8 @@ class CollectiveMILPPool:
 		logger.debug(f'-- defining the collective (pool) MILP problem...')
 
 		# Define a minimization MILP
-		self.milp = LpProblem(f'collective_pool', LpMinimize)
+		self.milp = LpProblem(f'collective_pool', LpMinimize) if self.formulation == 'big_m' \
+			else IndicatorLpProblem(f'collective_pool', LpMinimize)
 
 		# Additional temporal variables
 		self._horizon = self._nr_days * 24
@@ -139,11 +432,147 @@ class CollectiveMILPPool:
 		self._e_bn_min = dict_per_param(self._meters_data, 'e_bn_min')
 		self._e_bn_max = dict_per_param(self._meters_data, 'e_bn_max')
 		self._soc_min = dict_per_param(self._meters_data, 'soc_min')
+		# the initial state of charge is optional and defaults to the minimum state of charge
+		self._soc_init = {
+			n: soc_init if soc_init is not None else self._soc_min[n]
+			for n, soc_init in dict_per_param(self._meters_data, 'soc_init').items()
+		}
 		self._eff_bc = dict_per_param(self._meters_data, 'eff_bc')
 		self._eff_bd = dict_per_param(self._meters_data, 'eff_bd')
 		self._soc_max = dict_per_param(self._meters_data, 'soc_max')
 		self._deg_cost = dict_per_param(self._meters_data, 'deg_cost')
 
+		# Define the decision variables and constraints, or rebuild them from the model cache if their structure was
+		# already compiled (with the time series and tariffs of this instance patched in)
+		# (indicator constraints, pool exchanges and investment consensus terms are not compiled, so these MILPs are not
+		# cached)
+		use_cache = self.model_cache is not None and self.formulation == 'big_m' and self.pool_exchange is None \
+			and self.investment_consensus is None
+		compiled = None
+		if use_cache:
+			key = structure_key(self.__structure())
+			compiled = load_compiled(self.model_cache, key)
+		if compiled is not None:
+			logger.debug('-- rebuilding the MILP structure from the model cache...')
+			self.milp, variables, layout = build_problem(
+				compiled, 'collective_pool', LpMinimize, self.__patch_compiled(compiled))
+			self.milp_vars = _map_layout(layout, lambda j: variables[j])
+		else:
+			self.__formulate_milp()
+			if use_cache:
+				save_compiled(self.model_cache, key, self.__compile(), self.model_cache_max_mb)
+
+		# Keep track of the sharing rules' constraints that are added by the row generation
+		if self.row_generation:
+			self._sharing_rows = np.zeros((len(self.set_meters), self.time_intervals), dtype=bool)
+			self._rec_rows = np.zeros(self.time_intervals, dtype=bool)
+
+		# Restrict the investment decisions whenever an investment plan or investment bounds are provided
+		investment_bounds = {}
+		if self.investment_bounds is not None:
+			investment_bounds.update(self.investment_bounds)
+		if self.fixed_investments is not None:
+			investment_bounds.update({
+				var_key: {n: (fixed_value, fixed_value) for n, fixed_value in fixed_values.items()}
+				for var_key, fixed_values in self.fixed_investments.items()
+			})
+		for var_key, bounds in investment_bounds.items():
+			if var_key not in ['p_cont', 'p_gn_new', 'e_bn_new']:
+				raise ValueError(f'{var_key} is not an investment variable; '
+								 f'please provide any of ["p_cont", "p_gn_new", "e_bn_new"]')
+			for n, (low_bound, up_bound) in bounds.items():
+				if low_bound is not None:
+					self.milp_vars[var_key][n].lowBound = low_bound
+				if up_bound is not None:
+					self.milp_vars[var_key][n].upBound = up_bound
+
+		# Set the initial values of the decision variables, for warm starting the solver
+		if self.initial_values is not None:
+			for var_key, init_values in self.initial_values.items():
+				for var, init_value in self.__match_values(var_key, init_values):
+					var.setInitialValue(round(init_value) if var.cat == LpBinary else init_value)
+
+		# Fix the binary variables whenever their values are provided (e.g., by a relax-and-fix heuristic)
+		if self.fixed_binaries is not None:
+			for var_key, fixed_values in self.fixed_binaries.items():
+				if var_key not in BINARY_KEYS:
+					raise ValueError(f'{var_key} is not a binary variable; please provide any of {list(BINARY_KEYS)}')
+				for var, fixed_value in self.__match_values(var_key, fixed_values):
+					if self.formulation == 'indicator':
+						# the variables of indicator constraints must keep their binary domain
+						self.milp += var == round(fixed_value), 'Fixed_' + var.name
+					else:
+						var.lowBound = round(fixed_value)
+						var.upBound = round(fixed_value)
+
+		# Write MILP to .lp file
+		if self.write_lp:
+			dir_name = os.path.abspath(os.path.join(__file__, '..'))
+			lp_file = os.path.join(dir_name, f'Stage2Pool.lp')
+			self.milp.writeLP(lp_file)
+
+		# Set the solver to be called; its log is written to a file whenever its progress is to be followed
+		warm_start = self.initial_values is not None
+		self.__remove_log()
+		log_path = None
+		if self.progress_callback is not None or self.stop_rule is not None:
+			self._log_dir = tempfile.mkdtemp(prefix='collective_pool_')
+			log_path = os.path.join(self._log_dir, 'solver.log')
+		if self.solver == 'CBC' and 'PULP_CBC_CMD' in listSolvers(onlyAvailable=True):
+			# a followed CBC log must be line-buffered, which requires running CBC through a wrapper script
+			wrapper = line_buffered_wrapper(pulp.PULP_CBC_CMD.pulp_cbc_path, self._log_dir) \
+				if log_path is not None else None
+			solver_cmd = pulp.PULP_CBC_CMD if wrapper is None else COIN_CMD
+			self.milp.setSolver(solver_cmd(msg=False, timeLimit=self.timeout, gapRel=self.mipgap,
+										   warmStart=warm_start, logPath=log_path,
+										   **({} if wrapper is None else {'path': wrapper})))
+
+		elif self.solver == 'CPLEX' and 'CPLEX_CMD' in listSolvers(onlyAvailable=True):
+			# for more info on some available parameters:
+			# https://www.ibm.com/docs/en/icos/22.1.1?topic=parameters-mip-emphasis-switch
+			# https://www.ibm.com/docs/en/icos/22.1.0?topic=parameters-feasibility-pump-switch
+			# https://www.ibm.com/docs/en/icos/20.1.0?topic=parameters-feasibility-tolerance
+			# https://www.ibm.com/docs/en/icos/12.9.0?topic=parameters-integrality-tolerance
+			# https://www.ibm.com/docs/en/icos/12.9.0?topic=parameters-scale-parameter
+			# setting options in cplex though puLP:
+			# https://www-eio.upc.es/lceio/manuals/cplex90/relnotescplex/relnotescplex10.html
+			# https://www-eio.upc.edu/lceio/manuals/cplex75/doc/refmanccpp/html/baseSystem.html
+			# background on "fixed mip" infeasibility over incumbent solution (for duals calculation):
+			# https://or.stackexchange.com/questions/6048/avoid-infeasibility-in-fixed-mip-problem-in-cplex
+			self.milp.setSolver(CPLEX_CMD(
+				msg=False, timeLimit=self.timeout, gapRel=self.mipgap, warmStart=warm_start, logPath=log_path,
+				options=[
+				'set emphasis mip 5',
+				# 'set mip strategy fpheur 2',
+				# 'set simplex tolerances feasibility 1e-9',
+				# 'set mip tolerances integrality 1e-9',
+				'set read scale -1'
+			]))
+
+		elif self.solver == 'HiGHS' and 'HiGHS_CMD' in listSolvers(onlyAvailable=True):
+			self.milp.setSolver(
+				HiGHS_CMD(
+					msg=False,
+					timeLimit=self.timeout,
+					gapRel=self.mipgap,
+					threads=1,
+					warmStart=warm_start,
+					logPath=log_path
+				)
+			)
+
+		else:
+			raise ValueError(f'{self.solver}_CMD not available in puLP; '
+							 f'please install the required solver or try a different one')
+
+		logger.debug('-- defining the collective (pool) MILP problem... DONE!')
+
+		return
+
+	def __formulate_milp(self):
+		"""
+		Defines the decision variables, objective function and constraints of the collective MILP problem.
+		"""
 		# Initialize the decision variables
 		# contracted power tariff by n [kW]
 		p_cont = {meter_id: None for meter_id in self.set_meters}
@@ -196,7 +625,7 @@ class CollectiveMILPPool:
 		if self.total_share_coeffs:
 			for t in self.time_series:
 				increment = f't{t:07d}'
-				delta_rec_balance[t] = LpVariable('delta_rec_balance_' + increment, cat=LpBinary)
+				delta_rec_balance[t] = self.__binary_variable('delta_rec_balance_' + increment, t)
 
 		for n in self.set_meters:
 			increment = f'{n}'
@@ -219,25 +648,56 @@ class CollectiveMILPPool:
 			e_sale[n][t] = LpVariable('e_sale_' + increment, lowBound=0)
 			e_slc[n][t] = LpVariable('e_slc_' + increment, lowBound=0)
 			e_bat[n][t] = LpVariable('e_bat_' + increment, lowBound=0)
-			delta_sup[n][t] = LpVariable('delta_sup_' + increment, cat=LpBinary)
+			delta_sup[n][t] = self.__binary_variable('delta_sup_' + increment, t)
 			e_consumed[n][t] = LpVariable('e_consumed_' + increment, lowBound=0)
 			e_alc[n][t] = LpVariable('e_alc_' + increment, lowBound=0)
-			delta_slc[n][t] = LpVariable('delta_slc_' + increment, cat=LpBinary)
+			delta_slc[n][t] = self.__binary_variable('delta_slc_' + increment, t)
 			if self.strict_pos_coeffs:
-				delta_coeff[n][t] = LpVariable('delta_coeff_' + increment, cat=LpBinary)
+				delta_coeff[n][t] = self.__binary_variable('delta_coeff_' + increment, t)
 			if self.total_share_coeffs:
-				delta_meter_balance[n][t] = LpVariable('delta_meter_balance_' + increment, cat=LpBinary)
+				delta_meter_balance[n][t] = self.__binary_variable('delta_meter_balance_' + increment, t)
+
+		# Keep a reference to the decision variables, identified by the respective outputs' keys
+		self.milp_vars = {
+			'p_cont': p_cont,
+			'p_gn_new': p_gn_new,
+			'p_gn_total': p_gn_total,
+			'e_bn_new': e_bn_new,
+			'e_bn_total': e_bn_total,
+			'e_cmet': e_cmet,
+			'e_g': e_g,
+			'e_bc': e_bc,
+			'e_bd': e_bd,
+			'e_sup': e_sup,
+			'e_sur': e_sur,
+			'e_pur_pool': e_pur,
+			'e_sale_pool': e_sale,
+			'e_slc_pool': e_slc,
+			'e_bat': e_bat,
+			'delta_sup': delta_sup,
+			'e_consumed': e_consumed,
+			'e_alc': e_alc,
+			'delta_slc': delta_slc
+		}
+		if self.strict_pos_coeffs:
+			self.milp_vars['delta_coeff'] = delta_coeff
+		if self.total_share_coeffs:
+			self.milp_vars['delta_rec_balance'] = delta_rec_balance
+			self.milp_vars['delta_meter_balance'] = delta_meter_balance
+
+		if self.tight_bounds:
+			self.__propagate_bounds()
 
 		# Eq. 1: Objective Function
 		objective = (
 				lpSum(
 					lpSum(
-						e_sup[n][t] * self._l_buy[n][t]
-						- e_sur[n][t] * self._l_sell[n][t]
-						+ e_slc[n][t] * self._l_grid[t]
+						e_sup[n][t] * float(self._l_buy[n][t])
+						- e_sur[n][t] * float(self._l_sell[n][t])
+						+ e_slc[n][t] * float(self._l_grid[t])
 						+ e_bd[n][t] * self._deg_cost[n]
 						for n in self.set_meters
-					) * self._w_clustering[t]
+					) * float(self._w_clustering[t])
 					for t in self.time_series
 				) +
 				lpSum(
@@ -247,28 +707,28 @@ class CollectiveMILPPool:
 					for n in self.set_meters
 				)
 		)
+		if self.pool_exchange is not None:
+			objective += self.__pool_exchange_terms()
+		if self.investment_consensus is not None:
+			objective += self.__investment_consensus_terms()
 		self.milp += objective, 'Objective Function'
 
 		# Eq. 2-35: Constraints
 		for t in self.time_series:
 			increment = f'{t:07d}'
 
+			# Eqs. 17 and 25-26 couple all meters, so they are left out of a pool exchange
+			if self.pool_exchange is not None:
+				continue
+
 			# Eq. 17
 			self.milp += \
 				lpSum(e_sale[n][t] for n in self.set_meters) == lpSum(e_pur[n][t] for n in self.set_meters), \
 				'Market_equilibrium_' + increment
 
-			if self.total_share_coeffs:
-				# Eq. 25
-				self.milp += \
-					lpSum(e_cmet[n][t] for n in self.set_meters) >= -self._big_m * delta_rec_balance[t], \
-					'Check_REC_surplus_' + increment
-
-				# Eq. 26
-				self.milp += \
-					lpSum(e_cmet[n][t] for n in self.set_meters) <= \
-					self._big_m * (1 - delta_rec_balance[t]) + self._small_m, \
-					'Check_REC_deficit_' + increment
+			# Eqs. 25-26
+			if self.total_share_coeffs and not self.row_generation:
+				self.__add_rec_balance_rows(t)
 
 		for n in self.set_meters:
 			increment = f'{n}'
@@ -306,13 +766,25 @@ class CollectiveMILPPool:
 				e_bn_new[n] <= self._e_bn_max[n], \
 				'Max_new_storage_' + increment
 
+		# Symmetry-breaking constraints: identical meters are interchangeable, so their investments can be ordered
+		if self.symmetric_groups is not None:
+			for group in self.symmetric_groups:
+				for n, next_n in zip(group[:-1], group[1:]):
+					increment = f'{n}_{next_n}'
+					self.milp += \
+						p_gn_new[n] * self._l_gic[n] + e_bn_new[n] * self._l_bic[n] >= \
+						p_gn_new[next_n] * self._l_gic[next_n] + e_bn_new[next_n] * self._l_bic[next_n], \
+						'Symmetry_breaking_' + increment
+
 		for n, t in itertools.product(self.set_meters, self.time_series):
 			increment = f'{n}_t{t:07d}'
+			# logical constraints are written as indicator constraints if requested and the binaries are not relaxed
+			indicator = self.formulation == 'indicator' and t not in self.relaxed_steps
 
 			# Eq. 2
 			# UPDATED WITH DISAGGREGATED EWH MODULES (ORIGINAL AND OPTIMIZED LOADS)
 			self.milp += (
-				e_cmet[n][t] == self._e_c[n][t] - e_g[n][t] + e_bc[n][t] - e_bd[n][t],
+				e_cmet[n][t] == float(self._e_c[n][t]) - e_g[n][t] + e_bc[n][t] - e_bd[n][t],
 				'C_met_' + increment
 			)
 
@@ -341,7 +813,7 @@ class CollectiveMILPPool:
 
 			# Eq. 7
 			self.milp += \
-				e_g[n][t] == self._e_g_factor[n][t] * p_gn_total[n] * self._delta_t, \
+				e_g[n][t] == float(self._e_g_factor[n][t]) * p_gn_total[n] * self._delta_t, \
 				'Scaled_generation_' + increment
 
 			# Eq. 11
@@ -355,9 +827,9 @@ class CollectiveMILPPool:
 				'Discharge_rate_limit' + increment
 
 			energy_update = e_bc[n][t] * self._eff_bc[n] - e_bd[n][t] * 1 / self._eff_bd[n]
-			if t == 0:
+			if t == 0 or t in self.restart_steps:
 				# Eq. 13
-				init_e_bat = self._soc_min[n] / 100 * e_bn_total[n]
+				init_e_bat = self._soc_init[n] / 100 * e_bn_total[n]
 
 				# Eq. 14
 				self.milp += \
@@ -380,20 +852,31 @@ class CollectiveMILPPool:
 				'Maximum_SOC_' + increment
 
 			# Eq. 33
-			if self._nr_days >= 1:
+			if self.final_soc is not None:
+				if t == self.time_intervals - 1:
+					self.milp += \
+						e_bat[n][t] == self.final_soc[n] / 100 * e_bn_total[n], \
+						'Final_SOC_' + increment
+			elif self._nr_days >= 1:
 				if t in self.time_24_subseries:
 					self.milp += \
 						e_bat[n][t] == init_e_bat, \
 						'Daily_SOC_reset_' + increment
 
 			# Eq. 18
-			self.milp += \
-				e_sup[n][t] <= self._big_m * delta_sup[n][t] + self._small_m, \
-				'Supply_ON_' + increment
+			if indicator:
+				self.milp.add_indicator(delta_sup[n][t], 0, e_sup[n][t] <= 0, 'Supply_ON_' + increment)
 
-			self.milp += \
-				e_sur[n][t] <= self._big_m * (1 - delta_sup[n][t]) + self._small_m, \
-				'Supply_OFF_' + increment
+				self.milp.add_indicator(delta_sup[n][t], 1, e_sur[n][t] <= 0, 'Supply_OFF_' + increment)
+
+			else:
+				self.milp += \
+					e_sup[n][t] <= self._big_m * delta_sup[n][t] + self._small_m, \
+					'Supply_ON_' + increment
+
+				self.milp += \
+					e_sur[n][t] <= self._big_m * (1 - delta_sup[n][t]) + self._small_m, \
+					'Supply_OFF_' + increment
 
 			# Eq. 19
 			self.milp += \
@@ -405,108 +888,373 @@ class CollectiveMILPPool:
 				e_alc[n][t] >= e_pur[n][t] - e_sale[n][t], \
 				'Allocated_energy_' + increment
 
-			# Eq. 21
-			self.milp += \
-				e_slc[n][t] >= e_consumed[n][t] - self._big_m * (1 - delta_slc[n][t]), \
-				'Self_consumption_1_' + increment
+			if indicator:
+				# Eq. 21
+				self.milp.add_indicator(
+					delta_slc[n][t], 1, e_slc[n][t] >= e_consumed[n][t], 'Self_consumption_1_' + increment)
 
-			# Eq. 22
-			self.milp += \
-				e_slc[n][t] >= e_alc[n][t] - self._big_m * delta_slc[n][t], \
-				'Self_consumption_2_' + increment
+				# Eq. 22
+				self.milp.add_indicator(
+					delta_slc[n][t], 0, e_slc[n][t] >= e_alc[n][t], 'Self_consumption_2_' + increment)
 
-			if self.strict_pos_coeffs:
-				# Eq. 23
+			else:
+				# Eq. 21
 				self.milp += \
-					e_sale[n][t] - e_pur[n][t] <= -e_cmet[n][t] + self._big_m * delta_coeff[n][t], \
-					'Positive_coefficients_1_' + increment
+					e_slc[n][t] >= e_consumed[n][t] - self._big_m * (1 - delta_slc[n][t]), \
+					'Self_consumption_1_' + increment
 
-				# Eq. 24
+				# Eq. 22
 				self.milp += \
-					e_sale[n][t] - e_pur[n][t] <= self._big_m * (1 - delta_coeff[n][t]), \
-					'Positive_coefficients_2_' + increment
+					e_slc[n][t] >= e_alc[n][t] - self._big_m * delta_slc[n][t], \
+					'Self_consumption_2_' + increment
 
-			if self.total_share_coeffs:
-				# Eq. 27
-				self.milp += \
-					e_cmet[n][t] >= - self._big_m * delta_meter_balance[n][t], \
-					'Check_meter_surplus_' + increment
+			# Eqs. 23-24 and 27-32
+			if not self.row_generation:
+				self.__add_sharing_rows(n, t)
 
-				# Eq. 28
-				self.milp += \
-					e_cmet[n][t] <= self._big_m * (1 - delta_meter_balance[n][t]) + self._small_m, \
-					'Check_meter_deficit_' + increment
+	def __pool_exchange_terms(self):
+		"""
+		Defines the pool exchange of each meter and time step, i.e., its net pool purchases, which are paid at the pool
+		prices instead of being balanced by the market equilibrium constraints (Eq. 17), and their targets, either as
+		constraints or with penalized deviations.
+		:return: puLP expression with the cost of the pool exchanges and of their deviations from the targets
+		"""
+		e_pur = self.milp_vars['e_pur_pool']
+		e_sale = self.milp_vars['e_sale_pool']
+		prices = self.pool_exchange['prices']
+		targets = self.pool_exchange.get('targets')
+		penalty = self.pool_exchange.get('penalty')
 
-				# Eq. 29
+		terms = []
+		for n, t in itertools.product(self.set_meters, self.time_series):
+			increment = f'{n}_t{t:07d}'
+			w_clustering = float(self._w_clustering[t])
+			terms.append((e_pur[n][t] - e_sale[n][t]) * float(prices[t]) * w_clustering)
+			if targets is None:
+				continue
+			if penalty is None:
 				self.milp += \
-					e_sale[n][t] >= - e_cmet[n][t] - self._big_m * (
-							1 - delta_meter_balance[n][t] + delta_rec_balance[t]), \
-					'Share_all_surplus_low_' + increment
-
-				# Eq. 30
+					e_pur[n][t] - e_sale[n][t] == float(targets[n][t]), \
+					'Pool_exchange_target_' + increment
+			else:
+				dev_pos = LpVariable('pool_dev_pos_' + increment, lowBound=0)
+				dev_neg = LpVariable('pool_dev_neg_' + increment, lowBound=0)
 				self.milp += \
-					e_sale[n][t] <= - e_cmet[n][t] + self._big_m * (
-							1 - delta_meter_balance[n][t] + delta_rec_balance[t]), \
-					'Share_all_surplus_high_' + increment
+					e_pur[n][t] - e_sale[n][t] - float(targets[n][t]) == dev_pos - dev_neg, \
+					'Pool_exchange_deviation_' + increment
+				terms.append((dev_pos + dev_neg) * penalty * w_clustering)
 
-				# Eq. 31
-				self.milp += \
-					e_pur[n][t] >= e_cmet[n][t] - self._big_m * (
-							1 - delta_rec_balance[t] + delta_meter_balance[n][t]), \
-					'Buy_all_deficit_low_' + increment
+		return lpSum(terms)
 
-				# Eq. 32
+	def __investment_consensus_terms(self):
+		"""
+		Defines the linear costs of the investment decisions and the costs of their absolute deviations from their
+		targets, for steering them towards a consensus.
+		:return: puLP expression with the consensus costs of the investment decisions
+		"""
+		prices = self.investment_consensus.get('prices') or {}
+		targets = self.investment_consensus.get('targets') or {}
+		penalties = self.investment_consensus.get('penalties') or {}
+
+		terms = []
+		for var_key, var_prices in prices.items():
+			terms += [self.milp_vars[var_key][n] * price for n, price in var_prices.items()]
+		for var_key, var_targets in targets.items():
+			for n, target in var_targets.items():
+				# the variables' names must not include the investment variables' names, to which they do not belong
+				increment = f'{INVESTMENT_ABBREVIATIONS[var_key]}_{n}'
+				dev_pos = LpVariable('consensus_dev_pos_' + increment, lowBound=0)
+				dev_neg = LpVariable('consensus_dev_neg_' + increment, lowBound=0)
 				self.milp += \
-					e_pur[n][t] <= e_cmet[n][t] + self._big_m * (
-							1 - delta_rec_balance[t] + delta_meter_balance[n][t]), \
-					'Buy_all_deficit_high_' + increment
+					self.milp_vars[var_key][n] - target == dev_pos - dev_neg, \
+					'Investment_consensus_deviation_' + increment
+				terms.append((dev_pos + dev_neg) * penalties[var_key][n])
 
-		# Write MILP to .lp file
-		dir_name = os.path.abspath(os.path.join(__file__, '..'))
-		lp_file = os.path.join(dir_name, f'Stage2Pool.lp')
-		self.milp.writeLP(lp_file)
+		return lpSum(terms)
 
-		# Set the solver to be called
-		if self.solver == 'CBC' and 'PULP_CBC_CMD' in listSolvers(onlyAvailable=True):
-			self.milp.setSolver(pulp.PULP_CBC_CMD(msg=False, timeLimit=self.timeout, gapRel=self.mipgap))
+	def __add_rec_balance_rows(self, t: int):
+		"""
+		Adds the constraints that signal if the REC has a surplus or a deficit at a time step (Eqs. 25-26).
+		:param t: time step
+		"""
+		increment = f'{t:07d}'
+		indicator = self.formulation == 'indicator' and t not in self.relaxed_steps
+		e_cmet = self.milp_vars['e_cmet']
+		delta_rec_balance = self.milp_vars['delta_rec_balance']
+
+		if indicator:
+			# Eq. 25
+			self.milp.add_indicator(
+				delta_rec_balance[t], 0, lpSum(e_cmet[n][t] for n in self.set_meters) >= 0,
+				'Check_REC_surplus_' + increment)
+
+			# Eq. 26
+			self.milp.add_indicator(
+				delta_rec_balance[t], 1, lpSum(e_cmet[n][t] for n in self.set_meters) <= 0,
+				'Check_REC_deficit_' + increment)
 
-		elif self.solver == 'CPLEX' and 'CPLEX_CMD' in listSolvers(onlyAvailable=True):
-			# for more info on some available parameters:
-			# https://www.ibm.com/docs/en/icos/22.1.1?topic=parameters-mip-emphasis-switch
-			# https://www.ibm.com/docs/en/icos/22.1.0?topic=parameters-feasibility-pump-switch
-			# https://www.ibm.com/docs/en/icos/20.1.0?topic=parameters-feasibility-tolerance
-			# https://www.ibm.com/docs/en/icos/12.9.0?topic=parameters-integrality-tolerance
-			# https://www.ibm.com/docs/en/icos/12.9.0?topic=parameters-scale-parameter
-			# setting options in cplex though puLP:
-			# https://www-eio.upc.es/lceio/manuals/cplex90/relnotescplex/relnotescplex10.html
-			# https://www-eio.upc.edu/lceio/manuals/cplex75/doc/refmanccpp/html/baseSystem.html
-			# background on "fixed mip" infeasibility over incumbent solution (for duals calculation):
-			# https://or.stackexchange.com/questions/6048/avoid-infeasibility-in-fixed-mip-problem-in-cplex
-			self.milp.setSolver(CPLEX_CMD(msg=False, timeLimit=self.timeout, gapRel=self.mipgap, options=[
-				'set emphasis mip 5',
-				# 'set mip strategy fpheur 2',
-				# 'set simplex tolerances feasibility 1e-9',
-				# 'set mip tolerances integrality 1e-9',
-				'set read scale -1'
-			]))
+		else:
+			# Eq. 25
+			self.milp += \
+				lpSum(e_cmet[n][t] for n in self.set_meters) >= -self._big_m * delta_rec_balance[t], \
+				'Check_REC_surplus_' + increment
 
-		elif self.solver == 'HiGHS' and 'HiGHS_CMD' in listSolvers(onlyAvailable=True):
-			self.milp.setSolver(
-				HiGHS_CMD(
-					msg=False,
-					timeLimit=self.timeout,
-					gapRel=self.mipgap,
-					threads=1,
-				)
-			)
+			# Eq. 26
+			self.milp += \
+				lpSum(e_cmet[n][t] for n in self.set_meters) <= \
+				self._big_m * (1 - delta_rec_balance[t]) + self._small_m, \
+				'Check_REC_deficit_' + increment
+
+	def __add_sharing_rows(self, n: str, t: int):
+		"""
+		Adds the constraints of the sharing rules of a meter at a time step, i.e., the positive allocation coefficients
+		(Eqs. 23-24), if "strict_pos_coeffs", and the sharing of all surplus or deficit (Eqs. 27-32), if
+		"total_share_coeffs".
+		:param n: meter ID
+		:param t: time step
+		"""
+		increment = f'{n}_t{t:07d}'
+		indicator = self.formulation == 'indicator' and t not in self.relaxed_steps
+		e_cmet = self.milp_vars['e_cmet']
+		e_pur = self.milp_vars['e_pur_pool']
+		e_sale = self.milp_vars['e_sale_pool']
+		delta_coeff = self.milp_vars.get('delta_coeff')
+		delta_rec_balance = self.milp_vars.get('delta_rec_balance')
+		delta_meter_balance = self.milp_vars.get('delta_meter_balance')
+
+		if self.strict_pos_coeffs and indicator:
+			# Eq. 23
+			self.milp.add_indicator(
+				delta_coeff[n][t], 0, e_sale[n][t] - e_pur[n][t] <= -e_cmet[n][t],
+				'Positive_coefficients_1_' + increment)
+
+			# Eq. 24
+			self.milp.add_indicator(
+				delta_coeff[n][t], 1, e_sale[n][t] - e_pur[n][t] <= 0, 'Positive_coefficients_2_' + increment)
+
+		elif self.strict_pos_coeffs:
+			# Eq. 23
+			self.milp += \
+				e_sale[n][t] - e_pur[n][t] <= -e_cmet[n][t] + self._big_m * delta_coeff[n][t], \
+				'Positive_coefficients_1_' + increment
+
+			# Eq. 24
+			self.milp += \
+				e_sale[n][t] - e_pur[n][t] <= self._big_m * (1 - delta_coeff[n][t]), \
+				'Positive_coefficients_2_' + increment
+
+		if self.total_share_coeffs and indicator:
+			# Eq. 27
+			self.milp.add_indicator(
+				delta_meter_balance[n][t], 0, e_cmet[n][t] >= 0, 'Check_meter_surplus_' + increment)
+
+			# Eq. 28
+			self.milp.add_indicator(
+				delta_meter_balance[n][t], 1, e_cmet[n][t] <= 0, 'Check_meter_deficit_' + increment)
+
+			# Eqs. 29-32 hold for a meter in surplus in a REC in deficit, or vice versa; each combination of the
+			# binary variables is signaled by an auxiliary binary variable, forced to 1 when the combination holds
+			share_surplus = LpVariable('delta_share_surplus_' + increment, cat=LpBinary)
+			self.milp += \
+				share_surplus >= delta_meter_balance[n][t] - delta_rec_balance[t], \
+				'Share_all_surplus_signal_' + increment
 
+			buy_deficit = LpVariable('delta_buy_deficit_' + increment, cat=LpBinary)
+			self.milp += \
+				buy_deficit >= delta_rec_balance[t] - delta_meter_balance[n][t], \
+				'Buy_all_deficit_signal_' + increment
+
+			# Eqs. 29-30
+			self.milp.add_indicator(
+				share_surplus, 1, e_sale[n][t] == - e_cmet[n][t], 'Share_all_surplus_' + increment)
+
+			# Eqs. 31-32
+			self.milp.add_indicator(
+				buy_deficit, 1, e_pur[n][t] == e_cmet[n][t], 'Buy_all_deficit_' + increment)
+
+		elif self.total_share_coeffs:
+			# Eq. 27
+			self.milp += \
+				e_cmet[n][t] >= - self._big_m * delta_meter_balance[n][t], \
+				'Check_meter_surplus_' + increment
+
+			# Eq. 28
+			self.milp += \
+				e_cmet[n][t] <= self._big_m * (1 - delta_meter_balance[n][t]) + self._small_m, \
+				'Check_meter_deficit_' + increment
+
+			# Eq. 29
+			self.milp += \
+				e_sale[n][t] >= - e_cmet[n][t] - self._big_m * (
+						1 - delta_meter_balance[n][t] + delta_rec_balance[t]), \
+				'Share_all_surplus_low_' + increment
+
+			# Eq. 30
+			self.milp += \
+				e_sale[n][t] <= - e_cmet[n][t] + self._big_m * (
+						1 - delta_meter_balance[n][t] + delta_rec_balance[t]), \
+				'Share_all_surplus_high_' + increment
+
+			# Eq. 31
+			self.milp += \
+				e_pur[n][t] >= e_cmet[n][t] - self._big_m * (
+						1 - delta_rec_balance[t] + delta_meter_balance[n][t]), \
+				'Buy_all_deficit_low_' + increment
+
+			# Eq. 32
+			self.milp += \
+				e_pur[n][t] <= e_cmet[n][t] + self._big_m * (
+						1 - delta_rec_balance[t] + delta_meter_balance[n][t]), \
+				'Buy_all_deficit_high_' + increment
+
+	def __propagate_bounds(self):
+		"""
+		Sets finite upper (and lower) bounds on the continuous energy flows, per meter, derived from the meters' power
+		limits and maximum storage capacities. The bounds are either implied by the constraints or only exclude
+		solutions for which there is an alternative solution within the bounds with the same objective function value:
+			- |e_cmet| <= p_meter_max * delta_t (Eqs. 4-5);
+			- e_bc, e_bd <= (e_bn_init + e_bn_max) * storage_ratio * delta_t (Eqs. 9-12);
+			- e_bat <= soc_max / 100 * (e_bn_init + e_bn_max) (Eqs. 9-10 and 16);
+			- e_sup, e_sur <= big_m + small_m (Eq. 18);
+			- e_consumed <= p_meter_max * delta_t, since e_consumed = max(e_cmet, 0) is admissible (Eqs. 19 and 21);
+			- in the general regulatory context, the local net purchases |e_pur - e_sale| are limited by the retail
+			flows (Eqs. 3 and 18), so e_alc, e_slc and, after cancelling out simultaneous local purchases and sales of
+			a meter (which leaves Eqs. 17, 20, 23-24 and 29-32 unchanged), e_pur and e_sale are bounded as well.
+		"""
+		for n in self.set_meters:
+			max_net_load = self._p_meter_max[n] * self._delta_t
+			max_storage = self._e_bn_init[n] + self._e_bn_max[n]
+			max_retail = self._big_m + self._small_m
+			max_local_net = max_net_load + max_retail
+			upper_bounds = {
+				'e_cmet': max_net_load,
+				'e_bc': max_storage * self._storage_ratio * self._delta_t,
+				'e_bd': max_storage * self._storage_ratio * self._delta_t,
+				'e_bat': self._soc_max[n] / 100 * max_storage,
+				'e_sup': max_retail,
+				'e_sur': max_retail,
+				'e_consumed': max_net_load
+			}
+			if self.regulatory_context == 'General':
+				upper_bounds.update({
+					'e_alc': max_local_net,
+					'e_slc_pool': max_local_net,
+					'e_pur_pool': max_net_load + max_local_net,
+					'e_sale_pool': max_net_load + max_local_net
+				})
+			for var_key, up_bound in upper_bounds.items():
+				for var in self.milp_vars[var_key][n]:
+					var.upBound = up_bound
+			for var in self.milp_vars['e_cmet'][n]:
+				var.lowBound = -max_net_load
+
+	def __remove_log(self):
+		"""
+		Removes the temporary directory of the solver log, if any.
+		"""
+		if self._log_dir is not None:
+			shutil.rmtree(self._log_dir, ignore_errors=True)
+			self._log_dir = None
+
+	def __run_solver(self):
+		"""
+		Calls the solver, following its progress if requested.
+		"""
+		if self._log_dir is not None:
+			log_path = os.path.join(self._log_dir, 'solver.log')
+			with SolverMonitor(log_path, self.solver, self.progress_callback, self.stop_rule) as monitor:
+				self.milp.solve()
+			self.progress_events += monitor.events
+			self.stopped_early = self.stopped_early or monitor.stopped_early
 		else:
-			raise ValueError(f'{self.solver}_CMD not available in puLP; '
-							 f'please install the required solver or try a different one')
+			self.milp.solve()
 
-		logger.debug('-- defining the collective (pool) MILP problem... DONE!')
+	def __generate_sharing_rows(self) -> int:
+		"""
+		Checks the current solution for violations of the sharing rules' constraints that are not in the MILP (Eqs.
+		23-32) and adds the constraints of the violated (meter, time step) pairs. Since the omitted constraints link
+		the continuous variables through binary variables that are not in the MILP either, a constraint is violated
+		if no value of its binary variables satisfies it; the REC balance binary variable of a time step is shared by
+		all meters, so the value that satisfies most meters is chosen, and the REC balance constraints (Eqs. 25-26)
+		of a time step are added with the first meter's constraints.
+		When no constraint is violated, the binary variables of the omitted constraints are set to satisfying values
+		and added to the MILP, for the outputs to be complete.
+		:return: number of (meter, time step) pairs whose constraints were added
+		"""
+		if not (self.strict_pos_coeffs or self.total_share_coeffs):
+			return 0
+		solution = lambda var_key: np.array([[var.varValue or 0.0 for var in self.milp_vars[var_key][n]]
+											 for n in self.set_meters])
+		e_cmet = solution('e_cmet')
+		e_pur = solution('e_pur_pool')
+		e_sale = solution('e_sale_pool')
+		big_m, small_m, tol = self._big_m, self._small_m, ROW_GENERATION_TOLERANCE
+		violated = np.zeros(e_cmet.shape, dtype=bool)
+		binaries = {}
 
-		return
+		if self.strict_pos_coeffs:
+			# Eqs. 23-24, for delta_coeff = 0 and delta_coeff = 1
+			net_sale = e_sale - e_pur
+			coeff_ok = [(net_sale <= -e_cmet + tol) & (net_sale <= big_m + tol),
+						(net_sale <= -e_cmet + big_m + tol) & (net_sale <= tol)]
+			violated |= ~(coeff_ok[0] | coeff_ok[1])
+			binaries['delta_coeff'] = np.where(coeff_ok[0], 0, 1)
+
+		if self.total_share_coeffs:
+			def meter_ok(meter_balance, rec_balance):
+				# Eqs. 27-32, for given values of delta_meter_balance and delta_rec_balance
+				share_m = big_m * (1 - meter_balance + rec_balance)
+				buy_m = big_m * (1 - rec_balance + meter_balance)
+				return (e_cmet >= -big_m * meter_balance - tol) & \
+					(e_cmet <= big_m * (1 - meter_balance) + small_m + tol) & \
+					(e_sale >= -e_cmet - share_m - tol) & (e_sale <= -e_cmet + share_m + tol) & \
+					(e_pur >= e_cmet - buy_m - tol) & (e_pur <= e_cmet + buy_m + tol)
+
+			rec_net_load = e_cmet.sum(axis=0)
+			rec_solution = np.array([var.varValue or 0.0 for var in self.milp_vars['delta_rec_balance']]).round()
+			meter_violations = []
+			nr_failures = []
+			for rec_balance in (0, 1):
+				violations = ~(meter_ok(0, rec_balance) | meter_ok(1, rec_balance)) & ~self._sharing_rows
+				# Eqs. 25-26; the value of the REC balance binary variable is kept where the constraints are in the MILP
+				rec_ok = (rec_net_load >= -big_m * rec_balance - tol) & \
+					(rec_net_load <= big_m * (1 - rec_balance) + small_m + tol) & \
+					(~self._rec_rows | (rec_solution == rec_balance))
+				meter_violations.append(violations)
+				nr_failures.append(np.where(rec_ok, violations.sum(axis=0), np.inf))
+			rec_balance = np.argmin(nr_failures, axis=0)
+			violated |= np.where(rec_balance == 1, meter_violations[1], meter_violations[0])
+			binaries['delta_rec_balance'] = rec_balance
+			binaries['delta_meter_balance'] = np.where(meter_ok(0, rec_balance), 0, 1)
+
+		violated &= ~self._sharing_rows
+		nr_violated = int(violated.sum())
+		if nr_violated:
+			for i, t in zip(*np.nonzero(violated)):
+				if self.total_share_coeffs and not self._rec_rows[t]:
+					self.__add_rec_balance_rows(t)
+					self._rec_rows[t] = True
+				self.__add_sharing_rows(self.set_meters[i], t)
+			self._sharing_rows |= violated
+			logger.debug(f'-- row generation: constraints added for {nr_violated} (meter, time step) pairs')
+			return nr_violated
+
+		# Set the binary variables of the omitted constraints
+		for var_key, values in binaries.items():
+			if var_key == 'delta_rec_balance':
+				omitted = [(var, val) for var, val, in_milp in zip(self.milp_vars[var_key], values, self._rec_rows)
+						   if not in_milp]
+			else:
+				omitted = [(var, val) for i, n in enumerate(self.set_meters)
+						   for var, val, in_milp in zip(self.milp_vars[var_key][n], values[i], self._sharing_rows[i])
+						   if not in_milp]
+			for var, val in omitted:
+				var.varValue = float(val)
+			self.milp.addVariables([var for var, _ in omitted])
+		logger.debug(f'-- row generation: {int(self._sharing_rows.sum())} of {self._sharing_rows.size} (meter, time '
+					 f'step) pairs with sharing rules\' constraints')
+
+		return 0
 
 	def solve_milp(self):
 		"""
@@ -518,8 +1266,19 @@ class CollectiveMILPPool:
 		# Solve the MILP
 		logger.debug('-- solving the collective (pool) MILP problem...')
 
+		self.progress_events = []
+		self.stopped_early = False
 		try:
-			self.milp.solve()
+			self.__run_solver()
+			self.row_generation_iterations = 1
+			while self.row_generation and LpStatus[self.milp.status] == 'Optimal' and self.__generate_sharing_rows():
+				# warm start the solver from the last solution
+				for var in self.milp.variables():
+					if var.varValue is not None:
+						var.setInitialValue(round(var.varValue) if var.cat == LpInteger else var.varValue)
+				self.milp.solver.optionsDict['warmStart'] = True
+				self.__run_solver()
+				self.row_generation_iterations += 1
 			status = LpStatus[self.milp.status]
 			opt_value = value(self.milp.objective)
 
@@ -528,6 +1287,9 @@ class CollectiveMILPPool:
 			status = 'Infeasible'
 			opt_value = None
 
+		finally:
+			self.__remove_log()
+
 		self.status = status
 		self.obj_value = opt_value
 
@@ -535,6 +1297,40 @@ class CollectiveMILPPool:
 
 		return
 
+	def diagnose_infeasibility(self, families=None, iis=True, iis_max_constraints=IIS_MAX_CONSTRAINTS) -> dict:
+		"""
+		Function that defines the MILP and diagnoses its infeasibility, by re-solving it with elastic slack variables on
+		the selected constraint families and, for small instances, by computing an irreducible infeasible subsystem.
+		:param families: prefixes of the constraint families to be relaxed (e.g., ["Contracted_power_limit",
+			"Daily_SOC_reset_"]); if None, all families are relaxed
+		:param iis: if True, an IIS is computed whenever the MILP has up to "iis_max_constraints" constraints
+		:param iis_max_constraints: maximum number of constraints for which an IIS is computed
+		:return: report of the elastic diagnosis (see "elastic_diagnosis"), with an additional "iis" key with the list
+			of constraints' names in the IIS (None if not computed)
+		"""
+		# Define the MILP
+		self.__define_milp()
+
+		# Keep the original constraints, since the elastic diagnosis relaxes them in place
+		compute_iis = iis and len(self.milp.constraints) <= iis_max_constraints
+		original_constraints = {name: constraint.copy() for name, constraint in self.milp.constraints.items()} \
+			if compute_iis else None
+
+		logger.debug('-- diagnosing the collective (pool) MILP problem...')
+		report = elastic_diagnosis(self.milp, self.set_meters, families)
+
+		report['iis'] = None
+		if compute_iis:
+			report['iis'] = deletion_filter_iis(original_constraints, self.milp.solver)
+		elif iis:
+			logger.info(f'-- IIS not computed: {len(self.milp.constraints)} constraints > '
+						f'iis_max_constraints = {iis_max_constraints}')
+		self.__remove_log()
+
+		logger.debug('-- diagnosing the collective (pool) MILP problem... DONE!')
+
+		return report
+
 	def generate_outputs(self) -> OutputsCollectivePoolDict:
 		"""
 		Function for generating the outputs of optimization, namely the battery's set points.
@@ -586,7 +1382,7 @@ class CollectiveMILPPool:
 		var_name = lambda v_str, n_str: rematchd[v_str.split(n_str)[-1]]
 
 		for v in self.milp.variables():
-			if re.search('dummy', v.name):
+			if re.search('dummy', v.name) or v.name.startswith(('pool_dev_', 'consensus_dev_')):
 				continue
 			elif re.search('p_cont_', v.name):
 				n = var_name(v.name, 'p_cont_')
@@ -684,12 +1480,15 @@ class CollectiveMILPPool:
 			outputs['c_ind2pool'][n] = round(c_ind_array, 4)
 
 		# Also retrieve the slack values of the "Market Equilibrium" constraints. These can be considered as the
-		# "optimal" market prices.
-		dual_prices = \
-			[abs(self.milp.constraints[c].pi) for c in self.milp.constraints if c.startswith('Market_equilibrium_')]
-		outputs['dual_prices'] = [round(dp, 4) for dp in dual_prices]
-		# important step: scale the dual prices by the number of days they represent to achieve daily dual prices
-		outputs['dual_prices'] = list(np.array(outputs['dual_prices']) / np.array(self._w_clustering))
+		# "optimal" market prices. In a pool exchange, the market prices are the given pool prices.
+		if self.pool_exchange is not None:
+			outputs['dual_prices'] = [float(price) for price in self.pool_exchange['prices']]
+		else:
+			dual_prices = [abs(constraint.pi) for c, constraint in self.milp.constraints.items()
+						   if c.startswith('Market_equilibrium_')]
+			outputs['dual_prices'] = [round(dp, 4) for dp in dual_prices]
+			# important step: scale the dual prices by the number of days they represent to achieve daily dual prices
+			outputs['dual_prices'] = list(np.array(outputs['dual_prices']) / np.array(self._w_clustering))
 
 		logger.debug('-- generating outputs from the collective (pool) MILP problem... DONE!')
 
@@ -0,0 +1,209 @@
+"""
+Exchange ADMM decomposition of the collective (pool) MILP across meters.
+Apart from the market equilibrium (Eq. 17) and the REC balance check (Eqs. 25-26), which couple all meters at each
+time step, the meters' blocks of the MILP are independent. The pool is thus cleared by prices instead: each meter solves
+its own MILP, paying (or being paid) the pool price for its net pool purchases, with a penalty on the deviation from
+its share of a balanced exchange, and the prices are raised (lowered) where the pool has a deficit (surplus), until the
+exchanges are balanced. The REC balance binary variables are set by the coordinator from the meters' net loads.
+puLP's MILP solvers do not handle quadratic terms, so the usual quadratic penalty of the ADMM is replaced by an absolute
+one; as with any ADMM applied to a MILP, the result is a heuristic solution. The final exchanges are always balanced:
+the meters are re-solved with their pool exchanges fixed to the last ones, with the excess of the long side of the pool
+scaled down (see balanced_targets), and their status is reported as "Heuristic" rather than "Optimal".
+The subproblems of each iteration are solved in parallel processes or by a warm worker pool served over a local socket
+or a file-based queue (see rec_sizing/worker.py), whose directory may be shared by workers in several machines.
+"""
+import numpy as np
+
+from joblib import (
+	delayed,
+	Parallel
+)
+from loguru import logger
+
+from rec_sizing.custom_types.collective_milp_pool_types import (
+	BackpackCollectivePoolDict,
+	OutputsCollectivePoolDict
+)
+from rec_sizing.optimization.helpers.backpack_helpers import select_meters
+from rec_sizing.optimization.helpers.outputs_helpers import merge_meter_outputs
+from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+
+
+def solve_meter_subproblem(backpack: BackpackCollectivePoolDict,
+						   nr_dates: int,
+						   pool_exchange: dict,
+						   rec_balance: list,
+						   solver: str,
+						   timeout: int,
+						   mipgap: float) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Solves the collective (pool) MILP of a backpack's meters (usually, a single meter) for given pool prices, i.e.,
+	without the constraints that couple them to the remaining meters.
+	:param backpack: backpack with the data of the subproblem's meters
+	:param nr_dates: number of original days considered in the optimization horizon
+	:param pool_exchange: pool prices and targets of the meters' net pool purchases (see CollectiveMILPPool)
+	:param rec_balance: values of the REC balance binary variables, per time step; only used with "total_share_coeffs"
+	:param solver: solver chosen for the MILP
+	:param timeout: time limit (s) for the solver
+	:param mipgap: tolerance for the solver
+	:return: outputs of the MILP; empty if the solver raised an error
+	"""
+	fixed_binaries = {'delta_rec_balance': rec_balance} if backpack.get('total_share_coeffs') else None
+	milp = CollectiveMILPPool(backpack, nr_dates, solver, timeout, mipgap, write_lp=False,
+							  fixed_binaries=fixed_binaries, pool_exchange=pool_exchange)
+	milp.solve_milp()
+
+	return milp.generate_outputs()
+
+
+def balanced_targets(net_purchases: np.ndarray) -> np.ndarray:
+	"""
+	Balances the meters' pool exchanges at each time step by scaling down the exchanges of the long side of the pool
+	(purchases, if they exceed the sales, or sales otherwise), so that the net pool purchases add up to zero.
+	Exchanges are only reduced, so meters that need to sell (buy) at least some energy in the pool may end up unable to
+	do so; the sharing rules' constraints (Eqs. 23-32) only impose such amounts on the short side of the pool.
+	:param net_purchases: array with the net pool purchases of each meter (rows) and time step (columns), in kWh
+	:return: array with the balanced net pool purchases
+	"""
+	purchases = np.clip(net_purchases, 0, None)
+	sales = np.clip(-net_purchases, 0, None)
+	total_purchases = purchases.sum(axis=0)
+	total_sales = sales.sum(axis=0)
+	traded = np.minimum(total_purchases, total_sales)
+	purchases_scale = np.divide(traded, total_purchases, out=np.zeros_like(traded), where=total_purchases > 0)
+	sales_scale = np.divide(traded, total_sales, out=np.zeros_like(traded), where=total_sales > 0)
+
+	return purchases * purchases_scale - sales * sales_scale
+
+
+def _solve_subproblems(subproblems: list, n_jobs: int, broker, broker_timeout) -> list:
+	"""
+	Solves the subproblems of an iteration, either in a pool of processes or through a worker pool's broker.
+	:param subproblems: list with the arguments of solve_meter_subproblem of each subproblem
+	:param n_jobs: number of parallel processes (joblib convention: -1 uses all available CPUs)
+	:param broker: None, or the path of a worker pool's socket or file-based queue directory (see submit_subproblems)
+	:param broker_timeout: maximum time (s) to wait for the worker pool's results; None waits indefinitely
+	:return: list with the outputs of each subproblem; empty for the subproblems whose results were not received
+	"""
+	if broker is None:
+		return Parallel(n_jobs=n_jobs)(delayed(solve_meter_subproblem)(**subproblem) for subproblem in subproblems)
+
+	from rec_sizing.worker import submit_subproblems  # the worker pool imports the optimization stack itself
+	return submit_subproblems(broker, subproblems, timeout=broker_timeout)
+
+
+def _solution(outputs: list, var_key: str) -> np.ndarray:
+	"""
+	Stacks the values of a decision variable of the meters' subproblems.
+	:param outputs: list with the outputs of each meter's subproblem, in the order of the meters
+	:param var_key: outputs' key of the decision variable, with one array per meter
+	:return: array with the values of each meter (rows) and time step (columns)
+	"""
+	return np.array([[val or 0.0 for val in values] for part in outputs for values in part[var_key].values()])
+
+
+def exchange_admm(backpack: BackpackCollectivePoolDict,
+				  nr_dates: int,
+				  solver: str,
+				  timeout: int,
+				  mipgap: float,
+				  n_jobs: int,
+				  penalty: float,
+				  step: float,
+				  max_iterations: int,
+				  tolerance: float,
+				  broker=None,
+				  broker_timeout=None) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Solves the collective (pool) MILP by an exchange ADMM across meters (see the module's description).
+	The pool prices start at the mean of the meters' retail buying and selling tariffs and are kept within the range of
+	those tariffs, beyond which no meter trades in the pool.
+	:param backpack: backpack prepared for the MILP (see run_pre_collective_pool_milp), with "w_clustering"
+	:param nr_dates: number of original days considered in the optimization horizon
+	:param solver: solver chosen for the meters' MILPs
+	:param timeout: time limit (s) for the solver, per meter's MILP
+	:param mipgap: tolerance for the solver
+	:param n_jobs: number of parallel processes (joblib convention: -1 uses all available CPUs)
+	:param penalty: cost of the deviations of the meters' net pool purchases from their targets, in €/kWh
+	:param step: step of the pool prices' update, in €/kWh per kWh of mean pool imbalance
+	:param max_iterations: maximum number of price updates; at least 1
+	:param tolerance: the iterations stop when the pool imbalance and the change of the meters' pool exchanges are
+		below this value at all time steps, in kWh
+	:param broker: optional path of the socket or file-based queue directory of a worker pool, which then solves the
+		meters' MILPs (see rec_sizing/worker.py); if None, they are solved in a pool of "n_jobs" processes
+	:param broker_timeout: maximum time (s) to wait for the worker pool to solve the meters' MILPs of an iteration;
+		those not solved in time are handled as failed; None waits indefinitely
+	:return: outputs dictionary as in run_pre_collective_pool_milp, with the pool prices as "dual_prices", the REC
+		balance binary variables of the final net loads as "delta_rec_balance" and "milp_status" as in
+		merge_meter_outputs; empty if any meter's MILP failed
+	"""
+	meter_ids = list(backpack['meters'])
+	meter_backpacks = [select_meters(backpack, [meter_id]) for meter_id in meter_ids]
+	l_buy = np.array([backpack['meters'][n]['l_buy'] for n in meter_ids], dtype=float)
+	l_sell = np.array([backpack['meters'][n]['l_sell'] for n in meter_ids], dtype=float)
+	min_price, max_price = l_sell.min(axis=0), l_buy.max(axis=0)
+	prices = (l_buy + l_sell).mean(axis=0) / 2
+
+	# the REC balance starts from the net loads without storage and new generation
+	rec_net_load = sum(
+		np.array(meter_data['e_c']) - np.array(meter_data['e_g_factor']) * meter_data['p_gn_init'] * backpack['delta_t']
+		for meter_data in backpack['meters'].values()
+	)
+
+	def solve(targets, exchange_penalty):
+		subproblems = [
+			{'backpack': meter_backpack, 'nr_dates': nr_dates,
+			 'pool_exchange': {
+				 'prices': prices.tolist(),
+				 'targets': {n: targets[i].tolist() for n in meter_backpack['meters']} if targets is not None else None,
+				 'penalty': exchange_penalty},
+			 'rec_balance': (rec_net_load < 0).astype(int).tolist(),
+			 'solver': solver, 'timeout': timeout, 'mipgap': mipgap}
+			for i, meter_backpack in enumerate(meter_backpacks)
+		]
+		return _solve_subproblems(subproblems, n_jobs, broker, broker_timeout)
+
+	outputs = solve(None, None)
+	net_purchases = None
+	for iteration in range(1, max_iterations + 1):
+		if not all(outputs):
+			logger.warning('A meter\'s MILP could not be solved; aborting the ADMM')
+			return {}
+		last_net_purchases = net_purchases
+		net_purchases = _solution(outputs, 'e_pur_pool') - _solution(outputs, 'e_sale_pool')
+		rec_net_load = _solution(outputs, 'e_cmet').sum(axis=0)
+		imbalance = net_purchases.sum(axis=0)
+		change = np.abs(net_purchases - last_net_purchases).max() if last_net_purchases is not None else np.inf
+		logger.debug(f'-- ADMM iteration {iteration}: max. pool imbalance = {np.abs(imbalance).max():.4f} kWh, '
+					 f'max. exchange change = {change:.4f} kWh')
+		if np.abs(imbalance).max() <= tolerance and change <= tolerance:
+			break
+
+		# raise (lower) the prices where the pool has a deficit (surplus) and steer each meter to its share of a
+		# balanced exchange
+		mean_imbalance = imbalance / len(meter_ids)
+		prices = np.clip(prices + step * mean_imbalance, min_price, max_price)
+		outputs = solve(net_purchases - mean_imbalance, penalty)
+	else:
+		logger.warning(f'ADMM did not converge in {max_iterations} iterations (max. pool imbalance = '
+					   f'{np.abs(imbalance).max():.4f} kWh); balancing the last exchanges')
+
+	# Re-solve the meters' MILPs with balanced pool exchanges; the REC balance binary variables they are solved with
+	# come from the last iteration's net loads, so they are re-solved until those agree with their own net loads
+	targets = balanced_targets(net_purchases)
+	for _ in range(max_iterations):
+		rec_balance = (rec_net_load < 0).astype(int)
+		outputs = solve(targets, None)
+		if not all(outputs):
+			logger.warning('A meter\'s MILP could not be solved with the balanced pool exchanges; aborting the ADMM')
+			return {}
+		rec_net_load = _solution(outputs, 'e_cmet').sum(axis=0)
+		if not backpack.get('total_share_coeffs') or ((rec_net_load < 0).astype(int) == rec_balance).all():
+			break
+	else:
+		logger.warning('The REC balance binary variables did not settle with the balanced pool exchanges; reporting '
+					   'those of the final net loads')
+
+	return merge_meter_outputs(outputs, (rec_net_load < 0).astype(int).tolist(), prices.tolist())
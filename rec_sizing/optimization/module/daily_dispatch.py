@@ -0,0 +1,71 @@
+"""
+Per-day dispatch of the collective (pool) MILP for a given investment plan.
+With all investment decisions (including the contracted power) fixed, the daily SOC reset (Eq. 33) decouples the days
+of the horizon, so each day can be solved as an independent MILP, in parallel.
+If the binary variables are also fixed (e.g., at the incumbent of a previous MILP), each day becomes an LP, whose
+"Market_equilibrium_" duals are well-defined, which is used for pricing.
+"""
+from joblib import (
+	delayed,
+	Parallel
+)
+from loguru import logger
+from typing import Dict
+
+from rec_sizing.custom_types.collective_milp_pool_types import (
+	BackpackCollectivePoolDict,
+	OutputsCollectivePoolDict,
+	ValuePerId
+)
+from rec_sizing.optimization.helpers.backpack_helpers import slice_backpack
+from rec_sizing.optimization.helpers.milp_helpers import time_intervals
+from rec_sizing.optimization.helpers.outputs_helpers import (
+	merge_outputs,
+	slice_binaries
+)
+from rec_sizing.optimization.module.rolling_horizon import solve_window
+
+
+def daily_dispatch(backpack: BackpackCollectivePoolDict,
+				   fixed_investments: Dict[str, ValuePerId],
+				   n_jobs: int,
+				   solver: str,
+				   timeout: int,
+				   mipgap: float,
+				   fixed_binaries=None) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Solves one collective (pool) MILP per day of the horizon, in a pool of processes, and merges the daily outputs.
+	:param backpack: backpack with the data of the full horizon
+	:param fixed_investments: investment decisions to be fixed (see CollectiveMILPPool); must include "p_cont",
+		"p_gn_new" and "e_bn_new" for the days to be independent
+	:param n_jobs: number of parallel processes (joblib convention: -1 uses all available CPUs)
+	:param solver: solver chosen for the MILP
+	:param timeout: time limit (s) for the solver, per day
+	:param mipgap: tolerance for the solver
+	:param fixed_binaries: optional dict with the values of the binary variables for the full horizon, with the same
+		keys and structure as in the MILP outputs; if provided, each day is solved as an LP with the binaries fixed
+	:return: outputs dictionary with the merged schedules of all days; empty if any day failed
+	"""
+	nr_steps = time_intervals(backpack['nr_days'] * 24, backpack['delta_t'])
+	nr_daily_steps = min(time_intervals(24, backpack['delta_t']), nr_steps)
+	days = [(first_step, min(first_step + nr_daily_steps, nr_steps))
+			for first_step in range(0, nr_steps, nr_daily_steps)]
+
+	# each day's data is sliced here, so that only that day is serialized to the worker processes
+	partial_outputs = Parallel(n_jobs=n_jobs)(
+		delayed(solve_window)(slice_backpack(backpack, first_step, last_step), fixed_investments, None, solver, timeout,
+							  mipgap,
+							  fixed_binaries=slice_binaries(fixed_binaries, first_step, last_step)
+							  if fixed_binaries is not None else None)
+		for first_step, last_step in days
+	)
+
+	for (first_step, last_step), outputs in zip(days, partial_outputs):
+		if not outputs:
+			logger.warning(f'Day [{first_step}, {last_step}[ could not be solved; aborting the daily dispatch')
+			return {}
+
+	nr_kept_steps = [last_step - first_step for first_step, last_step in days]
+
+	return merge_outputs(partial_outputs, nr_kept_steps, backpack, backpack['nr_days'])
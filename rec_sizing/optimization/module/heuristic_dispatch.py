@@ -0,0 +1,147 @@
+"""
+Rule-based (heuristic) dispatch simulator for screening investment plans.
+Many candidate plans are simulated at once, with NumPy arrays batched over a candidates axis and a meters axis:
+    - each meter's storage follows a self-consumption-first policy, i.e., it charges from the meter's own surplus and
+      discharges to cover the meter's own deficit, returning to its initial energy content at the last step of each
+      day by discharging its excess or by recharging its shortfall from the grid, so that no energy is created;
+    - the remaining community surplus is matched to the remaining community deficit in the pool, pro-rata;
+    - any unmatched deficit (surplus) is supplied by (sold to) the retailer.
+The cost components are the same as the ones computed by the post-processing function "desegregated_OF_costs", so the
+simulation provides a fast approximation of the costs a MILP would achieve with the same investments.
+"""
+import numpy as np
+
+from typing import Dict
+
+from rec_sizing.custom_types.collective_milp_pool_types import BackpackCollectivePoolDict
+from rec_sizing.optimization.helpers.milp_helpers import time_intervals
+
+
+def _candidates_matrix(candidates: Dict[str, np.ndarray], set_meters: list) -> np.ndarray:
+	"""
+	Stacks the candidate values per meter into a matrix with shape (nr. candidates, nr. meters).
+	Meters that are not included in the candidates are considered to have no new investments.
+	:param candidates: dict with an array of candidate values (one per candidate) per meter ID
+	:param set_meters: list with the meters' IDs, which defines the order of the columns
+	:return: matrix with the candidate values
+	"""
+	nr_candidates = max(np.size(val) for val in candidates.values()) if candidates else 1
+	return np.column_stack([
+		np.broadcast_to(np.asarray(candidates.get(n, 0.0), dtype=float), (nr_candidates,))
+		for n in set_meters
+	])
+
+
+def simulate_heuristic_dispatch(backpack: BackpackCollectivePoolDict, candidates: dict) -> dict:
+	"""
+	Simulates the heuristic dispatch of the community for a batch of candidate investment plans.
+	:param backpack: backpack with the data, as expected by run_pre_collective_pool_milp; "w_clustering" and
+		"nr_days_old" are considered if available (i.e., for clustered data)
+	:param candidates: dict with the keys "p_gn_new" and "e_bn_new", each pointing to a dict with an array of candidate
+		values per meter ID; all arrays must have the same length (the number of candidates)
+	:return: dict with the cost components per meter (arrays with one value per candidate), the contracted power
+		required per meter, the total cost per candidate and a feasibility flag per candidate
+	"""
+	set_meters = list(backpack['meters'])
+	meters = [backpack['meters'][n] for n in set_meters]
+	delta_t = backpack['delta_t']
+	storage_ratio = backpack['storage_ratio']
+	nr_steps = time_intervals(backpack['nr_days'] * 24, delta_t)
+	nr_daily_steps = time_intervals(24, delta_t)
+	nr_dates = backpack.get('nr_days_old') or backpack['nr_days']
+	w_clustering = backpack.get('w_clustering')
+	w_clustering = np.ones(nr_steps) if w_clustering is None else np.asarray(w_clustering, dtype=float)
+	l_grid = np.asarray(backpack['l_grid'], dtype=float)
+
+	# Time series with shape (nr. meters, nr. steps) and parameters with shape (nr. meters,)
+	timeseries = lambda key: np.array([np.asarray(meter[key], dtype=float) for meter in meters])
+	parameter = lambda key: np.array([meter[key] for meter in meters], dtype=float)
+	e_c = timeseries('e_c')
+	e_g_factor = timeseries('e_g_factor')
+	l_buy = timeseries('l_buy')
+	l_sell = timeseries('l_sell')
+	soc_init = np.array([meter['soc_min'] if meter.get('soc_init') is None else meter['soc_init'] for meter in meters],
+						dtype=float)
+
+	# Investments with shape (nr. candidates, nr. meters)
+	p_gn_new = _candidates_matrix(candidates.get('p_gn_new', {}), set_meters)
+	e_bn_new = _candidates_matrix(candidates.get('e_bn_new', {}), set_meters)
+	p_gn_new, e_bn_new = np.broadcast_arrays(p_gn_new, e_bn_new)
+	p_gn_total = p_gn_new + parameter('p_gn_init')
+	e_bn_total = e_bn_new + parameter('e_bn_init')
+	e_bat_min = parameter('soc_min') / 100 * e_bn_total
+	e_bat_max = parameter('soc_max') / 100 * e_bn_total
+	e_bat_init = soc_init / 100 * e_bn_total
+	e_rate = e_bn_total * storage_ratio * delta_t
+	eff_bc = parameter('eff_bc')
+	eff_bd = parameter('eff_bd')
+	deg_cost = parameter('deg_cost')
+
+	# State and accumulators with shape (nr. candidates, nr. meters)
+	e_bat = e_bat_init.copy()
+	retailer_exchanges_cost = np.zeros_like(p_gn_total)
+	sc_tariff_cost = np.zeros_like(p_gn_total)
+	degradation_cost = np.zeros_like(p_gn_total)
+	p_peak = np.zeros_like(p_gn_total)
+
+	for t in range(nr_steps):
+		e_net = e_c[:, t] - e_g_factor[:, t] * p_gn_total * delta_t
+
+		if (t + 1) % nr_daily_steps == 0:
+			# Daily SOC reset (Eq. 33): at the last step of each day, the storage returns to its initial content, by
+			# discharging the excess (sold or shared in the pool) or by recharging the shortfall (bought from the pool
+			# or the retailer), within its rate limits
+			e_shortfall = e_bat_init - e_bat
+			e_bc = np.clip(e_shortfall / eff_bc, 0, e_rate)
+			e_bd = np.clip(-e_shortfall * eff_bd, 0, e_rate)
+		else:
+			# Self-consumption-first storage policy
+			e_bc = np.minimum(np.minimum(np.maximum(-e_net, 0), e_rate), (e_bat_max - e_bat) / eff_bc)
+			e_bd = np.minimum(np.minimum(np.maximum(e_net, 0), e_rate), (e_bat - e_bat_min) * eff_bd)
+		e_bat = e_bat + e_bc * eff_bc - e_bd / eff_bd
+		e_cmet = e_net + e_bc - e_bd
+
+		# Pool matching of the community surplus to the community deficit
+		e_deficit = np.maximum(e_cmet, 0)
+		e_surplus = np.maximum(-e_cmet, 0)
+		total_deficit = e_deficit.sum(axis=1, keepdims=True)
+		total_surplus = e_surplus.sum(axis=1, keepdims=True)
+		e_matched = np.minimum(total_deficit, total_surplus)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			e_pur = np.where(total_deficit > 0, e_deficit * e_matched / total_deficit, 0.0)
+			e_sale = np.where(total_surplus > 0, e_surplus * e_matched / total_surplus, 0.0)
+		e_sup = e_deficit - e_pur
+		e_sur = e_surplus - e_sale
+
+		# Cost accumulation
+		retailer_exchanges_cost += (e_sup * l_buy[:, t] - e_sur * l_sell[:, t]) * w_clustering[t]
+		sc_tariff_cost += e_pur * l_grid[t] * w_clustering[t]
+		degradation_cost += e_bd * deg_cost * w_clustering[t]
+		p_peak = np.maximum(p_peak, np.abs(e_cmet) / delta_t)
+
+	contractedpower_cost = p_peak * parameter('l_cont') * nr_dates
+	batteries_investments_cost = e_bn_new * parameter('l_bic') * nr_dates
+	pv_investments_cost = p_gn_new * parameter('l_gic') * nr_dates
+	c_ind = retailer_exchanges_cost + sc_tariff_cost + degradation_cost + contractedpower_cost + \
+		batteries_investments_cost + pv_investments_cost
+
+	# A candidate is flagged as feasible if it respects the investment bounds and the meters' power limits
+	feasible = \
+		(p_peak <= parameter('p_meter_max')) & \
+		(p_gn_new >= parameter('p_gn_min')) & (p_gn_new <= parameter('p_gn_max')) & \
+		(e_bn_new >= parameter('e_bn_min')) & (e_bn_new <= parameter('e_bn_max'))
+
+	per_meter = lambda matrix: {n: matrix[:, idx] for idx, n in enumerate(set_meters)}
+
+	return {
+		'p_cont': per_meter(p_peak),
+		'retailer_exchanges_cost': per_meter(retailer_exchanges_cost),
+		'sc_tariff_cost': per_meter(sc_tariff_cost),
+		'contractedpower_cost': per_meter(contractedpower_cost),
+		'batteries_investments_cost': per_meter(batteries_investments_cost),
+		'PV_investments_cost': per_meter(pv_investments_cost),
+		'degradation_cost': per_meter(degradation_cost),
+		'c_ind2pool': per_meter(c_ind),
+		'total_cost': c_ind.sum(axis=1),
+		'feasible': feasible.all(axis=1)
+	}
@@ -0,0 +1,73 @@
+"""
+Indicator constraints for puLP problems.
+An indicator constraint "binary = value -> linear constraint" only enforces the linear constraint when the binary
+variable takes the given value, which replaces the usual big-M constraints without their weak relaxations and
+numerical issues. puLP has no native support for indicator constraints, so they are written into the Subject To section
+of the problem's .lp file (CPLEX LP format), which is how puLP passes the problem to CPLEX; solvers that do not read
+them (e.g., CBC and HiGHS, which are given .mps files) must use the big-M formulation instead.
+"""
+from pulp import (
+	LpConstraint,
+	LpProblem
+)
+
+
+# Solvers that support the indicator constraints written by IndicatorLpProblem
+INDICATOR_SOLVERS = ('CPLEX',)
+# Sections of an .lp file that may follow the Subject To section
+_LP_SECTIONS = ('Bounds', 'Generals', 'Binaries', 'SOS', 'End')
+
+
+class IndicatorLpProblem(LpProblem):
+	def __init__(self, name='NoName', sense=1):
+		"""
+		puLP problem with indicator constraints, which are written to its .lp file (CPLEX LP format).
+		:param name: name of the problem
+		:param sense: sense of the problem's objective (e.g., LpMinimize)
+		"""
+		super().__init__(name, sense)
+		self.indicators = {}  # indicator constraints, by name: (binary variable, active value, linear constraint)
+
+	def add_indicator(self, binary, value: int, constraint: LpConstraint, name: str):
+		"""
+		Adds an indicator constraint "binary = value -> constraint" to the problem.
+		:param binary: binary puLP variable
+		:param value: value of the binary variable (0 or 1) for which the constraint is enforced
+		:param constraint: linear puLP constraint
+		:param name: name of the indicator constraint
+		"""
+		if value not in (0, 1):
+			raise ValueError(f'value = {value}; indicator constraints are enforced for a value of 0 or 1')
+		constraint.name = name  # sanitized by puLP, as the names of regular constraints
+		if constraint.name in self.indicators or constraint.name in self.constraints:
+			raise ValueError(f'constraint {constraint.name} is already defined')
+		# the variables of the indicator constraints are part of the problem, even if not used by any other constraint
+		self.addVariables([binary, *constraint.keys()])
+		self.indicators[constraint.name] = (binary, value, constraint)
+
+	def writeLP(self, filename, writeSOS=1, mip=1, max_length=100):
+		"""
+		Writes the problem to an .lp file, including its indicator constraints.
+		:param filename: path to the .lp file
+		:param writeSOS: if True, the special ordered sets are written
+		:param mip: if True, the integrality of the variables is written
+		:param max_length: maximum length of the variables' names
+		:return: list with the problem's variables
+		"""
+		variables = super().writeLP(filename, writeSOS=writeSOS, mip=mip, max_length=max_length)
+		if not self.indicators:
+			return variables
+
+		with open(filename) as lp_file:
+			lines = lp_file.readlines()
+		start = lines.index('Subject To\n') + 1
+		end = next(i for i in range(start, len(lines)) if lines[i].strip() in _LP_SECTIONS)
+		indicator_lines = []
+		for name, (binary, value, constraint) in sorted(self.indicators.items()):
+			row = constraint.asCplexLpConstraint(name)
+			indicator_lines.append(f'{name}: {binary.name} = {value} -> {row[len(name) + 2:]}')
+		lines[end:end] = indicator_lines
+		with open(filename, 'w') as lp_file:
+			lp_file.writelines(lines)
+
+		return variables
@@ -0,0 +1,197 @@
+"""
+Diagnosis of infeasible collective (pool) MILPs:
+	- elastic diagnosis: the constraints of the selected families are relaxed with non-negative slack variables and the
+	problem is re-solved minimizing the total slack, which identifies the families, meters and time steps whose
+	constraints need relaxing for the problem to become feasible;
+	- irreducible infeasible subsystem (IIS): for small instances, a deletion filter removes constraints while the
+	problem remains infeasible, which leaves a minimal set of conflicting constraints (the variables' bounds are kept).
+"""
+import re
+
+from loguru import logger
+from pulp import (
+	LpConstraintGE,
+	LpConstraintLE,
+	LpElement,
+	LpProblem,
+	LpStatus,
+	LpVariable,
+	lpSum
+)
+from typing import (
+	Dict,
+	Iterable,
+	List
+)
+
+
+# Prefixes of the names of the constraint families of the collective (pool) MILP
+CONSTRAINT_FAMILIES = (
+	'Market_equilibrium_', 'Check_REC_surplus_', 'Check_REC_deficit_', 'Contracted_power_limit', 'New_gen_installed_',
+	'Min_new_gen_', 'Max_new_gen_', 'New_storage_installed_', 'Min_new_storage_', 'Max_new_storage_',
+	'Symmetry_breaking_', 'C_met_', 'Equilibrium_', 'P_flow_low_limit_', 'P_flow_high_limit_', 'Scaled_generation_',
+	'Charge_rate_limit_', 'Discharge_rate_limit', 'Energy_update_', 'Minimum_SOC_', 'Maximum_SOC_',
+	'Daily_SOC_reset_', 'Final_SOC_', 'Supply_ON_', 'Supply_OFF_', 'Consumption_', 'Allocated_energy_',
+	'Self_consumption_1_', 'Self_consumption_2_', 'Positive_coefficients_1_', 'Positive_coefficients_2_',
+	'Check_meter_surplus_', 'Check_meter_deficit_', 'Share_all_surplus_low_', 'Share_all_surplus_high_',
+	'Buy_all_deficit_low_', 'Buy_all_deficit_high_'
+)
+# Statuses with which the solvers report an infeasible problem through puLP
+INFEASIBLE_STATUSES = ('Infeasible', 'Undefined')
+# Maximum number of constraints for which an IIS is computed
+IIS_MAX_CONSTRAINTS = 2000
+
+
+def constraint_family(name: str):
+	"""
+	Identifies the family of a constraint of the collective (pool) MILP.
+	:param name: name of the constraint
+	:return: prefix of the constraint's family; None if the constraint does not belong to any known family
+	"""
+	return next((family for family in CONSTRAINT_FAMILIES if name.startswith(family)), None)
+
+
+def _constraint_location(name: str, family: str, meter_ids: Dict[str, str]) -> tuple:
+	"""
+	Retrieves the meter and the time step of a constraint from its name.
+	:param name: name of the constraint
+	:param family: prefix of the constraint's family
+	:param meter_ids: dict with the original meters' IDs per meter ID as written in the constraints' names
+	:return: tuple with the meter ID (None for constraints of the whole REC) and the time step (None for constraints
+		of the whole horizon)
+	"""
+	suffix = name[len(family):]
+	match = re.fullmatch(r'(.*)_t(\d{7})', suffix)
+	if match:
+		return meter_ids.get(match.group(1), match.group(1)), int(match.group(2))
+	if re.fullmatch(r'\d{7}', suffix):
+		return None, int(suffix)
+	return meter_ids.get(suffix, suffix), None
+
+
+def elastic_diagnosis(milp: LpProblem, set_meters: List[str], families: Iterable[str] = None, tol=1e-6) -> dict:
+	"""
+	Relaxes, in place, the constraints of the selected families with non-negative slack variables and re-solves the
+	problem with the total slack as objective, using the solver already set in the problem.
+	:param milp: the (infeasible) collective (pool) MILP
+	:param set_meters: list with the meters' IDs
+	:param families: prefixes of the constraint families to be relaxed; if None, all families are relaxed
+	:param tol: slack value above which a constraint is reported as relaxed
+	:return: {
+		'status': status of the elastic problem; if it is not "Optimal", the infeasibility is not caused by (only) the
+			relaxed families, e.g., it is caused by the variables' bounds
+		'total_violation': sum of the slack values
+		'families': dict with, per relaxed family, the number of relaxed constraints, their total violation and the
+			lists of meters and time steps concerned
+		'relaxed_constraints': list of dicts with the name, family, meter, time step and violation of each relaxed
+			constraint, by decreasing violation
+	}
+	"""
+	families = CONSTRAINT_FAMILIES if families is None else tuple(families)
+	meter_ids = {str(n).translate(LpElement.trans): n for n in set_meters}
+
+	slacks = {}
+	for name, constraint in milp.constraints.items():
+		family = constraint_family(name)
+		if family is None or family not in families:
+			continue
+		slack = LpVariable(f'slack_{name}', lowBound=0)
+		if constraint.sense == LpConstraintLE:
+			constraint[slack] = -1
+		elif constraint.sense == LpConstraintGE:
+			constraint[slack] = 1
+		else:
+			negative_slack = LpVariable(f'slack_neg_{name}', lowBound=0)
+			constraint[slack] = 1
+			constraint[negative_slack] = -1
+			slack = slack + negative_slack
+		slacks[name] = (family, slack)
+	milp.setObjective(lpSum(slack for _, slack in slacks.values()))
+
+	logger.debug(f'-- solving the elastic problem with {len(slacks)} relaxed constraints...')
+	try:
+		milp.solve()
+		status = LpStatus[milp.status]
+	except Exception as e:
+		logger.warning(f'Solver raised an error: \'{e}\'. Considering elastic problem as "Infeasible".')
+		status = 'Infeasible'
+
+	report = {
+		'status': status,
+		'total_violation': None,
+		'families': {},
+		'relaxed_constraints': []
+	}
+	if status != 'Optimal':
+		return report
+
+	for name, (family, slack) in slacks.items():
+		violation = slack.value()
+		if violation is None or violation <= tol:
+			continue
+		meter_id, step = _constraint_location(name, family, meter_ids)
+		report['relaxed_constraints'].append({
+			'name': name,
+			'family': family,
+			'meter': meter_id,
+			'step': step,
+			'violation': violation
+		})
+	report['relaxed_constraints'].sort(key=lambda relaxed: -relaxed['violation'])
+	report['total_violation'] = sum(relaxed['violation'] for relaxed in report['relaxed_constraints'])
+
+	for relaxed in report['relaxed_constraints']:
+		family_report = report['families'].setdefault(relaxed['family'], {
+			'nr_relaxed': 0,
+			'total_violation': 0.0,
+			'meters': [],
+			'steps': []
+		})
+		family_report['nr_relaxed'] += 1
+		family_report['total_violation'] += relaxed['violation']
+		if relaxed['meter'] is not None and relaxed['meter'] not in family_report['meters']:
+			family_report['meters'].append(relaxed['meter'])
+		if relaxed['step'] is not None and relaxed['step'] not in family_report['steps']:
+			family_report['steps'].append(relaxed['step'])
+	for family_report in report['families'].values():
+		family_report['steps'].sort()
+
+	return report
+
+
+def deletion_filter_iis(constraints: dict, solver) -> List[str]:
+	"""
+	Computes an irreducible infeasible subsystem (IIS) of an infeasible set of constraints with a deletion filter:
+	blocks of constraints are removed while the remaining constraints stay infeasible, and blocks whose removal makes
+	them feasible are split, down to single (necessary) constraints. The variables' bounds are kept throughout.
+	:param constraints: dict with the (original) constraints per name
+	:param solver: puLP solver used for the feasibility checks
+	:return: list with the names of the constraints in the IIS; empty if the constraints are feasible
+	"""
+	def infeasible(names) -> bool:
+		problem = LpProblem('iis_check')
+		for name in names:
+			problem.addConstraint(constraints[name].copy(), name)
+		try:
+			problem.solve(solver)
+		except Exception as e:
+			logger.warning(f'Solver raised an error: \'{e}\'. Considering subsystem as "Infeasible".')
+			return True
+		return LpStatus[problem.status] in INFEASIBLE_STATUSES
+
+	candidates = list(constraints)
+	if not infeasible(candidates):
+		return []
+
+	remaining = set(candidates)
+	blocks = [candidates]
+	while blocks:
+		block = blocks.pop()
+		reduced = remaining.difference(block)
+		if infeasible([name for name in candidates if name in reduced]):
+			remaining = reduced
+		elif len(block) > 1:
+			half = len(block) // 2
+			blocks += [block[half:], block[:half]]
+
+	return [name for name in candidates if name in remaining]
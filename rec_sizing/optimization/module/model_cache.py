@@ -0,0 +1,216 @@
+"""
+On-disk cache of the compiled structure of the collective (pool) MILP.
+Building the puLP expressions of the MILP is deterministic given its structure (meters, horizon, time step, formulation
+flags and technical parameters and bounds of the meters), so the compiled model, i.e., the variables' names, bounds
+and categories, the constraints' matrix (in CSR format), senses, right-hand sides and names and the index maps of the
+decision variables, is stored under a hash of that structure. Later runs with the same structure, including runs in
+other processes, rebuild the puLP problem directly from the compiled arrays, after patching in their own numeric
+coefficients (time series and tariffs), which is several times faster than defining it from the original expressions.
+The cache is bounded in size: the least recently used entries are evicted first.
+"""
+import hashlib
+import json
+import numpy as np
+import os
+import tempfile
+
+from loguru import logger
+from pulp import (
+	LpAffineExpression,
+	LpConstraint,
+	LpContinuous,
+	LpInteger,
+	LpProblem,
+	LpVariable
+)
+
+
+# Version of the compiled model; must be increased whenever the MILP formulation changes, to invalidate older entries
+MODEL_CACHE_VERSION = 1
+# Extension of the cache entries' files
+CACHE_EXTENSION = '.npz'
+
+
+def structure_key(structure: dict) -> str:
+	"""
+	Hashes the structure of a MILP.
+	:param structure: JSON serializable dict with all the data that defines the MILP's structure
+	:return: hexadecimal digest of the structure
+	"""
+	dump = json.dumps({'version': MODEL_CACHE_VERSION, **structure}, sort_keys=True, default=float)
+
+	return hashlib.sha256(dump.encode()).hexdigest()
+
+
+def _encode_names(names: list) -> np.ndarray:
+	"""
+	Encodes a list of names as a compact byte array.
+	:param names: list of names, without line breaks
+	:return: uint8 array with the names, separated by line breaks
+	"""
+	return np.frombuffer('\n'.join(names).encode(), dtype=np.uint8)
+
+
+def _decode_names(array: np.ndarray) -> list:
+	"""
+	Decodes a byte array created by _encode_names.
+	:param array: uint8 array with the names, separated by line breaks
+	:return: list of names
+	"""
+	return array.tobytes().decode().split('\n') if array.size else []
+
+
+def compile_problem(milp: LpProblem, variables: list, layout: dict, required_entries=None) -> dict:
+	"""
+	Compiles a puLP problem into arrays.
+	:param milp: the puLP problem
+	:param variables: list with the problem's variables, in the order of the compiled columns
+	:param layout: JSON serializable structure with the columns' indices of the decision variables
+	:param required_entries: optional dict with a list of column indices per constraint name, for matrix entries
+		that must be kept (with a 0 coefficient, if missing) since they are later patched
+	:return: dict with the compiled arrays
+	"""
+	column = {id(var): j for j, var in enumerate(variables)}
+	required_entries = required_entries or {}
+	indptr = [0]
+	indices = []
+	data = []
+	for name, constraint in milp.constraints.items():
+		row = {column[id(var)]: coef for var, coef in constraint.items()}
+		for j in required_entries.get(name, []):
+			row.setdefault(j, 0.0)
+		indices += row.keys()
+		data += row.values()
+		indptr.append(len(indices))
+	objective_columns = [column[id(var)] for var in milp.objective.keys()]
+
+	return {
+		'var_names': _encode_names([var.name for var in variables]),
+		'lb': np.array([np.nan if var.lowBound is None else var.lowBound for var in variables], dtype=float),
+		'ub': np.array([np.nan if var.upBound is None else var.upBound for var in variables], dtype=float),
+		'is_integer': np.array([var.cat == LpInteger for var in variables]),  # binaries are bounded integers
+		'row_names': _encode_names(list(milp.constraints)),
+		'indptr': np.array(indptr, dtype=np.int64),
+		'indices': np.array(indices, dtype=np.int64),
+		'data': np.array(data, dtype=float),
+		'senses': np.array([constraint.sense for constraint in milp.constraints.values()], dtype=np.int8),
+		'rhs': np.array([-constraint.constant for constraint in milp.constraints.values()], dtype=float),
+		'objective_columns': np.array(objective_columns, dtype=np.int64),
+		'layout': _encode_names([json.dumps(layout)])
+	}
+
+
+def build_problem(compiled: dict, name: str, sense: int, objective: np.ndarray) -> tuple:
+	"""
+	Builds a puLP problem from its compiled arrays.
+	:param compiled: dict with the compiled arrays (see compile_problem), possibly with patched coefficients
+	:param name: name of the problem
+	:param sense: sense of the problem's objective (e.g., LpMinimize)
+	:param objective: array with the objective function's coefficients of all columns
+	:return: tuple with the puLP problem, the list of variables (in the order of the compiled columns) and the layout
+	"""
+	lb = [None if np.isnan(val) else val for val in compiled['lb'].tolist()]
+	ub = [None if np.isnan(val) else val for val in compiled['ub'].tolist()]
+	variables = [
+		LpVariable(var_name, low, up, LpInteger if is_integer else LpContinuous)
+		for var_name, low, up, is_integer in zip(_decode_names(compiled['var_names']), lb, ub,
+												 compiled['is_integer'].tolist())
+	]
+
+	indptr = compiled['indptr'].tolist()
+	indices = compiled['indices'].tolist()
+	data = compiled['data'].tolist()
+	senses = compiled['senses'].tolist()
+	rhs = compiled['rhs'].tolist()
+	constraints = {}
+	for i, row_name in enumerate(_decode_names(compiled['row_names'])):
+		start, end = indptr[i], indptr[i + 1]
+		constraints[row_name] = LpConstraint(
+			zip([variables[j] for j in indices[start:end]], data[start:end]), senses[i], row_name, rhs[i]
+		)
+
+	milp = LpProblem(name, sense)
+	milp.constraints = constraints
+	objective_columns = compiled['objective_columns'].tolist()
+	# as in a directly formulated problem, only the columns used by some row or by the objective are added (puLP
+	# writes columns without entries that some solvers, e.g., CBC, fail to read)
+	used_columns = sorted(set(indices).union(objective_columns))
+	milp.addVariables([variables[j] for j in used_columns])
+	milp.setObjective(LpAffineExpression(
+		zip([variables[j] for j in objective_columns], objective[objective_columns].tolist())
+	))
+
+	return milp, variables, compiled_layout(compiled)
+
+
+def compiled_layout(compiled: dict) -> dict:
+	"""
+	Retrieves the columns' indices of the decision variables of a compiled model.
+	:param compiled: dict with the compiled arrays
+	:return: structure with the columns' indices of the decision variables, as provided to compile_problem
+	"""
+	return json.loads(_decode_names(compiled['layout'])[0])
+
+
+def load_compiled(cache_dir: str, key: str):
+	"""
+	Loads a compiled model from the cache, marking it as recently used.
+	:param cache_dir: cache directory
+	:param key: structural hash of the model
+	:return: dict with the compiled arrays; None if the model is not cached or its entry cannot be read
+	"""
+	path = os.path.join(cache_dir, key + CACHE_EXTENSION)
+	if not os.path.isfile(path):
+		return None
+	try:
+		with np.load(path, allow_pickle=False) as entry:
+			compiled = {array_name: entry[array_name] for array_name in entry.files}
+	except Exception as e:
+		logger.warning(f'could not read the model cache entry {path} ({e}); removing it')
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+		return None
+	os.utime(path)
+
+	return compiled
+
+
+def save_compiled(cache_dir: str, key: str, compiled: dict, max_mb: float):
+	"""
+	Stores a compiled model in the cache, atomically, and evicts the least recently used entries above the size limit.
+	:param cache_dir: cache directory; created if it does not exist
+	:param key: structural hash of the model
+	:param compiled: dict with the compiled arrays
+	:param max_mb: maximum size of the cache, in MB
+	"""
+	os.makedirs(cache_dir, exist_ok=True)
+	with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as tmp_file:
+		np.savez_compressed(tmp_file, **compiled)
+	os.replace(tmp_file.name, os.path.join(cache_dir, key + CACHE_EXTENSION))
+	evict(cache_dir, max_mb)
+
+
+def evict(cache_dir: str, max_mb: float):
+	"""
+	Removes the least recently used entries of the cache until its size is within the limit; the most recently used
+	entry is always kept.
+	:param cache_dir: cache directory
+	:param max_mb: maximum size of the cache, in MB
+	"""
+	entries = []
+	for file_name in os.listdir(cache_dir):
+		if file_name.endswith(CACHE_EXTENSION):
+			stat = os.stat(os.path.join(cache_dir, file_name))
+			entries.append((stat.st_mtime, stat.st_size, file_name))
+	entries.sort()
+	total_size = sum(size for _, size, _ in entries)
+	while len(entries) > 1 and total_size > max_mb * 2 ** 20:
+		_, size, file_name = entries.pop(0)
+		try:
+			os.remove(os.path.join(cache_dir, file_name))
+		except OSError:
+			pass
+		total_size -= size
+		logger.debug(f'evicted {file_name} from the model cache')
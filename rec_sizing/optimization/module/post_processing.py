@@ -7,190 +7,156 @@
 """
 import numpy as np
 
-from rec_sizing.optimization.helpers.milp_helpers import (dict_none_lists, time_intervals)
+from scipy import sparse
+
+
+def _stack(values_per_meter, set_meters):
+    """
+    Stacks the time series of each meter into a (meters x steps) matrix.
+    :param values_per_meter: dict with a time series per meter
+    :param set_meters: list with the meters' IDs, which defines the order of the rows
+    :return: 2D NumPy array with one row per meter
+    """
+    return np.array([values_per_meter[n] for n in set_meters], dtype=float)
+
+
+def _per_meter(values, set_meters):
+    """
+    Unstacks an array with one value per meter into a dict.
+    :param values: 1D NumPy array with one value per meter
+    :param set_meters: list with the meters' IDs, in the order of the array
+    :return: dict with the (Python) value of each meter
+    """
+    return dict(zip(set_meters, values.tolist()))
 
 
 def desegregated_OF_costs(results, inputs_opt):
 
     set_meters = list(inputs_opt['meters'])
-    time_series = range(time_intervals(inputs_opt['nr_days'] * 24, inputs_opt['delta_t']))
+    meters = [inputs_opt['meters'][n] for n in set_meters]
     results = results.copy()
-    results['retailer_exchanges_cost'] = {meter_id: None for meter_id in set_meters}
-    results['sc_tariff_cost'] = {meter_id: None for meter_id in set_meters}
-    results['contractedpower_cost'] = {meter_id: None for meter_id in set_meters}
-    results['batteries_investments_cost'] = {meter_id: None for meter_id in set_meters}
-    results['PV_investments_cost'] = {meter_id: None for meter_id in set_meters}
-    # results['meter_cost'] = {meter_id: None for meter_id in set_meters}
-
-    for n in set_meters:
-        increment = f'{n}'
-        # Exchanges costs with the main grid (buying and selling energy)
-        results['retailer_exchanges_cost'][n] = (
-            round(
-                sum(
-                    (
-                            np.array(results['e_sup'][n]) * np.array(inputs_opt['meters'][n]['l_buy']) -
-                            np.array(results['e_sur'][n]) * np.array(inputs_opt['meters'][n]['l_sell'])
-                    ) *
-                    results['w_clustering']
-                ),
-                5
-            )
-        )
-        # Using Networks Costs for self-consumption (through assets)
-        results['sc_tariff_cost'][n] = (
-            round(
-                sum(
-                    np.array(results['e_slc_pool'][n] * np.array(inputs_opt['l_grid'])) * results['w_clustering']),
-                5
-            )
-        )
-        # Contracted Power Costs
-        results['contractedpower_cost'][n] = (
-            round(
-                results['p_cont'][n] * inputs_opt['meters'][n]['l_cont'] * inputs_opt['nr_days_old'],
-                5
-            )
-        )
-        # Investment costs of individual and shared assets (CPE)
-        results['batteries_investments_cost'][n] = (
-            round(
-                results['e_bn_new'][n] * inputs_opt['meters'][n]['l_bic'] * inputs_opt['nr_days_old'],
-                5
-            )
-        )
-        results['PV_investments_cost'][n] = (
-            round(
-                results['p_gn_new'][n] * inputs_opt['meters'][n]['l_gic'] * inputs_opt['nr_days_old'],
-                5
-            )
-        )
-        # results['meter_cost'][n] = (
-        #     round(
-        #         results['retailer_exchanges_cost'][n] +
-        #         results['sc_tariff_cost'][n] +
-        #         results['contractedpower_cost'][n] +
-        #         results['batteries_investments_cost'][n] +
-        #         results['PV_investments_cost'][n],
-        #         4
-        #     )
-        # )
+    w_clustering = np.asarray(results['w_clustering'], dtype=float)
+    parameter = lambda key: np.array([meter[key] for meter in meters], dtype=float)
+
+    # Exchanges costs with the main grid (buying and selling energy)
+    e_sup = _stack(results['e_sup'], set_meters)
+    e_sur = _stack(results['e_sur'], set_meters)
+    l_buy = np.array([meter['l_buy'] for meter in meters], dtype=float)
+    l_sell = np.array([meter['l_sell'] for meter in meters], dtype=float)
+    retailer_exchanges_cost = ((e_sup * l_buy - e_sur * l_sell) * w_clustering).sum(axis=1)
+    results['retailer_exchanges_cost'] = _per_meter(retailer_exchanges_cost.round(5), set_meters)
+
+    # Using Networks Costs for self-consumption (through assets)
+    e_slc = _stack(results['e_slc_pool'], set_meters)
+    sc_tariff_cost = (e_slc * np.asarray(inputs_opt['l_grid'], dtype=float) * w_clustering).sum(axis=1)
+    results['sc_tariff_cost'] = _per_meter(sc_tariff_cost.round(5), set_meters)
+
+    # Contracted Power Costs
+    p_cont = np.array([results['p_cont'][n] for n in set_meters], dtype=float)
+    contractedpower_cost = p_cont * parameter('l_cont') * inputs_opt['nr_days_old']
+    results['contractedpower_cost'] = _per_meter(contractedpower_cost.round(5), set_meters)
+
+    # Investment costs of individual and shared assets (CPE)
+    e_bn_new = np.array([results['e_bn_new'][n] for n in set_meters], dtype=float)
+    batteries_investments_cost = e_bn_new * parameter('l_bic') * inputs_opt['nr_days_old']
+    results['batteries_investments_cost'] = _per_meter(batteries_investments_cost.round(5), set_meters)
+
+    p_gn_new = np.array([results['p_gn_new'][n] for n in set_meters], dtype=float)
+    pv_investments_cost = p_gn_new * parameter('l_gic') * inputs_opt['nr_days_old']
+    results['PV_investments_cost'] = _per_meter(pv_investments_cost.round(5), set_meters)
 
     return results
 
 
 def post_processing_InternalMarket(results, inputs_opt):
     set_meters = list(inputs_opt['meters'])
-    _time_intervals = time_intervals(inputs_opt['nr_days'] * 24, inputs_opt['delta_t'])
-    time_series = range(_time_intervals)
     results = results.copy()
+    w_clustering = np.asarray(results['w_clustering'], dtype=float)
+
     # sold position energy (sold - bought) locally by n
-    results['sold_position'] = dict_none_lists(_time_intervals, set_meters)
-    for n in set_meters:
-        e_pur = results['e_pur_pool'][n]
-        e_sale = results['e_sale_pool'][n]
-        results['sold_position'][n] = [e_sale - e_pur for e_sale, e_pur in zip(e_sale, e_pur)]
+    sold_position = _stack(results['e_sale_pool'], set_meters) - _stack(results['e_pur_pool'], set_meters)
+    results['sold_position'] = dict(zip(set_meters, sold_position.tolist()))
 
     # internal market compensations - Pool
-    results['internal_market'] = {meter_id: None for meter_id in set_meters}
-    for n in set_meters:
-        results['internal_market'][n] = (
-            round(
-                sum(
-                    (
-                            np.array(results['dual_prices']) *
-                            np.array(results['sold_position'][n])) *
-                    results['w_clustering']
-                ),
-                4
-            )
-        )
-    # validation of pool compensations
-    if round(sum(results['internal_market'][n] for n in set_meters), 3) == 0:
-        print('True: total costs internal market compensations = 0')
-    else:
-        print('False: total costs internal market compensations != 0')
+    internal_market = (np.asarray(results['dual_prices'], dtype=float) * sold_position * w_clustering).sum(axis=1)
+    internal_market = internal_market.round(4)
+    results['internal_market'] = _per_meter(internal_market, set_meters)
 
     # installations costs with internal market compensations - Pool
-    results['installation_cost_compensations'] = {meter_id: None for meter_id in set_meters}
-    for n in set_meters:
-        results['installation_cost_compensations'][n] = (
-            round(
-                results['c_ind2pool'][n] -
-                results['internal_market'][n],
-                4
-            )
-        )
-    # validation installation cost with internal market compensations
-    if (round(results['obj_value'], 2) ==
-            round(sum(results['installation_cost_compensations'][n] for n in set_meters), 2)):
-        print('True: total costs = sum of installations costs with compensations')
-    else:
-        print('False: total costs != sum of installations costs with compensations')
+    c_ind2pool = np.array([results['c_ind2pool'][n] for n in set_meters], dtype=float)
+    results['installation_cost_compensations'] = _per_meter((c_ind2pool - internal_market).round(4), set_meters)
 
     return results
 
 
-def post_processing_members(results, inputs_pp):
+def ownership_matrix(inputs_pp, tol=1e-6):
+    """
+    Builds the sparse (members x meters) ownership matrix from the ownership structure, checking that the ownership
+    shares of each meter sum to 1.
+    :param inputs_pp: dict with the meters' ownership relative to each member, as expected by run_post_processing
+    :param tol: absolute tolerance for the sum of the ownership shares of each meter
+    :return: tuple with the ownership matrix (scipy.sparse CSR matrix), the list of members' IDs (rows) and the list
+        of meters' IDs (columns)
+    """
     set_meters = list(inputs_pp['ownership'])
     set_members = []
     for n in set_meters:
         set_members += list(inputs_pp['ownership'][n])
     set_members = list(set(set_members))
+
+    invalid_meters = [
+        f'{n} ({sum(inputs_pp["ownership"][n].values())})' for n in set_meters
+        if abs(sum(inputs_pp['ownership'][n].values()) - 1) > tol
+    ]
+    if invalid_meters:
+        raise ValueError(f'the ownership shares of meters {", ".join(invalid_meters)} do not sum to 1')
+
+    member_idx = {m: idx for idx, m in enumerate(set_members)}
+    rows, cols, shares = [], [], []
+    for idx_meter, n in enumerate(set_meters):
+        for m, share in inputs_pp['ownership'][n].items():
+            rows.append(member_idx[m])
+            cols.append(idx_meter)
+            shares.append(share)
+    ownership = sparse.csr_matrix((shares, (rows, cols)), shape=(len(set_members), len(set_meters)), dtype=float)
+
+    return ownership, set_members, set_meters
+
+
+def post_processing_members(results, inputs_pp):
+    ownership, set_members, set_meters = ownership_matrix(inputs_pp)
     results = results.copy()
-    results['member_cost_installation'] = {key: {} for key in set_members}
-    results['member_cost'] = {}
-    results['member_cost_compensations_installation'] = {key: {} for key in set_members}
-    results['member_cost_compensations'] = {}
+
+    def member_costs(cost_per_meter):
+        """
+        Splits the costs of each meter by its owners, as a sparse (members x meters) matrix with the rounded costs
+        of each member in each meter it owns.
+        :param cost_per_meter: dict with the cost of each meter
+        :return: scipy.sparse CSR matrix with the costs per member and meter
+        """
+        costs = ownership.multiply(np.array([cost_per_meter[n] for n in set_meters], dtype=float)).tocsr()
+        costs.data = costs.data.round(4)
+        return costs
+
+    def per_member_installation(costs):
+        """
+        Unstacks a sparse (members x meters) matrix into a dict of dicts, only for the meters owned by each member.
+        :param costs: scipy.sparse CSR matrix with the costs per member and meter
+        :return: dict with a dict per member, with the (Python) cost of each owned meter
+        """
+        return {
+            m: {set_meters[n]: val for n, val in zip(costs.indices[start:end].tolist(), costs.data[start:end].tolist())}
+            for m, start, end in zip(set_members, costs.indptr[:-1], costs.indptr[1:])
+        }
 
     # costs by member
-    for m in set_members:
-        for n in set_meters:
-            try:
-                results['member_cost_installation'][m][n] = (
-                    round(
-                        results['c_ind2pool'][n] * inputs_pp['ownership'][n][m],
-                        4
-                    )
-                )
-                results['member_cost_compensations_installation'][m][n] = (
-                    round(
-                        results['installation_cost_compensations'][n] * inputs_pp['ownership'][n][m],
-                        4
-                    )
-                )
-            except:
-                pass
-    for m in set_members:
-        results['member_cost'][m] = (
-            round(
-                sum(
-                    results['member_cost_installation'][m][n]
-                    for n in results['member_cost_installation'][m].keys()
-                ),
-                4
-            )
-        )
-        results['member_cost_compensations'][m] = (
-            round(
-                sum(
-                    results['member_cost_compensations_installation'][m][n]
-                    for n in results['member_cost_compensations_installation'][m].keys()
-                ),
-                4
-            )
-        )
-
-    # validation member cost
-    if round(results['obj_value'], 2) == round(sum(results['member_cost'][m] for m in set_members), 2):
-        print('True: total costs = sum of members costs')
-    else:
-        print('False: total costs != sum of members costs')
-    # validation member cost with internal market compensations
-    if (round(sum(results['installation_cost_compensations'][n] for n in set_meters), 2) ==
-            round(sum(results['member_cost_compensations'][m] for m in set_members), 2)):
-        print('True: sum installations costs with compensations = sum of members costs with compensations')
-    else:
-        print('False: sum installations costs with compensations != sum of members costs with compensations')
+    member_cost_installation = member_costs(results['c_ind2pool'])
+    member_cost_compensations_installation = member_costs(results['installation_cost_compensations'])
+    results['member_cost_installation'] = per_member_installation(member_cost_installation)
+    results['member_cost'] = \
+        dict(zip(set_members, np.asarray(member_cost_installation.sum(axis=1)).ravel().round(4).tolist()))
+    results['member_cost_compensations_installation'] = per_member_installation(member_cost_compensations_installation)
+    results['member_cost_compensations'] = \
+        dict(zip(set_members, np.asarray(member_cost_compensations_installation.sum(axis=1)).ravel().round(4).tolist()))
 
     return results
@@ -0,0 +1,137 @@
+"""
+Rolling-horizon dispatch for the collective (pool) MILP.
+The full horizon is split into overlapping windows of a few days that are solved sequentially, carrying the storage
+energy content from the last kept step of each window to the beginning of the next one. Within the windows, the storage
+is not reset to its initial state of charge at the end of every day (Eq. 33), but only required to return to it at the
+end of each window, so that its energy content flows between days and windows and the look-ahead days are planned for.
+"""
+from loguru import logger
+from typing import Dict
+
+from rec_sizing.custom_types.collective_milp_pool_types import (
+	BackpackCollectivePoolDict,
+	OutputsCollectivePoolDict,
+	ValuePerId
+)
+from rec_sizing.optimization.helpers.backpack_helpers import slice_backpack
+from rec_sizing.optimization.helpers.milp_helpers import time_intervals
+from rec_sizing.optimization.helpers.outputs_helpers import merge_outputs
+from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+
+
+def solve_window(window: BackpackCollectivePoolDict,
+				 fixed_investments: Dict[str, ValuePerId],
+				 soc_init: ValuePerId,
+				 solver: str,
+				 timeout: int,
+				 mipgap: float,
+				 write_lp=False,
+				 fixed_binaries=None,
+				 final_soc=None) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Solves the collective (pool) MILP over a window of the horizon.
+	:param window: backpack with the data of the window only (see slice_backpack), which is modified in place; callers
+		dispatching windows to other processes should slice the backpack beforehand, so that only the window's data is
+		serialized
+	:param fixed_investments: investment decisions to be fixed in the window (see CollectiveMILPPool)
+	:param soc_init: dict with the initial state of charge of each meter's storage, in %; None to use "soc_min"
+	:param solver: solver chosen for the MILP
+	:param timeout: time limit (s) for the solver
+	:param mipgap: tolerance for the solver
+	:param write_lp: if True, the window's MILP formulation is written to an .lp file (for debugging only, since the
+		file is rewritten by every window)
+	:param fixed_binaries: optional dict with the values of all binary variables in the window (see
+		CollectiveMILPPool); if provided, the binary variables are fixed and relaxed, so that an LP is solved
+	:param final_soc: optional dict with the state of charge of each meter's storage at the end of the window, in %,
+		replacing the daily reset of the storage (see CollectiveMILPPool)
+	:return: outputs of the MILP for the window; empty if the solver raised an error
+	"""
+	nr_window_steps = len(window['l_grid'])
+	window['w_clustering'] = [1] * nr_window_steps
+	if soc_init is not None:
+		for meter_id, meter_soc_init in soc_init.items():
+			window['meters'][meter_id]['soc_init'] = meter_soc_init
+
+	relaxed_steps = range(nr_window_steps) if fixed_binaries is not None else None
+	milp = CollectiveMILPPool(window, window['nr_days'], solver, timeout, mipgap,
+							  fixed_investments=fixed_investments, write_lp=write_lp,
+							  relaxed_steps=relaxed_steps, fixed_binaries=fixed_binaries, final_soc=final_soc)
+	milp.solve_milp()
+
+	return milp.generate_outputs()
+
+
+def carried_soc(outputs: OutputsCollectivePoolDict, backpack: BackpackCollectivePoolDict, step: int) -> ValuePerId:
+	"""
+	Retrieves the state of charge of each meter's storage at a given time step of a window's outputs.
+	:param outputs: outputs of the MILP for the window
+	:param backpack: backpack with the meters' data
+	:param step: time step (relative to the window) at which the state of charge is retrieved
+	:return: dict with the state of charge of each meter's storage, in %
+	"""
+	soc = {}
+	for n, meter_data in backpack['meters'].items():
+		e_bn_total = outputs['e_bn_total'][n]
+		if e_bn_total is None or e_bn_total <= 0:
+			soc[n] = meter_data['soc_min']
+		else:
+			# clip to the admissible range, to avoid carrying the solver's numerical noise
+			soc[n] = min(max(outputs['e_bat'][n][step] / e_bn_total * 100, meter_data['soc_min']),
+						 meter_data['soc_max'])
+
+	return soc
+
+
+def rolling_horizon_dispatch(backpack: BackpackCollectivePoolDict,
+							 window_days: int,
+							 overlap_days: int,
+							 fixed_investments: Dict[str, ValuePerId],
+							 solver: str,
+							 timeout: int,
+							 mipgap: float) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Solves the collective (pool) MILP in overlapping windows of "window_days" days. From each window, only the first
+	"window_days - overlap_days" days are kept (except for the last window, which is kept in full) and the next window
+	starts right after the kept days, with the storage energy content carried from the last kept step. Each window ends
+	with the storage at the meters' initial state of charge ("soc_init", or "soc_min" if not provided).
+	:param backpack: backpack with the data of the full horizon; "nr_days" must be the number of days in the data
+	:param window_days: number of days solved in each window
+	:param overlap_days: number of (look-ahead) days shared between consecutive windows
+	:param fixed_investments: investment decisions to be fixed in all windows (see CollectiveMILPPool)
+	:param solver: solver chosen for the MILP
+	:param timeout: time limit (s) for the solver, per window
+	:param mipgap: tolerance for the solver
+	:return: outputs dictionary with the merged schedules of all windows; empty if any window failed
+	"""
+	nr_steps = time_intervals(backpack['nr_days'] * 24, backpack['delta_t'])
+	nr_daily_steps = time_intervals(24, backpack['delta_t'])
+	nr_window_steps = window_days * nr_daily_steps
+	nr_commit_steps = (window_days - overlap_days) * nr_daily_steps
+
+	final_soc = {
+		n: meter_data['soc_init'] if meter_data.get('soc_init') is not None else meter_data['soc_min']
+		for n, meter_data in backpack['meters'].items()
+	}
+	partial_outputs = []
+	nr_kept_steps = []
+	soc_init = None
+	first_step = 0
+	while first_step < nr_steps:
+		last_step = min(first_step + nr_window_steps, nr_steps)
+		nr_steps_to_keep = nr_commit_steps if last_step < nr_steps else last_step - first_step
+		logger.debug(f'-- solving window [{first_step}, {last_step}[ and keeping {nr_steps_to_keep} steps...')
+
+		outputs = solve_window(slice_backpack(backpack, first_step, last_step), fixed_investments, soc_init, solver,
+							   timeout, mipgap, final_soc=final_soc)
+		if not outputs:
+			logger.warning(f'Window [{first_step}, {last_step}[ could not be solved; aborting the rolling horizon')
+			return {}
+
+		partial_outputs.append(outputs)
+		nr_kept_steps.append(nr_steps_to_keep)
+		soc_init = carried_soc(outputs, backpack, nr_steps_to_keep - 1)
+		first_step += nr_steps_to_keep
+
+	return merge_outputs(partial_outputs, nr_kept_steps, backpack, backpack['nr_days'])
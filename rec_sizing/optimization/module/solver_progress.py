@@ -0,0 +1,355 @@
+"""
+Live progress of the MILP solvers.
+The solvers are called by puLP as external processes, so their progress is followed by tailing their log file while it
+is written: each relevant line (new incumbents, node log rows and final summaries) is parsed into a progress event with
+the incumbent, the best bound, the relative gap, the number of explored nodes and the elapsed time. A user stopping
+rule is evaluated over these events and, when it fires, the solver process is interrupted (SIGINT), which makes CBC
+and CPLEX end the search gracefully and report their incumbent solution.
+CBC buffers its output when it is redirected to a file, so, where coreutils' stdbuf is available, it is run through a
+wrapper script with a line-buffered output, for its log to be followed live.
+"""
+import os
+import re
+import shutil
+import signal
+import threading
+import time
+
+from loguru import logger
+
+
+# Interval between consecutive reads of the solver log (s)
+POLL_INTERVAL = 0.2
+# Numeric value used by CBC for "no incumbent yet"
+CBC_NO_SOLUTION = 1e+50
+# Solvers whose search ends gracefully, returning the incumbent, when interrupted with SIGINT
+INTERRUPTIBLE_SOLVERS = ('CBC', 'CPLEX')
+
+_NUMBER = r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+_CBC_INCUMBENT = re.compile(rf'Cbc00(?:04|12)I Integer solution of {_NUMBER} found.* and (\d+) nodes')
+_CBC_NODES = re.compile(rf'Cbc0010I After (\d+) nodes, \d+ on tree, {_NUMBER} best solution, best possible {_NUMBER}')
+_CBC_ROOT = re.compile(rf'Cbc0013I At root node, .* from {_NUMBER} to {_NUMBER}')
+_CBC_PARTIAL = re.compile(rf'Cbc0005I Partial search - best objective {_NUMBER} \(best possible {_NUMBER}\)'
+						  rf'.* and (\d+) nodes')
+_CBC_COMPLETED = re.compile(rf'Cbc0001I Search completed - best objective {_NUMBER}, .* and (\d+) nodes')
+_HIGHS_NODE = re.compile(r'^\s*[A-Za-z]?\s+(\d+)\s+\d+\s+\d+\s+[\d.]+%\s+(\S+)\s+(\S+)\s+(\S+)\s+.*\s[\d.]+s\s*$')
+_CPLEX_NODE = re.compile(r'^[*\s]\s*(\d+)\+?\s+(\d+)\+?\s+(.*)$')
+
+
+def _to_float(text: str):
+	"""
+	Converts a number printed by a solver into a float.
+	:param text: printed number
+	:return: float; None if the text is not a finite number
+	"""
+	try:
+		number = float(text.rstrip('%'))
+	except ValueError:
+		return None
+	return number if abs(number) != float('inf') else None
+
+
+def parse_cbc_line(line: str):
+	"""
+	Parses a line of the CBC log.
+	:param line: line of the log
+	:return: dict with any of the keys "incumbent", "bound" and "nodes"; None if the line reports no progress
+	"""
+	match = _CBC_INCUMBENT.search(line)
+	if match:
+		return {'incumbent': _to_float(match.group(1)), 'nodes': int(match.group(2))}
+	match = _CBC_NODES.search(line)
+	if match:
+		incumbent = _to_float(match.group(2))
+		return {
+			'incumbent': incumbent if incumbent is not None and incumbent < CBC_NO_SOLUTION else None,
+			'bound': _to_float(match.group(3)),
+			'nodes': int(match.group(1))
+		}
+	match = _CBC_ROOT.search(line)
+	if match:
+		return {'bound': _to_float(match.group(2))}
+	match = _CBC_PARTIAL.search(line)
+	if match:
+		return {'incumbent': _to_float(match.group(1)), 'bound': _to_float(match.group(2)),
+				'nodes': int(match.group(3))}
+	match = _CBC_COMPLETED.search(line)
+	if match:
+		return {'incumbent': _to_float(match.group(1)), 'bound': _to_float(match.group(1)),
+				'nodes': int(match.group(2))}
+	return None
+
+
+def parse_highs_line(line: str):
+	"""
+	Parses a line of the HiGHS log, i.e., a row of its branch-and-bound table.
+	:param line: line of the log
+	:return: dict with any of the keys "incumbent", "bound" and "nodes"; None if the line reports no progress
+	"""
+	match = _HIGHS_NODE.match(line)
+	if not match:
+		return None
+	return {'incumbent': _to_float(match.group(3)), 'bound': _to_float(match.group(2)), 'nodes': int(match.group(1))}
+
+
+def parse_cplex_line(line: str):
+	"""
+	Parses a line of the CPLEX log, i.e., a row of its node log ("Node Left Objective IInf Best Integer Best Bound
+	ItCnt Gap"); rows of new incumbents (marked with "*") omit the objective, IInf and ItCnt columns.
+	:param line: line of the log
+	:return: dict with any of the keys "incumbent", "bound" and "nodes"; None if the line reports no progress
+	"""
+	match = _CPLEX_NODE.match(line)
+	if not match:
+		return None
+	columns = match.group(3).split()
+	if not columns:
+		return None
+	event = {'nodes': int(match.group(1))}
+	if columns[-1].endswith('%'):
+		# with an incumbent: [Objective IInf] Best Integer Best Bound [ItCnt] Gap
+		columns = columns[:-1]
+		if len(columns) > 2 and columns[-1].isdigit():
+			columns = columns[:-1]
+		if len(columns) < 2:
+			return None
+		event['incumbent'] = _to_float(columns[-2])
+		event['bound'] = _to_float(columns[-1])
+	else:
+		# without an incumbent: Objective IInf Best Bound ItCnt
+		if len(columns) < 4 or not columns[-1].isdigit():
+			return None
+		event['bound'] = _to_float(columns[-2])
+	return event
+
+
+LOG_PARSERS = {
+	'CBC': parse_cbc_line,
+	'CPLEX': parse_cplex_line,
+	'HiGHS': parse_highs_line
+}
+
+
+def line_buffered_wrapper(executable: str, directory: str):
+	"""
+	Creates a shell script that runs an executable with a line-buffered standard output (POSIX systems with coreutils'
+	stdbuf only), for its log to be written as it is produced.
+	:param executable: path to the executable
+	:param directory: directory where the script is created
+	:return: path to the script; None if stdbuf is not available
+	"""
+	stdbuf = shutil.which('stdbuf')
+	if os.name != 'posix' or stdbuf is None:
+		return None
+	script_path = os.path.join(directory, 'line_buffered_' + os.path.basename(executable))
+	with open(script_path, 'w') as script_file:
+		script_file.write(f'#!/bin/sh\nexec "{stdbuf}" -oL -eL "{executable}" "$@"\n')
+	os.chmod(script_path, 0o700)
+	return script_path
+
+
+def relative_gap(incumbent, bound):
+	"""
+	Computes the relative gap between an incumbent solution and the best bound.
+	:param incumbent: objective value of the incumbent; None if there is no incumbent
+	:param bound: best bound; None if unknown
+	:return: relative gap, between 0 and 1 for consistent values; None if it cannot be computed
+	"""
+	if incumbent is None or bound is None:
+		return None
+	return abs(incumbent - bound) / max(abs(incumbent), 1e-10)
+
+
+class GapStagnationRule:
+	def __init__(self, min_improvement=0.001, window=120.0):
+		"""
+		Stopping rule that fires when the relative gap has not improved by at least "min_improvement" in the last
+		"window" seconds, e.g., "stop if the gap hasn't improved 0.1% in 120 s" is GapStagnationRule(0.001, 120).
+		:param min_improvement: minimum improvement of the relative gap (absolute, e.g., 0.001 for 0.1 %)
+		:param window: period (s) without such improvement after which the search is stopped
+		"""
+		if min_improvement < 0 or window <= 0:
+			raise ValueError('min_improvement must be >= 0 and window must be > 0')
+		self.min_improvement = min_improvement
+		self.window = window
+		self._reference_gap = None  # last gap that counted as an improvement
+		self._reference_time = None  # elapsed time (s) of the last improvement
+
+	def __call__(self, event: dict) -> bool:
+		"""
+		Evaluates the rule over a progress event.
+		:param event: progress event (see SolverMonitor)
+		:return: True if the search should be stopped
+		"""
+		gap = event.get('gap')
+		if gap is None:
+			return False
+		if self._reference_gap is None or self._reference_gap - gap >= self.min_improvement:
+			self._reference_gap = gap
+			self._reference_time = event['elapsed']
+			return False
+		return event['elapsed'] - self._reference_time >= self.window
+
+	def __repr__(self):
+		return f'GapStagnationRule(min_improvement={self.min_improvement}, window={self.window})'
+
+
+def _solver_pid(log_path: str):
+	"""
+	Finds the solver process launched by this process that writes to the provided log file (Linux only).
+	:param log_path: path to the solver log
+	:return: PID of the solver process; None if not found
+	"""
+	target = os.path.realpath(log_path)
+	parent = str(os.getpid())
+	try:
+		pids = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+	except OSError:
+		return None
+	for pid in pids:
+		try:
+			with open(f'/proc/{pid}/stat') as stat_file:
+				# the process name is enclosed in parentheses and may contain spaces
+				ppid = stat_file.read().rsplit(')', 1)[1].split()[1]
+			if ppid != parent:
+				continue
+			for fd in os.listdir(f'/proc/{pid}/fd'):
+				if os.path.realpath(f'/proc/{pid}/fd/{fd}') == target:
+					return int(pid)
+		except (OSError, IndexError):
+			continue
+	return None
+
+
+class SolverMonitor:
+	def __init__(self, log_path: str, solver: str, callback=None, stop_rule=None, poll_interval=POLL_INTERVAL):
+		"""
+		Follows the log of a solver while it is written, in a background thread.
+		Progress events are dicts with the keys "solver", "elapsed" (s, since the monitor started), "incumbent",
+		"bound", "gap" (relative), "nodes" and "line" (the log line that originated the event).
+		:param log_path: path to the solver log
+		:param solver: one of "CBC", "CPLEX" and "HiGHS"
+		:param callback: optional function called with each progress event
+		:param stop_rule: optional function called with each progress event (and periodically, with the latest state,
+			while the log is silent) that returns True when the search should be stopped; the search is only stopped
+			after an incumbent is found, and only CBC and CPLEX return it when interrupted
+		:param poll_interval: interval between consecutive reads of the log (s)
+		"""
+		if solver not in LOG_PARSERS:
+			raise ValueError(f'{solver} is not supported; please provide any of {list(LOG_PARSERS)}')
+		if stop_rule is not None and solver not in INTERRUPTIBLE_SOLVERS:
+			logger.warning(f'{solver} does not return its incumbent when interrupted; the stopping rule is ignored')
+			stop_rule = None
+		self.log_path = log_path
+		self.solver = solver
+		self.callback = callback
+		self.stop_rule = stop_rule
+		self.poll_interval = poll_interval
+		self.events = []  # progress events, in order
+		self.stopped_early = False  # True if the stopping rule ended the search
+		self.stop_reason = None  # description of the stopping rule that ended the search
+		self._parser = LOG_PARSERS[solver]
+		self._state = {'solver': solver, 'elapsed': 0.0, 'incumbent': None, 'bound': None, 'gap': None, 'nodes': 0}
+		self._start = None
+		self._finished = threading.Event()
+		self._thread = None
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+	def start(self):
+		"""
+		Starts following the solver log.
+		"""
+		self._start = time.perf_counter()
+		self._thread = threading.Thread(target=self.__follow, daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		"""
+		Stops following the solver log, after processing its remaining lines.
+		"""
+		self._finished.set()
+		if self._thread is not None:
+			self._thread.join()
+
+	def __follow(self):
+		"""
+		Reads the solver log as it is written and processes its complete lines.
+		"""
+		position = 0
+		pending = ''
+		while True:
+			finished = self._finished.is_set()
+			try:
+				with open(self.log_path, errors='replace') as log_file:
+					log_file.seek(position)
+					chunk = log_file.read()
+					position = log_file.tell()
+			except OSError:
+				chunk = ''
+			lines = (pending + chunk).split('\n')
+			pending = lines.pop()
+			if finished and pending:
+				lines.append(pending)
+			for line in lines:
+				self.__process(line)
+			if finished:
+				return
+			if not lines:
+				self.__check(dict(self._state, elapsed=self.__elapsed()))
+			self._finished.wait(self.poll_interval)
+
+	def __elapsed(self) -> float:
+		return round(time.perf_counter() - self._start, 3)
+
+	def __process(self, line: str):
+		"""
+		Parses a log line and emits the respective progress event.
+		:param line: line of the log
+		"""
+		try:
+			update = self._parser(line)
+		except Exception as e:  # a malformed line must not stop the monitor
+			logger.debug(f'could not parse the {self.solver} log line {line!r} ({e})')
+			return
+		if not update:
+			return
+		self._state.update({key: val for key, val in update.items() if val is not None})
+		self._state['elapsed'] = self.__elapsed()
+		self._state['gap'] = relative_gap(self._state['incumbent'], self._state['bound'])
+		event = dict(self._state, line=line.strip())
+		self.events.append(event)
+		if self.callback is not None:
+			try:
+				self.callback(event)
+			except Exception as e:
+				logger.warning(f'progress callback raised an error: \'{e}\'')
+		self.__check(event)
+
+	def __check(self, event: dict):
+		"""
+		Evaluates the stopping rule and interrupts the solver if it fires.
+		:param event: latest progress event
+		"""
+		if self.stop_rule is None or self.stopped_early or event['incumbent'] is None or self._finished.is_set():
+			return
+		if not self.stop_rule(event):
+			return
+		pid = _solver_pid(self.log_path)
+		if pid is None:
+			logger.debug('stopping rule fired, but the solver process was not found')
+			return
+		logger.info(f'-- stopping the {self.solver} search after {event["elapsed"]} s (gap = {event["gap"]}; '
+					f'{self.stop_rule!r})')
+		try:
+			os.kill(pid, signal.SIGINT)
+		except OSError as e:
+			logger.warning(f'could not interrupt the solver: \'{e}\'')
+			return
+		self.stopped_early = True
+		self.stop_reason = repr(self.stop_rule)
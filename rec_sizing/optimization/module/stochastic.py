@@ -0,0 +1,241 @@
+"""
+Stochastic sizing of the collective (pool) MILP over several scenarios of the time series (e.g., consumption,
+generation and tariffs), with investment decisions shared by all scenarios and an operation adapted to each of them.
+Two methods are available:
+ - the extensive form, i.e., a single MILP with the scenarios stacked along the horizon, with their clustering weights
+ scaled by the scenarios' weights and the storage restarting from its initial state of charge at the first time step of
+ each scenario; the investments (including the contracted power, which must cover the peaks of all scenarios) are then
+ shared by construction and the expected cost is minimized exactly, at the cost of a MILP as large as all scenarios;
+ - progressive hedging, which solves one MILP per scenario (in parallel), with the investment decisions priced by
+ multipliers and penalized for their deviation from the scenarios' weighted mean, until all scenarios agree on them.
+ puLP's MILP solvers do not handle quadratic terms, so the usual quadratic proximal term is replaced by an absolute one;
+ as with any progressive hedging applied to MILPs, the result is a heuristic solution. The new generation and storage
+ capacities are finally fixed to their (mean) consensus values, each scenario is re-solved and the contracted power of
+ each meter is set to the largest one required by the scenarios.
+"""
+import numpy as np
+
+from joblib import (
+	delayed,
+	Parallel
+)
+from loguru import logger
+from typing import List
+
+from rec_sizing.custom_types.collective_milp_pool_types import (
+	BackpackCollectivePoolDict,
+	OutputsCollectivePoolDict
+)
+from rec_sizing.optimization.helpers.backpack_helpers import stack_scenarios
+from rec_sizing.optimization.helpers.outputs_helpers import (
+	BINARY_KEYS,
+	HEURISTIC_STATUS,
+	INVESTMENT_KEYS,
+	slice_outputs
+)
+from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+
+
+# Investment decisions shared by all scenarios and the backpack's keys of their costs (€/kW or €/kWh, per day)
+CONSENSUS_COST_KEYS = {'p_cont': 'l_cont', 'p_gn_new': 'l_gic', 'e_bn_new': 'l_bic'}
+
+
+def stochastic_results(scenario_outputs: List[OutputsCollectivePoolDict], weights: List[float], milp_status: str) \
+		-> dict:
+	"""
+	Gathers the outputs of the scenarios' MILPs, with the same investments, into the results of a stochastic sizing.
+	:param scenario_outputs: list with the outputs of each scenario's MILP
+	:param weights: list with the weights of each scenario, adding up to 1
+	:param milp_status: status of the stochastic sizing
+	:return: dict with the status, the expected and per scenario costs, the weights, the investments and the outputs of
+		each scenario
+	"""
+	return {
+		'milp_status': milp_status,
+		'expected_cost': round(sum(weight * outputs['obj_value'] for weight, outputs in zip(weights, scenario_outputs)),
+							   3),
+		'scenario_costs': [outputs['obj_value'] for outputs in scenario_outputs],
+		'weights': list(weights),
+		'investments': {key: dict(scenario_outputs[0][key]) for key in INVESTMENT_KEYS},
+		'scenarios': scenario_outputs
+	}
+
+
+def extensive_form(backpacks: List[BackpackCollectivePoolDict],
+				   weights: List[float],
+				   nr_dates: int,
+				   solver: str,
+				   timeout: int,
+				   mipgap: float) \
+		-> dict:
+	"""
+	Solves the stochastic sizing as a single MILP, with the scenarios stacked along the horizon.
+	:param backpacks: list with the backpacks of each scenario, prepared for the MILP and with the same horizon
+	:param weights: list with the weights of each scenario, adding up to 1
+	:param nr_dates: number of original days considered in each scenario's horizon
+	:param solver: solver chosen for the MILP
+	:param timeout: time limit (s) for the solver
+	:param mipgap: tolerance for the solver
+	:return: results as in stochastic_results; empty if the solver raised an error
+	"""
+	nr_steps = [len(scenario_backpack['l_grid']) for scenario_backpack in backpacks]
+	first_steps = np.cumsum([0] + nr_steps[:-1]).tolist()
+	milp = CollectiveMILPPool(stack_scenarios(backpacks, weights), nr_dates, solver, timeout, mipgap, write_lp=False,
+							  restart_steps=first_steps[1:])
+	milp.solve_milp()
+	outputs = milp.generate_outputs()
+	if not outputs:
+		return {}
+
+	scenario_outputs = [
+		slice_outputs(outputs, first_step, first_step + steps, scenario_backpack, scenario_backpack['w_clustering'],
+					  nr_dates)
+		for first_step, steps, scenario_backpack in zip(first_steps, nr_steps, backpacks)
+	]
+
+	return stochastic_results(scenario_outputs, weights, outputs['milp_status'])
+
+
+def solve_scenario_subproblem(backpack: BackpackCollectivePoolDict,
+							  nr_dates: int,
+							  investment_consensus: dict,
+							  fixed_investments: dict,
+							  initial_values: dict,
+							  solver: str,
+							  timeout: int,
+							  mipgap: float) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Solves the collective (pool) MILP of a single scenario, with its investment decisions priced (and penalized) or
+	fixed by the progressive hedging.
+	:param backpack: backpack with the data of the scenario, prepared for the MILP
+	:param nr_dates: number of original days considered in the optimization horizon
+	:param investment_consensus: prices, targets and penalties of the investment decisions (see CollectiveMILPPool)
+	:param fixed_investments: investment decisions to be fixed (see CollectiveMILPPool)
+	:param initial_values: initial values for warm starting the solver (see CollectiveMILPPool)
+	:param solver: solver chosen for the MILP
+	:param timeout: time limit (s) for the solver
+	:param mipgap: tolerance for the solver
+	:return: outputs of the MILP; empty if the solver raised an error
+	"""
+	milp = CollectiveMILPPool(backpack, nr_dates, solver, timeout, mipgap, write_lp=False,
+							  fixed_investments=fixed_investments, initial_values=initial_values,
+							  investment_consensus=investment_consensus)
+	milp.solve_milp()
+
+	return milp.generate_outputs()
+
+
+def _investments(outputs: OutputsCollectivePoolDict, meter_ids: list) -> np.ndarray:
+	"""
+	Stacks the investment decisions shared by all scenarios of a scenario's outputs.
+	:param outputs: outputs of the scenario's MILP
+	:param meter_ids: list with the meters' IDs
+	:return: array with the values of each investment decision (rows) and meter (columns)
+	"""
+	return np.array([[outputs[var_key][n] or 0.0 for n in meter_ids] for var_key in CONSENSUS_COST_KEYS])
+
+
+def progressive_hedging(backpacks: List[BackpackCollectivePoolDict],
+						weights: List[float],
+						nr_dates: int,
+						solver: str,
+						timeout: int,
+						mipgap: float,
+						n_jobs: int,
+						penalty: float,
+						max_iterations: int,
+						tolerance: float) \
+		-> dict:
+	"""
+	Solves the stochastic sizing by progressive hedging (see the module's description).
+	:param backpacks: list with the backpacks of each scenario, prepared for the MILP and with the same meters
+	:param weights: list with the weights of each scenario, adding up to 1
+	:param nr_dates: number of original days considered in each scenario's horizon
+	:param solver: solver chosen for the scenarios' MILPs
+	:param timeout: time limit (s) for the solver, per scenario's MILP
+	:param mipgap: tolerance for the solver
+	:param n_jobs: number of parallel processes (joblib convention: -1 uses all available CPUs)
+	:param penalty: cost of the deviations of the investment decisions from their consensus, as a fraction of their
+		costs over the horizon
+	:param max_iterations: maximum number of multipliers' updates
+	:param tolerance: the iterations stop when the expected absolute deviation of the investment decisions from their
+		consensus is below this value (kW or kWh), summed over all decisions
+	:return: results as in stochastic_results, where "milp_status" is HEURISTIC_STATUS if all scenarios' final MILPs
+		were optimally solved (the contracted power is then raised to the scenarios' maximum and the costs recomputed,
+		so the result is not necessarily optimal) or the first other status otherwise; empty if any scenario's MILP
+		failed
+	"""
+	meter_ids = list(backpacks[0]['meters'])
+	probabilities = np.array(weights)[:, None, None]
+	# the proximal penalties are proportional to the investments' costs, so that they are comparable between decisions;
+	# investments without costs are penalized as the mean costly one
+	costs = np.array([
+		[backpacks[0]['meters'][n][cost_key] * nr_dates for n in meter_ids]
+		for cost_key in CONSENSUS_COST_KEYS.values()
+	], dtype=float)
+	mean_cost = costs[costs > 0].mean() if (costs > 0).any() else 1.0
+	penalties = penalty * np.where(costs > 0, costs, mean_cost)
+	per_decision = lambda values: {
+		var_key: {n: float(values[i][j]) for j, n in enumerate(meter_ids)}
+		for i, var_key in enumerate(CONSENSUS_COST_KEYS)
+	}
+	warm_start = lambda outputs: {key: outputs[key] for key in CONSENSUS_COST_KEYS.keys() | set(BINARY_KEYS)
+								  if key in outputs}
+
+	def solve(consensus, fixed_investments, last_outputs):
+		return Parallel(n_jobs=n_jobs)(
+			delayed(solve_scenario_subproblem)(
+				scenario_backpack, nr_dates, consensus[s] if consensus is not None else None, fixed_investments,
+				warm_start(last_outputs[s]) if last_outputs is not None else None, solver, timeout, mipgap)
+			for s, scenario_backpack in enumerate(backpacks)
+		)
+
+	outputs = solve(None, None, None)
+	multipliers = np.zeros((len(backpacks),) + penalties.shape)
+	last_deviation = np.inf
+	for iteration in range(max_iterations + 1):
+		if not all(outputs):
+			logger.warning('A scenario\'s MILP could not be solved; aborting the progressive hedging')
+			return {}
+		investments = np.array([_investments(scenario_outputs, meter_ids) for scenario_outputs in outputs])
+		consensus = (probabilities * investments).sum(axis=0)
+		deviation = float((probabilities * np.abs(investments - consensus)).sum())
+		logger.debug(f'-- progressive hedging iteration {iteration}: expected deviation from the consensus = '
+					 f'{deviation:.4f}')
+		if deviation <= tolerance:
+			break
+		if iteration == max_iterations:
+			logger.warning(f'Progressive hedging did not converge in {max_iterations} iterations (expected deviation '
+						   f'from the consensus = {deviation:.4f}); fixing the mean investments')
+			break
+
+		# the penalties are doubled whenever the deviation does not decrease, as the absolute proximal term may
+		# otherwise be too weak for the scenarios to move towards the consensus
+		if deviation >= last_deviation:
+			penalties *= 2
+		last_deviation = deviation
+		multipliers += penalties * (investments - consensus)
+		outputs = solve(
+			[{'prices': per_decision(multipliers[s]), 'targets': per_decision(consensus),
+			  'penalties': per_decision(penalties)} for s in range(len(backpacks))],
+			None, outputs)
+
+	# Re-solve the scenarios' MILPs with the consensus capacities and contract the largest power required by them
+	consensus = per_decision(consensus)
+	outputs = solve(None, {'p_gn_new': consensus['p_gn_new'], 'e_bn_new': consensus['e_bn_new']}, None)
+	if not all(outputs):
+		logger.warning('A scenario\'s MILP could not be solved with the consensus investments; aborting the '
+					   'progressive hedging')
+		return {}
+	p_cont = {n: max(scenario_outputs['p_cont'][n] for scenario_outputs in outputs) for n in meter_ids}
+	scenario_outputs = []
+	for scenario_backpack, outputs_s in zip(backpacks, outputs):
+		outputs_s['p_cont'] = dict(p_cont)
+		nr_steps = len(scenario_backpack['l_grid'])
+		scenario_outputs.append(
+			slice_outputs(outputs_s, 0, nr_steps, scenario_backpack, scenario_backpack['w_clustering'], nr_dates))
+	milp_status = next((outputs_s['milp_status'] for outputs_s in outputs if outputs_s['milp_status'] != 'Optimal'),
+					   HEURISTIC_STATUS)
+
+	return stochastic_results(scenario_outputs, weights, milp_status)
@@ -0,0 +1,230 @@
+"""
+Validation of the results of the optimization and post-processing functions, as a structured report.
+Validation levels:
+	- "off": no checks are performed;
+	- "fast": consistency checks of the post-processing results, namely that the internal market compensations sum to
+	zero and that the installations' and members' costs sum to the objective function value;
+	- "full": the "fast" checks plus the evaluation of every constraint of the collective (pool) MILP (Eqs. 2-33),
+	of the variables' bounds and of the binary variables' integrality against the returned solution, one constraint
+	family at a time over (meters x time steps) arrays.
+Each check reports its maximum residual (for constraints, the maximum violation), the tolerance it was compared with
+and the number of violations.
+"""
+import numpy as np
+
+from rec_sizing.optimization.helpers.milp_helpers import time_intervals
+from rec_sizing.optimization.helpers.outputs_helpers import (
+	BINARY_KEYS,
+	METER_STEP_KEYS,
+	individual_costs
+)
+
+
+VALIDATION_LEVELS = ('off', 'fast', 'full')
+# Default absolute tolerances for the sums of rounded costs (€) and for the MILP constraints (kWh, kW, €)
+COSTS_TOLERANCE = 0.01
+CONSTRAINTS_TOLERANCE = 1e-4
+
+
+def _check(name: str, violations, tolerance: float) -> dict:
+	"""
+	Summarizes the violations of a check.
+	:param name: name of the check
+	:param violations: array (or scalar) with the non-negative violations of the check
+	:param tolerance: absolute tolerance above which a violation is counted
+	:return: dict with the check's name, maximum residual, tolerance, number of violations and outcome
+	"""
+	violations = np.atleast_1d(np.asarray(violations, dtype=float))
+	residual = float(violations.max()) if violations.size else 0.0
+	nr_violations = int((violations > tolerance).sum())
+
+	return {
+		'name': name,
+		'residual': residual,
+		'tolerance': tolerance,
+		'nr_violations': nr_violations,
+		'passed': nr_violations == 0
+	}
+
+
+def post_processing_checks(results: dict, tol=COSTS_TOLERANCE) -> list:
+	"""
+	Consistency checks of the post-processing results; checks whose results are missing are not performed.
+	:param results: results of the post-processing functions
+	:param tol: absolute tolerance for the sums of the rounded costs, in €
+	:return: list with the checks' summaries
+	"""
+	checks = []
+	total = lambda key: sum(results[key].values())
+
+	if 'internal_market' in results:
+		checks.append(_check('Internal market compensations sum to 0', abs(total('internal_market')), tol))
+	if 'installation_cost_compensations' in results and results.get('obj_value') is not None:
+		checks.append(_check(
+			'Installations costs with compensations sum to the objective function',
+			abs(results['obj_value'] - total('installation_cost_compensations')), tol
+		))
+	if 'member_cost' in results and results.get('obj_value') is not None:
+		checks.append(_check(
+			'Members costs sum to the objective function',
+			abs(results['obj_value'] - total('member_cost')), tol
+		))
+	if 'member_cost_compensations' in results and 'installation_cost_compensations' in results:
+		checks.append(_check(
+			'Members costs with compensations sum to the installations costs with compensations',
+			abs(total('installation_cost_compensations') - total('member_cost_compensations')), tol
+		))
+
+	return checks
+
+
+def constraint_checks(results: dict, inputs_opt: dict, tol=CONSTRAINTS_TOLERANCE) -> list:
+	"""
+	Evaluates the constraints of the collective (pool) MILP, the variables' bounds and the binary variables'
+	integrality against the returned solution.
+	:param results: results of the optimization (or post-processing) functions
+	:param inputs_opt: backpack used to obtain the results, as prepared by run_pre_collective_pool_milp
+	:param tol: absolute tolerance for the constraints' violations
+	:return: list with the checks' summaries, one per constraint family
+	"""
+	set_meters = list(inputs_opt['meters'])
+	meters = [inputs_opt['meters'][n] for n in set_meters]
+	delta_t = inputs_opt['delta_t']
+	nr_days = inputs_opt['nr_days']
+	nr_steps = time_intervals(nr_days * 24, delta_t)
+
+	# (meters x time steps) arrays of the decision variables and (meters x 1) / (meters x time steps) parameters
+	var = {key: np.array([results[key][n] for n in set_meters], dtype=float)
+		   for key in METER_STEP_KEYS if key in results}
+	inv = {key: np.array([results[key][n] for n in set_meters], dtype=float)[:, None]
+		   for key in ('p_cont', 'p_gn_new', 'p_gn_total', 'e_bn_new', 'e_bn_total')}
+	param = lambda key: np.array([meter[key] for meter in meters], dtype=float)[:, None]
+	series = lambda key: np.array([meter[key] for meter in meters], dtype=float)
+	soc_init = np.array([meter['soc_min'] if meter.get('soc_init') is None else meter['soc_init']
+						 for meter in meters], dtype=float)[:, None]
+	big_m = 2 * param('p_meter_max').max()
+	small_m = 0.0001
+	positive = lambda array: np.maximum(array, 0)
+
+	if var['e_cmet'].shape[1] != nr_steps:
+		raise ValueError(f'the results have {var["e_cmet"].shape[1]} time steps, but the inputs define {nr_steps}')
+
+	e_cmet, e_g, e_bc, e_bd = var['e_cmet'], var['e_g'], var['e_bc'], var['e_bd']
+	e_sup, e_sur, e_pur, e_sale = var['e_sup'], var['e_sur'], var['e_pur_pool'], var['e_sale_pool']
+	e_slc, e_bat, e_consumed, e_alc = var['e_slc_pool'], var['e_bat'], var['e_consumed'], var['e_alc']
+	delta_sup, delta_slc = var['delta_sup'], var['delta_slc']
+
+	checks = [
+		_check('Variables lower bounds', positive(-np.concatenate([
+			array.ravel() for key, array in {**var, **inv}.items() if key != 'e_cmet'
+		])), tol),
+		_check('Binary variables integrality', np.concatenate([
+			np.abs(np.asarray(results[key], dtype=float) - np.round(results[key])).ravel() if key not in var
+			else np.abs(var[key] - np.round(var[key])).ravel()
+			for key in BINARY_KEYS if key in results
+		]), tol),
+		_check('Objective function (Eq. 1)', abs(results['obj_value'] - sum(individual_costs(
+			results, inputs_opt, results['w_clustering'], results['nr_dates']).values())), max(tol, 1e-3)),
+		_check('Net consumption (Eq. 2)', np.abs(e_cmet - (series('e_c') - e_g + e_bc - e_bd)), tol),
+		_check('Meter equilibrium (Eq. 3)', np.abs(e_cmet - (e_sup - e_sur + e_pur - e_sale)), tol),
+		_check('Power flow limits (Eq. 4)', positive(np.abs(e_cmet) / delta_t - inv['p_cont']), tol),
+		_check('Contracted power limit (Eq. 5)', positive(inv['p_cont'] - param('p_meter_max')), tol),
+		_check('New generation installed (Eq. 6)',
+			   np.abs(inv['p_gn_new'] - (inv['p_gn_total'] - param('p_gn_init'))), tol),
+		_check('Scaled generation (Eq. 7)',
+			   np.abs(e_g - series('e_g_factor') * inv['p_gn_total'] * delta_t), tol),
+		_check('New generation limits (Eq. 8)', np.concatenate([
+			positive(param('p_gn_min') - inv['p_gn_new']), positive(inv['p_gn_new'] - param('p_gn_max'))
+		]), tol),
+		_check('New storage installed (Eq. 9)',
+			   np.abs(inv['e_bn_new'] - (inv['e_bn_total'] - param('e_bn_init'))), tol),
+		_check('New storage limits (Eq. 10)', np.concatenate([
+			positive(param('e_bn_min') - inv['e_bn_new']), positive(inv['e_bn_new'] - param('e_bn_max'))
+		]), tol),
+		_check('Charge and discharge rate limits (Eqs. 11-12)', np.concatenate([
+			positive(e_bc / delta_t - inv['e_bn_total'] * inputs_opt['storage_ratio']),
+			positive(e_bd / delta_t - inv['e_bn_total'] * inputs_opt['storage_ratio'])
+		]), tol),
+	]
+
+	# Eqs. 13-15: the stored energy of each step follows from the previous one (or from the initial one)
+	init_e_bat = soc_init / 100 * inv['e_bn_total']
+	previous_e_bat = np.concatenate([init_e_bat, e_bat[:, :-1]], axis=1)
+	energy_update = e_bc * param('eff_bc') - e_bd / param('eff_bd')
+	checks.append(_check('Energy update (Eqs. 13-15)', np.abs(e_bat - (previous_e_bat + energy_update)), tol))
+	checks.append(_check('State of charge limits (Eq. 16)', np.concatenate([
+		positive(param('soc_min') / 100 * inv['e_bn_total'] - e_bat),
+		positive(e_bat - param('soc_max') / 100 * inv['e_bn_total'])
+	]), tol))
+	if nr_days >= 1:
+		steps_per_day = time_intervals(24, delta_t)
+		day_ends = [steps_per_day * day - 1 for day in range(1, int(nr_days) + 1)]
+		checks.append(_check('Daily state of charge reset (Eq. 33)',
+							 np.abs(e_bat[:, day_ends] - init_e_bat), tol))
+
+	checks += [
+		_check('Market equilibrium (Eq. 17)', np.abs(e_sale.sum(axis=0) - e_pur.sum(axis=0)), tol),
+		_check('Supply or surplus (Eq. 18)', np.concatenate([
+			positive(e_sup - big_m * delta_sup - small_m), positive(e_sur - big_m * (1 - delta_sup) - small_m)
+		]), tol),
+		_check('Consumption (Eq. 19)', positive(e_cmet - e_consumed), tol),
+		_check('Allocated energy (Eq. 20)', positive(e_pur - e_sale - e_alc), tol),
+		_check('Self-consumption (Eqs. 21-22)', np.concatenate([
+			positive(e_consumed - big_m * (1 - delta_slc) - e_slc), positive(e_alc - big_m * delta_slc - e_slc)
+		]), tol),
+	]
+
+	if inputs_opt.get('strict_pos_coeffs'):
+		delta_coeff = var['delta_coeff']
+		checks.append(_check('Positive coefficients (Eqs. 23-24)', np.concatenate([
+			positive(e_sale - e_pur + e_cmet - big_m * delta_coeff),
+			positive(e_sale - e_pur - big_m * (1 - delta_coeff))
+		]), tol))
+
+	if inputs_opt.get('total_share_coeffs'):
+		delta_rec_balance = np.asarray(results['delta_rec_balance'], dtype=float)
+		delta_meter_balance = var['delta_meter_balance']
+		rec_balance = e_cmet.sum(axis=0)
+		share_slack = big_m * (1 - delta_meter_balance + delta_rec_balance)
+		buy_slack = big_m * (1 - delta_rec_balance + delta_meter_balance)
+		checks += [
+			_check('REC surplus or deficit (Eqs. 25-26)', np.concatenate([
+				positive(-big_m * delta_rec_balance - rec_balance),
+				positive(rec_balance - big_m * (1 - delta_rec_balance) - small_m)
+			]), tol),
+			_check('Meter surplus or deficit (Eqs. 27-28)', np.concatenate([
+				positive(-big_m * delta_meter_balance - e_cmet),
+				positive(e_cmet - big_m * (1 - delta_meter_balance) - small_m)
+			]), tol),
+			_check('Share all surplus (Eqs. 29-30)', positive(np.abs(e_sale + e_cmet) - share_slack), tol),
+			_check('Buy all deficit (Eqs. 31-32)', positive(np.abs(e_pur - e_cmet) - buy_slack), tol),
+		]
+
+	return checks
+
+
+def validate(results: dict, inputs_opt: dict, level='fast', costs_tol=COSTS_TOLERANCE,
+			 constraints_tol=CONSTRAINTS_TOLERANCE) -> dict:
+	"""
+	Validates the results of the optimization and post-processing functions.
+	:param results: results of the optimization or post-processing functions
+	:param inputs_opt: backpack used to obtain the results, as prepared by run_pre_collective_pool_milp
+	:param level: validation level; one of "off", "fast" and "full" (see the module's description)
+	:param costs_tol: absolute tolerance for the sums of the rounded costs, in €
+	:param constraints_tol: absolute tolerance for the constraints' violations
+	:return: report with the validation level, the list of checks' summaries and whether all checks passed
+	"""
+	if level not in VALIDATION_LEVELS:
+		raise ValueError(f'level = {level}; please provide one of {list(VALIDATION_LEVELS)}')
+
+	checks = []
+	if level != 'off' and results:
+		checks += post_processing_checks(results, costs_tol)
+		if level == 'full':
+			checks += constraint_checks(results, inputs_opt, constraints_tol)
+
+	return {
+		'level': level,
+		'checks': checks,
+		'passed': all(check['passed'] for check in checks)
+	}
@@ -1,12 +1,26 @@
+import hashlib
+import json
 import multiprocessing as mp
 import numpy as np
 
+from collections import OrderedDict
+from copy import deepcopy
 from loguru import logger
 from joblib import Parallel, delayed
 
 from rec_sizing.clustering.module.Clustering import clustering_kmedoids
 from rec_sizing.configs.configs import (
+	ADMM_MAX_ITERATIONS,
+	ADMM_PENALTY,
+	ADMM_STEP,
+	ADMM_TOLERANCE,
+	CLUSTERING_CACHE_SIZE,
 	MIPGAP,
+	MODEL_CACHE_DIR,
+	N_JOBS,
+	PH_MAX_ITERATIONS,
+	PH_PENALTY,
+	PH_TOLERANCE,
 	SOLVER,
 	TIMEOUT
 )
@@ -18,8 +32,64 @@ from rec_sizing.custom_types.collective_milp_pool_types import (
 	BackpackCollectivePoolDict,
 	OutputsCollectivePoolDict
 )
+from rec_sizing.optimization.helpers.backpack_helpers import (
+	aggregate_backpack,
+	resolve_series,
+	scenario_backpacks
+)
 from rec_sizing.optimization.helpers.general_helpers import iter_dt
+from rec_sizing.optimization.helpers.milp_helpers import time_intervals
+from rec_sizing.optimization.helpers.outputs_helpers import (
+	BINARY_KEYS,
+	disaggregate_binaries,
+	STEP_KEYS
+)
+from rec_sizing.optimization.helpers.preflight_helpers import check_backpack
+from rec_sizing.optimization.helpers.symmetry_helpers import (
+	aggregate_meter_groups,
+	exact_aggregation_groups,
+	expand_meter_groups,
+	identical_meter_groups
+)
+from rec_sizing.optimization.module.admm import exchange_admm
 from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+from rec_sizing.optimization.module.daily_dispatch import daily_dispatch
+from rec_sizing.optimization.module.heuristic_dispatch import simulate_heuristic_dispatch
+from rec_sizing.optimization.module.infeasibility import IIS_MAX_CONSTRAINTS
+from rec_sizing.optimization.module.rolling_horizon import rolling_horizon_dispatch
+from rec_sizing.optimization.module.stochastic import (
+	extensive_form,
+	progressive_hedging
+)
+
+
+def _default_solver_settings(solver, timeout, mipgap):
+	"""
+	Reverts any non-valid solver setting to its default value, with a warning.
+	:param solver: a string with the solver chosen for the MILP
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s)
+	:param mipgap: a float for controlling the solver's tolerance
+	:return: the (possibly defaulted) solver, timeout and mipgap
+	"""
+	# Default solver in case of non-valid option
+	if solver not in ['CBC', 'CPLEX', 'HiGHS']:
+		logger.warning(f'solver = {solver} not recognized; reverting to {SOLVER}')
+		solver = SOLVER
+
+	# Default timeout in case of non-valid option
+	if timeout < 0:
+		logger.warning(f'timeout < 0; reverting to default {TIMEOUT}')
+		timeout = TIMEOUT
+
+	# Default mipgap in case of non-valid option
+	if mipgap < 0:
+		logger.warning(f'mipgap < 0; reverting to default {MIPGAP}')
+		mipgap = MIPGAP
+	elif mipgap > 1:
+		logger.warning(f'mipgap > 1; reverting to default {MIPGAP}')
+		mipgap = MIPGAP
+
+	return solver, timeout, mipgap
 
 
 def run_clustering_kmedoids(
@@ -46,6 +116,8 @@ def run_clustering_kmedoids(
 			}
 		}
 		'l_grid': array of float with the applicable tariffs of grid usage for self-consumption
+		'series': (optional) dict with named arrays of float; any of the arrays in "timeseries_data" can be replaced by
+			the name of one of these series (e.g., 'l_buy': 'tariff_A'), which is then clustered only once
 	}
 
 	:return: {
@@ -96,6 +168,7 @@ def run_clustering_kmedoids(
 				'value': number of days in the cluster
 			}
 		]
+		'representative_series': (only if "series" was provided) dict with the representative days of each named series
 	}
 	"""
 	logger.info('Clustering provided data using KMedoids...')
@@ -107,11 +180,168 @@ def run_clustering_kmedoids(
 	return outputs
 
 
+# Clustering results per clustering inputs' hash, kept while the process lives (e.g., in a warm worker)
+_clustering_cache = OrderedDict()
+
+
+def _clustering_key(inputs_clustering: BackpackKMedoids) -> str:
+	"""
+	Hashes the clustering inputs, i.e., the settings and the time series' data.
+	:param inputs_clustering: inputs of run_clustering_kmedoids
+	:return: hexadecimal digest of the inputs
+	"""
+	digest = hashlib.sha256()
+	digest.update(json.dumps([inputs_clustering['nr_days'], inputs_clustering['delta_t'],
+							  inputs_clustering['nr_representative_days']]).encode())
+	add_series = lambda label, series: digest.update(
+		label.encode() + (series.encode() if isinstance(series, str) else np.asarray(series, dtype=float).tobytes()))
+	add_series('l_grid', inputs_clustering['l_grid'])
+	for series_name, series in sorted((inputs_clustering.get('series') or {}).items()):
+		add_series(f'series:{series_name}', series)
+	for meter_id, meter_data in inputs_clustering['timeseries_data'].items():
+		for key, series in meter_data.items():
+			add_series(f'{meter_id}:{key}', series)
+
+	return digest.hexdigest()
+
+
+def _cached_clustering(inputs_clustering: BackpackKMedoids) -> OutputsKMedoids:
+	"""
+	Runs run_clustering_kmedoids, reusing the outputs of a previous run with the same inputs, if still cached.
+	The K-Medoids heuristic initialization is deterministic, so cached outputs match those of a new run.
+	:param inputs_clustering: inputs of run_clustering_kmedoids
+	:return: outputs of run_clustering_kmedoids
+	"""
+	if CLUSTERING_CACHE_SIZE <= 0:
+		return run_clustering_kmedoids(inputs_clustering)
+
+	key = _clustering_key(inputs_clustering)
+	if key in _clustering_cache:
+		logger.info('Reusing cached clustering outputs...')
+		_clustering_cache.move_to_end(key)
+		return _clustering_cache[key]
+
+	outputs = run_clustering_kmedoids(inputs_clustering)
+	_clustering_cache[key] = outputs
+	while len(_clustering_cache) > CLUSTERING_CACHE_SIZE:
+		_clustering_cache.popitem(last=False)
+
+	return outputs
+
+
+def _prepare_backpack(backpack: BackpackCollectivePoolDict, preflight=True, cluster=True) -> int:
+	"""
+	Prepares the backpack for the collective (pool) MILP, in place: defaults non-valid options and, if requested,
+	replaces the time series data by the data of the representative days obtained through clustering.
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"
+	:param preflight: if True, the backpack's pre-flight checks are run first
+	:param cluster: if False, "nr_clusters" is ignored and the full horizon is kept, e.g., for dispatching it in
+		windows or days
+	:return: the number of original days considered in the optimization horizon
+	"""
+	# Pre-flight checks, before clustering and building the MILP; all issues found are raised in a single ValueError
+	if preflight:
+		check_backpack(backpack)
+
+	# Save the original number of days for post-processing
+	backpack['nr_days_old'] = backpack.get('nr_days')
+	# Default the number of clusters in case of non-valid option;
+	# define nr_clusters = nr_days in case nr_clusters was not provided (i.e., do not clusterize data)
+	nr_clusters = backpack.get('nr_clusters') if cluster else None
+	nr_days = backpack.get('nr_days')
+	nr_dates = nr_days
+	if nr_clusters is not None:
+		if nr_clusters > nr_days:
+			logger.warning(f'nr_clusters > nr_days')
+			nr_clusters = nr_days
+			backpack['nr_clusters'] = nr_days
+	else:
+		nr_clusters = nr_days
+		backpack['nr_clusters'] = nr_days
+
+	# Default the grid tariffs' array in case of non-valid option
+	if backpack.get('l_grid') is not None:
+		if (np.array(backpack.get('l_grid')) < 0).any():
+			logger.warning(f'One or more l_grid < 0; those tariffs will be set to their absolute values')
+			backpack['l_grid'] = [abs(tar) for tar in backpack['l_grid']]
+
+	# -- CLUSTERING ----------------------------------------------------------------------------------------------------
+	# Apply clustering to timeseries data (one meter at a time)
+	delta_t = backpack.get('delta_t')
+	nr_data_points = int(nr_days * 24 / delta_t)
+
+	if nr_days != nr_clusters:
+		# Create inputs for clustering method; named series are passed as such, to be clustered only once
+		meters = backpack.get('meters')
+		inputs_clustering = {
+			'nr_days': nr_days,
+			'delta_t': delta_t,
+			'nr_representative_days': nr_clusters,
+			'l_grid': backpack['l_grid'],
+			'series': backpack.get('series'),
+			'timeseries_data': {
+				meter_id: {
+					'e_g_factor': backpack['meters'][meter_id]['e_g_factor'],
+					'e_c': backpack['meters'][meter_id]['e_c'],
+					'l_buy': backpack['meters'][meter_id]['l_buy'],
+					'l_sell': backpack['meters'][meter_id]['l_sell']
+				}
+				for meter_id in meters
+			}
+		}
+
+		# Run clustering (or reuse the outputs of a previous run with the same data)
+		clustered_inputs = _cached_clustering(inputs_clustering)
+
+		# Substitute the daily data by the representative data; named series are substituted once, in the series table
+		for series_name, representative_days in clustered_inputs.get('representative_series', {}).items():
+			backpack['series'][series_name] = []
+			for cl in range(nr_clusters):
+				backpack['series'][series_name] += representative_days[str(cl)]
+
+		for meter_id, meter_data in meters.items():
+			for key in ['e_g_factor', 'e_c', 'l_buy', 'l_sell']:
+				if isinstance(meter_data[key], str):
+					continue
+				backpack['meters'][meter_id][key] = []
+				for cl in range(nr_clusters):
+					backpack['meters'][meter_id][key] += clustered_inputs[f'representative_{key}'][meter_id][str(cl)]
+
+		backpack['l_grid'] = []
+		backpack['w_clustering'] = []
+		nr_daily_data_points = int(24 / delta_t)
+
+		for cl in range(nr_clusters):
+			backpack['l_grid'] += clustered_inputs['representative_l_grid'][str(cl)]
+			backpack['w_clustering'] += [clustered_inputs['cluster_nr_days'][str(cl)]] * nr_daily_data_points
+		backpack['nr_days'] = nr_clusters
+
+	# Use timeseries data as is, effectively running the MILP with nr_days as the total number of days worth of data
+	else:
+		backpack['w_clustering'] = [1] * nr_data_points
+
+	# Meters that reference the same named series share the same array
+	resolve_series(backpack)
+
+	return nr_dates
+
+
 def run_pre_collective_pool_milp(
 		backpack: BackpackCollectivePoolDict,
 		solver=SOLVER,
 		timeout=TIMEOUT,
-		mipgap=MIPGAP) \
+		mipgap=MIPGAP,
+		investment_bounds=None,
+		initial_values=None,
+		lp_pricing=False,
+		symmetry=None,
+		diagnose=False,
+		model_cache=MODEL_CACHE_DIR,
+		progress_callback=None,
+		stop_rule=None,
+		tight_bounds=False,
+		formulation='big_m',
+		row_generation=False) \
 		-> OutputsCollectivePoolDict:
 	"""
 	Use this function to compute a standalone collective MILP for a given renewable energy community (REC) or citizens
@@ -123,6 +353,9 @@ def run_pre_collective_pool_milp(
 	below, under the parameter "backpack". Arrays with time-varying data such as consumption/generation forecasts and
 	opportunity costs must comply with the expected length defined by the MILP's horizon and step
 	(e.g., for a 24h horizon, and a step of 15 minutes or 0.25 hours, the length of the arrays must be 96).
+	The backpack is checked before building the MILP (arrays' lengths, parameters' bounds and obvious infeasibility
+	conditions, such as a meter without storage whose load cannot be kept within its power limit); all issues found
+	are raised in a single ValueError.
 
 	:param backpack: {
 		'nr_days': an int with the number of days to consider in the optimization
@@ -172,6 +405,9 @@ def run_pre_collective_pool_milp(
 				'deg_cost': a float representing a penalty for cyclic degradation of the BESS, in €/kWh
 			}
 		}
+		'series': (optional) dict with named arrays of float, e.g., tariffs or generation profiles shared by several
+			meters; any of the meters' arrays "l_buy", "l_sell", "e_c" and "e_g_factor" can be replaced by the name of
+			one of these series (e.g., 'l_buy': 'tariff_A'), which is then stored, clustered and used only once
 	}
 
 	:param solver: a string with the solver chosen for the MILP. For the meantime, the library accepts the values "CBC"
@@ -185,6 +421,61 @@ def run_pre_collective_pool_milp(
 	:param mipgap: a float for controlling the solver's tolerance; intolerant [0 - 1] fully permissive; any value
 	outside this range will be reverted to the default 0.01, with a warning.
 
+	:param investment_bounds: (optional) dict with additional bounds to the investment decisions, with any of the keys
+	"p_cont", "p_gn_new" and "e_bn_new" pointing to a dict of (lower bound, upper bound) tuples per meter ID, where
+	None means unbounded
+
+	:param initial_values: (optional) dict with initial values for the MILP variables (i.e., a MIP start), with the same
+	keys and structure as the returned dict (e.g., {'p_gn_new': {'Meter#1': 1.0}}); partial structures are admissible
+
+	:param lp_pricing: (optional) if True, the "dual_prices" are computed by "run_lp_dual_pricing", i.e., by re-solving
+	the LP obtained by fixing the binary variables and investments at the MILP's solution, instead of being read from the
+	MILP's solution
+
+	:param symmetry: (optional) string with the treatment given to groups of identical meters (i.e., with the same data);
+	one of:
+		None: identical meters are modelled as distinct meters
+		"aggregate": each group is modelled as a single meter with the group's aggregated loads, power limits and
+		investment bounds, and the results are split evenly by the group's meters; all meters of a group are then
+		operated alike, so only groups of meters with fixed net loads (no storage and a fixed new generation capacity),
+		for which this is exact, are aggregated, while the remaining groups are treated as in "order"
+		"order": symmetry-breaking constraints are added, ordering the meters of each group by their investment costs;
+		the optimal solution is kept, while the solver's branch and bound avoids exploring symmetric solutions
+	Non-valid options will be reverted to None, with a warning. In "aggregate" mode, "investment_bounds" and
+	"initial_values" refer to the whole aggregated group and are identified by the group's first meter ID.
+
+	:param diagnose: (optional) if True and the MILP is not solved, its infeasibility is diagnosed with
+	"run_infeasibility_diagnosis" (without computing an IIS) and the constraint families, meters and time steps that
+	need relaxing are logged
+
+	:param model_cache: (optional) directory of the on-disk model cache; the compiled structure of the MILP (which
+	depends on the meters, horizon, time step, formulation flags and the meters' technical parameters and bounds, but not
+	on the time series and tariffs) is stored there and reused by later runs with the same structure, also in other
+	processes; None disables the cache
+
+	:param progress_callback: (optional) function called with the solver's progress events while it runs, i.e., dicts
+	with the keys "solver", "elapsed" (s), "incumbent", "bound", "gap" (relative), "nodes" and "line" (the solver log
+	line they were parsed from)
+
+	:param stop_rule: (optional) function called with the solver's progress events that returns True when the search is
+	to be stopped, returning the incumbent solution (CBC and CPLEX only), e.g.,
+	GapStagnationRule(min_improvement=0.001, window=120) stops when the gap has not improved 0.1 % in 120 s
+
+	:param tight_bounds: (optional) if True, finite upper bounds derived from the meters' power limits and maximum
+	storage capacities are propagated to the continuous energy flows, tightening the LP relaxation (which helps the
+	presolve and branching of CBC and HiGHS) without changing the optimal objective function value
+
+	:param formulation: (optional) formulation of the logical constraints of the MILP (retail supply or surplus,
+	self-consumption, positive allocation coefficients and REC/meter balance checks), one of:
+		"big_m": big-M constraints, supported by all solvers
+		"indicator": indicator constraints, free of big-M values and tolerances; only supported by CPLEX
+	Non-valid options, or "indicator" with other solvers, will be reverted to "big_m", with a warning.
+
+	:param row_generation: (optional) if True and "strict_pos_coeffs" or "total_share_coeffs" are enabled, the MILP is
+	first solved without the sharing rules' constraints (Eqs. 23-32), which are only added for the (meter, time step)
+	pairs where the solution violates them, re-solving with a warm start until none is violated; since most of these
+	constraints are slack at the optimum, this drastically reduces the MILP's size for large communities
+
 	:return: {
 		'obj_value': float with value obtained for the objective function under an optimal solution of the MILP
 		'milp_status': string with the status of the optimization problem; only non-error value is "Optimal"
@@ -220,116 +511,780 @@ def run_pre_collective_pool_milp(
 	logger.info('Running a pre-delivery standalone/second stage collective (pool) MILP...')
 
 	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
-	# Default solver in case of non-valid option
-	if solver not in ['CBC', 'CPLEX', 'HiGHS']:
-		logger.warning(f'solver = {solver} not recognized; reverting to {SOLVER}')
-		solver = SOLVER
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
 
-	# Default timeout in case of non-valid option
-	if timeout < 0:
-		logger.warning(f'timeout < 0; reverting to default {TIMEOUT}')
-		timeout = TIMEOUT
+	# Default symmetry treatment in case of non-valid option
+	if symmetry not in [None, 'aggregate', 'order']:
+		logger.warning(f'symmetry = {symmetry} not recognized; reverting to None')
+		symmetry = None
 
-	# Default mipgap in case of non-valid option
-	if mipgap < 0:
-		logger.warning(f'mipgap < 0; reverting to default {MIPGAP}')
-		mipgap = MIPGAP
-	elif mipgap > 1:
-		logger.warning(f'mipgap > 1; reverting to default {MIPGAP}')
-		mipgap = MIPGAP
+	nr_dates = _prepare_backpack(backpack)
+
+	# -- SYMMETRY DETECTION --------------------------------------------------------------------------------------------
+	milp_backpack = backpack
+	groups = None
+	symmetric_groups = None
+	if symmetry is not None:
+		groups = identical_meter_groups(backpack)
+		logger.info(f' - {len(backpack["meters"])} meters grouped in {len(groups)} groups of identical meters -')
+		symmetric_groups = groups
+		if symmetry == 'aggregate':
+			groups, symmetric_groups = exact_aggregation_groups(backpack, groups)
+			if symmetric_groups:
+				logger.info(f' - {len(symmetric_groups)} groups with storage or generation to be sized cannot be '
+							f'aggregated exactly; ordering their meters instead -')
+			milp_backpack = aggregate_meter_groups(backpack, groups)
+
+	# -- RUN MILP ------------------------------------------------------------------------------------------------------
+	logger.info(' - defining MILP -')
+	milp = CollectiveMILPPool(milp_backpack, nr_dates, solver, timeout, mipgap,
+							  investment_bounds=investment_bounds, initial_values=initial_values,
+							  symmetric_groups=symmetric_groups or None, model_cache=model_cache,
+							  progress_callback=progress_callback, stop_rule=stop_rule, tight_bounds=tight_bounds,
+							  formulation=formulation, row_generation=row_generation)
 
-	# Save the original number of days for post-processing
-	backpack['nr_days_old'] = backpack.get('nr_days')
-	# Default the number of clusters in case of non-valid option;
-	# define nr_clusters = nr_days in case nr_clusters was not provided (i.e., do not clusterize data)
-	nr_clusters = backpack.get('nr_clusters')
 	nr_days = backpack.get('nr_days')
-	nr_dates = nr_days
-	if nr_clusters is not None:
-		if nr_clusters > nr_days:
-			logger.warning(f'nr_clusters > nr_days')
-			nr_clusters = nr_days
-			backpack['nr_clusters'] = nr_days
-	else:
-		nr_clusters = nr_days
-		backpack['nr_clusters'] = nr_days
+	logger.info(f' - MILP set with an horizon of {nr_days} days, mipgap={mipgap}, timeout={timeout}, solver={solver} -')
 
-	# Default the grid tariffs' array in case of non-valid option
-	if backpack.get('l_grid') is not None:
-		if (np.array(backpack.get('l_grid')) < 0).any():
-			logger.warning(f'One or more l_grid < 0; those tariffs will be set to 0.0')
-			backpack['l_grid'] = [abs(tar) for tar in backpack['l_grid']]
+	logger.info(' - solving MILP -')
+	milp.solve_milp()
+	if milp.stopped_early:
+		logger.info(f' - search stopped by the stopping rule after {milp.progress_events[-1]["elapsed"]} s; '
+					f'returning the incumbent solution -')
+
+	logger.info(' - generating outputs -')
+	results = milp.generate_outputs()
+	if diagnose and (not results or results['milp_status'] not in ['Optimal', 'Not Solved']):
+		logger.info(' - diagnosing infeasibility -')
+		diagnosis_milp = CollectiveMILPPool(milp_backpack, nr_dates, solver, timeout, mipgap, write_lp=False,
+											investment_bounds=investment_bounds,
+											symmetric_groups=symmetric_groups or None)
+		_log_diagnosis(diagnosis_milp.diagnose_infeasibility(iis=False))
+	if symmetry == 'aggregate':
+		results = expand_meter_groups(results, groups)
+
+	if lp_pricing and results:
+		logger.info(' - computing dual prices from the fixed-binary LP -')
+		results['dual_prices'] = run_lp_dual_pricing(backpack, results, solver=solver, timeout=timeout)
+
+	logger.info('Running a pre-delivery standalone/second stage collective (pool) MILP... DONE!')
+
+	return results
+
+
+def run_rolling_horizon_collective_pool_milp(
+		backpack: BackpackCollectivePoolDict,
+		window_days=7,
+		overlap_days=1,
+		investments=None,
+		two_phase=False,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Use this function to compute the operational schedule of a renewable energy community (REC) or citizens energy
+	community (CEC) under a pool market structure, for long horizons (e.g., a full year of 15-minute data) that cannot
+	be solved by a single MILP.
+	The horizon is split into overlapping windows of "window_days" days that are solved sequentially by the same
+	collective MILP used in "run_pre_collective_pool_milp". From each window only the first
+	"window_days - overlap_days" days are kept (the remaining days act as a look-ahead) and the storage energy content
+	at the end of the kept days is carried to the beginning of the next window. Unlike the single MILP, the storage is
+	not reset to its initial state of charge at the end of every day, but only at the end of each window, so that its
+	energy content flows between days and windows.
+	Investments are not optimized in the windows, since each window only sees part of the horizon. They can either be
+	provided by the user, sized beforehand over clustered data (two-phase option) or, by default, set to the minimum
+	new capacities required for each meter ("p_gn_min" and "e_bn_min"). When not provided, the contracted power is
+	optimized per window and the maximum over all windows is reported.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp", where "nr_days" must be an integer;
+		"nr_clusters" is only used by the sizing phase of the two-phase option
+
+	:param window_days: an int with the number of days solved in each window
+
+	:param overlap_days: an int with the number of (look-ahead) days shared between consecutive windows;
+		must be smaller than window_days
+
+	:param investments: (optional) dict with the investment plan to be considered, with any of the keys "p_cont",
+		"p_gn_new" and "e_bn_new" pointing to a dict of floats per meter ID (in kW or kWh); ignored if two_phase=True
+
+	:param two_phase: boolean indicating if the investments are to be sized first, by running
+		"run_pre_collective_pool_milp" over the clustered data (with "nr_clusters" representative days), and then fixed
+		for dispatching the full horizon in windows; the contracted power is not fixed, since the clustered data may
+		not include the peak net load of the full horizon
+
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each MILP solved
+
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
+
+	:return: the same structure as in "run_pre_collective_pool_milp", covering the full horizon, where "obj_value" and
+		"c_ind2pool" are recomputed for the merged schedules and "milp_status" is "Optimal" only if all windows were
+		optimally solved; an empty dict is returned if any window could not be solved
+	"""
+	logger.info('Running a rolling-horizon collective (pool) MILP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
+
+	if window_days < 1:
+		raise ValueError(f'window_days = {window_days}; please provide at least one day per window')
+	if not 0 <= overlap_days < window_days:
+		raise ValueError(f'overlap_days = {overlap_days}; please provide a value in [0, window_days[')
+
+	# Pre-flight checks, once for the full horizon, before any window is built
+	check_backpack(backpack)
+
+	# -- INVESTMENTS ---------------------------------------------------------------------------------------------------
+	meters = backpack.get('meters')
+	if two_phase:
+		logger.info(' - phase 1: sizing the investments -')
+		if backpack.get('nr_clusters') is None:
+			logger.warning('two_phase=True but nr_clusters not provided; sizing over the full horizon')
+		sizing_results = run_pre_collective_pool_milp(deepcopy(backpack), solver, timeout, mipgap)
+		if not sizing_results:
+			logger.warning('Sizing phase could not be solved; aborting the rolling horizon')
+			return {}
+		investments = {key: sizing_results[key] for key in ['p_gn_new', 'e_bn_new']}
+	elif investments is None:
+		logger.info(' - no investments provided; considering the minimum new capacities -')
+		investments = {
+			'p_gn_new': {meter_id: meter_data['p_gn_min'] for meter_id, meter_data in meters.items()},
+			'e_bn_new': {meter_id: meter_data['e_bn_min'] for meter_id, meter_data in meters.items()}
+		}
+
+	# Prepare the backpack for the MILPs and for post-processing (the horizon is not clustered)
+	nr_days = _prepare_backpack(backpack, preflight=False, cluster=False)
+
+	# -- RUN WINDOWS ---------------------------------------------------------------------------------------------------
+	logger.info(f' - dispatching {nr_days} days in windows of {window_days} days with {overlap_days} days of overlap, '
+				f'mipgap={mipgap}, timeout={timeout}, solver={solver} -')
+	results = rolling_horizon_dispatch(backpack, window_days, overlap_days, investments, solver, timeout, mipgap)
+
+	logger.info('Running a rolling-horizon collective (pool) MILP... DONE!')
+
+	return results
+
+
+def run_fixed_investment_evaluation(
+		backpack: BackpackCollectivePoolDict,
+		investments: dict,
+		n_jobs=N_JOBS,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Use this function to evaluate a given investment plan for a renewable energy community (REC) or citizens energy
+	community (CEC) under a pool market structure, over full-resolution (unclustered) data.
+	The collective MILP of "run_pre_collective_pool_milp" is solved with all investment decisions fixed. Since the
+	storage energy content is reset at the end of each day, the problem then splits into independent daily MILPs,
+	which are solved in a pool of processes; the daily schedules, costs and dual prices are merged into the usual
+	outputs' structure.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp", where "nr_clusters" is ignored
+
+	:param investments: dict with the investment plan to be evaluated
+	{
+		'p_cont': dict of floats with the contracted power per meter, in kW
+		'p_gn_new': dict of floats with the increase in PV capacity per meter, in kW
+		'e_bn_new': dict of floats with the increase in storage capacity per meter, in kWh
+	}
+
+	:param n_jobs: an int with the number of parallel processes; -1 uses all available CPUs
+
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each daily MILP
+
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
+
+	:return: the same structure as in "run_pre_collective_pool_milp", where "obj_value" and "c_ind2pool" are
+		recomputed for the merged schedules and "milp_status" is "Optimal" only if all days were optimally solved;
+		an empty dict is returned if any day could not be solved
+	"""
+	logger.info('Evaluating a fixed investment plan with a per-day collective (pool) MILP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
+
+	meters = backpack.get('meters')
+	for key in ['p_cont', 'p_gn_new', 'e_bn_new']:
+		if investments.get(key) is None:
+			raise ValueError(f'{key} missing from the investment plan')
+		missing_meters = [meter_id for meter_id in meters if meter_id not in investments[key]]
+		if missing_meters:
+			raise ValueError(f'{key} missing from the investment plan for meters {missing_meters}')
+	investments = {key: investments[key] for key in ['p_cont', 'p_gn_new', 'e_bn_new']}
+
+	# Pre-flight checks, once for the full horizon, before the days are dispatched, and preparation of the backpack for
+	# the MILPs and for post-processing (the horizon is not clustered)
+	nr_days = _prepare_backpack(backpack, cluster=False)
+
+	# -- RUN DAILY MILPS -----------------------------------------------------------------------------------------------
+	logger.info(f' - dispatching {nr_days} days with n_jobs={n_jobs}, mipgap={mipgap}, timeout={timeout}, '
+				f'solver={solver} -')
+	results = daily_dispatch(backpack, investments, n_jobs, solver, timeout, mipgap)
+
+	logger.info('Evaluating a fixed investment plan with a per-day collective (pool) MILP... DONE!')
+
+	return results
+
+
+def run_heuristic_screening(
+		backpack: BackpackCollectivePoolDict,
+		candidates: dict) \
+		-> dict:
+	"""
+	Use this function to screen many candidate investment plans (new PV and storage capacities per meter) of a
+	renewable energy community (REC) or citizens energy community (CEC) under a pool market structure, before running
+	any MILP. Instead of optimizing the dispatch, a rule-based policy is simulated for all candidates at once:
+	storage assets charge from their own meter's surplus and discharge to cover their own meter's deficit
+	(self-consumption first), and the remaining community surplus is matched pro-rata to the remaining community
+	deficit in the pool, with the retailer covering the rest. The resulting costs are an approximation (an upper
+	bound, for feasible candidates) of the costs the MILP would achieve for the same investments.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"; the data is used as is, i.e., without
+		clustering
+
+	:param candidates: {
+		'p_gn_new': dict with an array of candidate increases in PV capacity per meter ID, in kW
+		'e_bn_new': dict with an array of candidate increases in storage capacity per meter ID, in kWh
+		}
+		all arrays must have the same length, i.e., the number of candidates; meters not included in one of the dicts
+		are considered to have no new capacity of that type
+
+	:return: {
+		'p_cont': dict of arrays with the minimum contracted power required per meter and per candidate, in kW
+		'retailer_exchanges_cost': dict of arrays with the retailer exchanges costs per meter and per candidate, in €
+		'sc_tariff_cost': dict of arrays with the self-consumption tariff costs per meter and per candidate, in €
+		'contractedpower_cost': dict of arrays with the contracted power costs per meter and per candidate, in €
+		'batteries_investments_cost': dict of arrays with the storage investment costs per meter and per candidate,
+			in €
+		'PV_investments_cost': dict of arrays with the PV investment costs per meter and per candidate, in €
+		'degradation_cost': dict of arrays with the storage degradation costs per meter and per candidate, in €
+		'c_ind2pool': dict of arrays with the sum of all the above costs per meter and per candidate, in €
+		'total_cost': array with the total cost of the community per candidate, in €
+		'feasible': array of booleans indicating, per candidate, if the investment bounds and the meters' power
+			limits ("p_meter_max") are respected
+	}
+	"""
+	logger.info('Screening candidate investment plans with a heuristic dispatch...')
+
+	results = simulate_heuristic_dispatch(resolve_series(backpack), candidates)
+
+	logger.info('Screening candidate investment plans with a heuristic dispatch... DONE!')
+
+	return results
+
+
+def run_coarse_to_fine_collective_pool_milp(
+		backpack: BackpackCollectivePoolDict,
+		coarse_delta_t=1.0,
+		strategy='warm_start',
+		bounds_margin=0.1,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Use this function to compute the same collective MILP of "run_pre_collective_pool_milp" in two resolutions.
+	The time series are first aggregated to a coarser time step (e.g., from 15 minutes to 1 hour; consumption is summed
+	while generation factors and prices are averaged) and the resulting, smaller MILP is solved. Its solution is then
+	used to speed up the MILP at the original time step, either:
+	 - "warm_start": as a MIP start, with the coarse investments, contracted power and, if the data is not clustered,
+	 binary patterns (repeated over the finer time steps);
+	 - "bounds": as a MIP start (as above) and as a restriction of the investments to a neighbourhood of the coarse
+	 investments, of +/- bounds_margin times the admissible range of each investment.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"
+
+	:param coarse_delta_t: a float with the coarse time step, in hours; must be a multiple of backpack["delta_t"]
+		that divides a day
+
+	:param strategy: a string with the way the coarse solution is used; one of "warm_start" and "bounds"
+
+	:param bounds_margin: a float with the fraction of each investment's admissible range
+		(e.g., "p_gn_max" - "p_gn_min") that is kept around the coarse investment, for the "bounds" strategy
+
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each MILP
+
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
+
+	:return: the same structure as in "run_pre_collective_pool_milp", for the original time step
+	"""
+	logger.info('Running a coarse-to-fine collective (pool) MILP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
+
+	if strategy not in ['warm_start', 'bounds']:
+		logger.warning(f'strategy = {strategy} not recognized; reverting to "warm_start"')
+		strategy = 'warm_start'
 
-	# -- CLUSTERING ----------------------------------------------------------------------------------------------------
-	# Apply clustering to timeseries data (one meter at a time)
 	delta_t = backpack.get('delta_t')
-	nr_data_points = int(nr_days * 24 / delta_t)
+	if coarse_delta_t <= delta_t:
+		logger.warning(f'coarse_delta_t <= delta_t; solving the MILP at the original resolution only')
+		return run_pre_collective_pool_milp(backpack, solver, timeout, mipgap)
+	factor = int(round(coarse_delta_t / delta_t))
 
-	if nr_days != nr_clusters:
-		# Create inputs for clustering method
-		meters = backpack.get('meters')
-		inputs_clustering = {
-			'nr_days': nr_days,
-			'delta_t': delta_t,
-			'nr_representative_days': nr_clusters,
-			'l_grid': backpack['l_grid'],
-			'timeseries_data': {
-				meter_id: {
-					'e_g_factor': backpack['meters'][meter_id]['e_g_factor'],
-					'e_c': backpack['meters'][meter_id]['e_c'],
-					'l_buy': backpack['meters'][meter_id]['l_buy'],
-					'l_sell': backpack['meters'][meter_id]['l_sell']
+	# -- COARSE MILP ---------------------------------------------------------------------------------------------------
+	logger.info(f' - solving the coarse MILP with delta_t={coarse_delta_t} -')
+	coarse_results = run_pre_collective_pool_milp(aggregate_backpack(deepcopy(backpack), coarse_delta_t),
+												  solver, timeout, mipgap)
+	if not coarse_results:
+		logger.warning('Coarse MILP could not be solved; solving the MILP at the original resolution only')
+		return run_pre_collective_pool_milp(backpack, solver, timeout, mipgap)
+	logger.info(f' - coarse MILP solved with obj_value={coarse_results["obj_value"]} -')
+
+	initial_values = {key: coarse_results[key] for key in ['p_cont', 'p_gn_new', 'e_bn_new']}
+	nr_clusters = backpack.get('nr_clusters')
+	if nr_clusters is None or nr_clusters >= backpack.get('nr_days'):
+		# binary patterns only match the fine time steps if both MILPs run over the same (unclustered) days
+		initial_values.update(disaggregate_binaries(coarse_results, factor))
+
+	investment_bounds = None
+	if strategy == 'bounds':
+		investment_bounds = {}
+		for key, (min_key, max_key) in {'p_gn_new': ('p_gn_min', 'p_gn_max'),
+										'e_bn_new': ('e_bn_min', 'e_bn_max')}.items():
+			investment_bounds[key] = {}
+			for meter_id, meter_data in backpack['meters'].items():
+				margin = bounds_margin * (meter_data[max_key] - meter_data[min_key])
+				investment_bounds[key][meter_id] = (coarse_results[key][meter_id] - margin,
+													coarse_results[key][meter_id] + margin)
+
+	# -- FINE MILP -----------------------------------------------------------------------------------------------------
+	logger.info(f' - solving the fine MILP with delta_t={delta_t} and strategy={strategy} -')
+	results = run_pre_collective_pool_milp(backpack, solver, timeout, mipgap,
+										   investment_bounds=investment_bounds, initial_values=initial_values)
+
+	logger.info('Running a coarse-to-fine collective (pool) MILP... DONE!')
+
+	return results
+
+
+def run_relax_and_fix_collective_pool_milp(
+		backpack: BackpackCollectivePoolDict,
+		relax_and_fix=True,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP) \
+		-> dict:
+	"""
+	Use this function to quickly assess the collective MILP of "run_pre_collective_pool_milp" without solving it in full.
+	First, the LP relaxation of the MILP (i.e., with all binary variables relaxed to continuous variables in [0, 1]) is
+	solved, providing a lower bound to the MILP's optimal objective value and a relaxed investment plan.
+	Then, if requested, a relax-and-fix heuristic is run: the binary variables are enforced one (representative) day at
+	a time, keeping the binary variables of the following days relaxed and fixing the binary variables of the previous
+	days to the values previously found. The MILP solved for the last day yields a feasible plan, whose objective value
+	is an upper bound to the MILP's optimal objective value, so that the gap to the lower bound certifies its quality.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"
+
+	:param relax_and_fix: if True, the relax-and-fix heuristic is run after the LP relaxation
+
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each LP / MILP solved
+
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
+
+	:return: {
+		'lower_bound': float with the objective value of the LP relaxation, i.e., a lower bound to the MILP's optimal
+			objective value; None if the LP relaxation could not be solved
+		'relaxed_plan': dict with the keys "p_cont", "p_gn_new" and "e_bn_new", each pointing to a dict with the
+			respective (relaxed) investment decision per meter ID
+		'outputs': the same structure as in "run_pre_collective_pool_milp", for the relax-and-fix solution;
+			empty if relax_and_fix is False or if the heuristic did not find a feasible solution
+		'gap': float with the relative gap between the relax-and-fix objective value and the lower bound;
+			None if not available
+	}
+	"""
+	logger.info('Running an LP relaxation / relax-and-fix collective (pool) MILP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
+
+	nr_dates = _prepare_backpack(backpack)
+	nr_steps = time_intervals(backpack['nr_days'] * 24, backpack['delta_t'])
+	nr_daily_steps = min(time_intervals(24, backpack['delta_t']), nr_steps)
+	days = [range(first_step, min(first_step + nr_daily_steps, nr_steps))
+			for first_step in range(0, nr_steps, nr_daily_steps)]
+
+	results = {
+		'lower_bound': None,
+		'relaxed_plan': {},
+		'outputs': {},
+		'gap': None
+	}
+
+	# -- LP RELAXATION -------------------------------------------------------------------------------------------------
+	logger.info(' - solving the LP relaxation -')
+	lp = CollectiveMILPPool(backpack, nr_dates, solver, timeout, mipgap, write_lp=False,
+							relaxed_steps=range(nr_steps))
+	lp.solve_milp()
+	relaxed_outputs = lp.generate_outputs()
+	if not relaxed_outputs or relaxed_outputs['milp_status'] != 'Optimal':
+		logger.warning('LP relaxation could not be solved to optimality; no bound is available')
+		return results
+	results['lower_bound'] = lp.obj_value
+	results['relaxed_plan'] = {key: relaxed_outputs[key] for key in ['p_cont', 'p_gn_new', 'e_bn_new']}
+	logger.info(f' - LP relaxation solved with lower_bound={round(lp.obj_value, 3)} -')
+
+	if not relax_and_fix:
+		return results
+
+	# -- RELAX-AND-FIX -------------------------------------------------------------------------------------------------
+	fixed_binaries = {}
+	outputs = {}
+	for day_nr, day_steps in enumerate(days):
+		logger.info(f' - relax-and-fix: enforcing the binary variables of day {day_nr + 1}/{len(days)} -')
+		milp = CollectiveMILPPool(backpack, nr_dates, solver, timeout, mipgap, write_lp=False,
+								  relaxed_steps=range(day_steps.stop, nr_steps), fixed_binaries=fixed_binaries)
+		milp.solve_milp()
+		outputs = milp.generate_outputs()
+		if not outputs or outputs['milp_status'] not in ['Optimal', 'Not Solved']:
+			logger.warning(f'Relax-and-fix found no feasible solution at day {day_nr + 1}; aborting the heuristic')
+			return results
+
+		# fix the binary variables of the current day to the values found
+		for key in BINARY_KEYS:
+			if key not in outputs:
+				continue
+			if key in STEP_KEYS:
+				fixed_binaries.setdefault(key, [None] * nr_steps)
+				fixed_binaries[key][day_steps.start:day_steps.stop] = outputs[key][day_steps.start:day_steps.stop]
+			else:
+				fixed_binaries.setdefault(key, {n: [None] * nr_steps for n in outputs[key]})
+				for n, values in outputs[key].items():
+					fixed_binaries[key][n][day_steps.start:day_steps.stop] = values[day_steps.start:day_steps.stop]
+
+	results['outputs'] = outputs
+	if outputs['obj_value'] != 0:
+		results['gap'] = (outputs['obj_value'] - results['lower_bound']) / abs(outputs['obj_value'])
+	logger.info(f' - relax-and-fix solved with obj_value={outputs["obj_value"]} and gap={results["gap"]} -')
+
+	logger.info('Running an LP relaxation / relax-and-fix collective (pool) MILP... DONE!')
+
+	return results
+
+
+def run_admm_collective_pool_milp(
+		backpack: BackpackCollectivePoolDict,
+		n_jobs=N_JOBS,
+		broker=None,
+		broker_timeout=None,
+		penalty=ADMM_PENALTY,
+		step=ADMM_STEP,
+		max_iterations=ADMM_MAX_ITERATIONS,
+		tolerance=ADMM_TOLERANCE,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP) \
+		-> OutputsCollectivePoolDict:
+	"""
+	Use this function to solve the collective MILP of "run_pre_collective_pool_milp" for communities with many meters,
+	by decomposing it across meters with an exchange ADMM. Each meter's MILP is solved on its own, trading in the pool
+	at coordinated pool prices, which are updated with the pool imbalances until the meters' pool exchanges are balanced
+	(see rec_sizing/optimization/module/admm.py). Each iteration solves one small MILP per meter, in parallel, so the
+	effort grows linearly with the number of meters, instead of the combinatorial growth of the full MILP; the result is
+	a feasible, but not necessarily optimal, solution.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"
+
+	:param n_jobs: an int with the number of parallel processes solving the meters' MILPs; -1 uses all available CPUs
+
+	:param broker: (optional) path of the local socket ("rec-sizing serve --socket") or of the file-based queue
+		directory ("rec-sizing serve --queue") of a warm worker pool, which then solves the meters' MILPs instead of a
+		local pool of processes; a queue directory can be shared by worker pools in several machines
+
+	:param broker_timeout: (optional) maximum time (s) to wait for the worker pool to solve the meters' MILPs of an
+		iteration, e.g., in case no server is running or a server died while solving them; the meters' MILPs not
+		solved in time are handled as failed, and an empty dict is then returned; None waits indefinitely
+
+	:param penalty: a float with the cost of the deviations of the meters' pool exchanges from their balanced shares,
+		in €/kWh
+
+	:param step: a float with the step of the pool prices' update, in €/kWh per kWh of mean pool imbalance
+
+	:param max_iterations: an int with the maximum number of pool prices' updates; must be at least 1
+
+	:param tolerance: a float with the pool imbalance and change of the pool exchanges (kWh) below which the pool
+		prices are considered converged
+
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each meter's MILP
+
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
+
+	:return: the same structure as in "run_pre_collective_pool_milp", where "dual_prices" are the coordinated pool
+		prices, "obj_value" is the sum of the individual costs "c_ind2pool", "delta_rec_balance" follows the final net
+		loads and "milp_status" is "Heuristic" if all meters' MILPs were optimally solved (the solution is feasible, but
+		not necessarily optimal) or the first other status otherwise; an empty dict is returned if any meter's MILP could
+		not be solved
+	"""
+	logger.info('Running an ADMM decomposition of the collective (pool) MILP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
+
+	if max_iterations < 1:
+		raise ValueError(f'max_iterations = {max_iterations}; please provide at least one iteration')
+
+	nr_dates = _prepare_backpack(backpack)
+
+	# -- RUN ADMM ------------------------------------------------------------------------------------------------------
+	logger.info(f' - coordinating {len(backpack["meters"])} meters\' MILPs with n_jobs={n_jobs}, mipgap={mipgap}, '
+				f'timeout={timeout}, solver={solver} -')
+	results = exchange_admm(backpack, nr_dates, solver, timeout, mipgap, n_jobs, penalty, step, max_iterations,
+							tolerance, broker=broker, broker_timeout=broker_timeout)
+
+	logger.info('Running an ADMM decomposition of the collective (pool) MILP... DONE!')
+
+	return results
+
+
+def run_stochastic_collective_pool_milp(
+		backpack: BackpackCollectivePoolDict,
+		method='extensive',
+		n_jobs=N_JOBS,
+		penalty=PH_PENALTY,
+		max_iterations=PH_MAX_ITERATIONS,
+		tolerance=PH_TOLERANCE,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP) \
+		-> dict:
+	"""
+	Use this function to size the REC's assets for several scenarios of the time series at once (e.g., consumption,
+	generation and tariffs), i.e., to minimize the expected cost of "run_pre_collective_pool_milp" over the scenarios,
+	with the investment decisions (contracted power, new generation and storage capacities) shared by all scenarios and
+	the operation adapted to each of them (see rec_sizing/optimization/module/stochastic.py).
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp", with the additional key:
+		{
+			"scenarios": list with one dict per scenario, with the keys:
+				{
+					"weight": a positive float with the scenario's weight (e.g., probability); weights are normalized
+						to add up to 1,
+					"l_grid": (optional) the scenario's grid tariffs, as in the backpack,
+					"meters": (optional) a dict with, per meter ID, the meter's time series that differ from the
+						backpack's, i.e., any of "l_buy", "l_sell", "e_c" and "e_g_factor", as in the backpack
 				}
-				for meter_id in meters
-			}
 		}
+		each scenario is clustered independently if "nr_clusters" is provided
 
-		# Run clustering
-		clustered_inputs = run_clustering_kmedoids(inputs_clustering)
+	:param method: a string with the method for solving the stochastic sizing, one of:
+		- "extensive": a single MILP with all scenarios stacked along the horizon, which minimizes the expected cost
+			exactly, but grows with the number of scenarios
+		- "progressive_hedging": one MILP per scenario, solved in parallel and iteratively steered to the same
+			investments; a heuristic for many scenarios, whose final contracted power is the largest one required
+			by the scenarios
 
-		# Substitute the daily data by the representative data
-		for meter_id, meter_data in meters.items():
-			backpack['meters'][meter_id]['e_g_factor'] = []
-			backpack['meters'][meter_id]['e_c'] = []
-			backpack['meters'][meter_id]['l_buy'] = []
-			backpack['meters'][meter_id]['l_sell'] = []
+	:param n_jobs: an int with the number of parallel processes solving the scenarios' MILPs (progressive hedging
+		only); -1 uses all available CPUs
 
-			for cl in range(nr_clusters):
-				backpack['meters'][meter_id]['e_g_factor'] += \
-					clustered_inputs['representative_e_g_factor'][meter_id][str(cl)]
-				backpack['meters'][meter_id]['e_c'] += \
-					clustered_inputs['representative_e_c'][meter_id][str(cl)]
-				backpack['meters'][meter_id]['l_buy'] += \
-					clustered_inputs['representative_l_buy'][meter_id][str(cl)]
-				backpack['meters'][meter_id]['l_sell'] += \
-					clustered_inputs['representative_l_sell'][meter_id][str(cl)]
+	:param penalty: a float with the cost of the deviations of the investments from their consensus, as a fraction of
+		their costs over the horizon (progressive hedging only)
 
-		backpack['l_grid'] = []
-		backpack['w_clustering'] = []
-		nr_daily_data_points = int(24 / delta_t)
+	:param max_iterations: an int with the maximum number of iterations (progressive hedging only)
 
-		for cl in range(nr_clusters):
-			backpack['l_grid'] += clustered_inputs['representative_l_grid'][str(cl)]
-			backpack['w_clustering'] += [clustered_inputs['cluster_nr_days'][str(cl)]] * nr_daily_data_points
-		backpack['nr_days'] = nr_clusters
+	:param tolerance: a float with the expected deviation of the investments from their consensus (kW or kWh) below
+		which the scenarios are considered to agree (progressive hedging only)
 
-	# Use timeseries data as is, effectively running the MILP with nr_days as the total number of days worth of data
-	else:
-		backpack['w_clustering'] = [1] * nr_data_points
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
 
-	# -- RUN MILP ------------------------------------------------------------------------------------------------------
-	logger.info(' - defining MILP -')
-	milp = CollectiveMILPPool(backpack, nr_dates, solver, timeout, mipgap)
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each MILP
 
-	nr_days = backpack.get('nr_days')
-	logger.info(f' - MILP set with an horizon of {nr_days} days, mipgap={mipgap}, timeout={timeout}, solver={solver} -')
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
 
-	logger.info(' - solving MILP -')
-	milp.solve_milp()
+	:return: a dict with the structure:
+		{
+			"milp_status": a string with the status of the MILP (extensive form) or "Heuristic" if all scenarios'
+				final MILPs were optimally solved (progressive hedging, whose costs are recomputed for the largest
+				contracted power of the scenarios), and their first other status otherwise,
+			"expected_cost": a float with the expected cost of the REC over the scenarios (€),
+			"scenario_costs": a list with the cost of the REC in each scenario (€),
+			"weights": a list with the normalized weights of the scenarios,
+			"investments": a dict with the investment decisions shared by all scenarios, i.e., "p_cont", "p_gn_new",
+				"p_gn_total", "e_bn_new" and "e_bn_total", with the same structure as in "run_pre_collective_pool_milp",
+			"scenarios": a list with the outputs of each scenario, as in "run_pre_collective_pool_milp", with the
+				scenario's representative time series
+		}
+		an empty dict is returned if any MILP could not be solved
+	"""
+	logger.info('Running a stochastic collective (pool) MILP over scenarios...')
 
-	logger.info(' - generating outputs -')
-	results = milp.generate_outputs()
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
 
-	logger.info('Running a pre-delivery standalone/second stage collective (pool) MILP... DONE!')
+	# Default method in case of non-valid option
+	if method not in ['extensive', 'progressive_hedging']:
+		logger.warning(f'method = {method} not recognized; reverting to "extensive"')
+		method = 'extensive'
+
+	backpacks, weights = scenario_backpacks(backpack)
+	nr_dates = [_prepare_backpack(scenario_backpack) for scenario_backpack in backpacks][0]
+
+	# -- RUN STOCHASTIC MILP -------------------------------------------------------------------------------------------
+	logger.info(f' - sizing for {len(backpacks)} scenarios with method={method}, mipgap={mipgap}, timeout={timeout}, '
+				f'solver={solver} -')
+	if method == 'extensive':
+		results = extensive_form(backpacks, weights, nr_dates, solver, timeout, mipgap)
+	else:
+		results = progressive_hedging(backpacks, weights, nr_dates, solver, timeout, mipgap, n_jobs, penalty,
+									  max_iterations, tolerance)
+
+	logger.info('Running a stochastic collective (pool) MILP over scenarios... DONE!')
 
 	return results
+
+
+def run_lp_dual_pricing(
+		backpack: BackpackCollectivePoolDict,
+		outputs: OutputsCollectivePoolDict,
+		n_jobs=N_JOBS,
+		solver=SOLVER,
+		timeout=TIMEOUT) \
+		-> list:
+	"""
+	Use this function to compute the local energy market (LEM) prices of a solution of the collective MILP of
+	"run_pre_collective_pool_milp" as the shadow prices of its "Market_equilibrium_" constraints, in an explicit pricing
+	stage. All binary variables and investment decisions (including the contracted power) are fixed at the solution's
+	values, which turns the MILP into an LP with well-defined duals. Since the storage energy content is reset at the
+	end of each day, that LP is split into independent daily LPs, which are solved in a pool of processes.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp", with the data that originated the
+		solution, i.e., as updated in place by "run_pre_collective_pool_milp" (with representative days, if clustered)
+
+	:param outputs: the structure returned by "run_pre_collective_pool_milp", with the solution to be priced
+
+	:param n_jobs: an int with the number of parallel processes; -1 uses all available CPUs
+
+	:param solver: a string with the solver chosen for the LP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each daily LP
+
+	:return: float array with the market equilibrium shadow prices to be used as LEM prices, in €/kWh;
+		empty if any daily LP could not be solved
+	"""
+	logger.info('Computing dual prices from the fixed-binary collective (pool) LP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, _ = _default_solver_settings(solver, timeout, MIPGAP)
+
+	investments = {key: outputs[key] for key in ['p_cont', 'p_gn_new', 'e_bn_new']}
+	binaries = {key: outputs[key] for key in BINARY_KEYS if key in outputs}
+
+	# -- RUN DAILY LPS -------------------------------------------------------------------------------------------------
+	results = daily_dispatch(backpack, investments, n_jobs, solver, timeout, MIPGAP, fixed_binaries=binaries)
+	if not results:
+		logger.warning('Fixed-binary LP could not be solved; no dual prices available')
+		return []
+
+	logger.info('Computing dual prices from the fixed-binary collective (pool) LP... DONE!')
+
+	return results['dual_prices']
+
+
+def _log_diagnosis(report: dict):
+	"""
+	Logs the summary of an infeasibility diagnosis report.
+	:param report: report returned by "run_infeasibility_diagnosis"
+	"""
+	if report['status'] != 'Optimal':
+		logger.warning(f'Elastic problem status: {report["status"]}; the infeasibility is not caused (only) by the '
+					   f'relaxed constraint families, e.g., it is caused by the investment bounds')
+	for family, family_report in report['families'].items():
+		logger.warning(f'{family}: {family_report["nr_relaxed"]} constraint(s) relaxed by a total of '
+					   f'{family_report["total_violation"]:.6g}, for meters {family_report["meters"]} and time steps '
+					   f'{family_report["steps"]}')
+	if report.get('iis'):
+		logger.warning(f'IIS with {len(report["iis"])} constraint(s): {report["iis"]}')
+
+
+def run_infeasibility_diagnosis(
+		backpack: BackpackCollectivePoolDict,
+		solver=SOLVER,
+		timeout=TIMEOUT,
+		mipgap=MIPGAP,
+		investment_bounds=None,
+		families=None,
+		iis=True,
+		iis_max_constraints=IIS_MAX_CONSTRAINTS) \
+		-> dict:
+	"""
+	Use this function to find out why the collective MILP of "run_pre_collective_pool_milp" is infeasible for a given
+	backpack. The MILP is re-solved with non-negative slack variables on the selected constraint families (elastic
+	mode), minimizing the total slack, which identifies the families, meters and time steps whose constraints need
+	relaxing. For small instances, an irreducible infeasible subsystem (IIS), i.e., a minimal set of conflicting
+	constraints, is also computed with a deletion filter over the solver's feasibility checks. The pre-flight checks
+	of the backpack are not enforced, but any issues found are reported.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"
+
+	:param solver: a string with the solver chosen for the MILP (see "run_pre_collective_pool_milp")
+
+	:param timeout: an integer representing a temporal limit for the solver to find an optimal solution (s),
+		applicable to each solve
+
+	:param mipgap: a float for controlling the solver's tolerance (see "run_pre_collective_pool_milp")
+
+	:param investment_bounds: (optional) the same structure as in "run_pre_collective_pool_milp"; the bounds are kept
+		(not relaxed) in the diagnosis
+
+	:param families: (optional) list with the prefixes of the names of the constraint families to be relaxed, e.g.,
+		["Contracted_power_limit", "Min_new_gen_", "P_flow_low_limit_", "P_flow_high_limit_", "Daily_SOC_reset_"]; all
+		families listed in "CONSTRAINT_FAMILIES" (rec_sizing/optimization/module/infeasibility.py) are relaxed by default
+
+	:param iis: (optional) if True, an IIS is computed for MILPs with up to "iis_max_constraints" constraints
+
+	:param iis_max_constraints: (optional) an int with the maximum number of constraints for which an IIS is computed
+
+	:return: {
+		'preflight_issues': list of strings with the issues found by the backpack's pre-flight checks
+		'status': string with the status of the elastic problem; if it is not "Optimal", the infeasibility is not
+			caused (only) by the relaxed families, e.g., it is caused by the investment bounds
+		'total_violation': float with the total slack needed for feasibility
+		'families': dict with, per relaxed family, the number of relaxed constraints ('nr_relaxed'), their total
+			violation ('total_violation') and the lists of meters ('meters') and time steps ('steps') concerned
+		'relaxed_constraints': list of dicts with the 'name', 'family', 'meter', 'step' and 'violation' of each
+			relaxed constraint, by decreasing violation
+		'iis': list with the names of the constraints in the IIS; None if not computed; empty if the MILP is feasible
+	}
+	"""
+	logger.info('Diagnosing the infeasibility of a collective (pool) MILP...')
+
+	# -- DEFAULTS AND WARNINGS -----------------------------------------------------------------------------------------
+	solver, timeout, mipgap = _default_solver_settings(solver, timeout, mipgap)
+
+	try:
+		check_backpack(backpack)
+		preflight_issues = []
+	except ValueError as e:
+		preflight_issues = str(e).split('\n- ')[1:]
+		logger.warning(str(e))
+
+	nr_dates = _prepare_backpack(backpack, preflight=False)
+
+	# -- RUN DIAGNOSIS -------------------------------------------------------------------------------------------------
+	milp = CollectiveMILPPool(backpack, nr_dates, solver, timeout, mipgap, write_lp=False,
+							  investment_bounds=investment_bounds)
+	report = {'preflight_issues': preflight_issues, **milp.diagnose_infeasibility(families, iis, iis_max_constraints)}
+	_log_diagnosis(report)
+
+	logger.info('Diagnosing the infeasibility of a collective (pool) MILP... DONE!')
+
+	return report
@@ -0,0 +1,227 @@
+"""
+Loading (and saving) of backpacks from (to) a columnar file layout, as an alternative to building the nested dict of
+lists expected by run_pre_collective_pool_milp. A backpack directory contains:
+	- settings.json: the backpack's scalar settings (nr_days, nr_clusters, delta_t, storage_ratio, ...);
+	- meters.parquet or meters.csv: one row per meter, with a "meter_id" column and one column per scalar parameter
+	(l_cont, l_gic, p_meter_max, ...); a column named after a time series (e.g., "l_buy") holds the names of series
+	of the "series" table that the meters reference;
+	- <field>.npy, <field>.parquet or <field>.csv, for "l_grid" and for each meters' time series that is not referenced
+	by name ("l_buy", "l_sell", "e_c" and "e_g_factor"): a .npy file holds a 1D array for "l_grid" and a 2D array with
+	one row per meter (in the order of the meters' table) for the meters' time series; a .parquet/.csv file holds one
+	column per meter ID (or a single column for "l_grid");
+	- series.npz, series.parquet or series.csv (optional): the named series, one per array / column.
+The .npy files are memory mapped, so the time series of each meter are views of the files' data, which are consumed
+without copies by the clustering and the MILP builder.
+"""
+import importlib.util
+import json
+import numpy as np
+import os
+import pandas as pd
+
+from rec_sizing.custom_types.collective_milp_pool_types import BackpackCollectivePoolDict
+from rec_sizing.optimization.helpers.backpack_helpers import METER_TIMESERIES_KEYS
+
+
+SETTINGS_FILE = 'settings.json'
+METERS_TABLE = 'meters'
+SERIES_TABLE = 'series'
+TABLE_EXTENSIONS = ('.parquet', '.csv')
+ARRAY_EXTENSIONS = ('.npy', '.parquet', '.csv')
+PARQUET_ENGINES = ('pyarrow', 'fastparquet')
+
+
+def _find_file(path: str, name: str, extensions: tuple, required=True):
+	"""
+	Finds the file of a given data field in a backpack directory, trying the extensions in order.
+	:param path: backpack directory
+	:param name: name of the file, without extension
+	:param extensions: admissible extensions, by order of preference
+	:param required: if True, an error is raised when no file is found
+	:return: path to the file; None if not found and not required
+	"""
+	for extension in extensions:
+		file_path = os.path.join(path, name + extension)
+		if os.path.isfile(file_path):
+			return file_path
+	if required:
+		raise FileNotFoundError(f'no {"/".join(name + extension for extension in extensions)} file found in {path}')
+	return None
+
+
+def require_parquet_engine():
+	"""
+	Checks that a Parquet engine (pyarrow or fastparquet) is installed, failing fast before any data is read or written.
+	:raises ImportError: if neither pyarrow nor fastparquet is installed
+	"""
+	if not any(importlib.util.find_spec(engine) is not None for engine in PARQUET_ENGINES):
+		raise ImportError('Parquet files require pyarrow (or fastparquet); please install it, e.g., with '
+						  '"pip install rec_sizing[parquet]", or use another file format')
+
+
+def _read_table(file_path: str) -> pd.DataFrame:
+	"""
+	Reads a .parquet or .csv table.
+	:param file_path: path to the table
+	:return: dataframe with the table's data
+	"""
+	if file_path.endswith('.parquet'):
+		require_parquet_engine()
+		return pd.read_parquet(file_path)
+	return pd.read_csv(file_path)
+
+
+def _python_value(val):
+	"""
+	Converts the NumPy scalars read from a table to the respective Python types.
+	:param val: value read from a table
+	:return: Python value; None for missing values
+	"""
+	if isinstance(val, np.generic):
+		val = val.item()
+	if isinstance(val, float) and np.isnan(val):
+		return None
+	return val
+
+
+def load_backpack(path: str, mmap=True) -> BackpackCollectivePoolDict:
+	"""
+	Assembles a backpack from a backpack directory (see the module's description for the expected layout).
+	:param path: backpack directory
+	:param mmap: if True, .npy files are memory mapped (read-only) instead of being loaded into memory
+	:return: backpack, as expected by run_pre_collective_pool_milp, whose time series are NumPy arrays
+	"""
+	with open(os.path.join(path, SETTINGS_FILE)) as settings_file:
+		backpack = json.load(settings_file)
+
+	meters_table = _read_table(_find_file(path, METERS_TABLE, TABLE_EXTENSIONS))
+	if 'meter_id' not in meters_table.columns:
+		raise ValueError(f'"meter_id" column missing from the meters\' table in {path}')
+	meters_table['meter_id'] = meters_table['meter_id'].astype(str)
+	meter_ids = list(meters_table['meter_id'])
+	if len(set(meter_ids)) != len(meter_ids):
+		raise ValueError(f'duplicated meter IDs in the meters\' table in {path}')
+
+	def read_array(name: str, per_meter: bool):
+		"""
+		Reads the data of a time series field, as a 1D array or as a 1D array per meter ID.
+		:param name: name of the field
+		:param per_meter: if True, the field has one time series per meter
+		:return: 1D array, or dict with a 1D array per meter ID
+		"""
+		file_path = _find_file(path, name, ARRAY_EXTENSIONS)
+		if file_path.endswith('.npy'):
+			data = np.load(file_path, mmap_mode='r' if mmap else None)
+			if not per_meter:
+				return data.ravel()
+			if data.ndim != 2 or data.shape[0] != len(meter_ids):
+				raise ValueError(f'{file_path} must hold a 2D array with one row per meter ({len(meter_ids)} rows); '
+								 f'got shape {data.shape}')
+			return {meter_id: data[idx] for idx, meter_id in enumerate(meter_ids)}
+		table = _read_table(file_path)
+		if not per_meter:
+			return table.iloc[:, 0].to_numpy(dtype=float)
+		missing_meters = [meter_id for meter_id in meter_ids if meter_id not in table.columns]
+		if missing_meters:
+			raise ValueError(f'{file_path} has no column for meters {missing_meters}')
+		return {meter_id: table[meter_id].to_numpy(dtype=float) for meter_id in meter_ids}
+
+	backpack['l_grid'] = read_array('l_grid', per_meter=False)
+
+	# Named series, which can be referenced by the meters instead of their own time series
+	series_path = _find_file(path, SERIES_TABLE, ('.npz',) + TABLE_EXTENSIONS, required=False)
+	if series_path is not None:
+		if series_path.endswith('.npz'):
+			with np.load(series_path) as series_file:
+				backpack['series'] = {name: series_file[name] for name in series_file.files}
+		else:
+			series_table = _read_table(series_path)
+			backpack['series'] = {name: series_table[name].to_numpy(dtype=float) for name in series_table.columns}
+
+	# Scalar parameters (and references to named series) per meter; missing values are left out
+	meters = {}
+	for row in meters_table.to_dict('records'):
+		meter_id = row.pop('meter_id')
+		meters[meter_id] = {key: _python_value(val) for key, val in row.items() if _python_value(val) is not None}
+	for key in METER_TIMESERIES_KEYS:
+		referencing_meters = [meter_id for meter_id, meter_data in meters.items() if key in meter_data]
+		if len(referencing_meters) == len(meters):
+			continue
+		meter_series = read_array(key, per_meter=True)
+		for meter_id, meter_data in meters.items():
+			if key not in meter_data:
+				meter_data[key] = meter_series[meter_id]
+	backpack['meters'] = meters
+
+	return backpack
+
+
+def save_backpack(backpack: BackpackCollectivePoolDict, path: str, file_format='npy'):
+	"""
+	Writes a backpack to a backpack directory (see the module's description for the layout), e.g., for converting
+	existing dict inputs once and loading them faster afterwards.
+	:param backpack: backpack, as expected by run_pre_collective_pool_milp
+	:param path: backpack directory; created if it does not exist
+	:param file_format: format of the time series files; one of "npy", "parquet" and "csv"
+	"""
+	if file_format not in ['npy', 'parquet', 'csv']:
+		raise ValueError(f'file_format = {file_format}; please provide one of ["npy", "parquet", "csv"]')
+	if file_format == 'parquet':
+		require_parquet_engine()
+	os.makedirs(path, exist_ok=True)
+	table_format = 'parquet' if file_format == 'parquet' else 'csv'
+
+	def write_table(table: pd.DataFrame, name: str):
+		"""
+		Writes a table in the chosen table format.
+		:param table: dataframe to be written
+		:param name: name of the file, without extension
+		"""
+		file_path = os.path.join(path, f'{name}.{table_format}')
+		if table_format == 'parquet':
+			table.to_parquet(file_path, index=False)
+		else:
+			table.to_csv(file_path, index=False)
+
+	settings = {
+		key: val for key, val in backpack.items()
+		if key not in ('meters', 'l_grid', 'series', 'w_clustering', 'nr_days_old')
+	}
+	with open(os.path.join(path, SETTINGS_FILE), 'w') as settings_file:
+		json.dump(settings, settings_file, indent='\t')
+
+	meter_ids = list(backpack['meters'])
+	write_table(pd.DataFrame([
+		{'meter_id': meter_id, **{
+			key: val for key, val in meter_data.items()
+			if key not in METER_TIMESERIES_KEYS or isinstance(val, str)
+		}}
+		for meter_id, meter_data in backpack['meters'].items()
+	]), METERS_TABLE)
+
+	if file_format == 'npy':
+		np.save(os.path.join(path, 'l_grid.npy'), np.asarray(backpack['l_grid'], dtype=float))
+	else:
+		write_table(pd.DataFrame({'l_grid': np.asarray(backpack['l_grid'], dtype=float)}), 'l_grid')
+
+	for key in METER_TIMESERIES_KEYS:
+		if all(isinstance(meter_data[key], str) for meter_data in backpack['meters'].values()):
+			continue
+		# meters that reference a named series keep the reference in the meters' table; their rows are filled with
+		# the referenced series, so that the file keeps one row per meter
+		data = np.array([
+			backpack['series'][meter_data[key]] if isinstance(meter_data[key], str) else meter_data[key]
+			for meter_data in backpack['meters'].values()
+		], dtype=float)
+		if file_format == 'npy':
+			np.save(os.path.join(path, f'{key}.npy'), data)
+		else:
+			write_table(pd.DataFrame(dict(zip(meter_ids, data))), key)
+
+	if backpack.get('series'):
+		if file_format == 'npy':
+			np.savez(os.path.join(path, 'series.npz'),
+					 **{name: np.asarray(val, dtype=float) for name, val in backpack['series'].items()})
+		else:
+			write_table(pd.DataFrame({name: np.asarray(val, dtype=float)
+									  for name, val in backpack['series'].items()}), SERIES_TABLE)
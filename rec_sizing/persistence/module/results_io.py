@@ -0,0 +1,178 @@
+"""
+Persistence of the results of the optimization and post-processing functions in a compressed columnar file layout.
+A results directory contains:
+	- results.json: a small sidecar with the scalar and other small results (e.g., "obj_value", "milp_status",
+	"p_cont" or "c_ind2pool") and the metadata needed to rebuild the remaining fields;
+	- the time series results, either in a single compressed results.npz file (one array per field) or in one
+	<field>.parquet file per field: results with one time series per ID (e.g., "e_bat" or "sold_position") are stored
+	as 2D arrays / tables with one row / column per ID, and results with a single time series (e.g., "dual_prices") as
+	1D arrays / single column tables.
+Fields are only read from the time series files when they are accessed, if lazily loaded.
+"""
+import json
+import numpy as np
+import os
+import pandas as pd
+
+from collections.abc import Mapping
+
+from rec_sizing.persistence.module.backpack_io import require_parquet_engine
+
+
+SIDECAR_FILE = 'results.json'
+ARRAYS_FILE = 'results.npz'
+
+
+def _is_number_list(val) -> bool:
+	"""
+	Checks if a value is a non-empty list (or 1D array) of numbers.
+	:param val: value to be checked
+	:return: True if the value is a list of numbers
+	"""
+	if isinstance(val, np.ndarray):
+		return val.ndim == 1 and val.size > 0 and np.issubdtype(val.dtype, np.number)
+	return isinstance(val, (list, tuple)) and len(val) > 0 and \
+		all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in val)
+
+
+def _field_kind(val):
+	"""
+	Classifies a result field by its structure.
+	:param val: value of the field
+	:return: "array" for a list of numbers, "matrix" for a dict with lists of numbers of equal length per ID,
+		None for any other field (stored in the sidecar)
+	"""
+	if _is_number_list(val):
+		return 'array'
+	if isinstance(val, dict) and val and all(_is_number_list(v) for v in val.values()) and \
+			len({len(v) for v in val.values()}) == 1:
+		return 'matrix'
+	return None
+
+
+def _json_default(val):
+	"""
+	Converts NumPy objects to JSON serializable objects.
+	:param val: object that the json module could not serialize
+	:return: serializable version of the object
+	"""
+	if isinstance(val, np.generic):
+		return val.item()
+	if isinstance(val, np.ndarray):
+		return val.tolist()
+	raise TypeError(f'Object of type {type(val).__name__} is not JSON serializable')
+
+
+def save_results(results: dict, path: str, file_format='npz'):
+	"""
+	Writes a results dict to a results directory (see the module's description for the layout).
+	:param results: results of the optimization or post-processing functions
+	:param path: results directory; created if it does not exist
+	:param file_format: format of the time series files; one of "npz" and "parquet"
+	"""
+	if file_format not in ['npz', 'parquet']:
+		raise ValueError(f'file_format = {file_format}; please provide one of ["npz", "parquet"]')
+	if file_format == 'parquet':
+		require_parquet_engine()
+	os.makedirs(path, exist_ok=True)
+
+	sidecar = {'format': file_format, 'keys': list(results), 'fields': {}, 'values': {}}
+	arrays = {}
+	for key, val in results.items():
+		kind = _field_kind(val)
+		if kind is None:
+			sidecar['values'][key] = val
+		elif kind == 'array':
+			sidecar['fields'][key] = {'kind': kind}
+			arrays[key] = np.asarray(val, dtype=float)
+		else:
+			sidecar['fields'][key] = {'kind': kind, 'ids': list(val)}
+			arrays[key] = np.array(list(val.values()), dtype=float)
+
+	if file_format == 'npz':
+		np.savez_compressed(os.path.join(path, ARRAYS_FILE), **arrays)
+	else:
+		for key, data in arrays.items():
+			if sidecar['fields'][key]['kind'] == 'array':
+				table = pd.DataFrame({key: data})
+			else:
+				table = pd.DataFrame(dict(zip(sidecar['fields'][key]['ids'], data)))
+			table.to_parquet(os.path.join(path, f'{key}.parquet'), index=False)
+
+	with open(os.path.join(path, SIDECAR_FILE), 'w') as sidecar_file:
+		json.dump(sidecar, sidecar_file, default=_json_default)
+
+
+class LazyResults(Mapping):
+	def __init__(self, path: str):
+		"""
+		Read-only, dict-like view of a results directory, where each time series field is only read from its file
+		(and converted to the in-memory results structure) when first accessed.
+		:param path: results directory
+		"""
+		self.path = path  # results directory
+		with open(os.path.join(path, SIDECAR_FILE)) as sidecar_file:
+			sidecar = json.load(sidecar_file)
+		self.file_format = sidecar['format']  # format of the time series files
+		if self.file_format == 'parquet':
+			require_parquet_engine()
+		self._fields = sidecar['fields']  # metadata of the time series fields
+		self._values = sidecar['values']  # fields stored in the sidecar and fields already loaded
+		self._keys = sidecar['keys']  # all fields, in the original order
+		self._npz = None  # for the (lazily opened) results.npz file
+
+	def __read_field(self, key: str) -> np.ndarray:
+		"""
+		Reads the data of a time series field from its file.
+		:param key: name of the field
+		:return: 1D or 2D array with the field's data
+		"""
+		if self.file_format == 'npz':
+			if self._npz is None:
+				self._npz = np.load(os.path.join(self.path, ARRAYS_FILE))
+			return self._npz[key]
+		table = pd.read_parquet(os.path.join(self.path, f'{key}.parquet'))
+		if self._fields[key]['kind'] == 'array':
+			return table[key].to_numpy()
+		return table[self._fields[key]['ids']].to_numpy().T
+
+	def __getitem__(self, key: str):
+		if key not in self._values:
+			if key not in self._fields:
+				raise KeyError(key)
+			data = self.__read_field(key)
+			if self._fields[key]['kind'] == 'array':
+				self._values[key] = data.tolist()
+			else:
+				self._values[key] = dict(zip(self._fields[key]['ids'], data.tolist()))
+		return self._values[key]
+
+	def __iter__(self):
+		return iter(self._keys)
+
+	def __len__(self) -> int:
+		return len(self._keys)
+
+	def close(self):
+		"""
+		Closes the results.npz file, if open; fields already accessed remain available.
+		"""
+		if self._npz is not None:
+			self._npz.close()
+			self._npz = None
+
+
+def load_results(path: str, lazy=False):
+	"""
+	Reads a results directory written by save_results.
+	:param path: results directory
+	:param lazy: if True, a LazyResults view is returned, which only reads each time series field when accessed
+	:return: results dict (or LazyResults view), with the same structure as the results that were written
+	"""
+	results = LazyResults(path)
+	if lazy:
+		return results
+	loaded_results = dict(results)
+	results.close()
+
+	return loaded_results
@@ -0,0 +1,112 @@
+from loguru import logger
+
+from rec_sizing.custom_types.collective_milp_pool_types import BackpackCollectivePoolDict
+from rec_sizing.persistence.module.backpack_io import (
+	load_backpack,
+	save_backpack
+)
+from rec_sizing.persistence.module.results_io import (
+	load_results,
+	save_results
+)
+
+
+def load_backpack_from_directory(path: str, mmap=True) -> BackpackCollectivePoolDict:
+	"""
+	Use this function to assemble the backpack expected by "run_pre_collective_pool_milp" (and the remaining
+	optimization functions) from a columnar file layout, instead of building a nested dict of lists:
+
+	:param path: a string with the path to a directory with the following files:
+		'settings.json': JSON object with the backpack's settings, i.e., "nr_days", "nr_clusters", "delta_t",
+			"storage_ratio", "strict_pos_coeffs" and "total_share_coeffs"
+		'meters.parquet' or 'meters.csv': table with one row per meter, a "meter_id" column and one column per meter's
+			scalar parameter ("l_cont", "l_gic", "l_bic", "p_meter_max", "p_gn_init", ...); optionally, columns named
+			after the meters' time series ("l_buy", "l_sell", "e_c", "e_g_factor") with the names of the series of the
+			"series" table referenced by each meter
+		'l_grid.npy', 'l_grid.parquet' or 'l_grid.csv': the grid tariffs' time series, in €/kWh
+		'<field>.npy', '<field>.parquet' or '<field>.csv', for each of the meters' time series "l_buy", "l_sell", "e_c"
+			and "e_g_factor" not referenced by name: a 2D array with one row per meter, in the order of the meters'
+			table (.npy), or a table with one column per meter ID (.parquet / .csv)
+		'series.npz', 'series.parquet' or 'series.csv' (optional): the named series, one per array / column
+
+	:param mmap: a boolean indicating if the .npy files are memory mapped (read-only), so that the meters' time series
+		are views of the files' data, consumed without copies by the clustering and the MILP; otherwise, the files are
+		loaded into memory
+
+	:return: the backpack, with the same structure as in "run_pre_collective_pool_milp", where the time series are
+		NumPy arrays instead of lists
+	"""
+	logger.info(f'Loading backpack from {path}...')
+
+	backpack = load_backpack(path, mmap)
+
+	logger.info(f'Loading backpack from {path}... DONE!')
+
+	return backpack
+
+
+def save_backpack_to_directory(backpack: BackpackCollectivePoolDict, path: str, file_format='npy'):
+	"""
+	Use this function to write a backpack to the columnar file layout read by "load_backpack_from_directory", e.g.,
+	for converting existing inputs once and loading them faster afterwards.
+
+	:param backpack: the same structure as in "run_pre_collective_pool_milp"
+
+	:param path: a string with the path to the directory where the files are written; created if it does not exist
+
+	:param file_format: a string with the format of the time series' files; one of "npy", "parquet" (which requires
+		pyarrow or fastparquet to be installed) and "csv"; the meters' table is written as .parquet for "parquet" and
+		as .csv otherwise
+	"""
+	logger.info(f'Saving backpack to {path}...')
+
+	save_backpack(backpack, path, file_format)
+
+	logger.info(f'Saving backpack to {path}... DONE!')
+
+
+def save_results_to_directory(results: dict, path: str, file_format='npz'):
+	"""
+	Use this function to persist the results of "run_pre_collective_pool_milp" (or of any other optimization function)
+	or of "run_post_processing" in a compressed columnar layout, instead of pickling or JSON-dumping them.
+
+	:param results: the dict returned by the optimization or post-processing functions
+
+	:param path: a string with the path to the directory where the files are written; created if it does not exist;
+		it will contain:
+		'results.json': a small sidecar with the scalar and other small results (e.g., "obj_value", "milp_status",
+			"p_cont", "c_ind2pool") and the metadata required to rebuild the time series results
+		'results.npz' (for "npz") or '<field>.parquet' per field (for "parquet"): the time series results, with one
+			row / column per ID for the results with one time series per meter (or member)
+
+	:param file_format: a string with the format of the time series' files; one of "npz" (a single compressed NumPy
+		archive) and "parquet" (which requires pyarrow or fastparquet to be installed)
+	"""
+	logger.info(f'Saving results to {path}...')
+
+	save_results(results, path, file_format)
+
+	logger.info(f'Saving results to {path}... DONE!')
+
+
+def load_results_from_directory(path: str, lazy=False):
+	"""
+	Use this function to reload the results persisted by "save_results_to_directory" into the same structure that was
+	saved.
+
+	:param path: a string with the path to the results directory
+
+	:param lazy: a boolean indicating if the time series results are only read from the files when accessed; if True,
+		a read-only dict-like object is returned, where the sidecar results are readily available and each time series
+		result is read (once) on first access
+
+	:return: the results, with the same structure as the dict that was saved (numeric lists are reloaded as lists of
+		floats)
+	"""
+	logger.info(f'Loading results from {path}...')
+
+	results = load_results(path, lazy)
+
+	logger.info(f'Loading results from {path}... DONE!')
+
+	return results
@@ -1,8 +1,12 @@
 from loguru import logger
 from rec_sizing.optimization.module.post_processing import *
+from rec_sizing.optimization.module.validation import (
+    VALIDATION_LEVELS,
+    validate
+)
 
 
-def run_post_processing(results_opt, inputs_opt, inputs_pp):
+def run_post_processing(results_opt, inputs_opt, inputs_pp, validation='fast'):
     """
     Use this functions to compute a post-processing results for a given optimized renewable energy community (REC)
     After run the sizing with the function "run_pre_collective_pool_milp()", this is able to compute the desegregated
@@ -29,6 +33,9 @@ def run_post_processing(results_opt, inputs_opt, inputs_pp):
                 }
             }
         }
+        the ownership values of each meter must sum to 1; otherwise, a ValueError is raised
+    :param validation: level of the validation of the results, whose report is logged and returned (see
+        "run_validation()"); one of "off", "fast" (default) and "full"
     :return: {the following results are added to a previous input parameter called "results_opt" on this function.
         That were previously returned from the function "run_pre_collective_pool_milp()" as "results" variable when
         the sizing optimization is computed. For more details on this variable's content check the function
@@ -57,6 +64,8 @@ def run_post_processing(results_opt, inputs_opt, inputs_pp):
             compensated with the internal market for the optimization horizon, in €;
         'member_cost_compensations': dict of floats with the members costs compensated with the internal market for the
             optimization horizon, in €;
+        'validation': report of the validation of the results, as returned by "run_validation()"; only if
+            validation != "off"
     """
     logger.info('Compute the desegregated costs of the optimization (pool)')
     # the desegregated costs are added to the optimization results structure
@@ -71,6 +80,50 @@ def run_post_processing(results_opt, inputs_opt, inputs_pp):
     # the REC costs per member are added to the previous output structure (IM_compensations)
     members_costs = post_processing_members(IM_compensations, inputs_pp)
 
+    if validation not in VALIDATION_LEVELS:
+        logger.warning(f'validation = {validation}; reverting to default "fast"')
+        validation = 'fast'
+    if validation != 'off':
+        members_costs['validation'] = run_validation(members_costs, inputs_opt, level=validation)
+
     logger.info('post-processing (pool)... DONE!')
 
     return members_costs
+
+
+def run_validation(results, inputs_opt, level='fast'):
+    """
+    Use this function to validate the results of the optimization and post-processing functions, instead of relying
+    on visual checks. The report is also logged: a summary when all checks pass and a warning per failed check.
+    :param results: results returned by "run_pre_collective_pool_milp()" or by "run_post_processing()"
+    :param inputs_opt: the inputs used to compute the sizing optimization, as "backpack"; for the "full" level, its
+        time series must have the same number of time steps as the results (i.e., after any clustering)
+    :param level: one of
+        "off": no checks are performed;
+        "fast": checks that the internal market compensations sum to zero and that the installations' and members'
+            costs (with and without compensations) sum to the objective function value;
+        "full": the "fast" checks plus the evaluation of every MILP constraint, variable bound and binary variable's
+            integrality against the returned solution
+    :return: {
+        'level': the validation level used,
+        'checks': list of dicts, one per check, with
+        {
+            'name': description of the check,
+            'residual': maximum residual (or constraint violation) found,
+            'tolerance': absolute tolerance used,
+            'nr_violations': number of residuals (or constraint violations) above the tolerance,
+            'passed': True if there are no violations
+        },
+        'passed': True if all checks passed
+    }
+    """
+    report = validate(results, inputs_opt, level=level)
+
+    failed_checks = [check for check in report['checks'] if not check['passed']]
+    for check in failed_checks:
+        logger.warning(f'validation failed: {check["name"]} (residual = {check["residual"]:.6g}, '
+                       f'tolerance = {check["tolerance"]:.6g}, {check["nr_violations"]} violation(s))')
+    if not failed_checks:
+        logger.info(f'validation ({level}): {len(report["checks"])} check(s) passed')
+
+    return report
@@ -0,0 +1,541 @@
+"""
+Warm worker pool for low-latency sizing requests: a long-lived set of worker processes that import the libraries once
+and keep their caches (e.g., the clustering outputs) resident between jobs, so that small requests do not pay the
+interpreter, import and set-up overhead of a fresh process.
+Jobs are dicts with the following keys:
+	- 'backpack': the backpack dict, or a path to its JSON file or columnar directory;
+	- 'ownership': (optional) the ownership dict, or a path to its JSON file; if provided, the results are
+	post-processed;
+	- 'output': (optional) results directory; if not provided, the results are returned with the job's summary;
+	- 'id', 'profile', 'solver', 'timeout', 'mipgap', 'validation', 'format', 'model_cache', 'progress' and 'gap_stall'
+	(an [improvement, seconds] pair): (optional) as in the command-line interface.
+Jobs with a 'subproblem' key (and, optionally, an 'id') solve a meter's subproblem of the ADMM decomposition instead,
+with the arguments of solve_meter_subproblem (rec_sizing/optimization/module/admm.py), and always return its results
+with the job's summary; submit_subproblems sends such jobs to a served pool.
+The pool can be served over a local (Unix domain) socket, with one JSON job per line and one JSON summary per line in
+response, or through a file-based queue, i.e., a directory where job files are dropped into "incoming" and their
+summaries are written to "done".
+Workers are recycled (i.e., replaced by a fresh process) after a job that leaves them above a resident memory limit,
+after a maximum number of jobs, or if they crash, in which case their job is reported as failed.
+"""
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from concurrent.futures import (
+	Future,
+	ThreadPoolExecutor
+)
+from loguru import logger
+
+from rec_sizing.cli import (
+	run_job,
+	SUMMARY_COLUMNS
+)
+from rec_sizing.configs.configs import (
+	SOLVER_PROFILES,
+	WORKER_MAX_JOBS,
+	WORKER_MAX_RSS_MB,
+	WORKER_POOL_SIZE
+)
+from rec_sizing.persistence.module.results_io import _json_default
+
+
+# Sub-directories of a file-based queue
+QUEUE_DIRS = ('incoming', 'processing', 'done')
+# File whose creation stops a file-based queue server
+QUEUE_STOP_FILE = 'STOP'
+
+
+def _rss_mb() -> float:
+	"""
+	Resident memory of the current process, in MB; on systems without /proc, the peak resident memory is used instead.
+	:return: resident memory, in MB
+	"""
+	try:
+		with open('/proc/self/statm') as statm:
+			return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+	except (OSError, ValueError, IndexError):
+		import resource
+		peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _job_arguments(job: dict) -> dict:
+	"""
+	Translates a job dict into the arguments of run_job, defaulting its solver settings to the job's profile.
+	:param job: the job (see the module's description)
+	:return: dict with the arguments of run_job
+	"""
+	profile = job.get('profile', 'default')
+	if profile not in SOLVER_PROFILES:
+		raise ValueError(f'profile = {profile}; please provide one of {sorted(SOLVER_PROFILES)}')
+	solver_settings = dict(SOLVER_PROFILES[profile])
+	for key in ('solver', 'timeout', 'mipgap'):
+		if job.get(key) is not None:
+			solver_settings[key] = job[key]
+
+	return {
+		'backpack': job['backpack'],
+		'output_path': job.get('output'),
+		'ownership': job.get('ownership'),
+		'solver_settings': solver_settings,
+		'validation': job.get('validation', 'fast'),
+		'file_format': job.get('format', 'npz'),
+		'job_name': str(job.get('id', 'job')),
+		'model_cache': job.get('model_cache'),
+		'progress': bool(job.get('progress', False)),
+		'gap_stall': job.get('gap_stall')
+	}
+
+
+def _run_subproblem(job: dict) -> dict:
+	"""
+	Runs a job that solves a meter's subproblem of the ADMM decomposition.
+	:param job: the job, with the arguments of solve_meter_subproblem under "subproblem"
+	:return: summary with the same structure as the summaries returned by run_job, with the results under "results"
+	"""
+	from rec_sizing.optimization.module.admm import solve_meter_subproblem
+	summary = {'job': str(job.get('id', 'subproblem')), 'status': None, 'validation': None, 'obj_value': None,
+			   'error': None, **{column: None for column in SUMMARY_COLUMNS}}
+	start = time.perf_counter()
+	results = solve_meter_subproblem(**job['subproblem'])
+	summary['solve'] = summary['total'] = time.perf_counter() - start
+	summary['status'] = results.get('milp_status', 'Infeasible')
+	summary['obj_value'] = results.get('obj_value')
+	summary['results'] = results
+
+	return summary
+
+
+def _failed_summary(job_name: str, error: str) -> dict:
+	"""
+	Summary of a job that could not be run.
+	:param job_name: name of the job
+	:param error: error message
+	:return: summary with the same structure as the summaries returned by run_job
+	"""
+	return {'job': job_name, 'status': 'Error', 'validation': None, 'obj_value': None, 'error': error,
+			**{column: None for column in SUMMARY_COLUMNS}}
+
+
+def _worker_loop(worker_id: int, tasks, events, max_rss_mb, max_jobs, log_level: str):
+	"""
+	Main loop of a worker process: imports the optimization stack once and runs jobs from the tasks' queue until it is
+	asked to stop or needs recycling.
+	:param worker_id: ID of the worker in the pool
+	:param tasks: queue with (job ID, job) tuples; None stops the worker
+	:param events: queue where the worker reports its state and the jobs' summaries
+	:param max_rss_mb: resident memory (MB) above which the worker exits after its job; None for no limit
+	:param max_jobs: number of jobs after which the worker exits; None for no limit
+	:param log_level: minimum level of the log messages written to stderr
+	"""
+	# Warm up: import the optimization and post-processing stack before the first job arrives
+	import rec_sizing.optimization_functions  # noqa: F401
+	import rec_sizing.post_processing_functions  # noqa: F401
+	events.put(('ready', worker_id, os.getpid()))
+
+	nr_jobs = 0
+	while True:
+		task = tasks.get()
+		if task is None:
+			break
+		job_id, job = task
+		events.put(('started', worker_id, job_id))
+		try:
+			if 'subproblem' in job:
+				summary = _run_subproblem(job)
+			else:
+				summary = run_job(**_job_arguments(job), log_level=log_level)
+		except Exception as e:
+			summary = _failed_summary(str(job.get('id', job_id)), str(e))
+		nr_jobs += 1
+		rss = _rss_mb()
+		summary['worker'] = worker_id
+		summary['rss_mb'] = rss
+
+		# the recycling is reported with the job's summary, so that it is accounted for before the job is answered
+		recycle = None
+		if max_rss_mb is not None and rss > max_rss_mb:
+			recycle = f'resident memory of {rss:.0f} MB > {max_rss_mb} MB'
+		elif max_jobs is not None and nr_jobs >= max_jobs:
+			recycle = f'{nr_jobs} jobs run'
+		events.put(('done', worker_id, job_id, summary, recycle))
+		if recycle is not None:
+			break
+
+
+class WorkerPool:
+	def __init__(self, nr_workers=WORKER_POOL_SIZE, max_rss_mb=WORKER_MAX_RSS_MB, max_jobs=WORKER_MAX_JOBS,
+				 log_level='INFO'):
+		"""
+		Pool of warm worker processes, each running one job at a time from a shared queue.
+		:param nr_workers: number of worker processes
+		:param max_rss_mb: resident memory (MB) above which a worker is recycled after its job; None for no limit
+		:param max_jobs: number of jobs after which a worker is recycled; None for no limit
+		:param log_level: minimum level of the workers' log messages
+		"""
+		if nr_workers < 1:
+			raise ValueError(f'nr_workers = {nr_workers}; please provide a positive number of workers')
+		self.nr_workers = nr_workers
+		self.max_rss_mb = max_rss_mb
+		self.max_jobs = max_jobs
+		self.log_level = log_level
+		self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'recycled': 0, 'crashed': 0}
+		self._context = mp.get_context('spawn')  # fresh interpreters, safe alongside the pool's threads
+		self._tasks = self._context.Queue()
+		self._events = self._context.Queue()
+		self._workers = {}  # worker process per worker ID
+		self._in_flight = {}  # job ID being run per worker ID
+		self._futures = {}  # future per job ID
+		self._job_ids = itertools.count()
+		self._worker_ids = itertools.count()
+		self._lock = threading.Lock()
+		self._ready = threading.Semaphore(0)
+		self._ready_workers = set()  # IDs of the workers that finished warming up
+		self._failed_starts = 0  # number of workers that exited before finishing warming up
+		self._running = False
+		self._monitor = None
+
+	def __start_worker(self):
+		"""
+		Starts a new worker process.
+		"""
+		worker_id = next(self._worker_ids)
+		process = self._context.Process(
+			target=_worker_loop,
+			args=(worker_id, self._tasks, self._events, self.max_rss_mb, self.max_jobs, self.log_level),
+			daemon=True
+		)
+		process.start()
+		self._workers[worker_id] = process
+
+	def __replace_worker(self, worker_id: int):
+		"""
+		Joins a worker process that exited and starts a new one in its place.
+		:param worker_id: ID of the worker
+		"""
+		process = self._workers.pop(worker_id, None)
+		if process is not None:
+			process.join(timeout=5)
+		if self._running:
+			self.__start_worker()
+
+	def __handle_event(self, event: tuple):
+		"""
+		Handles an event reported by a worker.
+		:param event: tuple with the event's type, the worker's ID and the event's data
+		"""
+		kind, worker_id = event[:2]
+		if kind == 'ready':
+			logger.debug(f'worker {worker_id} ready (pid {event[2]})')
+			self._ready_workers.add(worker_id)
+			self._ready.release()
+		elif kind == 'started':
+			self._in_flight[worker_id] = event[2]
+		elif kind == 'done':
+			job_id, summary, recycle = event[2:]
+			self._in_flight.pop(worker_id, None)
+			self.stats['completed' if summary['status'] != 'Error' else 'failed'] += 1
+			if recycle is not None:
+				logger.info(f'recycling worker {worker_id}: {recycle}')
+				self.stats['recycled'] += 1
+				self.__replace_worker(worker_id)
+			future = self._futures.pop(job_id, None)
+			if future is not None:
+				future.set_result(summary)
+
+	def __check_workers(self):
+		"""
+		Replaces the workers that exited unexpectedly, failing the jobs they were running.
+		"""
+		if all(process.is_alive() for process in self._workers.values()):
+			return
+		# events flushed by the workers when exiting are handled first, so that recycled workers are not taken as crashed
+		while True:
+			try:
+				self.__handle_event(self._events.get_nowait())
+			except queue.Empty:
+				break
+		for worker_id, process in list(self._workers.items()):
+			if process.is_alive():
+				continue
+			if worker_id not in self._ready_workers:
+				# a worker that cannot even import the libraries is not replaced, to avoid an endless restart loop
+				logger.error(f'worker {worker_id} exited while starting (exit code {process.exitcode})')
+				self._failed_starts += 1
+				self._workers.pop(worker_id)
+				self._ready.release()
+				continue
+			logger.warning(f'worker {worker_id} exited unexpectedly (exit code {process.exitcode})')
+			self.stats['crashed'] += 1
+			job_id = self._in_flight.pop(worker_id, None)
+			future = self._futures.pop(job_id, None)
+			if future is not None:
+				self.stats['failed'] += 1
+				future.set_result(_failed_summary(str(job_id), f'worker exited with code {process.exitcode}'))
+			self.__replace_worker(worker_id)
+
+	def __monitor_loop(self):
+		"""
+		Monitors the workers' events and health while the pool is running (and until all submitted jobs are done).
+		"""
+		while self._running or self._futures:
+			try:
+				event = self._events.get(timeout=0.2)
+			except queue.Empty:
+				event = None
+			with self._lock:
+				if event is not None:
+					self.__handle_event(event)
+				elif self._running:
+					self.__check_workers()
+
+	def start(self, wait=True):
+		"""
+		Starts the worker processes.
+		:param wait: if True, waits until all workers have imported the libraries and are ready for jobs
+		:return: the pool itself
+		"""
+		self._running = True
+		with self._lock:
+			for _ in range(self.nr_workers):
+				self.__start_worker()
+		self._monitor = threading.Thread(target=self.__monitor_loop, daemon=True)
+		self._monitor.start()
+		if wait:
+			for _ in range(self.nr_workers):
+				self._ready.acquire()
+			if self._failed_starts:
+				self.shutdown()
+				raise RuntimeError(f'{self._failed_starts} worker process(es) failed to start')
+
+		return self
+
+	def submit(self, job: dict) -> Future:
+		"""
+		Submits a job to the pool.
+		:param job: the job (see the module's description)
+		:return: future with the job's summary (see run_job), including the "worker" that ran it and its resident
+			memory after the job ("rss_mb")
+		"""
+		if not self._running:
+			raise RuntimeError('the worker pool is not running')
+		future = Future()
+		with self._lock:
+			job_id = next(self._job_ids)
+			self._futures[job_id] = future
+			self.stats['submitted'] += 1
+		self._tasks.put((job_id, job))
+
+		return future
+
+	def run(self, job: dict, timeout=None) -> dict:
+		"""
+		Submits a job to the pool and waits for its summary.
+		:param job: the job (see the module's description)
+		:param timeout: maximum time to wait, in seconds; None waits indefinitely
+		:return: the job's summary
+		"""
+		return self.submit(job).result(timeout)
+
+	def shutdown(self, timeout=30):
+		"""
+		Stops the workers, after the jobs already submitted are done.
+		:param timeout: maximum time to wait for each worker to finish, in seconds
+		"""
+		if not self._running:
+			return
+		with self._lock:
+			self._running = False
+			for _ in self._workers:
+				self._tasks.put(None)
+		for process in list(self._workers.values()):
+			process.join(timeout)
+			if process.is_alive():
+				process.terminate()
+		self._workers.clear()
+		if self._monitor is not None:
+			self._monitor.join(timeout)
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.shutdown()
+
+
+def serve_socket(pool: WorkerPool, socket_path: str):
+	"""
+	Serves a worker pool over a local (Unix domain) socket, until a {"command": "shutdown"} request is received.
+	Each request is a line with a JSON job, answered with a line with the JSON summary of the job (with its results,
+	if the job had no "output" directory); a {"command": "stats"} request is answered with the pool's statistics.
+	:param pool: a running worker pool
+	:param socket_path: path of the socket file; an existing file is replaced
+	"""
+	class Handler(socketserver.StreamRequestHandler):
+		def handle(self):
+			for line in self.rfile:
+				if not line.strip():
+					continue
+				try:
+					request = json.loads(line)
+					if request.get('command') == 'stats':
+						response = dict(pool.stats)
+					elif request.get('command') == 'shutdown':
+						response = {'status': 'shutting down'}
+						threading.Thread(target=self.server.shutdown, daemon=True).start()
+					else:
+						response = pool.run(request)
+				except Exception as e:
+					response = _failed_summary('request', str(e))
+				self.wfile.write(json.dumps(response, default=_json_default).encode() + b'\n')
+				self.wfile.flush()
+
+	if os.path.exists(socket_path):
+		os.remove(socket_path)
+	with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+		server.daemon_threads = True
+		logger.info(f'serving sizing jobs at {socket_path}')
+		server.serve_forever(poll_interval=0.2)
+	os.remove(socket_path)
+
+
+def submit_to_socket(socket_path: str, request: dict, timeout=None) -> dict:
+	"""
+	Sends a job (or a command) to a worker pool served with serve_socket and waits for the response.
+	:param socket_path: path of the socket file
+	:param request: the job (see the module's description), or a {"command": "stats" | "shutdown"} dict
+	:param timeout: maximum time to wait for the response, in seconds; None waits indefinitely
+	:return: the response, e.g., the job's summary
+	"""
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+		client.settimeout(timeout)
+		client.connect(socket_path)
+		client.sendall(json.dumps(request, default=_json_default).encode() + b'\n')
+		with client.makefile('rb') as response:
+			return json.loads(response.readline())
+
+
+def serve_queue(pool: WorkerPool, queue_path: str, poll_interval=0.5, drain=False):
+	"""
+	Serves a worker pool through a file-based queue: each JSON job file dropped into "<queue_path>/incoming" is moved
+	to "processing" and submitted, and its summary is written to "done" with the same file name (the job file is then
+	removed). Jobs with no "id" are named after their file. Jobs without an "output" directory have their results
+	written to "<queue_path>/done/<file name without extension>".
+	:param pool: a running worker pool
+	:param queue_path: queue directory; its sub-directories are created if they do not exist
+	:param poll_interval: time between scans of the "incoming" directory, in seconds
+	:param drain: if True, the server stops once there are no incoming jobs nor jobs being run; otherwise, it stops
+		when a "<queue_path>/STOP" file is created
+	"""
+	incoming, processing, done = (os.path.join(queue_path, name) for name in QUEUE_DIRS)
+	for path in (incoming, processing, done):
+		os.makedirs(path, exist_ok=True)
+	pending = {}
+
+	def finish(file_name: str, future: Future, keep_results: bool):
+		summary = future.result()
+		if not keep_results:
+			summary.pop('results', None)
+		with open(os.path.join(done, file_name + '.tmp'), 'w') as summary_file:
+			json.dump(summary, summary_file, default=_json_default)
+		os.replace(os.path.join(done, file_name + '.tmp'), os.path.join(done, file_name))
+		os.remove(os.path.join(processing, file_name))
+
+	logger.info(f'serving sizing jobs from {incoming}')
+	while not os.path.exists(os.path.join(queue_path, QUEUE_STOP_FILE)):
+		file_names = sorted((name for name in os.listdir(incoming) if name.endswith('.json')),
+							key=lambda name: os.path.getmtime(os.path.join(incoming, name)))
+		for file_name in file_names:
+			try:
+				# moving the file claims the job, even if several servers share the queue
+				os.replace(os.path.join(incoming, file_name), os.path.join(processing, file_name))
+			except FileNotFoundError:
+				continue
+			try:
+				with open(os.path.join(processing, file_name)) as job_file:
+					job = json.load(job_file)
+				job.setdefault('id', os.path.splitext(file_name)[0])
+				keep_results = 'subproblem' in job
+				if not keep_results:
+					job.setdefault('output', os.path.join(done, os.path.splitext(file_name)[0]))
+				future = pool.submit(job)
+			except Exception as e:
+				keep_results = False
+				future = Future()
+				future.set_result(_failed_summary(os.path.splitext(file_name)[0], str(e)))
+			pending[file_name] = future
+			future.add_done_callback(lambda fut, name=file_name, keep=keep_results: finish(name, fut, keep))
+
+		pending = {name: future for name, future in pending.items() if not future.done()}
+		if drain and not file_names and not pending:
+			break
+		time.sleep(poll_interval)
+
+
+def submit_subproblems(broker: str, subproblems: list, poll_interval=0.1, timeout=None) -> list:
+	"""
+	Solves meters' subproblems of the ADMM decomposition in a worker pool served with serve_socket or serve_queue, and
+	waits for their results. Subproblems are sent to a file-based queue by writing one job file per subproblem into its
+	"incoming" directory, so they can be claimed by several servers sharing the queue, even in different machines.
+	:param broker: path of the socket file, or of the queue directory
+	:param subproblems: list with the arguments of solve_meter_subproblem of each subproblem
+	:param poll_interval: time between checks for the subproblems' summaries in a file-based queue, in seconds
+	:param timeout: maximum time to wait for the subproblems' results, in seconds; None waits indefinitely
+	:return: list with the results of each subproblem; empty for the subproblems that failed or whose results were not
+		received in time (e.g., if no server is running or a server died while solving them)
+	"""
+	if not os.path.isdir(broker):
+		def submit(subproblem):
+			try:
+				return submit_to_socket(broker, {'subproblem': subproblem}, timeout=timeout)
+			except OSError as e:
+				logger.warning(f'subproblem not solved by the worker pool at {broker}: {e}')
+				return {}
+
+		with ThreadPoolExecutor(max_workers=min(len(subproblems), 32)) as executor:
+			summaries = list(executor.map(submit, subproblems))
+		return [summary.get('results') or {} for summary in summaries]
+
+	incoming, _, done = (os.path.join(broker, name) for name in QUEUE_DIRS)
+	prefix = f'subproblem_{os.getpid()}_{time.time_ns()}'
+	file_names = [f'{prefix}_{i:06d}.json' for i in range(len(subproblems))]
+	for file_name, subproblem in zip(file_names, subproblems):
+		# the job file is only named as a job once fully written, so that it is not claimed before that
+		with open(os.path.join(incoming, file_name + '.tmp'), 'w') as job_file:
+			json.dump({'subproblem': subproblem}, job_file, default=_json_default)
+		os.replace(os.path.join(incoming, file_name + '.tmp'), os.path.join(incoming, file_name))
+
+	deadline = time.monotonic() + timeout if timeout is not None else None
+	results = {}
+	while len(results) < len(file_names):
+		if deadline is not None and time.monotonic() > deadline:
+			missing = [file_name for file_name in file_names if file_name not in results]
+			logger.warning(f'{len(missing)} subproblem(s) not solved by the worker pool at {broker} within {timeout} s')
+			# unclaimed jobs are withdrawn, so that no server solves them after they are given up on
+			for file_name in missing:
+				try:
+					os.remove(os.path.join(incoming, file_name))
+				except FileNotFoundError:
+					pass
+			results.update({file_name: {} for file_name in missing})
+			break
+		for file_name in file_names:
+			summary_path = os.path.join(done, file_name)
+			if file_name in results or not os.path.exists(summary_path):
+				continue
+			with open(summary_path) as summary_file:
+				results[file_name] = json.load(summary_file).get('results') or {}
+			os.remove(summary_path)
+		if len(results) < len(file_names):
+			time.sleep(poll_interval)
+
+	return [results[file_name] for file_name in file_names]
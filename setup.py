@@ -15,8 +15,11 @@ setup(
 		'pulp~=2.8.0',
 		'scikit-learn~=1.3.2',
 		'scikit-learn-extra~=0.3.0',
+		'scipy~=1.10',
 		'setuptools~=75.3.2'
 	],
+	extras_require={'parquet': ['pyarrow']},
+	entry_points={'console_scripts': ['rec-sizing = rec_sizing.cli:main']},
 	setup_requires=['pytest_runner==6.0.0'],
 	tests_require=['pytest==7.4.2'],
 	test_suite='tests'
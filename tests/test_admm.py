@@ -0,0 +1,100 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+
+from rec_sizing.optimization.module.admm import balanced_targets
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_INSTALL_POOL
+from rec_sizing.optimization_functions import (
+	run_admm_collective_pool_milp,
+	run_pre_collective_pool_milp
+)
+from rec_sizing.worker import (
+	QUEUE_DIRS,
+	QUEUE_STOP_FILE,
+	serve_queue,
+	submit_subproblems,
+	WorkerPool
+)
+
+
+def _assert_balanced_pool(results):
+	for t in range(len(results['dual_prices'])):
+		purchases = sum(e_pur[t] for e_pur in results['e_pur_pool'].values())
+		sales = sum(e_sale[t] for e_sale in results['e_sale_pool'].values())
+		assert abs(purchases - sales) <= 1e-6
+
+
+def test_balanced_targets():
+	net_purchases = np.array([[2.0, -1.0, 0.0], [-1.0, 3.0, 1.0], [0.0, -1.0, 0.0]])
+	targets = balanced_targets(net_purchases)
+	# assert that the exchanges are balanced by scaling down the long side of the pool only
+	assert np.allclose(targets.sum(axis=0), 0)
+	assert np.allclose(targets, [[1.0, -1.0, 0.0], [-1.0, 2.0, 0.0], [0.0, -1.0, 0.0]])
+
+
+def test_admm_collective_pool_milp():
+	inputs = deepcopy(INPUTS_INSTALL_POOL)
+	inputs['strict_pos_coeffs'] = True
+	inputs['total_share_coeffs'] = True
+	full_results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC', mipgap=0)
+	results = run_admm_collective_pool_milp(deepcopy(inputs), n_jobs=1, solver='CBC', mipgap=0)
+
+	# assert that the outputs have the same structure as the full MILP's and a balanced pool
+	assert results['milp_status'] == 'Heuristic'
+	assert set(results) == set(full_results)
+	assert set(results['e_bat']) == set(inputs['meters'])
+	assert len(results['dual_prices']) == len(full_results['dual_prices'])
+	_assert_balanced_pool(results)
+	# assert that the solution does not outperform the full MILP's optimum and that the costs add up
+	assert results['obj_value'] >= full_results['obj_value'] - 1e-3
+	assert round(sum(results['c_ind2pool'].values()), 3) == results['obj_value']
+	# assert that the REC balance binary variables follow the final net loads
+	rec_net_load = np.array(list(results['e_cmet'].values())).sum(axis=0)
+	assert results['delta_rec_balance'] == (rec_net_load < 0).astype(int).tolist()
+
+
+def test_admm_queue_broker():
+	inputs = deepcopy(INPUTS_INSTALL_POOL)
+	expected_results = run_admm_collective_pool_milp(deepcopy(inputs), n_jobs=1, solver='CBC', mipgap=0)
+	with TemporaryDirectory() as queue_path, WorkerPool(nr_workers=2, log_level='WARNING') as pool:
+		server = threading.Thread(target=serve_queue, args=(pool, queue_path), kwargs={'poll_interval': 0.05})
+		server.start()
+		while not os.path.isdir(os.path.join(queue_path, 'done')):
+			server.join(0.05)
+		results = run_admm_collective_pool_milp(deepcopy(inputs), broker=queue_path, solver='CBC', mipgap=0)
+		open(os.path.join(queue_path, QUEUE_STOP_FILE), 'w').close()
+		server.join()
+
+		# assert that the subproblems solved by the worker pool reach the same solution, leaving the queue empty
+		assert results['obj_value'] == expected_results['obj_value']
+		assert results['dual_prices'] == expected_results['dual_prices']
+		_assert_balanced_pool(results)
+		assert all(os.listdir(os.path.join(queue_path, name)) == [] for name in ['incoming', 'processing', 'done'])
+
+
+def test_admm_invalid_iterations():
+	with pytest.raises(ValueError):
+		run_admm_collective_pool_milp(deepcopy(INPUTS_INSTALL_POOL), max_iterations=0, solver='CBC')
+
+
+def test_queue_broker_timeout():
+	with TemporaryDirectory() as queue_path:
+		for name in QUEUE_DIRS:
+			os.makedirs(os.path.join(queue_path, name))
+		# assert that, with no server running, the subproblems are given up on and withdrawn from the queue
+		results = submit_subproblems(queue_path, [{'nr_dates': 1}, {'nr_dates': 1}], poll_interval=0.05, timeout=0.2)
+		assert results == [{}, {}]
+		assert os.listdir(os.path.join(queue_path, 'incoming')) == []
+
+
+if __name__ == '__main__':
+	test_balanced_targets()
+	test_admm_collective_pool_milp()
+	test_admm_queue_broker()
+	test_admm_invalid_iterations()
+	test_queue_broker_timeout()
@@ -0,0 +1,87 @@
+import io
+import json
+import os
+
+from contextlib import redirect_stdout
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+
+from rec_sizing.cli import (
+	find_jobs,
+	main
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing import (
+	INPUTS_INSTALL_POOL_PP,
+	INPUTS_OWNERSHIP_PP
+)
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+from rec_sizing.persistence_functions import (
+	load_results_from_directory,
+	save_backpack_to_directory
+)
+
+
+def _write_json(data: dict, path: str):
+	with open(path, 'w') as json_file:
+		json.dump(data, json_file)
+
+
+def test_cli_run():
+	with TemporaryDirectory() as path:
+		backpack_path = os.path.join(path, 'backpack.json')
+		ownership_path = os.path.join(path, 'ownership.json')
+		output_path = os.path.join(path, 'results')
+		_write_json(INPUTS_INSTALL_POOL_PP, backpack_path)
+		_write_json(INPUTS_OWNERSHIP_PP, ownership_path)
+
+		with redirect_stdout(io.StringIO()) as stdout:
+			exit_code = main(['run', backpack_path, '--ownership', ownership_path, '--output', output_path,
+							  '--profile', 'cbc', '--progress', '--gap-stall', '0.001', '120', '--log-level', 'WARNING'])
+		results = load_results_from_directory(output_path)
+
+		# assert that the job succeeded and that the post-processed results were written
+		expected_results = run_pre_collective_pool_milp(deepcopy(INPUTS_INSTALL_POOL_PP), solver='CBC')
+		assert exit_code == 0
+		assert results['milp_status'] == 'Optimal'
+		assert round(results['obj_value'], 3) == round(expected_results['obj_value'], 3)
+		assert 'member_cost' in results
+		assert results['validation']['passed']
+		assert stdout.getvalue().splitlines()[1].split()[1:3] == ['Optimal', 'passed']
+
+
+def test_cli_batch():
+	with TemporaryDirectory() as path:
+		jobs_path = os.path.join(path, 'jobs')
+		output_path = os.path.join(path, 'results')
+		# a JSON job with ownership, a columnar job without ownership, an invalid job and a non-job directory
+		os.makedirs(os.path.join(jobs_path, 'job_json'))
+		_write_json(INPUTS_INSTALL_POOL_PP, os.path.join(jobs_path, 'job_json', 'backpack.json'))
+		_write_json(INPUTS_OWNERSHIP_PP, os.path.join(jobs_path, 'job_json', 'ownership.json'))
+		save_backpack_to_directory(INPUTS_INSTALL_POOL_PP, os.path.join(jobs_path, 'job_columnar'))
+		invalid_backpack = deepcopy(INPUTS_INSTALL_POOL_PP)
+		invalid_backpack['delta_t'] = -1
+		os.makedirs(os.path.join(jobs_path, 'job_invalid'))
+		_write_json(invalid_backpack, os.path.join(jobs_path, 'job_invalid', 'backpack.json'))
+		os.makedirs(os.path.join(jobs_path, 'not_a_job'))
+
+		assert [job[0] for job in find_jobs(jobs_path)] == ['job_columnar', 'job_invalid', 'job_json']
+
+		with redirect_stdout(io.StringIO()) as stdout:
+			exit_code = main(['batch', jobs_path, '--output', output_path, '--workers', '2', '--solver', 'CBC',
+							  '--log-level', 'ERROR'])
+		summary = stdout.getvalue().splitlines()
+
+		# assert that the invalid job is reported without stopping the others
+		assert exit_code == 1
+		assert len(summary) == 4
+		assert summary[1].split()[:3] == ['job_columnar', 'Optimal', '-']
+		assert summary[2].split()[:2] == ['job_invalid', 'Error']
+		assert summary[3].split()[:3] == ['job_json', 'Optimal', 'passed']
+		assert 'member_cost' not in load_results_from_directory(os.path.join(output_path, 'job_columnar'))
+		assert 'member_cost' in load_results_from_directory(os.path.join(output_path, 'job_json'))
+		assert not os.path.exists(os.path.join(output_path, 'job_invalid'))
+
+
+if __name__ == '__main__':
+	test_cli_run()
+	test_cli_batch()
@@ -0,0 +1,35 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import (
+	run_coarse_to_fine_collective_pool_milp,
+	run_pre_collective_pool_milp
+)
+from rec_sizing.optimization.helpers.backpack_helpers import aggregate_backpack
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+def test_aggregate_backpack():
+	aggregated = aggregate_backpack(INPUTS_CLUSTER_POOL, 2 * INPUTS_CLUSTER_POOL['delta_t'])
+	e_c = INPUTS_CLUSTER_POOL['meters']['CPE#1']['e_c']
+	l_buy = INPUTS_CLUSTER_POOL['meters']['CPE#1']['l_buy']
+	# assert that energy is summed and prices are averaged
+	assert aggregated['meters']['CPE#1']['e_c'][0] == e_c[0] + e_c[1]
+	assert aggregated['meters']['CPE#1']['l_buy'][0] == (l_buy[0] + l_buy[1]) / 2
+	assert len(aggregated['l_grid']) == len(INPUTS_CLUSTER_POOL['l_grid']) / 2
+
+
+def test_coarse_to_fine():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs.pop('nr_clusters', None)
+	full_results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC')
+	for strategy in ['warm_start', 'bounds']:
+		results = run_coarse_to_fine_collective_pool_milp(deepcopy(inputs), coarse_delta_t=2 * inputs['delta_t'],
+														  strategy=strategy, bounds_margin=1.0, solver='CBC')
+		assert results['milp_status'] == 'Optimal'
+		# with a margin covering the full admissible range, the fine MILP must reach the same optimum (within the gap)
+		assert abs(results['obj_value'] - full_results['obj_value']) <= 0.01 * abs(full_results['obj_value'])
+
+
+if __name__ == '__main__':
+	test_aggregate_backpack()
+	test_coarse_to_fine()
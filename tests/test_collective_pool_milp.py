@@ -1,4 +1,5 @@
 from copy import deepcopy
+from tempfile import TemporaryDirectory
 
 from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
 from rec_sizing.optimization.structures.I_O_collective_pool_milp import (
@@ -9,6 +10,7 @@ from rec_sizing.optimization.structures.I_O_collective_pool_milp import (
 	OUTPUTS_NO_INSTALL_POOL,
 	OUTPUTS_NO_INSTALL_DEG_COST_POOL
 )
+from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing import INPUTS_INSTALL_POOL_PP
 
 
 def test_solve_collective_pool_milp_no_install():
@@ -77,7 +79,66 @@ def test_solve_collective_pool_milp_yes_install():
 		#assert valu == OUTPUTS_INSTALL_POOL.get(ki), f'{ki}'
 
 
+def test_solve_collective_pool_milp_tight_bounds():
+	inputs = deepcopy(INPUTS_INSTALL_POOL_PP)
+	inputs['strict_pos_coeffs'] = True
+	inputs['total_share_coeffs'] = True
+	inputs['w_clustering'] = [1] * len(inputs['l_grid'])
+	results = {}
+	for tight_bounds in [False, True]:
+		milp = CollectiveMILPPool(deepcopy(inputs), inputs['nr_days'], solver='CBC', mipgap=0, write_lp=False,
+								  tight_bounds=tight_bounds)
+		milp.solve_milp()
+		results[tight_bounds] = milp.generate_outputs()
+
+		# Assert that the energy flows are bounded only if requested
+		for var_key in ['e_sup', 'e_sur', 'e_pur_pool', 'e_sale_pool', 'e_slc_pool', 'e_consumed', 'e_alc', 'e_bc',
+						'e_bd']:
+			for meter_vars in milp.milp_vars[var_key].values():
+				assert all((var.upBound is not None) == tight_bounds for var in meter_vars), var_key
+
+	# Assert that the bounds do not change the optimal solution's cost
+	assert results[True]['milp_status'] == 'Optimal'
+	assert round(results[True]['obj_value'], 3) == round(results[False]['obj_value'], 3)
+
+
+def test_solve_collective_pool_milp_row_generation():
+	inputs = deepcopy(INPUTS_INSTALL_POOL_PP)
+	inputs['strict_pos_coeffs'] = True
+	inputs['total_share_coeffs'] = True
+	inputs['w_clustering'] = [1] * len(inputs['l_grid'])
+	milps = {}
+	for row_generation in [False, True]:
+		milps[row_generation] = CollectiveMILPPool(deepcopy(inputs), inputs['nr_days'], solver='CBC', mipgap=0,
+												   write_lp=False, row_generation=row_generation)
+		milps[row_generation].solve_milp()
+	full_milp, milp = milps[False], milps[True]
+
+	# Assert that the row generation reaches the optimal solution with fewer constraints
+	assert milp.status == 'Optimal'
+	assert round(milp.obj_value, 3) == round(full_milp.obj_value, 3)
+	assert len(milp.milp.constraints) < len(full_milp.milp.constraints)
+	assert milp.row_generation_iterations >= 1
+
+	# Assert that the outputs include the binary variables of the omitted constraints
+	results = milp.generate_outputs()
+	assert all(val is not None for val in results['delta_rec_balance'])
+	for key in ['delta_coeff', 'delta_meter_balance']:
+		assert all(val is not None for values in results[key].values() for val in values), key
+
+	# Assert that the row generation also starts from a master MILP rebuilt from the model cache
+	with TemporaryDirectory() as model_cache:
+		for _ in range(2):
+			cached_milp = CollectiveMILPPool(deepcopy(inputs), inputs['nr_days'], solver='CBC', mipgap=0,
+											 write_lp=False, row_generation=True, model_cache=model_cache)
+			cached_milp.solve_milp()
+			assert cached_milp.status == 'Optimal'
+			assert round(cached_milp.obj_value, 3) == round(full_milp.obj_value, 3)
+
+
 if __name__ == '__main__':
 	test_solve_collective_pool_milp_no_install()
 	test_solve_collective_pool_milp_yes_install()
 	test_solve_collective_pool_milp_no_install_deg()
+	test_solve_collective_pool_milp_tight_bounds()
+	test_solve_collective_pool_milp_row_generation()
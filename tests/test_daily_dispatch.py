@@ -0,0 +1,57 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import (
+	run_fixed_investment_evaluation,
+	run_rolling_horizon_collective_pool_milp
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+INVESTMENTS = {
+	'p_cont': {'CPE#1': 4.0, 'CPE#2': 0.4},
+	'p_gn_new': {'CPE#1': 0.0, 'CPE#2': 0.0},
+	'e_bn_new': {'CPE#1': 0.0, 'CPE#2': 0.0}
+}
+
+
+def test_fixed_investment_evaluation():
+	results = run_fixed_investment_evaluation(deepcopy(INPUTS_CLUSTER_POOL), INVESTMENTS, n_jobs=2, solver='CBC')
+	assert results['milp_status'] == 'Optimal'
+	# assert that the investments were kept fixed
+	assert results['p_cont'] == INVESTMENTS['p_cont']
+	# assert that the full horizon is covered
+	assert all(len(e_sup) == 48 for e_sup in results['e_sup'].values())
+	assert len(results['dual_prices']) == 48
+
+	# assert that the daily decomposition matches a sequential dispatch of the same plan
+	sequential_results = run_rolling_horizon_collective_pool_milp(
+		deepcopy(INPUTS_CLUSTER_POOL), window_days=2, overlap_days=0, investments=INVESTMENTS, solver='CBC')
+	assert round(results['obj_value'], 2) == round(sequential_results['obj_value'], 2)
+
+
+def test_fixed_investment_evaluation_missing_plan():
+	investments = {key: val for key, val in INVESTMENTS.items() if key != 'p_cont'}
+	try:
+		run_fixed_investment_evaluation(deepcopy(INPUTS_CLUSTER_POOL), investments, solver='CBC')
+		assert False, 'a ValueError should have been raised'
+	except ValueError:
+		pass
+
+
+def test_preflight_before_dispatch():
+	# assert that a malformed backpack is rejected before any window or day is dispatched
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs['meters']['CPE#1']['e_c'] = inputs['meters']['CPE#1']['e_c'][:-1]
+	for run in [lambda backpack: run_fixed_investment_evaluation(backpack, INVESTMENTS, solver='CBC'),
+				lambda backpack: run_rolling_horizon_collective_pool_milp(backpack, window_days=2, solver='CBC')]:
+		try:
+			run(deepcopy(inputs))
+			assert False, 'a ValueError should have been raised'
+		except ValueError as err:
+			assert 'e_c of meter CPE#1 has shape (47,)' in str(err)
+
+
+if __name__ == '__main__':
+	test_fixed_investment_evaluation()
+	test_fixed_investment_evaluation_missing_plan()
+	test_preflight_before_dispatch()
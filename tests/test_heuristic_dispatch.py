@@ -0,0 +1,76 @@
+import numpy as np
+
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import run_heuristic_screening
+from rec_sizing.optimization.helpers.backpack_helpers import (
+	select_meters,
+	slice_backpack
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import (
+	INPUTS_CLUSTER_POOL,
+	INPUTS_INSTALL_POOL,
+	INPUTS_NO_INSTALL_POOL
+)
+
+
+def test_heuristic_screening_no_install():
+	results = run_heuristic_screening(INPUTS_NO_INSTALL_POOL, {})
+	# Meter#1: the 0.9 kWh of PV at t=0 are fully stored (1 kWh battery, 1 kW) and cover the 0.5 kWh consumed at t=1,
+	# so there is never any surplus to share in the pool and Meter#2's 0.1 kWh/h are always supplied by the retailer
+	assert np.allclose(results['p_cont']['Meter#1'], [0.0])
+	assert np.allclose(results['p_cont']['Meter#2'], [0.1])
+	assert np.allclose(results['retailer_exchanges_cost']['Meter#2'], [0.6])
+	assert np.allclose(results['sc_tariff_cost']['Meter#2'], [0.0])
+	assert results['feasible'].tolist() == [True]
+
+
+def test_heuristic_screening_soc_init_none():
+	# assert that a missing initial state of charge defaults to soc_min, as in the MILP
+	inputs = deepcopy(INPUTS_NO_INSTALL_POOL)
+	for meter_data in inputs['meters'].values():
+		meter_data['soc_init'] = None
+	results = run_heuristic_screening(inputs, {})
+	for meter_data in inputs['meters'].values():
+		meter_data['soc_init'] = meter_data['soc_min']
+	expected_results = run_heuristic_screening(inputs, {})
+	assert results['feasible'].tolist() == [True]
+	assert np.allclose(results['total_cost'], expected_results['total_cost'])
+
+
+def test_heuristic_screening_batch():
+	candidates = {
+		'p_gn_new': {'Meter#2': np.array([0.0, 0.5, 1.0])},
+		'e_bn_new': {'Meter#1': np.array([0.0, 1.0, 0.5])}
+	}
+	results = run_heuristic_screening(INPUTS_INSTALL_POOL, candidates)
+	assert results['total_cost'].shape == (3,)
+	# assert that simulating the batch is the same as simulating each candidate on its own
+	for idx in range(3):
+		single_candidate = {
+			'p_gn_new': {'Meter#2': candidates['p_gn_new']['Meter#2'][idx:idx + 1]},
+			'e_bn_new': {'Meter#1': candidates['e_bn_new']['Meter#1'][idx:idx + 1]}
+		}
+		single_results = run_heuristic_screening(INPUTS_INSTALL_POOL, single_candidate)
+		assert np.isclose(single_results['total_cost'][0], results['total_cost'][idx])
+
+
+def test_heuristic_screening_energy_conservation():
+	# a single day of a consumption-only meter whose storage starts half full, with energy bought at 1 €/kWh
+	inputs = select_meters(slice_backpack(INPUTS_CLUSTER_POOL, 0, 24), ['CPE#1'])
+	meter = dict(inputs['meters']['CPE#1'], soc_init=50.0, e_g_factor=[0.0] * 24, l_buy=[1.0] * 24, l_sell=[0.0] * 24)
+	inputs['meters'] = {'CPE#1': meter}
+	inputs['l_grid'] = [0.0] * 24
+	results = run_heuristic_screening(inputs, {})
+	# assert that the energy discharged during the day is bought back to reset the storage, with the losses of both
+	# the discharge and the recharge, instead of being refilled for free
+	e_discharged = 0.5 * meter['eff_bd']
+	e_recharged = 0.5 / meter['eff_bc']
+	assert np.allclose(results['retailer_exchanges_cost']['CPE#1'], [sum(meter['e_c']) - e_discharged + e_recharged])
+
+
+if __name__ == '__main__':
+	test_heuristic_screening_no_install()
+	test_heuristic_screening_soc_init_none()
+	test_heuristic_screening_batch()
+	test_heuristic_screening_energy_conservation()
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+
+def _loaded_modules(code: str, modules: tuple) -> list:
+	"""
+	Runs code in a fresh interpreter and lists which of the given modules were loaded.
+	"""
+	probe = f'import sys\n{code}\nprint([m for m in {modules!r} if m in sys.modules])'
+	output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True).stdout
+	return eval(output.strip().splitlines()[-1])
+
+
+def test_lazy_imports():
+	heavy_modules = ('pulp', 'joblib', 'pandas', 'scipy', 'sklearn', 'sklearn_extra', 'matplotlib')
+
+	# assert that importing the package does not load any heavy dependency
+	assert _loaded_modules('import rec_sizing', heavy_modules) == []
+	# nor does listing its attributes, e.g., by tab completion
+	assert _loaded_modules('import rec_sizing\nassert \'run_pre_collective_pool_milp\' in dir(rec_sizing)',
+						   heavy_modules) == []
+
+	# assert that the optimization functions are loaded on first access, without the clustering's dependencies
+	loaded = _loaded_modules('import rec_sizing\nassert callable(rec_sizing.run_pre_collective_pool_milp)',
+							 heavy_modules)
+	assert 'pulp' in loaded
+	assert not {'sklearn', 'sklearn_extra', 'matplotlib', 'pandas'} & set(loaded)
+
+
+if __name__ == '__main__':
+	test_lazy_imports()
@@ -0,0 +1,88 @@
+import os
+import pytest
+
+from copy import deepcopy
+from pulp import (
+	LpMinimize,
+	LpVariable
+)
+from tempfile import TemporaryDirectory
+
+from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+from rec_sizing.optimization.module.indicator_constraints import IndicatorLpProblem
+from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing import INPUTS_INSTALL_POOL_PP
+
+
+def _inputs() -> dict:
+	inputs = deepcopy(INPUTS_INSTALL_POOL_PP)
+	inputs['strict_pos_coeffs'] = True
+	inputs['total_share_coeffs'] = True
+	inputs['w_clustering'] = [1] * len(inputs['l_grid'])
+	return inputs
+
+
+def test_write_indicator_constraints():
+	x = LpVariable('x', lowBound=0)
+	y = LpVariable('y', lowBound=0)
+	delta = LpVariable('delta', cat='Binary')
+	milp = IndicatorLpProblem('indicators', LpMinimize)
+	milp += x + y
+	milp += x + y >= 1, 'Demand'
+	milp.add_indicator(delta, 0, x <= 0, 'X_OFF')
+	milp.add_indicator(delta, 1, y <= 0, 'Y_OFF')
+	with pytest.raises(ValueError):
+		milp.add_indicator(delta, 2, y <= 0, 'Y_ON')
+	with pytest.raises(ValueError):
+		milp.add_indicator(delta, 1, y <= 0, 'Demand')
+
+	with TemporaryDirectory() as path:
+		lp_path = os.path.join(path, 'indicators.lp')
+		milp.writeLP(lp_path)
+		with open(lp_path) as lp_file:
+			lines = lp_file.read().splitlines()
+
+	# assert that the indicator constraints are written in the Subject To section and that their binary variable is
+	# declared, even if it is not used by any other constraint
+	assert lines.index('X_OFF: delta = 0 -> x <= 0') < lines.index('Binaries') < lines.index('delta')
+	assert lines.index('Subject To') < lines.index('Y_OFF: delta = 1 -> y <= 0') < lines.index('Binaries')
+
+
+def test_indicator_formulation():
+	# assert that the indicator formulation is reverted to big-M for solvers that do not support it
+	milp = CollectiveMILPPool(_inputs(), 1, solver='CBC', write_lp=False, formulation='indicator')
+	assert milp.formulation == 'big_m'
+
+	big_m_milp = CollectiveMILPPool(_inputs(), 1, solver='CBC', mipgap=0, write_lp=False)
+	big_m_milp.solve_milp()
+	assert big_m_milp.status == 'Optimal'
+	solution = {var.name: var.varValue for var in big_m_milp.milp.variables()}
+
+	# define the indicator formulation (CPLEX might not be available, but the MILP is defined before the solver is set)
+	milp = CollectiveMILPPool(_inputs(), 1, solver='CPLEX', write_lp=False, formulation='indicator')
+	try:
+		milp._CollectiveMILPPool__define_milp()
+	except ValueError:
+		pass
+	assert isinstance(milp.milp, IndicatorLpProblem)
+	assert not any(name.startswith(('Supply_ON', 'Self_consumption', 'Check_')) for name in milp.milp.constraints)
+
+	# assert that the big-M optimal solution satisfies the indicator formulation, with the same objective function value
+	for var in milp.milp.variables():
+		if var.name.startswith(('delta_share_surplus_', 'delta_buy_deficit_')):
+			# auxiliary variables, named <prefix>_<meter ID>_t<time step>
+			suffix = var.name.split('_', 3)[-1]
+			surplus = solution['delta_meter_balance_' + suffix] - solution['delta_rec_balance_' + suffix[-8:]]
+			var.varValue = max(0, surplus if var.name.startswith('delta_share_surplus_') else -surplus)
+		else:
+			var.varValue = solution[var.name]
+	assert all(constraint.valid(1e-6) for constraint in milp.milp.constraints.values())
+	assert len(milp.milp.indicators) > 0
+	for binary, value, constraint in milp.milp.indicators.values():
+		if round(binary.varValue) == value:
+			assert constraint.valid(1e-3), constraint.name
+	assert abs(milp.milp.objective.value() - big_m_milp.obj_value) < 1e-6
+
+
+if __name__ == '__main__':
+	test_write_indicator_constraints()
+	test_indicator_formulation()
@@ -0,0 +1,34 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import run_infeasibility_diagnosis
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_INSTALL_POOL
+
+
+def test_infeasibility_diagnosis():
+	# a meter that can neither contract power nor install PV or storage cannot supply its load
+	meter_id = next(iter(INPUTS_INSTALL_POOL['meters']))
+	investment_bounds = {key: {meter_id: (None, 0.0)} for key in ['p_cont', 'p_gn_new', 'e_bn_new']}
+	power_families = ['P_flow_low_limit_', 'P_flow_high_limit_']
+	report = run_infeasibility_diagnosis(deepcopy(INPUTS_INSTALL_POOL), solver='CBC',
+										 investment_bounds=investment_bounds, families=power_families)
+	assert report['status'] == 'Optimal'
+	assert report['preflight_issues'] == []
+	assert report['total_violation'] > 0
+	assert set(report['families']) <= set(power_families)
+	assert all(family_report['meters'] == [meter_id] for family_report in report['families'].values())
+	assert all(relaxed['step'] is not None for relaxed in report['relaxed_constraints'])
+
+	# assert that the IIS is a (small) set of conflicting constraints of the same meter
+	assert report['iis']
+	assert any(name.startswith('P_flow_high_limit_') for name in report['iis'])
+	assert all(meter_id in name for name in report['iis'])
+
+	# a feasible MILP needs no relaxation and has no IIS
+	report = run_infeasibility_diagnosis(deepcopy(INPUTS_INSTALL_POOL), solver='CBC')
+	assert report['total_violation'] == 0
+	assert report['relaxed_constraints'] == []
+	assert report['iis'] == []
+
+
+if __name__ == '__main__':
+	test_infeasibility_diagnosis()
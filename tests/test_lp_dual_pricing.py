@@ -0,0 +1,40 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import (
+	run_lp_dual_pricing,
+	run_pre_collective_pool_milp
+)
+from rec_sizing.optimization.helpers.outputs_helpers import (
+	BINARY_KEYS,
+	slice_binaries
+)
+from rec_sizing.optimization.module.daily_dispatch import daily_dispatch
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+def test_slice_binaries():
+	outputs = {'delta_sup': {'Meter#1': [0, 1, 1, 0]}, 'delta_rec_balance': [1, 0, 0, 1], 'e_bat': {'Meter#1': [0] * 4}}
+	binaries = slice_binaries(outputs, 1, 3)
+	assert binaries == {'delta_sup': {'Meter#1': [1, 1]}, 'delta_rec_balance': [0, 0]}
+
+
+def test_lp_dual_pricing():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs.pop('nr_clusters', None)
+	results = run_pre_collective_pool_milp(inputs, solver='CBC', lp_pricing=True)
+	assert len(results['dual_prices']) == 48
+	assert all(dual_price is not None for dual_price in results['dual_prices'])
+
+	# assert that the fixed-binary LP reproduces the MILP's solution (within the MILP's gap)
+	investments = {key: results[key] for key in ['p_cont', 'p_gn_new', 'e_bn_new']}
+	binaries = {key: results[key] for key in BINARY_KEYS if key in results}
+	lp_results = daily_dispatch(inputs, investments, 2, 'CBC', 60, 0.01, fixed_binaries=binaries)
+	assert lp_results['milp_status'] == 'Optimal'
+	assert lp_results['obj_value'] <= results['obj_value'] + 1e-3
+	assert lp_results['obj_value'] >= results['obj_value'] * 0.99 - 1e-3
+	assert lp_results['dual_prices'] == run_lp_dual_pricing(inputs, results, n_jobs=2, solver='CBC')
+
+
+if __name__ == '__main__':
+	test_slice_binaries()
+	test_lp_dual_pricing()
@@ -0,0 +1,71 @@
+import os
+
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from rec_sizing.optimization.module.CollectiveMILPPool import CollectiveMILPPool
+from rec_sizing.optimization.module.model_cache import (
+	CACHE_EXTENSION,
+	evict
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_INSTALL_POOL
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+
+
+def _cache_entries(path: str) -> list:
+	return sorted(file_name for file_name in os.listdir(path) if file_name.endswith(CACHE_EXTENSION))
+
+
+def test_model_cache_reuse():
+	# same structure (meters, horizon and bounds), different time series and tariffs
+	inputs = deepcopy(INPUTS_INSTALL_POOL)
+	for meter_data in inputs['meters'].values():
+		meter_data['e_c'] = [e_c * 1.5 for e_c in meter_data['e_c']]
+		meter_data['e_g_factor'] = [0.0] + meter_data['e_g_factor'][1:]
+		meter_data['l_buy'] = [l_buy + 0.02 for l_buy in meter_data['l_buy']]
+		meter_data['l_cont'] *= 2
+
+	with TemporaryDirectory() as path:
+		run_pre_collective_pool_milp(deepcopy(INPUTS_INSTALL_POOL), solver='CBC', model_cache=path)
+		assert len(_cache_entries(path)) == 1
+
+		# assert that the second run rebuilds the MILP from the cache, without formulating it
+		formulate = '_CollectiveMILPPool__formulate_milp'
+		with mock.patch.object(CollectiveMILPPool, formulate, side_effect=AssertionError('not cached')):
+			results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC', model_cache=path)
+		assert len(_cache_entries(path)) == 1
+
+		# assert that the patched MILP yields the same results as a freshly formulated one
+		expected_results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC')
+		assert results['milp_status'] == 'Optimal'
+		assert results['obj_value'] == expected_results['obj_value']
+		for key in ['p_cont', 'p_gn_new', 'e_bn_new', 'c_ind2pool']:
+			assert results[key] == expected_results[key], key
+
+		# assert that a structural change (a meter's bounds) creates a new entry
+		inputs['meters']['Meter#1']['p_meter_max'] *= 2
+		run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC', model_cache=path)
+		assert len(_cache_entries(path)) == 2
+
+
+def test_model_cache_eviction():
+	with TemporaryDirectory() as path:
+		for index, size in enumerate([3, 2, 1]):
+			file_path = os.path.join(path, f'entry_{index}{CACHE_EXTENSION}')
+			with open(file_path, 'wb') as entry_file:
+				entry_file.write(b'0' * size * 2 ** 20)
+			os.utime(file_path, (index, index))
+
+		# assert that the least recently used entries are evicted first
+		evict(path, max_mb=4)
+		assert _cache_entries(path) == [f'entry_1{CACHE_EXTENSION}', f'entry_2{CACHE_EXTENSION}']
+
+		# assert that the most recently used entry is always kept
+		evict(path, max_mb=0)
+		assert _cache_entries(path) == [f'entry_2{CACHE_EXTENSION}']
+
+
+if __name__ == '__main__':
+	test_model_cache_reuse()
+	test_model_cache_eviction()
@@ -0,0 +1,103 @@
+import numpy as np
+import os
+import pytest
+
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+from rec_sizing.persistence.module import backpack_io
+from rec_sizing.persistence_functions import (
+	load_backpack_from_directory,
+	load_results_from_directory,
+	save_backpack_to_directory,
+	save_results_to_directory
+)
+from rec_sizing.post_processing_functions import run_post_processing
+
+
+def test_backpack_npy_round_trip():
+	with TemporaryDirectory() as path:
+		save_backpack_to_directory(INPUTS_CLUSTER_POOL, path, file_format='npy')
+		backpack = load_backpack_from_directory(path)
+
+		# assert that the time series are memory mapped views and that all data is kept
+		assert isinstance(backpack['meters']['CPE#1']['e_c'], np.memmap)
+		assert backpack['nr_clusters'] == INPUTS_CLUSTER_POOL['nr_clusters']
+		assert list(backpack['l_grid']) == INPUTS_CLUSTER_POOL['l_grid']
+		for meter_id, meter_data in INPUTS_CLUSTER_POOL['meters'].items():
+			for key, val in meter_data.items():
+				assert np.array_equal(backpack['meters'][meter_id][key], val), f'{meter_id}: {key}'
+
+		# assert that the MILP runs over the loaded arrays
+		results = run_pre_collective_pool_milp(backpack, solver='CBC')
+		expected_results = run_pre_collective_pool_milp(deepcopy(INPUTS_CLUSTER_POOL), solver='CBC')
+		assert results['obj_value'] == expected_results['obj_value']
+
+
+def test_backpack_csv_with_series():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs['series'] = {'tariff_A': inputs['meters']['CPE#1']['l_buy']}
+	for meter_data in inputs['meters'].values():
+		meter_data['l_buy'] = 'tariff_A'
+	with TemporaryDirectory() as path:
+		save_backpack_to_directory(inputs, path, file_format='csv')
+		backpack = load_backpack_from_directory(path)
+		assert backpack['meters']['CPE#2']['l_buy'] == 'tariff_A'
+		assert list(backpack['series']['tariff_A']) == inputs['series']['tariff_A']
+		assert list(backpack['meters']['CPE#2']['e_c']) == inputs['meters']['CPE#2']['e_c']
+
+
+def test_results_round_trip():
+	backpack = deepcopy(INPUTS_CLUSTER_POOL)
+	results = run_pre_collective_pool_milp(backpack, solver='CBC')
+	ownership = {meter_id: {'Member#1': 1.0} for meter_id in backpack['meters']}
+	results = run_post_processing(results, backpack, {'ownership': ownership})
+	with TemporaryDirectory() as path:
+		save_results_to_directory(results, path)
+		# assert that the reloaded results match the original ones, both eagerly and lazily loaded
+		assert load_results_from_directory(path) == results
+		lazy_results = load_results_from_directory(path, lazy=True)
+		assert lazy_results['e_bat'] == results['e_bat']
+		assert dict(lazy_results) == results
+		assert list(lazy_results) == list(results)
+
+
+def test_backpack_parquet_round_trip():
+	pytest.importorskip('pyarrow')
+	with TemporaryDirectory() as path:
+		save_backpack_to_directory(INPUTS_CLUSTER_POOL, path, file_format='parquet')
+		backpack = load_backpack_from_directory(path)
+		assert list(backpack['l_grid']) == INPUTS_CLUSTER_POOL['l_grid']
+		for meter_id, meter_data in INPUTS_CLUSTER_POOL['meters'].items():
+			for key, val in meter_data.items():
+				assert np.array_equal(backpack['meters'][meter_id][key], val), f'{meter_id}: {key}'
+
+
+def test_results_parquet_round_trip():
+	pytest.importorskip('pyarrow')
+	results = run_pre_collective_pool_milp(deepcopy(INPUTS_CLUSTER_POOL), solver='CBC')
+	with TemporaryDirectory() as path:
+		save_results_to_directory(results, path, file_format='parquet')
+		assert load_results_from_directory(path) == results
+		assert dict(load_results_from_directory(path, lazy=True)) == results
+
+
+def test_parquet_without_engine(monkeypatch):
+	# assert that the missing Parquet engine is reported before anything is written
+	monkeypatch.setattr(backpack_io, 'PARQUET_ENGINES', ('no_such_parquet_engine',))
+	with TemporaryDirectory() as path:
+		with pytest.raises(ImportError):
+			save_backpack_to_directory(INPUTS_CLUSTER_POOL, path, file_format='parquet')
+		with pytest.raises(ImportError):
+			save_results_to_directory({'obj_value': 0.0, 'e_bat': {'CPE#1': [0.0]}}, path, file_format='parquet')
+		assert not os.listdir(path)
+
+
+if __name__ == '__main__':
+	test_backpack_npy_round_trip()
+	test_backpack_csv_with_series()
+	test_results_round_trip()
+	test_backpack_parquet_round_trip()
+	test_results_parquet_round_trip()
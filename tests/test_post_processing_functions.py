@@ -6,6 +6,7 @@ from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing
 )
 
 # import optimization and post-processing module
+from copy import deepcopy
 from rec_sizing.optimization_functions import *
 from rec_sizing.post_processing_functions import *
 
@@ -18,10 +19,43 @@ def test_collective_pool_milp_postprocessing():
     results = run_pre_collective_pool_milp(INPUTS_INSTALL_POOL_PP)
     # post-processing
     results_pp = run_post_processing(results, INPUTS_INSTALL_POOL_PP, INPUTS_OWNERSHIP_PP)
+    assert results_pp.pop('validation')['passed']
 
     for ki, valu in results_pp.items():
         assert valu == OUTPUTS_INSTALL_POOL_PP.get(ki), f'{ki}'
 
 
+def test_post_processing_from_outputs():
+    """post-processing of known optimization outputs, without solving the MILP"""
+    pp_keys = ['retailer_exchanges_cost', 'sc_tariff_cost', 'contractedpower_cost', 'batteries_investments_cost',
+               'PV_investments_cost', 'sold_position', 'internal_market', 'installation_cost_compensations',
+               'member_cost_installation', 'member_cost', 'member_cost_compensations_installation',
+               'member_cost_compensations']
+    inputs = deepcopy(INPUTS_INSTALL_POOL_PP)
+    inputs['nr_days_old'] = inputs['nr_days']
+    results = {key: val for key, val in OUTPUTS_INSTALL_POOL_PP.items() if key not in pp_keys}
+    results_pp = run_post_processing(results, inputs, INPUTS_OWNERSHIP_PP)
+
+    for key in pp_keys:
+        assert results_pp[key] == OUTPUTS_INSTALL_POOL_PP[key], f'{key}'
+
+
+def test_ownership_shares_validation():
+    """ownership shares of a meter that do not sum to 1 are rejected"""
+    inputs_pp = deepcopy(INPUTS_OWNERSHIP_PP)
+    meter_id = next(iter(inputs_pp['ownership']))
+    member_id = next(iter(inputs_pp['ownership'][meter_id]))
+    inputs_pp['ownership'][meter_id][member_id] += 0.1
+
+    try:
+        ownership_matrix(inputs_pp)
+    except ValueError as err:
+        assert meter_id in str(err)
+    else:
+        raise AssertionError('ownership shares that do not sum to 1 were accepted')
+
+
 if __name__ == '__main__':
     test_collective_pool_milp_postprocessing()
+    test_post_processing_from_outputs()
+    test_ownership_shares_validation()
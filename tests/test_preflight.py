@@ -0,0 +1,52 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+from rec_sizing.optimization.helpers.preflight_helpers import check_backpack
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+def _issues(backpack):
+	try:
+		check_backpack(backpack)
+	except ValueError as err:
+		return str(err)
+	return ''
+
+
+def test_check_backpack():
+	assert check_backpack(deepcopy(INPUTS_CLUSTER_POOL))
+
+	# assert that all issues are reported at once
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs['meters']['CPE#1']['e_c'] = inputs['meters']['CPE#1']['e_c'][:-1]
+	inputs['meters']['CPE#1']['l_buy'] = 'unknown_tariff'
+	inputs['meters']['CPE#2']['p_gn_min'] = inputs['meters']['CPE#2']['p_gn_max'] + 1
+	issues = _issues(inputs)
+	assert issues.startswith('3 issue(s)')
+	assert 'e_c of meter CPE#1 has shape (47,); expected 48 time steps' in issues
+	assert 'l_buy of meter CPE#1 references an unknown series "unknown_tariff"' in issues
+	assert 'meter CPE#2: p_gn_min' in issues
+
+
+def test_no_storage_feasibility():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	meter_data = inputs['meters']['CPE#1']
+	meter_data['e_bn_init'] = meter_data['e_bn_min'] = meter_data['e_bn_max'] = 0
+	meter_data['p_meter_max'] = 0.5 * max(meter_data['e_c']) / inputs['delta_t']
+	if min(meter_data['e_g_factor']) > 0:
+		meter_data['e_g_factor'][meter_data['e_c'].index(max(meter_data['e_c']))] = 0
+	meter_data['p_gn_init'] = meter_data['p_gn_min'] = meter_data['p_gn_max'] = 0
+	assert 'meter CPE#1: without storage or generation, the load exceeds p_meter_max' in _issues(inputs)
+
+	# assert that the entry point runs the checks before building the MILP
+	try:
+		run_pre_collective_pool_milp(inputs, solver='CBC')
+	except ValueError as err:
+		assert 'p_meter_max' in str(err)
+	else:
+		raise AssertionError('an infeasible backpack was not rejected')
+
+
+if __name__ == '__main__':
+	test_check_backpack()
+	test_no_storage_feasibility()
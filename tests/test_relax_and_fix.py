@@ -0,0 +1,35 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import (
+	run_pre_collective_pool_milp,
+	run_relax_and_fix_collective_pool_milp
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+def test_relax_and_fix():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs.pop('nr_clusters', None)
+	full_results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC')
+	results = run_relax_and_fix_collective_pool_milp(deepcopy(inputs), solver='CBC')
+	# assert that the LP relaxation bounds the MILP optimum from below
+	assert results['lower_bound'] <= full_results['obj_value'] + 1e-3
+	assert set(results['relaxed_plan']) == {'p_cont', 'p_gn_new', 'e_bn_new'}
+	# assert that the relax-and-fix solution is feasible and bounds the MILP optimum from above (within the gap)
+	outputs = results['outputs']
+	assert outputs['milp_status'] == 'Optimal'
+	assert outputs['obj_value'] >= full_results['obj_value'] * 0.99 - 1e-3
+	assert all(val in [0, 1] for values in outputs['delta_sup'].values() for val in values)
+	assert 0 <= results['gap'] <= 1
+
+
+def test_lp_relaxation_only():
+	results = run_relax_and_fix_collective_pool_milp(deepcopy(INPUTS_CLUSTER_POOL), relax_and_fix=False, solver='CBC')
+	assert results['lower_bound'] is not None
+	assert results['outputs'] == {}
+	assert results['gap'] is None
+
+
+if __name__ == '__main__':
+	test_relax_and_fix()
+	test_lp_relaxation_only()
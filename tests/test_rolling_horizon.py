@@ -0,0 +1,81 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import (
+	run_pre_collective_pool_milp,
+	run_rolling_horizon_collective_pool_milp
+)
+from rec_sizing.optimization.helpers.backpack_helpers import slice_backpack
+from rec_sizing.optimization.module.rolling_horizon import carried_soc
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import (
+	INPUTS_CLUSTER_POOL,
+	INPUTS_NO_INSTALL_POOL
+)
+
+
+def test_slice_backpack():
+	sliced = slice_backpack(INPUTS_CLUSTER_POOL, 24, 48)
+	# assert the sliced horizon and time series
+	assert sliced['nr_days'] == 1
+	assert sliced['l_grid'] == INPUTS_CLUSTER_POOL['l_grid'][24:48]
+	assert sliced['meters']['CPE#1']['e_c'] == INPUTS_CLUSTER_POOL['meters']['CPE#1']['e_c'][24:48]
+	# assert that scalar parameters are kept
+	assert sliced['meters']['CPE#1']['p_meter_max'] == INPUTS_CLUSTER_POOL['meters']['CPE#1']['p_meter_max']
+
+
+def test_rolling_horizon_single_window():
+	# a single window must reproduce the full MILP when no investments are possible
+	full_results = run_pre_collective_pool_milp(deepcopy(INPUTS_NO_INSTALL_POOL), solver='CBC')
+	results = run_rolling_horizon_collective_pool_milp(deepcopy(INPUTS_NO_INSTALL_POOL), solver='CBC')
+	assert results['milp_status'] == 'Optimal'
+	assert round(results['obj_value'], 3) == round(full_results['obj_value'], 3)
+
+
+def test_rolling_horizon_two_phase():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	results = run_rolling_horizon_collective_pool_milp(inputs, window_days=1, overlap_days=0, two_phase=True,
+													   solver='CBC')
+	assert results['milp_status'] == 'Optimal'
+	# assert that the full horizon is covered
+	assert all(len(e_bat) == 48 for e_bat in results['e_bat'].values())
+	assert len(results['dual_prices']) == 48
+	# assert that the objective value is the sum of the individual costs
+	assert round(sum(results['c_ind2pool'].values()), 2) == round(results['obj_value'], 2)
+
+
+def test_carried_soc():
+	outputs = {'e_bn_total': {'CPE#1': 2.0, 'CPE#2': 0.0}, 'e_bat': {'CPE#1': [0.5, 1.0, 2.5], 'CPE#2': [0.0] * 3}}
+	soc = carried_soc(outputs, INPUTS_CLUSTER_POOL, 1)
+	# assert that the state of charge is retrieved at the given step, and soc_min for meters without storage
+	assert soc == {'CPE#1': 50.0, 'CPE#2': INPUTS_CLUSTER_POOL['meters']['CPE#2']['soc_min']}
+	# assert that the solver's numerical noise is clipped to the admissible range
+	assert carried_soc(outputs, INPUTS_CLUSTER_POOL, 2)['CPE#1'] == INPUTS_CLUSTER_POOL['meters']['CPE#1']['soc_max']
+
+
+def test_rolling_horizon_storage_seam():
+	# cheap energy at the last step of the first day and expensive energy in the first steps of the second day
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	for meter_data in inputs['meters'].values():
+		meter_data['l_buy'] = meter_data['l_buy'][:23] + [0.01] + [1.0] * 4 + meter_data['l_buy'][28:]
+	investments = {key: {meter_id: 0.0 for meter_id in inputs['meters']} for key in ['p_gn_new', 'e_bn_new']}
+	results = run_rolling_horizon_collective_pool_milp(inputs, window_days=2, overlap_days=1, investments=investments,
+													   solver='CBC')
+	assert results['milp_status'] == 'Optimal'
+
+	meter_data = inputs['meters']['CPE#1']
+	e_bat = results['e_bat']['CPE#1']
+	# assert that the storage is charged across the seam between the windows, instead of being reset at midnight
+	assert e_bat[23] > meter_data['soc_min'] / 100 * results['e_bn_total']['CPE#1'] + 1e-3
+	# assert that the energy content of the second window starts from the one carried from the first window
+	e_bc = results['e_bc']['CPE#1'][24]
+	e_bd = results['e_bd']['CPE#1'][24]
+	assert abs(e_bat[24] - (e_bat[23] + e_bc * meter_data['eff_bc'] - e_bd / meter_data['eff_bd'])) <= 1e-5
+	# assert that the storage returns to its initial state of charge at the end of the horizon
+	assert abs(e_bat[-1] - meter_data['soc_min'] / 100 * results['e_bn_total']['CPE#1']) <= 1e-5
+
+
+if __name__ == '__main__':
+	test_slice_backpack()
+	test_rolling_horizon_single_window()
+	test_rolling_horizon_two_phase()
+	test_carried_soc()
+	test_rolling_horizon_storage_seam()
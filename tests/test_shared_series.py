@@ -0,0 +1,62 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import (
+	run_clustering_kmedoids,
+	run_pre_collective_pool_milp
+)
+from rec_sizing.clustering.structures.I_O_clustering import CLUSTERING_INPUTS
+from rec_sizing.optimization.helpers.backpack_helpers import resolve_series
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+def _inputs_with_shared_series(inputs):
+	# make all meters reference the tariffs and generation profile of the first meter, as named series
+	inputs = deepcopy(inputs)
+	meters = inputs['meters'] if 'meters' in inputs else inputs['timeseries_data']
+	first_meter = next(iter(meters.values()))
+	inputs['series'] = {}
+	for key in ['l_buy', 'l_sell', 'e_g_factor']:
+		inputs['series'][f'shared_{key}'] = first_meter[key]
+		for meter_data in meters.values():
+			meter_data[key] = f'shared_{key}'
+	return inputs
+
+
+def _inputs_with_copied_series(inputs):
+	# the same data as in _inputs_with_shared_series, but with one copy of each array per meter
+	inputs = _inputs_with_shared_series(inputs)
+	resolve_series(inputs)
+	inputs.pop('series')
+	return deepcopy(inputs)
+
+
+def test_resolve_series():
+	inputs = _inputs_with_shared_series(INPUTS_CLUSTER_POOL)
+	assert inputs['series']
+	resolve_series(inputs)
+	meters = list(inputs['meters'].values())
+	for key in ['l_buy', 'l_sell', 'e_g_factor']:
+		# assert that the meters share the same array
+		assert meters[0][key] is meters[1][key]
+		assert meters[0][key] == INPUTS_CLUSTER_POOL['meters']['CPE#1'][key]
+
+
+def test_clustering_shared_series():
+	inputs = _inputs_with_shared_series(CLUSTERING_INPUTS)
+	outputs = run_clustering_kmedoids(inputs)
+	for series_name, representative_days in outputs['representative_series'].items():
+		key = series_name.replace('shared_', '')
+		for meter_id in inputs['timeseries_data']:
+			assert outputs[f'representative_{key}'][meter_id] == representative_days
+
+
+def test_run_pre_shared_series():
+	results = run_pre_collective_pool_milp(_inputs_with_copied_series(INPUTS_CLUSTER_POOL), solver='CBC')
+	shared_results = run_pre_collective_pool_milp(_inputs_with_shared_series(INPUTS_CLUSTER_POOL), solver='CBC')
+	assert abs(shared_results['obj_value'] - results['obj_value']) <= 0.01 * abs(results['obj_value']) + 1e-3
+
+
+if __name__ == '__main__':
+	test_resolve_series()
+	test_clustering_shared_series()
+	test_run_pre_shared_series()
@@ -0,0 +1,109 @@
+import os
+import pytest
+import subprocess
+import sys
+
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+
+from rec_sizing.optimization.module.solver_progress import (
+	GapStagnationRule,
+	parse_cbc_line,
+	parse_cplex_line,
+	parse_highs_line,
+	SolverMonitor
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_INSTALL_POOL
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+
+
+# Script that mimics a solver: it writes CBC log lines until interrupted, and then reports its incumbent and exits
+FAKE_SOLVER = '''
+import signal, sys, time
+def interrupt(*args):
+	print('Cbc0005I Partial search - best objective 10.5 (best possible 9), took 100 iterations and 7 nodes (1 seconds)')
+	sys.exit(0)
+signal.signal(signal.SIGINT, interrupt)
+print('Cbc0013I At root node, 5 cuts changed objective from 8 to 9 in 3 passes', flush=True)
+print('Cbc0012I Integer solution of 10.5 found by RINS after 50 iterations and 2 nodes (0.5 seconds)', flush=True)
+time.sleep(60)
+'''
+
+
+def test_parse_cbc_line():
+	assert parse_cbc_line('Cbc0012I Integer solution of 63.653858 found by DiveCoefficient after 4331 iterations and '
+						  '2 nodes (8.46 seconds)') == {'incumbent': 63.653858, 'nodes': 2}
+	assert parse_cbc_line('Cbc0010I After 600 nodes, 288 on tree, 62.602232 best solution, best possible 61.956672 '
+						  '(49.80 seconds)') == {'incumbent': 62.602232, 'bound': 61.956672, 'nodes': 600}
+	assert parse_cbc_line('Cbc0010I After 0 nodes, 1 on tree, 1e+50 best solution, best possible 61.956672 '
+						  '(5.25 seconds)') == {'incumbent': None, 'bound': 61.956672, 'nodes': 0}
+	assert parse_cbc_line('Cbc0013I At root node, 752 cuts changed objective from 60.510618 to 61.956672 in 10 '
+						  'passes') == {'bound': 61.956672}
+	assert parse_cbc_line('Cbc0005I Partial search - best objective 62.602232 (best possible 61.956672), took 30230 '
+						  'iterations and 783 nodes (57.00 seconds)') == \
+		{'incumbent': 62.602232, 'bound': 61.956672, 'nodes': 783}
+	assert parse_cbc_line('Cbc0038I Full problem 1000 rows 800 columns') is None
+
+
+def test_parse_highs_and_cplex_lines():
+	assert parse_highs_line(' H       0       0         0   0.00%   40.34041213     42.37503681        4.80%      0'
+							'      0      0      1234     0.5s') == \
+		{'incumbent': 42.37503681, 'bound': 40.34041213, 'nodes': 0}
+	assert parse_highs_line('         0       0         0   0.00%   40.34041213     inf                  inf        0'
+							'      0      0         0     0.1s')['incumbent'] is None
+	assert parse_cplex_line('*     0+    0                           42.3750       40.3404             4.80%') == \
+		{'nodes': 0, 'incumbent': 42.375, 'bound': 40.3404}
+	assert parse_cplex_line('    100    50       41.0000    12       42.3750       40.9000     5000    3.48%') == \
+		{'nodes': 100, 'incumbent': 42.375, 'bound': 40.9}
+	assert parse_cplex_line('      0     2       40.3404   250                     40.3404     2263') == \
+		{'nodes': 0, 'bound': 40.3404}
+	assert parse_cplex_line('        Nodes                                         Cuts/') is None
+
+
+def test_gap_stagnation_rule():
+	rule = GapStagnationRule(min_improvement=0.01, window=10)
+	assert not rule({'elapsed': 0, 'gap': None})
+	assert not rule({'elapsed': 1, 'gap': 0.10})
+	assert not rule({'elapsed': 8, 'gap': 0.095})  # improvement below min_improvement
+	assert not rule({'elapsed': 9, 'gap': 0.08})  # improvement; the window restarts
+	assert not rule({'elapsed': 18, 'gap': 0.075})
+	assert rule({'elapsed': 19, 'gap': 0.075})
+	with pytest.raises(ValueError):
+		GapStagnationRule(window=0)
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason='the solver process is found through /proc')
+def test_solver_monitor_stops_solver():
+	with TemporaryDirectory() as path:
+		log_path = os.path.join(path, 'solver.log')
+		events = []
+		with open(log_path, 'w') as log_file, \
+				SolverMonitor(log_path, 'CBC', events.append, lambda event: True, poll_interval=0.05) as monitor:
+			solver = subprocess.Popen([sys.executable, '-c', FAKE_SOLVER], stdout=log_file)
+			assert solver.wait(timeout=30) == 0
+
+	# assert that the solver was interrupted as soon as it had an incumbent, and reported it
+	assert monitor.stopped_early
+	assert events[-1]['incumbent'] == 10.5
+	assert events[-1]['bound'] == 9
+	assert events[-1]['nodes'] == 7
+	assert abs(events[-1]['gap'] - 1.5 / 10.5) < 1e-9
+
+
+def test_progress_callback():
+	events = []
+	results = run_pre_collective_pool_milp(deepcopy(INPUTS_INSTALL_POOL), solver='CBC', progress_callback=events.append)
+
+	# assert that the solver's progress was reported, ending with the returned solution
+	assert results['milp_status'] == 'Optimal'
+	assert events
+	assert all(event['solver'] == 'CBC' for event in events)
+	assert abs(events[-1]['incumbent'] - results['obj_value']) < 1e-3
+
+
+if __name__ == '__main__':
+	test_parse_cbc_line()
+	test_parse_highs_and_cplex_lines()
+	test_gap_stagnation_rule()
+	test_solver_monitor_stops_solver()
+	test_progress_callback()
@@ -0,0 +1,88 @@
+import pytest
+
+from copy import deepcopy
+
+from rec_sizing.optimization.helpers.backpack_helpers import scenario_backpacks
+from rec_sizing.optimization.helpers.outputs_helpers import INVESTMENT_KEYS
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_INSTALL_POOL
+from rec_sizing.optimization_functions import (
+	run_pre_collective_pool_milp,
+	run_stochastic_collective_pool_milp
+)
+
+
+def _two_scenarios(inputs):
+	# a likely scenario as the backpack and a less likely one with a larger, more expensive consumption of one meter
+	meter_id, meter_data = next(iter(inputs['meters'].items()))
+	return [
+		{'weight': 2},
+		{'weight': 1, 'meters': {meter_id: {'e_c': [val * 1.5 for val in meter_data['e_c']],
+											'l_buy': [val * 1.2 for val in meter_data['l_buy']]}}}
+	]
+
+
+def test_scenario_backpacks():
+	inputs = deepcopy(INPUTS_INSTALL_POOL)
+	inputs['scenarios'] = _two_scenarios(inputs)
+	backpacks, weights = scenario_backpacks(inputs)
+	# assert that the weights are normalized and that only the scenario's time series are overridden
+	assert abs(weights[0] - 2 / 3) <= 1e-9 and abs(weights[1] - 1 / 3) <= 1e-9
+	assert all('scenarios' not in backpack for backpack in backpacks)
+	assert backpacks[0]['meters'] == inputs['meters']
+	meter_id = next(iter(inputs['meters']))
+	assert backpacks[1]['meters'][meter_id]['e_c'] == inputs['scenarios'][1]['meters'][meter_id]['e_c']
+	assert backpacks[1]['meters'][meter_id]['e_g_factor'] == inputs['meters'][meter_id]['e_g_factor']
+
+	# assert that non-valid scenarios are rejected
+	for scenarios in [[], [{'weight': 0}], [{'weight': 1, 'meters': {'unknown': {'e_c': [0.0]}}}],
+					  [{'weight': 1, 'meters': {meter_id: {'p_gn_max': 1.0}}}], [{'weight': 1, 'tariffs': []}]]:
+		inputs['scenarios'] = scenarios
+		with pytest.raises(ValueError):
+			scenario_backpacks(inputs)
+
+
+def test_single_scenario():
+	inputs = deepcopy(INPUTS_INSTALL_POOL)
+	expected_results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC', mipgap=0)
+	inputs['scenarios'] = [{'weight': 0.5}]
+	results = run_stochastic_collective_pool_milp(deepcopy(inputs), solver='CBC', mipgap=0)
+
+	# assert that a single scenario is sized as the deterministic MILP
+	assert results['milp_status'] == 'Optimal'
+	assert results['weights'] == [1.0]
+	assert results['expected_cost'] == expected_results['obj_value']
+	assert set(results['scenarios'][0]) == set(expected_results)
+
+
+def _assert_stochastic_results(method, expected_status):
+	inputs = deepcopy(INPUTS_INSTALL_POOL)
+	inputs['scenarios'] = _two_scenarios(inputs)
+	extensive_results = run_stochastic_collective_pool_milp(deepcopy(inputs), solver='CBC', mipgap=0)
+	results = run_stochastic_collective_pool_milp(deepcopy(inputs), method=method, n_jobs=1, solver='CBC', mipgap=0)
+
+	# assert that the investments are shared by all scenarios and that the expected cost adds up
+	assert results['milp_status'] == expected_status
+	assert len(results['scenarios']) == 2
+	for scenario_outputs in results['scenarios']:
+		assert all(scenario_outputs[key] == results['investments'][key] for key in INVESTMENT_KEYS)
+		assert round(sum(scenario_outputs['c_ind2pool'].values()), 3) == scenario_outputs['obj_value']
+	expected_cost = sum(weight * cost for weight, cost in zip(results['weights'], results['scenario_costs']))
+	assert abs(results['expected_cost'] - expected_cost) <= 1e-3
+	# assert that no method outperforms the extensive form's optimum and that the costlier scenario costs more
+	assert results['expected_cost'] >= extensive_results['expected_cost'] - 1e-3
+	assert max(results['scenario_costs']) == results['scenario_costs'][1]
+
+
+def test_extensive_form():
+	_assert_stochastic_results('extensive', 'Optimal')
+
+
+def test_progressive_hedging():
+	_assert_stochastic_results('progressive_hedging', 'Heuristic')
+
+
+if __name__ == '__main__':
+	test_scenario_backpacks()
+	test_single_scenario()
+	test_extensive_form()
+	test_progressive_hedging()
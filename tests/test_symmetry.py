@@ -0,0 +1,76 @@
+from copy import deepcopy
+
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+from rec_sizing.optimization.helpers.symmetry_helpers import (
+	aggregate_meter_groups,
+	exact_aggregation_groups,
+	expand_meter_groups,
+	identical_meter_groups
+)
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+
+
+def _inputs_with_twin_meter():
+	inputs = deepcopy(INPUTS_CLUSTER_POOL)
+	inputs['meters']['CPE#1_twin'] = deepcopy(inputs['meters']['CPE#1'])
+	return inputs
+
+
+def test_identical_meter_groups():
+	inputs = _inputs_with_twin_meter()
+	groups = identical_meter_groups(inputs)
+	assert groups == [['CPE#1', 'CPE#1_twin'], ['CPE#2']]
+
+	# assert that the representative meter is scaled and that the outputs are split back evenly
+	aggregated = aggregate_meter_groups(inputs, groups)
+	assert list(aggregated['meters']) == ['CPE#1', 'CPE#2']
+	assert aggregated['meters']['CPE#1']['e_c'][0] == 2 * inputs['meters']['CPE#1']['e_c'][0]
+	assert aggregated['meters']['CPE#1']['l_buy'] == inputs['meters']['CPE#1']['l_buy']
+	outputs = {'p_gn_new': {'CPE#1': 2.0, 'CPE#2': 1.0}, 'delta_sup': {'CPE#1': [1, 0], 'CPE#2': [0, 0]}}
+	expanded = expand_meter_groups(outputs, groups)
+	assert expanded['p_gn_new'] == {'CPE#1': 1.0, 'CPE#1_twin': 1.0, 'CPE#2': 1.0}
+	assert expanded['delta_sup']['CPE#1_twin'] == [1, 0]
+
+
+def test_symmetry_modes():
+	full_results = run_pre_collective_pool_milp(_inputs_with_twin_meter(), solver='CBC')
+	for symmetry in ['aggregate', 'order']:
+		results = run_pre_collective_pool_milp(_inputs_with_twin_meter(), solver='CBC', symmetry=symmetry)
+		assert set(results['c_ind2pool']) == {'CPE#1', 'CPE#1_twin', 'CPE#2'}
+		assert abs(results['obj_value'] - full_results['obj_value']) <= 0.01 * abs(full_results['obj_value']) + 1e-3
+		assert round(sum(results['c_ind2pool'].values()), 2) == round(results['obj_value'], 2)
+
+
+def _inputs_with_inflexible_twin_meters():
+	inputs = _inputs_with_twin_meter()
+	for meter_id in ['CPE#1', 'CPE#1_twin']:
+		inputs['meters'][meter_id].update({'e_bn_init': 0.0, 'e_bn_max': 0.0})
+	return inputs
+
+
+def test_exact_aggregation_groups():
+	# meters with storage may be better operated differently, so their group is only ordered
+	inputs = _inputs_with_twin_meter()
+	groups = identical_meter_groups(inputs)
+	assert exact_aggregation_groups(inputs, groups) == ([['CPE#1'], ['CPE#1_twin'], ['CPE#2']],
+														[['CPE#1', 'CPE#1_twin']])
+	# meters with fixed net loads never trade with each other, so their group is aggregated
+	inputs = _inputs_with_inflexible_twin_meters()
+	assert exact_aggregation_groups(inputs, groups) == (groups, [])
+
+
+def test_exact_aggregation():
+	inputs = _inputs_with_inflexible_twin_meters()
+	full_results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC', mipgap=0)
+	results = run_pre_collective_pool_milp(deepcopy(inputs), solver='CBC', mipgap=0, symmetry='aggregate')
+	# assert that the aggregated MILP reaches the optimum of the full MILP
+	assert results['milp_status'] == 'Optimal'
+	assert abs(results['obj_value'] - full_results['obj_value']) <= 1e-3
+	assert results['e_sup']['CPE#1'] == results['e_sup']['CPE#1_twin']
+
+
+if __name__ == '__main__':
+	test_identical_meter_groups()
+	test_symmetry_modes()
+	test_exact_aggregation_groups()
+	test_exact_aggregation()
@@ -0,0 +1,43 @@
+from copy import deepcopy
+
+from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing import (
+	INPUTS_INSTALL_POOL_PP,
+	INPUTS_OWNERSHIP_PP
+)
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+from rec_sizing.post_processing_functions import (
+	run_post_processing,
+	run_validation
+)
+
+
+def test_validation_levels():
+	inputs = deepcopy(INPUTS_INSTALL_POOL_PP)
+	results = run_pre_collective_pool_milp(inputs, solver='CBC')
+	results_pp = run_post_processing(deepcopy(results), inputs, INPUTS_OWNERSHIP_PP, validation='off')
+	validated_results_pp = run_post_processing(deepcopy(results), inputs, INPUTS_OWNERSHIP_PP, validation='full')
+
+	# assert that the validation only adds its report to the results
+	assert 'validation' not in results_pp
+	assert set(validated_results_pp) - set(results_pp) == {'validation'}
+
+	assert run_validation(results_pp, inputs, level='off') == {'level': 'off', 'checks': [], 'passed': True}
+	fast_report = run_validation(results_pp, inputs, level='fast')
+	full_report = run_validation(results_pp, inputs, level='full')
+	assert validated_results_pp['validation'] == full_report
+	assert fast_report['passed'] and len(fast_report['checks']) == 4
+	assert full_report['passed'] and len(full_report['checks']) > len(fast_report['checks'])
+
+	# assert that a violated market equilibrium is reported
+	meter_id = next(iter(results_pp['e_sale_pool']))
+	results_pp['e_sale_pool'][meter_id][0] += 1.0
+	full_report = run_validation(results_pp, inputs, level='full')
+	failed_checks = [check['name'] for check in full_report['checks'] if not check['passed']]
+	assert not full_report['passed']
+	assert 'Market equilibrium (Eq. 17)' in failed_checks
+	check = next(check for check in full_report['checks'] if check['name'] == 'Market equilibrium (Eq. 17)')
+	assert abs(check['residual'] - 1.0) < 1e-6 and check['nr_violations'] == 1
+
+
+if __name__ == '__main__':
+	test_validation_levels()
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+
+from copy import deepcopy
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import rec_sizing.optimization_functions as optimization_functions
+
+from rec_sizing.optimization.structures.I_O_collective_pool_milp import INPUTS_CLUSTER_POOL
+from rec_sizing.optimization.structures.I_O_collective_pool_milp_postprocessing import (
+	INPUTS_INSTALL_POOL_PP,
+	INPUTS_OWNERSHIP_PP
+)
+from rec_sizing.optimization_functions import run_pre_collective_pool_milp
+from rec_sizing.persistence_functions import load_results_from_directory
+from rec_sizing.worker import (
+	serve_queue,
+	serve_socket,
+	submit_to_socket,
+	WorkerPool
+)
+
+
+def test_clustering_cache():
+	optimization_functions._clustering_cache.clear()
+	expected_results = run_pre_collective_pool_milp(deepcopy(INPUTS_CLUSTER_POOL), solver='CBC')
+	assert len(optimization_functions._clustering_cache) == 1
+
+	# assert that a backpack with the same data reuses the cached clustering outputs
+	with mock.patch.object(optimization_functions, 'run_clustering_kmedoids') as clustering:
+		results = run_pre_collective_pool_milp(deepcopy(INPUTS_CLUSTER_POOL), solver='CBC')
+	clustering.assert_not_called()
+	assert results['obj_value'] == expected_results['obj_value']
+
+
+def test_worker_pool_socket():
+	with TemporaryDirectory() as path, WorkerPool(nr_workers=1, max_rss_mb=1, log_level='WARNING') as pool:
+		socket_path = os.path.join(path, 'rec_sizing.sock')
+		server = threading.Thread(target=serve_socket, args=(pool, socket_path))
+		server.start()
+		while not os.path.exists(socket_path):
+			server.join(0.05)
+
+		job = {'id': 'socket_job', 'backpack': INPUTS_INSTALL_POOL_PP, 'ownership': INPUTS_OWNERSHIP_PP,
+			   'solver': 'CBC'}
+		summaries = [submit_to_socket(socket_path, job) for _ in range(2)]
+		invalid_summary = submit_to_socket(socket_path, {**job, 'profile': 'unknown'})
+		stats = submit_to_socket(socket_path, {'command': 'stats'})
+		submit_to_socket(socket_path, {'command': 'shutdown'})
+		server.join()
+
+	# assert that the results are returned and that the worker was recycled after each job (memory limit of 1 MB)
+	expected_results = run_pre_collective_pool_milp(deepcopy(INPUTS_INSTALL_POOL_PP), solver='CBC')
+	for summary in summaries:
+		assert summary['job'] == 'socket_job'
+		assert summary['status'] == 'Optimal'
+		assert round(summary['results']['obj_value'], 3) == round(expected_results['obj_value'], 3)
+		assert 'member_cost' in summary['results']
+	assert summaries[0]['worker'] != summaries[1]['worker']
+	assert invalid_summary['status'] == 'Error'
+	assert stats['completed'] == 2
+	assert stats['failed'] == 1
+	assert stats['recycled'] == 3
+	assert stats['crashed'] == 0
+
+
+def test_worker_pool_queue():
+	with TemporaryDirectory() as path, WorkerPool(nr_workers=2, log_level='WARNING') as pool:
+		queue_path = os.path.join(path, 'queue')
+		backpack_path = os.path.join(path, 'backpack.json')
+		with open(backpack_path, 'w') as backpack_file:
+			json.dump(INPUTS_INSTALL_POOL_PP, backpack_file)
+		os.makedirs(os.path.join(queue_path, 'incoming'))
+		for job_name in ['job_1', 'job_2']:
+			with open(os.path.join(queue_path, 'incoming', f'{job_name}.json'), 'w') as job_file:
+				json.dump({'backpack': backpack_path, 'profile': 'cbc'}, job_file)
+
+		serve_queue(pool, queue_path, poll_interval=0.1, drain=True)
+
+		# assert that the jobs' summaries and results were written and the queue emptied
+		assert os.listdir(os.path.join(queue_path, 'incoming')) == []
+		assert os.listdir(os.path.join(queue_path, 'processing')) == []
+		for job_name in ['job_1', 'job_2']:
+			with open(os.path.join(queue_path, 'done', f'{job_name}.json')) as summary_file:
+				summary = json.load(summary_file)
+			assert summary['job'] == job_name
+			assert summary['status'] == 'Optimal'
+			results = load_results_from_directory(os.path.join(queue_path, 'done', job_name))
+			assert results['obj_value'] == summary['obj_value']
+
+
+if __name__ == '__main__':
+	test_clustering_cache()
+	test_worker_pool_socket()
+	test_worker_pool_queue()